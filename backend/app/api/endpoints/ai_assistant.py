@@ -1,23 +1,36 @@
 """
 AI 助手 API 端点
 """
-from fastapi import APIRouter, HTTPException
-from typing import List, Optional
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, AsyncIterator, Tuple, Any
+from pydantic import BaseModel, field_validator
+from sqlalchemy.ext.asyncio import AsyncSession
+import json
 import logging
+import math
 
-from ...services.ai_service import ai_manager
+from ...core.config import AI_BATCH_CONFIG
+from ...core.database import get_async_db
+
+from ...services.ai_service import ai_manager, http_client_pool, ThinkingChainParser
+from ...services.context_retrieval import context_retriever, CONTEXT_SOURCES
+from ...services.prompt_builder import PromptBuilder
+from ...services.consistency_service import consistency_checker, load_consistency_material
+from ...services.structured_output import StructuredOutputError
+from ...services.ai_rate_limit import RateLimitExceeded, set_quota_project
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
 def build_kwargs(request):
-    """构建AI参数"""
+    """构建AI参数（同时记录请求所属项目，用于限流时跨项目公平排队）"""
+    set_quota_project(getattr(request, "project_id", None))
     kwargs = {}
     if request.max_tokens:
         kwargs["max_tokens"] = request.max_tokens
-    if request.temperature:
+    if request.temperature is not None:
         kwargs["temperature"] = request.temperature
     if hasattr(request, 'top_p') and request.top_p:
         kwargs["top_p"] = request.top_p
@@ -25,6 +38,8 @@ def build_kwargs(request):
         kwargs["frequency_penalty"] = request.frequency_penalty
     if hasattr(request, 'presence_penalty') and request.presence_penalty:
         kwargs["presence_penalty"] = request.presence_penalty
+    if getattr(request, 'use_cache', None) is not None:
+        kwargs["use_cache"] = request.use_cache
     return kwargs
 
 
@@ -43,6 +58,7 @@ class ChatRequest(BaseModel):
     top_p: Optional[float] = None
     frequency_penalty: Optional[float] = None
     presence_penalty: Optional[float] = None
+    use_cache: Optional[bool] = None  # None: 仅 temperature 为 0 时缓存；True: 强制缓存；False: 不使用缓存
 
 
 class GenerateRequest(BaseModel):
@@ -50,11 +66,75 @@ class GenerateRequest(BaseModel):
     prompt: str
     project_id: Optional[int] = None
     context_type: Optional[str] = None  # setting, character, plot, chapter
+    use_context: bool = True  # 携带 project_id 时检索项目资料作为上下文
+    context_types: Optional[List[str]] = None  # 限定检索的资料类型：chapter, character, world_setting, timeline
+    context_budget: Optional[int] = None  # 资料上下文的token预算，默认取配置
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+    top_p: Optional[float] = None
+    frequency_penalty: Optional[float] = None
+    presence_penalty: Optional[float] = None
+    use_cache: Optional[bool] = None  # None: 仅 temperature 为 0 时缓存；True: 强制缓存；False: 不使用缓存
+
+
+class BatchGenerateRequest(BaseModel):
+    """批量生成请求模型"""
+    prompts: List[str]
+    generation_type: Optional[str] = None  # world_setting, character, plot, continuation, consistency_check
+    project_id: Optional[int] = None
     max_tokens: Optional[int] = None
     temperature: Optional[float] = None
     top_p: Optional[float] = None
     frequency_penalty: Optional[float] = None
     presence_penalty: Optional[float] = None
+    use_cache: Optional[bool] = None
+
+
+class VolumeConsistencyRequest(BaseModel):
+    """整卷一致性检查请求模型"""
+    project_id: int
+    volume_id: Optional[int] = None  # 不指定时检查项目全部章节
+    chapter_ids: Optional[List[int]] = None  # 进一步限定章节
+    use_cache: bool = True  # 复用未修改章节的提取结果
+
+
+class CharacterExtractionRequest(BaseModel):
+    """人物提取请求模型"""
+    text: str  # 设定文档或章节正文
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None  # 默认为0，结果可被缓存
+    use_cache: Optional[bool] = None
+
+
+class ExtractedCharacter(BaseModel):
+    """从文本中提取的人物"""
+    name: str
+    gender: str = "未知"
+    age: str = "未知"
+    appearance: str = ""
+    personality: str = ""
+    background: str = ""
+    abilities: str = ""
+    importance: str = "次要"  # 主要 / 次要
+    notes: str = ""
+
+    @field_validator("gender", "age", "appearance", "personality", "background", "abilities", "importance", "notes",
+                     mode="before")
+    @classmethod
+    def _to_text(cls, value: Any) -> Any:
+        # 模型常把年龄输出为数字、把能力输出为列表
+        if value is None:
+            return ""
+        if isinstance(value, (int, float)):
+            return str(value)
+        if isinstance(value, list):
+            return "、".join(str(item) for item in value)
+        return value
+
+
+class CharacterExtractionResult(BaseModel):
+    """人物提取结果"""
+    characters: List[ExtractedCharacter] = []
 
 
 class ProviderSwitchRequest(BaseModel):
@@ -84,6 +164,19 @@ async def get_providers():
         raise HTTPException(status_code=500, detail="获取AI提供商列表失败")
 
 
+@router.get("/providers/stats")
+async def get_provider_stats():
+    """获取提供商池的路由顺序与各提供商的延迟、失败切换、对冲统计"""
+    try:
+        return {
+            **ai_manager.get_routing_stats(),
+            "status": "success"
+        }
+    except Exception as e:
+        logger.error(f"获取AI提供商统计失败: {e}")
+        raise HTTPException(status_code=500, detail="获取AI提供商统计失败")
+
+
 @router.post("/switch-provider")
 async def switch_provider(request: ProviderSwitchRequest):
     """切换AI提供商"""
@@ -130,14 +223,31 @@ async def get_config(provider: str):
 
 
 @router.get("/status")
-async def get_ai_status():
-    """获取AI服务状态"""
+async def get_ai_status(probe: bool = False):
+    """
+    获取AI服务状态
+
+    默认只读取健康监测的缓存状态，不发起请求（状态轮询不会产生付费调用）；
+    probe=true 时立即检查连接，不参与主动探测的提供商会发送一次真实请求
+    """
     try:
-        is_connected = await ai_manager.check_connection()
+        if probe:
+            is_connected = await ai_manager.check_connection()
+            health = ai_manager.get_health_status()
+            status = "online" if is_connected else "offline"
+        else:
+            health = ai_manager.get_health_status()
+            is_connected = health["healthy"] is True and not health["circuit_open"]
+            status = "unknown" if health["healthy"] is None else ("online" if is_connected else "offline")
         return {
             "provider": ai_manager.get_current_provider(),
             "connected": is_connected,
-            "status": "online" if is_connected else "offline"
+            "status": status,
+            "health": health,
+            "quota": ai_manager.get_quota_stats(),
+            "cache": ai_manager.get_cache_stats(),
+            "connection_pool": http_client_pool.get_stats(),
+            "context_retrieval": context_retriever.get_stats()
         }
     except Exception as e:
         logger.error(f"检查AI服务状态失败: {e}")
@@ -149,6 +259,20 @@ async def get_ai_status():
         }
 
 
+@router.delete("/cache")
+async def clear_cache():
+    """清空AI响应缓存"""
+    try:
+        await ai_manager.response_cache.clear()
+        return {
+            "message": "AI响应缓存已清空",
+            "status": "success"
+        }
+    except Exception as e:
+        logger.error(f"清空AI响应缓存失败: {e}")
+        raise HTTPException(status_code=500, detail=f"清空AI响应缓存失败: {str(e)}")
+
+
 @router.get("/ollama/models")
 async def get_ollama_models():
     """获取Ollama本地可用模型列表"""
@@ -376,56 +500,12 @@ async def get_ollama_model_info(model_name: str):
         raise HTTPException(status_code=500, detail=f"获取Ollama模型信息失败: {str(e)}")
 
 
-@router.post("/chat")
-async def chat_completion(request: ChatRequest):
-    """AI聊天对话"""
-    try:
-        # 检查AI服务状态
-        if not await ai_manager.check_connection():
-            raise HTTPException(
-                status_code=503,
-                detail=f"AI服务 ({ai_manager.get_current_provider()}) 连接失败，请检查配置和网络连接"
-            )
-
-        messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
-        kwargs = build_kwargs(request)
-
-        # 使用思维链处理
-        result = await ai_manager.chat_completion_with_thinking(messages, **kwargs)
-
-        return {
-            "response": result["content"],
-            "thinking": result["thinking"],
-            "raw_response": result["raw_response"],
-            "provider": ai_manager.get_current_provider(),
-            "status": "success"
-        }
-    except HTTPException:
-        raise
-    except ValueError as e:
-        logger.error(f"AI配置错误: {e}")
-        raise HTTPException(status_code=400, detail=f"AI配置错误: {str(e)}")
-    except Exception as e:
-        logger.error(f"AI聊天对话失败: {e}")
-        raise HTTPException(status_code=500, detail=f"AI聊天对话失败: {str(e)}")
-
-
-@router.post("/generate-setting")
-async def generate_setting(request: GenerateRequest):
-    """AI生成设定"""
-    try:
-        # 检查AI服务状态
-        if not await ai_manager.check_connection():
-            raise HTTPException(
-                status_code=503,
-                detail=f"AI服务 ({ai_manager.get_current_provider()}) 连接失败，请检查配置和网络连接"
-            )
-
-        # 构建设定生成的提示词
-        prompt = f"""
+# 各生成类型的提示词模板，{prompt} 为用户输入
+PROMPT_TEMPLATES = {
+    "world_setting": """
 请根据以下要求生成小说世界设定：
 
-{request.prompt}
+{prompt}
 
 请生成详细的世界设定，包括：
 1. 世界观背景
@@ -436,44 +516,11 @@ async def generate_setting(request: GenerateRequest):
 6. 特殊规则或法则
 
 请用中文回答，格式清晰，内容丰富。
-"""
-
-        kwargs = build_kwargs(request)
-        result = await ai_manager.generate_text_with_thinking(prompt, **kwargs)
-
-        return {
-            "content": result["content"],
-            "thinking": result["thinking"],
-            "raw_response": result["raw_response"],
-            "type": "world_setting",
-            "provider": ai_manager.get_current_provider(),
-            "status": "success"
-        }
-    except HTTPException:
-        raise
-    except ValueError as e:
-        logger.error(f"AI配置错误: {e}")
-        raise HTTPException(status_code=400, detail=f"AI配置错误: {str(e)}")
-    except Exception as e:
-        logger.error(f"AI生成设定失败: {e}")
-        raise HTTPException(status_code=500, detail=f"AI生成设定失败: {str(e)}")
-
-
-@router.post("/generate-character")
-async def generate_character(request: GenerateRequest):
-    """AI生成人物"""
-    try:
-        # 检查AI服务状态
-        if not await ai_manager.check_connection():
-            raise HTTPException(
-                status_code=503,
-                detail=f"AI服务 ({ai_manager.get_current_provider()}) 连接失败，请检查配置和网络连接"
-            )
-
-        prompt = f"""
+""",
+    "character": """
 请根据以下要求生成小说人物：
 
-{request.prompt}
+{prompt}
 
 请生成详细的人物设定，包括：
 1. 基本信息（姓名、年龄、性别、身份）
@@ -485,8 +532,160 @@ async def generate_character(request: GenerateRequest):
 7. 成长轨迹
 
 请用中文回答，格式清晰，人物形象生动。
+""",
+    "plot": """
+请根据以下要求生成小说剧情：
+
+{prompt}
+
+请生成详细的剧情大纲，包括：
+1. 主要情节线
+2. 关键转折点
+3. 人物冲突
+4. 情节发展
+5. 高潮设计
+6. 结局安排
+
+请用中文回答，剧情逻辑清晰，富有张力。
+""",
+    "continuation": """
+请根据以下内容进行续写：
+
+{prompt}
+
+续写要求：
+1. 保持文风一致
+2. 情节自然流畅
+3. 人物性格符合设定
+4. 推进故事发展
+5. 保持悬念和张力
+
+请用中文续写，文笔流畅，情节合理。
+""",
+    "consistency_check": """
+请检查以下内容的一致性：
+
+{prompt}
+
+检查要点：
+1. 人物设定是否前后一致
+2. 世界观设定是否有矛盾
+3. 时间线是否合理
+4. 情节逻辑是否通顺
+5. 细节描述是否冲突
+
+请指出发现的问题并提供修改建议。
+"""
+}
+
+
+CHARACTER_EXTRACTION_TEMPLATE = """
+请从以下小说设定或正文中提取出场人物：
+
+{prompt}
+
+要求：
+1. 每个人物只输出一次，name 使用正式姓名
+2. gender 取 男/女/未知，age 无法确定时填“未知”
+3. background 填身份或标签，abilities 填能力与功法
+4. importance 取 主要/次要
+5. 文中没有提到的字段留空
+"""
+
+
+CONTEXT_TEMPLATE = """以下是当前项目中与本次任务相关的资料，请在创作时保持与其一致：
+
+{context}
+
 """
 
+
+def create_prompt_builder(max_tokens: Optional[int] = None, separator: str = "") -> PromptBuilder:
+    """按当前提供商与模型创建提示词组装器，输出预留取请求或配置的 max_tokens"""
+    provider = ai_manager.get_current_provider()
+    config = ai_manager.provider_configs.get(provider, {})
+    return PromptBuilder(
+        provider,
+        ai_manager.get_current_model(),
+        max_output_tokens=max_tokens or config.get("max_tokens"),
+        separator=separator
+    )
+
+
+def build_prompt(generation_type: str, user_prompt: str, context: Optional[str] = None,
+                 max_tokens: Optional[int] = None) -> Tuple[str, dict]:
+    """
+    根据生成类型构建提示词，返回 (提示词, token使用情况)
+
+    模板说明为必需部分；超出模型上下文窗口时先裁剪项目资料，再裁剪用户输入
+    （续写保留前文结尾，其余保留开头）。
+    """
+    head, tail = PROMPT_TEMPLATES[generation_type].split("{prompt}")
+    builder = create_prompt_builder(max_tokens)
+    if context:
+        builder.add("context", CONTEXT_TEMPLATE.format(context=context), priority=0, min_tokens=64)
+    builder.add("instruction", head, required=True)
+    builder.add(
+        "prompt", user_prompt, priority=1, min_tokens=32,
+        keep="tail" if generation_type == "continuation" else "head"
+    )
+    builder.add("requirements", tail, required=True)
+    return builder.build()
+
+
+async def retrieve_context(request: GenerateRequest) -> Optional[dict]:
+    """为携带 project_id 的生成请求检索项目资料，检索失败时不影响生成"""
+    if not request.project_id or not request.use_context or not context_retriever.enabled:
+        return None
+    if request.context_types:
+        invalid_types = [t for t in request.context_types if t not in CONTEXT_SOURCES]
+        if invalid_types:
+            raise HTTPException(status_code=400, detail=f"不支持的资料类型: {', '.join(invalid_types)}")
+
+    try:
+        return await context_retriever.build_project_context(
+            request.project_id,
+            request.prompt,
+            token_budget=request.context_budget,
+            source_types=request.context_types
+        )
+    except Exception as e:
+        logger.warning(f"检索项目 {request.project_id} 资料失败: {e}")
+        return None
+
+
+def context_meta(context: Optional[dict]) -> dict:
+    """响应中附带的资料检索信息"""
+    if not context:
+        return {"context": None}
+    return {"context": {"chunks": context["chunks"], "tokens": context["tokens"]}}
+
+
+def rate_limit_error(error: RateLimitExceeded) -> HTTPException:
+    """本地额度不足时返回429，并提示客户端重试时间"""
+    return HTTPException(
+        status_code=429, detail=str(error), headers={"Retry-After": str(math.ceil(error.retry_after))}
+    )
+
+
+async def ensure_ai_available():
+    """检查AI服务状态（读取健康监测缓存）"""
+    if not await ai_manager.is_available():
+        raise HTTPException(
+            status_code=503,
+            detail=f"AI服务 ({ai_manager.get_current_provider()}) 连接失败，请检查配置和网络连接"
+        )
+
+
+async def run_generation(request: GenerateRequest, generation_type: str, action: str) -> dict:
+    """执行一次非流式生成"""
+    try:
+        await ensure_ai_available()
+
+        context = await retrieve_context(request)
+        prompt, usage = build_prompt(
+            generation_type, request.prompt, context["text"] if context else None, request.max_tokens
+        )
         kwargs = build_kwargs(request)
         result = await ai_manager.generate_text_with_thinking(prompt, **kwargs)
 
@@ -494,157 +693,313 @@ async def generate_character(request: GenerateRequest):
             "content": result["content"],
             "thinking": result["thinking"],
             "raw_response": result["raw_response"],
-            "type": "character",
+            "type": generation_type,
             "provider": ai_manager.get_current_provider(),
+            **context_meta(context),
+            "usage": usage,
             "status": "success"
         }
     except HTTPException:
         raise
+    except RateLimitExceeded as e:
+        logger.warning(f"{action}被限流: {e}")
+        raise rate_limit_error(e)
     except ValueError as e:
         logger.error(f"AI配置错误: {e}")
         raise HTTPException(status_code=400, detail=f"AI配置错误: {str(e)}")
     except Exception as e:
-        logger.error(f"AI生成人物失败: {e}")
-        raise HTTPException(status_code=500, detail=f"AI生成人物失败: {str(e)}")
+        logger.error(f"{action}失败: {e}")
+        raise HTTPException(status_code=500, detail=f"{action}失败: {str(e)}")
 
 
-@router.post("/generate-plot")
-async def generate_plot(request: GenerateRequest):
-    """AI生成剧情"""
+def sse_event(event: str, data: dict) -> str:
+    """格式化一条SSE事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_thinking_events(chunks: AsyncIterator[str], meta: dict, action: str) -> AsyncIterator[str]:
+    """
+    将AI流式输出转换为SSE事件流
+
+    事件类型：thinking（思维过程片段）、content（正文片段）、
+    done（完成，附带完整结果）、error（出错）
+    """
+    parser = ThinkingChainParser()
+    raw_parts = []
     try:
-        # 检查AI服务状态
-        if not await ai_manager.check_connection():
-            raise HTTPException(
-                status_code=503,
-                detail=f"AI服务 ({ai_manager.get_current_provider()}) 连接失败，请检查配置和网络连接"
-            )
+        async for chunk in chunks:
+            raw_parts.append(chunk)
+            for kind, text in parser.feed(chunk):
+                yield sse_event(kind, {"text": text})
+        for kind, text in parser.flush():
+            yield sse_event(kind, {"text": text})
+
+        content, thinking = parser.result()
+        yield sse_event("done", {
+            "content": content,
+            "thinking": thinking,
+            "raw_response": "".join(raw_parts),
+            **meta,
+            "status": "success"
+        })
+    except Exception as e:
+        logger.error(f"{action}失败: {e}")
+        yield sse_event("error", {"message": f"{action}失败: {str(e)}", "status": "error"})
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    """构建SSE响应"""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
 
-        prompt = f"""
-请根据以下要求生成小说剧情：
 
-{request.prompt}
+async def stream_generation(request: GenerateRequest, generation_type: str, action: str) -> StreamingResponse:
+    """执行一次流式生成"""
+    await ensure_ai_available()
 
-请生成详细的剧情大纲，包括：
-1. 主要情节线
-2. 关键转折点
-3. 人物冲突
-4. 情节发展
-5. 高潮设计
-6. 结局安排
+    context = await retrieve_context(request)
+    prompt, usage = build_prompt(
+        generation_type, request.prompt, context["text"] if context else None, request.max_tokens
+    )
+    kwargs = build_kwargs(request)
+    meta = {
+        "type": generation_type,
+        "provider": ai_manager.get_current_provider(),
+        **context_meta(context),
+        "usage": usage
+    }
+    return sse_response(
+        stream_thinking_events(ai_manager.stream_generate(prompt, **kwargs), meta, action)
+    )
 
-请用中文回答，剧情逻辑清晰，富有张力。
-"""
 
+@router.post("/chat")
+async def chat_completion(request: ChatRequest):
+    """AI聊天对话"""
+    try:
+        await ensure_ai_available()
+
+        messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
+        messages, usage = create_prompt_builder(request.max_tokens).build_messages(messages)
         kwargs = build_kwargs(request)
-        result = await ai_manager.generate_text_with_thinking(prompt, **kwargs)
+
+        # 使用思维链处理
+        result = await ai_manager.chat_completion_with_thinking(messages, **kwargs)
 
         return {
-            "content": result["content"],
+            "response": result["content"],
             "thinking": result["thinking"],
             "raw_response": result["raw_response"],
-            "type": "plot",
             "provider": ai_manager.get_current_provider(),
+            "usage": usage,
             "status": "success"
         }
     except HTTPException:
         raise
+    except RateLimitExceeded as e:
+        logger.warning(f"AI聊天对话被限流: {e}")
+        raise rate_limit_error(e)
     except ValueError as e:
         logger.error(f"AI配置错误: {e}")
         raise HTTPException(status_code=400, detail=f"AI配置错误: {str(e)}")
     except Exception as e:
-        logger.error(f"AI生成剧情失败: {e}")
-        raise HTTPException(status_code=500, detail=f"AI生成剧情失败: {str(e)}")
+        logger.error(f"AI聊天对话失败: {e}")
+        raise HTTPException(status_code=500, detail=f"AI聊天对话失败: {str(e)}")
+
+
+@router.post("/chat/stream")
+async def chat_completion_stream(request: ChatRequest):
+    """AI聊天对话（SSE流式输出）"""
+    await ensure_ai_available()
+
+    messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
+    messages, usage = create_prompt_builder(request.max_tokens).build_messages(messages)
+    kwargs = build_kwargs(request)
+    meta = {"provider": ai_manager.get_current_provider(), "usage": usage}
+    return sse_response(
+        stream_thinking_events(ai_manager.stream_chat(messages, **kwargs), meta, "AI聊天对话")
+    )
+
+
+@router.post("/generate-setting")
+async def generate_setting(request: GenerateRequest):
+    """AI生成设定"""
+    return await run_generation(request, "world_setting", "AI生成设定")
+
+
+@router.post("/generate-setting/stream")
+async def generate_setting_stream(request: GenerateRequest):
+    """AI生成设定（SSE流式输出）"""
+    return await stream_generation(request, "world_setting", "AI生成设定")
+
+
+@router.post("/generate-character")
+async def generate_character(request: GenerateRequest):
+    """AI生成人物"""
+    return await run_generation(request, "character", "AI生成人物")
+
+
+@router.post("/generate-character/stream")
+async def generate_character_stream(request: GenerateRequest):
+    """AI生成人物（SSE流式输出）"""
+    return await stream_generation(request, "character", "AI生成人物")
+
+
+@router.post("/generate-plot")
+async def generate_plot(request: GenerateRequest):
+    """AI生成剧情"""
+    return await run_generation(request, "plot", "AI生成剧情")
+
+
+@router.post("/generate-plot/stream")
+async def generate_plot_stream(request: GenerateRequest):
+    """AI生成剧情（SSE流式输出）"""
+    return await stream_generation(request, "plot", "AI生成剧情")
 
 
 @router.post("/continue-writing")
 async def continue_writing(request: GenerateRequest):
     """AI续写"""
-    try:
-        # 检查AI服务状态
-        if not await ai_manager.check_connection():
-            raise HTTPException(
-                status_code=503,
-                detail=f"AI服务 ({ai_manager.get_current_provider()}) 连接失败，请检查配置和网络连接"
-            )
+    return await run_generation(request, "continuation", "AI续写")
 
-        prompt = f"""
-请根据以下内容进行续写：
 
-{request.prompt}
+@router.post("/continue-writing/stream")
+async def continue_writing_stream(request: GenerateRequest):
+    """AI续写（SSE流式输出）"""
+    return await stream_generation(request, "continuation", "AI续写")
 
-续写要求：
-1. 保持文风一致
-2. 情节自然流畅
-3. 人物性格符合设定
-4. 推进故事发展
-5. 保持悬念和张力
 
-请用中文续写，文笔流畅，情节合理。
-"""
+@router.post("/check-consistency")
+async def check_consistency(request: GenerateRequest):
+    """AI一致性检查"""
+    return await run_generation(request, "consistency_check", "AI一致性检查")
 
-        kwargs = build_kwargs(request)
-        result = await ai_manager.generate_text_with_thinking(prompt, **kwargs)
 
+@router.post("/check-consistency/stream")
+async def check_consistency_stream(request: GenerateRequest):
+    """AI一致性检查（SSE流式输出）"""
+    return await stream_generation(request, "consistency_check", "AI一致性检查")
+
+
+@router.post("/check-consistency/volume")
+async def check_volume_consistency(request: VolumeConsistencyRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    AI整卷一致性检查
+
+    各章节并行提取事实断言（按内容哈希缓存），合并后只把相互矛盾的断言交给AI做最终判断
+    """
+    try:
+        material = await db.run_sync(
+            lambda session: load_consistency_material(
+                session, request.project_id, request.volume_id, request.chapter_ids
+            )
+        )
+        if not material["chapters"]:
+            raise HTTPException(status_code=404, detail="没有找到需要检查的章节")
+
+        await ensure_ai_available()
+        result = await consistency_checker.check(material, use_cache=request.use_cache)
         return {
-            "content": result["content"],
-            "thinking": result["thinking"],
-            "raw_response": result["raw_response"],
-            "type": "continuation",
+            **result,
+            "type": "volume_consistency_check",
             "provider": ai_manager.get_current_provider(),
             "status": "success"
         }
     except HTTPException:
         raise
     except ValueError as e:
-        logger.error(f"AI配置错误: {e}")
-        raise HTTPException(status_code=400, detail=f"AI配置错误: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"AI续写失败: {e}")
-        raise HTTPException(status_code=500, detail=f"AI续写失败: {str(e)}")
+        logger.error(f"AI整卷一致性检查失败: {e}")
+        raise HTTPException(status_code=500, detail=f"AI整卷一致性检查失败: {str(e)}")
 
 
-@router.post("/check-consistency")
-async def check_consistency(request: GenerateRequest):
-    """AI一致性检查"""
+@router.post("/extract-characters")
+async def extract_characters(request: CharacterExtractionRequest):
+    """
+    AI人物提取
+
+    使用结构化输出（提供商原生JSON模式或工具调用），结果按人物模型校验，输出无效时有限次重试
+    """
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="提取人物的文本不能为空")
+
     try:
-        # 检查AI服务状态
-        if not await ai_manager.check_connection():
-            raise HTTPException(
-                status_code=503,
-                detail=f"AI服务 ({ai_manager.get_current_provider()}) 连接失败，请检查配置和网络连接"
-            )
+        await ensure_ai_available()
 
-        prompt = f"""
-请检查以下内容的一致性：
+        head, tail = CHARACTER_EXTRACTION_TEMPLATE.split("{prompt}")
+        builder = create_prompt_builder(request.max_tokens)
+        builder.add("instruction", head, required=True)
+        builder.add("text", request.text, priority=1, min_tokens=32)
+        builder.add("requirements", tail, required=True)
+        prompt, usage = builder.build()
 
-{request.prompt}
+        kwargs = build_kwargs(request)
+        kwargs.setdefault("temperature", 0)
+        result = await ai_manager.generate_structured(prompt, CharacterExtractionResult, **kwargs)
+        return {
+            "characters": [character.model_dump() for character in result.characters],
+            "provider": ai_manager.get_current_provider(),
+            "usage": usage,
+            "status": "success"
+        }
+    except HTTPException:
+        raise
+    except RateLimitExceeded as e:
+        logger.warning(f"AI人物提取被限流: {e}")
+        raise rate_limit_error(e)
+    except StructuredOutputError as e:
+        logger.error(f"AI人物提取输出无效: {e}")
+        raise HTTPException(status_code=502, detail=f"AI输出无法解析为人物列表: {str(e)}")
+    except Exception as e:
+        logger.error(f"AI人物提取失败: {e}")
+        raise HTTPException(status_code=500, detail=f"AI人物提取失败: {str(e)}")
 
-检查要点：
-1. 人物设定是否前后一致
-2. 世界观设定是否有矛盾
-3. 时间线是否合理
-4. 情节逻辑是否通顺
-5. 细节描述是否冲突
 
-请指出发现的问题并提供修改建议。
-"""
+@router.post("/batch")
+async def batch_generate(request: BatchGenerateRequest):
+    """AI批量生成，按提供商并发上限并行执行，结果与输入顺序一致"""
+    if not request.prompts:
+        raise HTTPException(status_code=400, detail="批量生成的提示词列表不能为空")
+    max_items = AI_BATCH_CONFIG.get("max_items", 500)
+    if len(request.prompts) > max_items:
+        raise HTTPException(status_code=400, detail=f"单次批量生成最多 {max_items} 条")
+    if request.generation_type and request.generation_type not in PROMPT_TEMPLATES:
+        raise HTTPException(status_code=400, detail=f"不支持的生成类型: {request.generation_type}")
 
+    try:
+        await ensure_ai_available()
+
+        if request.generation_type:
+            prompts = [
+                build_prompt(request.generation_type, prompt, max_tokens=request.max_tokens)[0]
+                for prompt in request.prompts
+            ]
+        else:
+            prompts = request.prompts
         kwargs = build_kwargs(request)
-        result = await ai_manager.generate_text_with_thinking(prompt, **kwargs)
+        results = await ai_manager.generate_many(prompts, **kwargs)
 
+        success_count = sum(1 for item in results if item["status"] == "success")
         return {
-            "content": result["content"],
-            "thinking": result["thinking"],
-            "raw_response": result["raw_response"],
-            "type": "consistency_check",
+            "results": results,
+            "summary": {
+                "total": len(results),
+                "success": success_count,
+                "errors": len(results) - success_count
+            },
+            "type": request.generation_type,
             "provider": ai_manager.get_current_provider(),
-            "status": "success"
+            "status": "success" if success_count == len(results) else "partial"
         }
     except HTTPException:
         raise
-    except ValueError as e:
-        logger.error(f"AI配置错误: {e}")
-        raise HTTPException(status_code=400, detail=f"AI配置错误: {str(e)}")
     except Exception as e:
-        logger.error(f"AI一致性检查失败: {e}")
-        raise HTTPException(status_code=500, detail=f"AI一致性检查失败: {str(e)}")
+        logger.error(f"AI批量生成失败: {e}")
+        raise HTTPException(status_code=500, detail=f"AI批量生成失败: {str(e)}")
@@ -6,7 +6,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 import logging
 
-from ...core.database import get_db
+from ...core.database import get_db, get_read_db
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -15,7 +15,7 @@ router = APIRouter()
 @router.get("/")
 async def get_chapters(
     project_id: int = Query(..., description="项目ID"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取章节列表"""
     return {"message": "章节列表功能待实现", "project_id": project_id}
@@ -6,7 +6,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 import logging
 
-from ...core.database import get_db
+from ...core.database import get_db, get_read_db
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -17,7 +17,7 @@ async def get_characters(
     project_id: int = Query(..., description="项目ID"),
     skip: int = Query(0, ge=0, description="跳过的记录数"),
     limit: int = Query(20, ge=1, le=100, description="返回的记录数"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取人物列表"""
     return {"message": "人物列表功能待实现", "project_id": project_id}
@@ -35,7 +35,7 @@ async def create_character(
 @router.get("/{character_id}")
 async def get_character(
     character_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取人物详情"""
     return {"message": "获取人物详情功能待实现", "character_id": character_id}
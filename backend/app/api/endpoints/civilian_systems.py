@@ -2,11 +2,14 @@
 生民体系API接口
 """
 import logging
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ...core.database import get_db
+from ...core.database import get_async_db
+from ...services.pagination import InvalidCursor, paginate, recent_order
+from ...services.sparse_fields import InvalidFields, list_response, parse_fields, select_fields
 from ...models.civilian_system import CivilianSystem
 from ...schemas.civilian_system import (
     CivilianSystemCreate,
@@ -29,20 +32,31 @@ async def get_civilian_systems(
     dimension_id: int = Query(None, description="维度ID"),
     skip: int = Query(0, ge=0, description="跳过数量"),
     limit: int = Query(100, ge=1, le=1000, description="限制数量"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页响应头 X-Next-Cursor"),
+    include_total: bool = Query(False, description="是否在响应头 X-Total-Count 中返回总数"),
+    fields: Optional[str] = Query(None, description="返回的字段，逗号分隔，不指定则返回完整记录"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取生民体系列表"""
     try:
-        query = db.query(CivilianSystem).filter(
-            CivilianSystem.project_id == project_id
+        query = select(CivilianSystem).where(
+            CivilianSystem.project_id == project_id,
+            CivilianSystem.is_deleted == False
         )
 
         if dimension_id is not None:
-            query = query.filter(CivilianSystem.dimension_id == dimension_id)
+            query = query.where(CivilianSystem.dimension_id == dimension_id)
 
-        systems = query.offset(skip).limit(limit).all()
+        selected = parse_fields(fields, CivilianSystem)
+        query = select_fields(query, CivilianSystem, selected)
 
-        return [system.to_dict() for system in systems]
+        page = await paginate(
+            db, query, recent_order(CivilianSystem), limit,
+            cursor=cursor, offset=skip, include_total=include_total
+        )
+        return list_response(page.items, selected, page.headers(), schema=CivilianSystemResponse)
+    except (InvalidCursor, InvalidFields) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取生民体系列表失败: {e}")
         raise HTTPException(status_code=500, detail="获取生民体系列表失败")
@@ -51,33 +65,31 @@ async def get_civilian_systems(
 @router.post("/", response_model=CivilianSystemResponse)
 async def create_civilian_system(
     system_data: CivilianSystemCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建新生民体系"""
     try:
         system = CivilianSystem(**system_data.dict())
         db.add(system)
-        db.commit()
-        db.refresh(system)
+        await db.commit()
+        await db.refresh(system)
 
         logger.info(f"创建生民体系成功: {system.id}")
         return system.to_dict()
     except Exception as e:
         logger.error(f"创建生民体系失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="创建生民体系失败")
 
 
 @router.get("/{system_id}", response_model=CivilianSystemResponse)
 async def get_civilian_system(
     system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取生民体系详情"""
     try:
-        system = db.query(CivilianSystem).filter(
-            CivilianSystem.id == system_id
-        ).first()
+        system = await db.get(CivilianSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="生民体系不存在")
@@ -94,13 +106,11 @@ async def get_civilian_system(
 async def update_civilian_system(
     system_id: int,
     system_data: CivilianSystemUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新生民体系"""
     try:
-        system = db.query(CivilianSystem).filter(
-            CivilianSystem.id == system_id
-        ).first()
+        system = await db.get(CivilianSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="生民体系不存在")
@@ -110,8 +120,8 @@ async def update_civilian_system(
         for field, value in update_data.items():
             setattr(system, field, value)
 
-        db.commit()
-        db.refresh(system)
+        await db.commit()
+        await db.refresh(system)
 
         logger.info(f"更新生民体系成功: {system_id}")
         return system.to_dict()
@@ -119,26 +129,24 @@ async def update_civilian_system(
         raise
     except Exception as e:
         logger.error(f"更新生民体系失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="更新生民体系失败")
 
 
 @router.delete("/{system_id}")
 async def delete_civilian_system(
     system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除生民体系"""
     try:
-        system = db.query(CivilianSystem).filter(
-            CivilianSystem.id == system_id
-        ).first()
+        system = await db.get(CivilianSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="生民体系不存在")
 
-        db.delete(system)
-        db.commit()
+        await db.delete(system)
+        await db.commit()
 
         logger.info(f"删除生民体系成功: {system_id}")
         return {"message": "生民体系删除成功"}
@@ -146,7 +154,7 @@ async def delete_civilian_system(
         raise
     except Exception as e:
         logger.error(f"删除生民体系失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="删除生民体系失败")
 
 
@@ -154,19 +162,17 @@ async def delete_civilian_system(
 async def add_social_class(
     system_id: int,
     class_data: SocialClassData,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加社会阶层"""
     try:
-        system = db.query(CivilianSystem).filter(
-            CivilianSystem.id == system_id
-        ).first()
+        system = await db.get(CivilianSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="生民体系不存在")
 
         system.add_social_class(class_data.dict())
-        db.commit()
+        await db.commit()
 
         logger.info(f"添加社会阶层成功: {system_id}")
         return {"message": "社会阶层添加成功"}
@@ -174,7 +180,7 @@ async def add_social_class(
         raise
     except Exception as e:
         logger.error(f"添加社会阶层失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="添加社会阶层失败")
 
 
@@ -182,19 +188,17 @@ async def add_social_class(
 async def add_lifestyle_type(
     system_id: int,
     lifestyle_data: LifestyleData,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加生活方式"""
     try:
-        system = db.query(CivilianSystem).filter(
-            CivilianSystem.id == system_id
-        ).first()
+        system = await db.get(CivilianSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="生民体系不存在")
 
         system.add_lifestyle_type(lifestyle_data.dict())
-        db.commit()
+        await db.commit()
 
         logger.info(f"添加生活方式成功: {system_id}")
         return {"message": "生活方式添加成功"}
@@ -202,7 +206,7 @@ async def add_lifestyle_type(
         raise
     except Exception as e:
         logger.error(f"添加生活方式失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="添加生活方式失败")
 
 
@@ -210,19 +214,17 @@ async def add_lifestyle_type(
 async def add_cultural_practice(
     system_id: int,
     practice_data: CulturalPracticeData,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加文化习俗"""
     try:
-        system = db.query(CivilianSystem).filter(
-            CivilianSystem.id == system_id
-        ).first()
+        system = await db.get(CivilianSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="生民体系不存在")
 
         system.add_cultural_practice(practice_data.dict())
-        db.commit()
+        await db.commit()
 
         logger.info(f"添加文化习俗成功: {system_id}")
         return {"message": "文化习俗添加成功"}
@@ -230,7 +232,7 @@ async def add_cultural_practice(
         raise
     except Exception as e:
         logger.error(f"添加文化习俗失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="添加文化习俗失败")
 
 
@@ -238,19 +240,17 @@ async def add_cultural_practice(
 async def update_population_stats(
     system_id: int,
     stats_data: PopulationStatsData,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新人口统计"""
     try:
-        system = db.query(CivilianSystem).filter(
-            CivilianSystem.id == system_id
-        ).first()
+        system = await db.get(CivilianSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="生民体系不存在")
 
         system.update_population_stats(stats_data.dict())
-        db.commit()
+        await db.commit()
 
         logger.info(f"更新人口统计成功: {system_id}")
         return {"message": "人口统计更新成功"}
@@ -258,20 +258,18 @@ async def update_population_stats(
         raise
     except Exception as e:
         logger.error(f"更新人口统计失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="更新人口统计失败")
 
 
 @router.get("/{system_id}/social-metrics")
 async def get_social_metrics(
     system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取社会指标"""
     try:
-        system = db.query(CivilianSystem).filter(
-            CivilianSystem.id == system_id
-        ).first()
+        system = await db.get(CivilianSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="生民体系不存在")
@@ -289,17 +287,13 @@ async def get_social_metrics(
 async def get_dimensional_comparison(
     system_id: int,
     target_system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取维度比较"""
     try:
-        system = db.query(CivilianSystem).filter(
-            CivilianSystem.id == system_id
-        ).first()
+        system = await db.get(CivilianSystem, system_id)
 
-        target_system = db.query(CivilianSystem).filter(
-            CivilianSystem.id == target_system_id
-        ).first()
+        target_system = await db.get(CivilianSystem, target_system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="生民体系不存在")
@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
-from ...core.database import get_db
+from ...core.database import get_db, get_read_db
 from ...services.conversation_service import ConversationService
 
 router = APIRouter()
@@ -64,7 +64,7 @@ async def process_user_input(
 @router.get("/summary/{user_id}")
 async def get_conversation_summary(
     user_id: str,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取对话总结"""
     service = ConversationService(db)
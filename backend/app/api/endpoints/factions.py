@@ -6,7 +6,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 import logging
 
-from ...core.database import get_db
+from ...core.database import get_db, get_read_db
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -15,7 +15,7 @@ router = APIRouter()
 @router.get("/")
 async def get_factions(
     project_id: int = Query(..., description="项目ID"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取势力列表"""
     return {"message": "势力列表功能待实现", "project_id": project_id}
@@ -33,7 +33,7 @@ async def create_faction(
 @router.get("/{faction_id}")
 async def get_faction(
     faction_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取势力详情"""
     return {"message": "获取势力详情功能待实现", "faction_id": faction_id}
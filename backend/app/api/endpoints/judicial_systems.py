@@ -2,11 +2,14 @@
 司法体系API接口
 """
 import logging
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ...core.database import get_db
+from ...core.database import get_async_db
+from ...services.pagination import InvalidCursor, paginate, recent_order
+from ...services.sparse_fields import InvalidFields, list_response, parse_fields, select_fields
 from ...models.judicial_system import JudicialSystem
 from ...schemas.judicial_system import (
     JudicialSystemCreate,
@@ -29,20 +32,31 @@ async def get_judicial_systems(
     dimension_id: int = Query(None, description="维度ID"),
     skip: int = Query(0, ge=0, description="跳过数量"),
     limit: int = Query(100, ge=1, le=1000, description="限制数量"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页响应头 X-Next-Cursor"),
+    include_total: bool = Query(False, description="是否在响应头 X-Total-Count 中返回总数"),
+    fields: Optional[str] = Query(None, description="返回的字段，逗号分隔，不指定则返回完整记录"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取司法体系列表"""
     try:
-        query = db.query(JudicialSystem).filter(
-            JudicialSystem.project_id == project_id
+        query = select(JudicialSystem).where(
+            JudicialSystem.project_id == project_id,
+            JudicialSystem.is_deleted == False
         )
 
         if dimension_id is not None:
-            query = query.filter(JudicialSystem.dimension_id == dimension_id)
+            query = query.where(JudicialSystem.dimension_id == dimension_id)
 
-        systems = query.offset(skip).limit(limit).all()
+        selected = parse_fields(fields, JudicialSystem)
+        query = select_fields(query, JudicialSystem, selected)
 
-        return [system.to_dict() for system in systems]
+        page = await paginate(
+            db, query, recent_order(JudicialSystem), limit,
+            cursor=cursor, offset=skip, include_total=include_total
+        )
+        return list_response(page.items, selected, page.headers(), schema=JudicialSystemResponse)
+    except (InvalidCursor, InvalidFields) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取司法体系列表失败: {e}")
         raise HTTPException(status_code=500, detail="获取司法体系列表失败")
@@ -51,33 +65,31 @@ async def get_judicial_systems(
 @router.post("/", response_model=JudicialSystemResponse)
 async def create_judicial_system(
     system_data: JudicialSystemCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建新司法体系"""
     try:
         system = JudicialSystem(**system_data.dict())
         db.add(system)
-        db.commit()
-        db.refresh(system)
+        await db.commit()
+        await db.refresh(system)
 
         logger.info(f"创建司法体系成功: {system.id}")
         return system.to_dict()
     except Exception as e:
         logger.error(f"创建司法体系失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="创建司法体系失败")
 
 
 @router.get("/{system_id}", response_model=JudicialSystemResponse)
 async def get_judicial_system(
     system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取司法体系详情"""
     try:
-        system = db.query(JudicialSystem).filter(
-            JudicialSystem.id == system_id
-        ).first()
+        system = await db.get(JudicialSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="司法体系不存在")
@@ -94,13 +106,11 @@ async def get_judicial_system(
 async def update_judicial_system(
     system_id: int,
     system_data: JudicialSystemUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新司法体系"""
     try:
-        system = db.query(JudicialSystem).filter(
-            JudicialSystem.id == system_id
-        ).first()
+        system = await db.get(JudicialSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="司法体系不存在")
@@ -110,8 +120,8 @@ async def update_judicial_system(
         for field, value in update_data.items():
             setattr(system, field, value)
 
-        db.commit()
-        db.refresh(system)
+        await db.commit()
+        await db.refresh(system)
 
         logger.info(f"更新司法体系成功: {system_id}")
         return system.to_dict()
@@ -119,26 +129,24 @@ async def update_judicial_system(
         raise
     except Exception as e:
         logger.error(f"更新司法体系失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="更新司法体系失败")
 
 
 @router.delete("/{system_id}")
 async def delete_judicial_system(
     system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除司法体系"""
     try:
-        system = db.query(JudicialSystem).filter(
-            JudicialSystem.id == system_id
-        ).first()
+        system = await db.get(JudicialSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="司法体系不存在")
 
-        db.delete(system)
-        db.commit()
+        await db.delete(system)
+        await db.commit()
 
         logger.info(f"删除司法体系成功: {system_id}")
         return {"message": "司法体系删除成功"}
@@ -146,7 +154,7 @@ async def delete_judicial_system(
         raise
     except Exception as e:
         logger.error(f"删除司法体系失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="删除司法体系失败")
 
 
@@ -154,19 +162,17 @@ async def delete_judicial_system(
 async def add_court(
     system_id: int,
     court_data: CourtData,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加法院"""
     try:
-        system = db.query(JudicialSystem).filter(
-            JudicialSystem.id == system_id
-        ).first()
+        system = await db.get(JudicialSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="司法体系不存在")
 
         system.add_court(court_data.dict())
-        db.commit()
+        await db.commit()
 
         logger.info(f"添加法院成功: {system_id}")
         return {"message": "法院添加成功"}
@@ -174,7 +180,7 @@ async def add_court(
         raise
     except Exception as e:
         logger.error(f"添加法院失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="添加法院失败")
 
 
@@ -182,19 +188,17 @@ async def add_court(
 async def add_legal_code(
     system_id: int,
     code_data: LegalCodeData,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加法律条文"""
     try:
-        system = db.query(JudicialSystem).filter(
-            JudicialSystem.id == system_id
-        ).first()
+        system = await db.get(JudicialSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="司法体系不存在")
 
         system.add_legal_code(code_data.dict())
-        db.commit()
+        await db.commit()
 
         logger.info(f"添加法律条文成功: {system_id}")
         return {"message": "法律条文添加成功"}
@@ -202,7 +206,7 @@ async def add_legal_code(
         raise
     except Exception as e:
         logger.error(f"添加法律条文失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="添加法律条文失败")
 
 
@@ -210,19 +214,17 @@ async def add_legal_code(
 async def add_enforcement_agency(
     system_id: int,
     agency_data: EnforcementAgencyData,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加执法机构"""
     try:
-        system = db.query(JudicialSystem).filter(
-            JudicialSystem.id == system_id
-        ).first()
+        system = await db.get(JudicialSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="司法体系不存在")
 
         system.add_enforcement_agency(agency_data.dict())
-        db.commit()
+        await db.commit()
 
         logger.info(f"添加执法机构成功: {system_id}")
         return {"message": "执法机构添加成功"}
@@ -230,7 +232,7 @@ async def add_enforcement_agency(
         raise
     except Exception as e:
         logger.error(f"添加执法机构失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="添加执法机构失败")
 
 
@@ -238,19 +240,17 @@ async def add_enforcement_agency(
 async def add_judicial_personnel(
     system_id: int,
     personnel_data: JudicialPersonnelData,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加司法人员"""
     try:
-        system = db.query(JudicialSystem).filter(
-            JudicialSystem.id == system_id
-        ).first()
+        system = await db.get(JudicialSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="司法体系不存在")
 
         system.add_judicial_personnel(personnel_data.dict())
-        db.commit()
+        await db.commit()
 
         logger.info(f"添加司法人员成功: {system_id}")
         return {"message": "司法人员添加成功"}
@@ -258,20 +258,18 @@ async def add_judicial_personnel(
         raise
     except Exception as e:
         logger.error(f"添加司法人员失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="添加司法人员失败")
 
 
 @router.get("/{system_id}/judicial-efficiency")
 async def get_judicial_efficiency(
     system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取司法效率指标"""
     try:
-        system = db.query(JudicialSystem).filter(
-            JudicialSystem.id == system_id
-        ).first()
+        system = await db.get(JudicialSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="司法体系不存在")
@@ -289,17 +287,13 @@ async def get_judicial_efficiency(
 async def get_dimensional_legal_differences(
     system_id: int,
     target_system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取维度法律差异"""
     try:
-        system = db.query(JudicialSystem).filter(
-            JudicialSystem.id == system_id
-        ).first()
+        system = await db.get(JudicialSystem, system_id)
 
-        target_system = db.query(JudicialSystem).filter(
-            JudicialSystem.id == target_system_id
-        ).first()
+        target_system = await db.get(JudicialSystem, target_system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="司法体系不存在")
@@ -320,13 +314,11 @@ async def get_dimensional_legal_differences(
 async def validate_cross_dimensional_case(
     system_id: int,
     case_data: CrossDimensionalCaseData,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """验证跨维度案件管辖权"""
     try:
-        system = db.query(JudicialSystem).filter(
-            JudicialSystem.id == system_id
-        ).first()
+        system = await db.get(JudicialSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="司法体系不存在")
@@ -6,7 +6,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 import logging
 
-from ...core.database import get_db
+from ...core.database import get_db, get_read_db
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -15,7 +15,7 @@ router = APIRouter()
 @router.get("/")
 async def get_plots(
     project_id: int = Query(..., description="项目ID"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取剧情列表"""
     return {"message": "剧情列表功能待实现", "project_id": project_id}
@@ -2,11 +2,14 @@
 政治体系管理 API 端点
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import logging
 
-from ...core.database import get_db
+from ...core.database import get_async_db
+from ...services.pagination import InvalidCursor, paginate, recent_order
+from ...services.sparse_fields import InvalidFields, list_response, parse_fields, select_fields
 from ...models.political_system import PoliticalSystem
 from ...schemas.political_system import (
     PoliticalSystemCreate,
@@ -23,15 +26,28 @@ async def get_political_systems(
     project_id: int = Query(..., description="项目ID"),
     skip: int = Query(0, ge=0, description="跳过数量"),
     limit: int = Query(100, ge=1, le=1000, description="限制数量"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页响应头 X-Next-Cursor"),
+    include_total: bool = Query(False, description="是否在响应头 X-Total-Count 中返回总数"),
+    fields: Optional[str] = Query(None, description="返回的字段，逗号分隔，不指定则返回完整记录"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取政治体系列表"""
     try:
-        systems = db.query(PoliticalSystem).filter(
-            PoliticalSystem.project_id == project_id
-        ).offset(skip).limit(limit).all()
-        
-        return [system.to_dict() for system in systems]
+        query = select(PoliticalSystem).where(
+            PoliticalSystem.project_id == project_id,
+            PoliticalSystem.is_deleted == False
+        )
+
+        selected = parse_fields(fields, PoliticalSystem)
+        query = select_fields(query, PoliticalSystem, selected)
+
+        page = await paginate(
+            db, query, recent_order(PoliticalSystem), limit,
+            cursor=cursor, offset=skip, include_total=include_total
+        )
+        return list_response(page.items, selected, page.headers(), schema=PoliticalSystemResponse)
+    except (InvalidCursor, InvalidFields) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取政治体系列表失败: {e}")
         raise HTTPException(status_code=500, detail="获取政治体系列表失败")
@@ -40,33 +56,31 @@ async def get_political_systems(
 @router.post("/", response_model=PoliticalSystemResponse)
 async def create_political_system(
     system_data: PoliticalSystemCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建新政治体系"""
     try:
         system = PoliticalSystem(**system_data.dict())
         db.add(system)
-        db.commit()
-        db.refresh(system)
+        await db.commit()
+        await db.refresh(system)
         
         logger.info(f"创建政治体系成功: {system.id}")
         return system.to_dict()
     except Exception as e:
         logger.error(f"创建政治体系失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="创建政治体系失败")
 
 
 @router.get("/{system_id}", response_model=PoliticalSystemResponse)
 async def get_political_system(
     system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取政治体系详情"""
     try:
-        system = db.query(PoliticalSystem).filter(
-            PoliticalSystem.id == system_id
-        ).first()
+        system = await db.get(PoliticalSystem, system_id)
         
         if not system:
             raise HTTPException(status_code=404, detail="政治体系不存在")
@@ -83,13 +97,11 @@ async def get_political_system(
 async def update_political_system(
     system_id: int,
     system_data: PoliticalSystemUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新政治体系"""
     try:
-        system = db.query(PoliticalSystem).filter(
-            PoliticalSystem.id == system_id
-        ).first()
+        system = await db.get(PoliticalSystem, system_id)
         
         if not system:
             raise HTTPException(status_code=404, detail="政治体系不存在")
@@ -99,8 +111,8 @@ async def update_political_system(
         for field, value in update_data.items():
             setattr(system, field, value)
         
-        db.commit()
-        db.refresh(system)
+        await db.commit()
+        await db.refresh(system)
         
         logger.info(f"更新政治体系成功: {system_id}")
         return system.to_dict()
@@ -108,26 +120,24 @@ async def update_political_system(
         raise
     except Exception as e:
         logger.error(f"更新政治体系失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="更新政治体系失败")
 
 
 @router.delete("/{system_id}")
 async def delete_political_system(
     system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除政治体系"""
     try:
-        system = db.query(PoliticalSystem).filter(
-            PoliticalSystem.id == system_id
-        ).first()
+        system = await db.get(PoliticalSystem, system_id)
         
         if not system:
             raise HTTPException(status_code=404, detail="政治体系不存在")
         
-        db.delete(system)
-        db.commit()
+        await db.delete(system)
+        await db.commit()
         
         logger.info(f"删除政治体系成功: {system_id}")
         return {"message": "政治体系删除成功"}
@@ -135,7 +145,7 @@ async def delete_political_system(
         raise
     except Exception as e:
         logger.error(f"删除政治体系失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="删除政治体系失败")
 
 
@@ -143,19 +153,17 @@ async def delete_political_system(
 async def add_institution(
     system_id: int,
     institution_data: dict,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加政治机构"""
     try:
-        system = db.query(PoliticalSystem).filter(
-            PoliticalSystem.id == system_id
-        ).first()
+        system = await db.get(PoliticalSystem, system_id)
         
         if not system:
             raise HTTPException(status_code=404, detail="政治体系不存在")
         
         system.add_institution(institution_data)
-        db.commit()
+        await db.commit()
         
         logger.info(f"添加政治机构成功: {system_id}")
         return {"message": "政治机构添加成功"}
@@ -163,7 +171,7 @@ async def add_institution(
         raise
     except Exception as e:
         logger.error(f"添加政治机构失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="添加政治机构失败")
 
 
@@ -171,19 +179,17 @@ async def add_institution(
 async def add_law(
     system_id: int,
     law_data: dict,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加法律"""
     try:
-        system = db.query(PoliticalSystem).filter(
-            PoliticalSystem.id == system_id
-        ).first()
+        system = await db.get(PoliticalSystem, system_id)
         
         if not system:
             raise HTTPException(status_code=404, detail="政治体系不存在")
         
         system.add_law(law_data)
-        db.commit()
+        await db.commit()
         
         logger.info(f"添加法律成功: {system_id}")
         return {"message": "法律添加成功"}
@@ -191,20 +197,18 @@ async def add_law(
         raise
     except Exception as e:
         logger.error(f"添加法律失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="添加法律失败")
 
 
 @router.get("/{system_id}/stability")
 async def get_stability_score(
     system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取政治稳定性评分"""
     try:
-        system = db.query(PoliticalSystem).filter(
-            PoliticalSystem.id == system_id
-        ).first()
+        system = await db.get(PoliticalSystem, system_id)
         
         if not system:
             raise HTTPException(status_code=404, detail="政治体系不存在")
@@ -221,13 +225,11 @@ async def get_stability_score(
 @router.get("/{system_id}/validate")
 async def validate_consistency(
     system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """验证政治体系一致性"""
     try:
-        system = db.query(PoliticalSystem).filter(
-            PoliticalSystem.id == system_id
-        ).first()
+        system = await db.get(PoliticalSystem, system_id)
         
         if not system:
             raise HTTPException(status_code=404, detail="政治体系不存在")
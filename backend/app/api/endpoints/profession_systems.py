@@ -2,11 +2,14 @@
 职业体系API接口
 """
 import logging
-from typing import List
+from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ...core.database import get_db
+from ...core.database import get_async_db
+from ...services.pagination import InvalidCursor, paginate, recent_order
+from ...services.sparse_fields import InvalidFields, list_response, parse_fields, select_fields
 from ...models.profession_system import ProfessionSystem
 from ...schemas.profession_system import (
     ProfessionSystemCreate,
@@ -29,20 +32,31 @@ async def get_profession_systems(
     dimension_id: int = Query(None, description="维度ID"),
     skip: int = Query(0, ge=0, description="跳过数量"),
     limit: int = Query(100, ge=1, le=1000, description="限制数量"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页响应头 X-Next-Cursor"),
+    include_total: bool = Query(False, description="是否在响应头 X-Total-Count 中返回总数"),
+    fields: Optional[str] = Query(None, description="返回的字段，逗号分隔，不指定则返回完整记录"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取职业体系列表"""
     try:
-        query = db.query(ProfessionSystem).filter(
-            ProfessionSystem.project_id == project_id
+        query = select(ProfessionSystem).where(
+            ProfessionSystem.project_id == project_id,
+            ProfessionSystem.is_deleted == False
         )
 
         if dimension_id is not None:
-            query = query.filter(ProfessionSystem.dimension_id == dimension_id)
+            query = query.where(ProfessionSystem.dimension_id == dimension_id)
 
-        systems = query.offset(skip).limit(limit).all()
+        selected = parse_fields(fields, ProfessionSystem)
+        query = select_fields(query, ProfessionSystem, selected)
 
-        return [system.to_dict() for system in systems]
+        page = await paginate(
+            db, query, recent_order(ProfessionSystem), limit,
+            cursor=cursor, offset=skip, include_total=include_total
+        )
+        return list_response(page.items, selected, page.headers(), schema=ProfessionSystemResponse)
+    except (InvalidCursor, InvalidFields) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取职业体系列表失败: {e}")
         raise HTTPException(status_code=500, detail="获取职业体系列表失败")
@@ -51,33 +65,31 @@ async def get_profession_systems(
 @router.post("/", response_model=ProfessionSystemResponse)
 async def create_profession_system(
     system_data: ProfessionSystemCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建新职业体系"""
     try:
         system = ProfessionSystem(**system_data.dict())
         db.add(system)
-        db.commit()
-        db.refresh(system)
+        await db.commit()
+        await db.refresh(system)
 
         logger.info(f"创建职业体系成功: {system.id}")
         return system.to_dict()
     except Exception as e:
         logger.error(f"创建职业体系失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="创建职业体系失败")
 
 
 @router.get("/{system_id}", response_model=ProfessionSystemResponse)
 async def get_profession_system(
     system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取职业体系详情"""
     try:
-        system = db.query(ProfessionSystem).filter(
-            ProfessionSystem.id == system_id
-        ).first()
+        system = await db.get(ProfessionSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="职业体系不存在")
@@ -94,13 +106,11 @@ async def get_profession_system(
 async def update_profession_system(
     system_id: int,
     system_data: ProfessionSystemUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新职业体系"""
     try:
-        system = db.query(ProfessionSystem).filter(
-            ProfessionSystem.id == system_id
-        ).first()
+        system = await db.get(ProfessionSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="职业体系不存在")
@@ -110,8 +120,8 @@ async def update_profession_system(
         for field, value in update_data.items():
             setattr(system, field, value)
 
-        db.commit()
-        db.refresh(system)
+        await db.commit()
+        await db.refresh(system)
 
         logger.info(f"更新职业体系成功: {system_id}")
         return system.to_dict()
@@ -119,26 +129,24 @@ async def update_profession_system(
         raise
     except Exception as e:
         logger.error(f"更新职业体系失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="更新职业体系失败")
 
 
 @router.delete("/{system_id}")
 async def delete_profession_system(
     system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除职业体系"""
     try:
-        system = db.query(ProfessionSystem).filter(
-            ProfessionSystem.id == system_id
-        ).first()
+        system = await db.get(ProfessionSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="职业体系不存在")
 
-        db.delete(system)
-        db.commit()
+        await db.delete(system)
+        await db.commit()
 
         logger.info(f"删除职业体系成功: {system_id}")
         return {"message": "职业体系删除成功"}
@@ -146,7 +154,7 @@ async def delete_profession_system(
         raise
     except Exception as e:
         logger.error(f"删除职业体系失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="删除职业体系失败")
 
 
@@ -154,19 +162,17 @@ async def delete_profession_system(
 async def add_profession(
     system_id: int,
     profession_data: ProfessionData,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加职业"""
     try:
-        system = db.query(ProfessionSystem).filter(
-            ProfessionSystem.id == system_id
-        ).first()
+        system = await db.get(ProfessionSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="职业体系不存在")
 
         system.add_profession(profession_data.dict())
-        db.commit()
+        await db.commit()
 
         logger.info(f"添加职业成功: {system_id}")
         return {"message": "职业添加成功"}
@@ -174,7 +180,7 @@ async def add_profession(
         raise
     except Exception as e:
         logger.error(f"添加职业失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="添加职业失败")
 
 
@@ -183,19 +189,17 @@ async def add_skill_requirement(
     system_id: int,
     profession_name: str,
     skill_data: SkillData,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """为职业添加技能要求"""
     try:
-        system = db.query(ProfessionSystem).filter(
-            ProfessionSystem.id == system_id
-        ).first()
+        system = await db.get(ProfessionSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="职业体系不存在")
 
         system.add_skill_requirement(profession_name, skill_data.dict())
-        db.commit()
+        await db.commit()
 
         logger.info(f"添加技能要求成功: {system_id}")
         return {"message": "技能要求添加成功"}
@@ -203,7 +207,7 @@ async def add_skill_requirement(
         raise
     except Exception as e:
         logger.error(f"添加技能要求失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="添加技能要求失败")
 
 
@@ -211,19 +215,17 @@ async def add_skill_requirement(
 async def add_career_path(
     system_id: int,
     path_data: CareerPathData,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加职业发展路径"""
     try:
-        system = db.query(ProfessionSystem).filter(
-            ProfessionSystem.id == system_id
-        ).first()
+        system = await db.get(ProfessionSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="职业体系不存在")
 
         system.add_career_path(path_data.dict())
-        db.commit()
+        await db.commit()
 
         logger.info(f"添加职业发展路径成功: {system_id}")
         return {"message": "职业发展路径添加成功"}
@@ -231,7 +233,7 @@ async def add_career_path(
         raise
     except Exception as e:
         logger.error(f"添加职业发展路径失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="添加职业发展路径失败")
 
 
@@ -239,19 +241,17 @@ async def add_career_path(
 async def add_professional_organization(
     system_id: int,
     org_data: ProfessionalOrganizationData,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加行业组织"""
     try:
-        system = db.query(ProfessionSystem).filter(
-            ProfessionSystem.id == system_id
-        ).first()
+        system = await db.get(ProfessionSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="职业体系不存在")
 
         system.add_professional_organization(org_data.dict())
-        db.commit()
+        await db.commit()
 
         logger.info(f"添加行业组织成功: {system_id}")
         return {"message": "行业组织添加成功"}
@@ -259,20 +259,18 @@ async def add_professional_organization(
         raise
     except Exception as e:
         logger.error(f"添加行业组织失败: {e}")
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="添加行业组织失败")
 
 
 @router.get("/{system_id}/profession-metrics")
 async def get_profession_metrics(
     system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取职业体系指标"""
     try:
-        system = db.query(ProfessionSystem).filter(
-            ProfessionSystem.id == system_id
-        ).first()
+        system = await db.get(ProfessionSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="职业体系不存在")
@@ -290,17 +288,13 @@ async def get_profession_metrics(
 async def get_dimensional_profession_analysis(
     system_id: int,
     target_system_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取维度职业分析"""
     try:
-        system = db.query(ProfessionSystem).filter(
-            ProfessionSystem.id == system_id
-        ).first()
+        system = await db.get(ProfessionSystem, system_id)
 
-        target_system = db.query(ProfessionSystem).filter(
-            ProfessionSystem.id == target_system_id
-        ).first()
+        target_system = await db.get(ProfessionSystem, target_system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="职业体系不存在")
@@ -322,13 +316,11 @@ async def validate_career_transition(
     system_id: int,
     from_profession: str,
     to_profession: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """验证职业转换可行性"""
     try:
-        system = db.query(ProfessionSystem).filter(
-            ProfessionSystem.id == system_id
-        ).first()
+        system = await db.get(ProfessionSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="职业体系不存在")
@@ -346,13 +338,11 @@ async def validate_career_transition(
 async def get_skill_gap_analysis(
     system_id: int,
     target_profession: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取技能差距分析"""
     try:
-        system = db.query(ProfessionSystem).filter(
-            ProfessionSystem.id == system_id
-        ).first()
+        system = await db.get(ProfessionSystem, system_id)
 
         if not system:
             raise HTTPException(status_code=404, detail="职业体系不存在")
@@ -1,18 +1,34 @@
 """
 项目数据管理API端点
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
-from ...core.database import get_db
+from ...core.database import get_async_db
+from ...core.serialization import FastJSONResponse
 from ...services.project_data_service import ProjectDataService
 from ...services.ai_project_service import AIProjectService
 
 router = APIRouter()
 
 
+async def run_data_service(db: AsyncSession, operation: Callable[[ProjectDataService], Any]) -> Any:
+    """
+    在异步会话上执行项目数据服务操作
+
+    项目数据服务与AI助手、对话服务共用同步实现，这里通过 AsyncSession.run_sync
+    在异步驱动的连接上运行，数据库IO不会阻塞事件循环。
+    """
+    return await db.run_sync(lambda session: operation(ProjectDataService(session)))
+
+
+async def run_ai_service(db: AsyncSession, operation: Callable[[AIProjectService], Any]) -> Any:
+    """在异步会话上执行AI助手项目数据服务操作"""
+    return await db.run_sync(lambda session: operation(AIProjectService(session)))
+
+
 class ProjectDataRequest(BaseModel):
     """项目数据请求模型"""
     data: Dict[str, Any]
@@ -27,24 +43,26 @@ class SearchRequest(BaseModel):
     """搜索请求模型"""
     query: str
     data_types: Optional[List[str]] = None
+    project_id: Optional[int] = None
+    limit: int = 50
 
 
 @router.get("/projects/{project_id}/data")
 async def get_project_data(
     project_id: int,
     model_name: Optional[str] = Query(None, description="指定模型类型，不指定则返回所有数据"),
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description="返回的字段，逗号分隔，不指定则返回完整记录"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取项目数据"""
-    service = ProjectDataService(db)
-    
     try:
         if model_name:
-            data = service.get_project_model_data(project_id, model_name)
-            return {"data": {model_name: data}}
+            data = await run_data_service(db, lambda service: service.get_project_model_data(project_id, model_name, fields))
+            return FastJSONResponse({"data": {model_name: data}})
         else:
-            data = service.get_project_data(project_id)
-            return data
+            data = await run_data_service(db, lambda service: service.get_project_data(project_id, fields))
+            # 整个项目的数据量较大，直接编码，不经过 jsonable_encoder 逐项转换
+            return FastJSONResponse(data)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -56,13 +74,11 @@ async def create_project_data(
     project_id: int,
     model_name: str,
     request: ProjectDataRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建项目数据"""
-    service = ProjectDataService(db)
-    
     try:
-        result = service.create_project_data(project_id, model_name, request.data)
+        result = await run_data_service(db, lambda service: service.create_project_data(project_id, model_name, request.data))
         return {"success": True, "data": result}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -76,13 +92,11 @@ async def update_project_data(
     model_name: str,
     item_id: int,
     request: ProjectDataRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新项目数据"""
-    service = ProjectDataService(db)
-    
     try:
-        result = service.update_project_data(project_id, model_name, item_id, request.data)
+        result = await run_data_service(db, lambda service: service.update_project_data(project_id, model_name, item_id, request.data))
         if result is None:
             raise HTTPException(status_code=404, detail="数据记录不存在")
         return {"success": True, "data": result}
@@ -97,13 +111,11 @@ async def delete_project_data(
     project_id: int,
     model_name: str,
     item_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除项目数据"""
-    service = ProjectDataService(db)
-    
     try:
-        success = service.delete_project_data(project_id, model_name, item_id)
+        success = await run_data_service(db, lambda service: service.delete_project_data(project_id, model_name, item_id))
         if not success:
             raise HTTPException(status_code=404, detail="数据记录不存在")
         return {"success": True, "message": "删除成功"}
@@ -116,13 +128,11 @@ async def delete_project_data(
 @router.get("/projects/{project_id}/statistics")
 async def get_project_statistics(
     project_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取项目统计信息"""
-    service = ProjectDataService(db)
-    
     try:
-        stats = service.get_project_statistics(project_id)
+        stats = await run_data_service(db, lambda service: service.get_project_statistics(project_id))
         return {"statistics": stats}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取项目统计失败: {str(e)}")
@@ -132,13 +142,11 @@ async def get_project_statistics(
 async def clear_project_data(
     project_id: int,
     model_names: Optional[List[str]] = Query(None, description="指定要清空的模型类型"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """清空项目数据"""
-    service = ProjectDataService(db)
-    
     try:
-        success = service.clear_project_data(project_id, model_names)
+        success = await run_data_service(db, lambda service: service.clear_project_data(project_id, model_names))
         if not success:
             raise HTTPException(status_code=500, detail="清空项目数据失败")
         return {"success": True, "message": "清空成功"}
@@ -151,13 +159,11 @@ async def copy_project_data(
     source_project_id: int,
     target_project_id: int,
     model_names: Optional[List[str]] = Query(None, description="指定要复制的模型类型"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """复制项目数据"""
-    service = ProjectDataService(db)
-    
     try:
-        success = service.copy_project_data(source_project_id, target_project_id, model_names)
+        success = await run_data_service(db, lambda service: service.copy_project_data(source_project_id, target_project_id, model_names))
         if not success:
             raise HTTPException(status_code=500, detail="复制项目数据失败")
         return {"success": True, "message": "复制成功"}
@@ -168,13 +174,11 @@ async def copy_project_data(
 @router.get("/projects/{project_id}/validate")
 async def validate_project_data(
     project_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """验证项目数据完整性"""
-    service = ProjectDataService(db)
-    
     try:
-        result = service.validate_project_data_integrity(project_id)
+        result = await run_data_service(db, lambda service: service.validate_project_data_integrity(project_id))
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"验证项目数据失败: {str(e)}")
@@ -184,13 +188,11 @@ async def validate_project_data(
 @router.post("/ai/set-project/{project_id}")
 async def ai_set_current_project(
     project_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """AI助手设置当前操作项目"""
-    service = AIProjectService(db)
-    
     try:
-        success = service.set_current_project(project_id)
+        success = await run_ai_service(db, lambda service: service.set_current_project(project_id))
         if not success:
             raise HTTPException(status_code=404, detail="项目不存在")
         return {"success": True, "message": f"当前项目已设置为 {project_id}"}
@@ -200,12 +202,10 @@ async def ai_set_current_project(
 
 @router.get("/ai/current-project")
 async def ai_get_current_project(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """AI助手获取当前操作项目"""
-    service = AIProjectService(db)
-    
-    project_id = service.get_current_project_id()
+    project_id = await run_ai_service(db, lambda service: service.get_current_project_id())
     if project_id is None:
         raise HTTPException(status_code=400, detail="未设置当前操作项目")
     
@@ -215,13 +215,11 @@ async def ai_get_current_project(
 @router.get("/ai/read-data")
 async def ai_read_project_data(
     data_type: Optional[str] = Query(None, description="数据类型"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """AI助手读取项目数据"""
-    service = AIProjectService(db)
-    
     try:
-        data = service.read_project_data(data_type)
+        data = await run_ai_service(db, lambda service: service.read_project_data(data_type))
         return {"success": True, "data": data}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -234,13 +232,11 @@ async def ai_write_project_data(
     data_type: str,
     request: ProjectDataRequest,
     operation: str = Query("create", description="操作类型: create 或 update"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """AI助手写入项目数据"""
-    service = AIProjectService(db)
-    
     try:
-        result = service.write_project_data(data_type, request.data, operation)
+        result = await run_ai_service(db, lambda service: service.write_project_data(data_type, request.data, operation))
         return {"success": True, "data": result}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -251,13 +247,11 @@ async def ai_write_project_data(
 @router.post("/ai/batch-write")
 async def ai_batch_write_project_data(
     request: BatchDataRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """AI助手批量写入项目数据"""
-    service = AIProjectService(db)
-    
     try:
-        result = service.batch_write_project_data(request.batch_data)
+        result = await run_ai_service(db, lambda service: service.batch_write_project_data(request.batch_data))
         return {"success": True, "result": result}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -268,13 +262,18 @@ async def ai_batch_write_project_data(
 @router.post("/ai/search")
 async def ai_search_project_data(
     request: SearchRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """AI助手搜索项目数据"""
-    service = AIProjectService(db)
-    
+    """AI助手搜索项目数据（全文索引，按相关度排序并附带摘要片段）"""
+    def search(service: AIProjectService) -> Dict[str, Any]:
+        if request.project_id is not None and not service.set_current_project(request.project_id):
+            raise ValueError(f"项目 {request.project_id} 不存在")
+        return service.search_project_data(request.query, request.data_types, request.limit)
+
     try:
-        results = service.search_project_data(request.query, request.data_types)
+        results = await run_ai_service(db, search)
+        # 首次检索时建立的全文索引写在本请求的会话中，随会话提交
+        await db.commit()
         return {"success": True, "results": results}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -284,13 +283,11 @@ async def ai_search_project_data(
 
 @router.get("/ai/context")
 async def ai_get_project_context(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """AI助手获取项目上下文"""
-    service = AIProjectService(db)
-    
     try:
-        context = service.get_project_context()
+        context = await run_ai_service(db, lambda service: service.get_project_context())
         return {"success": True, "context": context}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -301,13 +298,11 @@ async def ai_get_project_context(
 @router.get("/ai/operation-log")
 async def ai_get_operation_log(
     limit: int = Query(50, description="返回记录数量"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取AI操作日志"""
-    service = AIProjectService(db)
-    
     try:
-        log = service.get_ai_operation_log(limit)
+        log = await run_ai_service(db, lambda service: service.get_ai_operation_log(limit))
         return {"success": True, "log": log}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取操作日志失败: {str(e)}")
@@ -315,13 +310,11 @@ async def ai_get_operation_log(
 
 @router.delete("/ai/operation-log")
 async def ai_clear_operation_log(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """清空AI操作日志"""
-    service = AIProjectService(db)
-    
     try:
-        service.clear_ai_operation_log()
+        await run_ai_service(db, lambda service: service.clear_ai_operation_log())
         return {"success": True, "message": "操作日志已清空"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"清空操作日志失败: {str(e)}")
@@ -2,13 +2,14 @@
 项目管理 API 端点
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import logging
 
-from ...core.database import get_db
+from ...core.database import get_async_db
 from ...models.project import Project, ProjectType, ProjectStatus
 from ...services.project_service import ProjectService
+from ...services.pagination import InvalidCursor
 from ...schemas.project import (
     ProjectCreate,
     ProjectUpdate,
@@ -56,22 +57,24 @@ async def get_projects(
     project_type: Optional[ProjectType] = Query(None, description="项目类型筛选"),
     status: Optional[ProjectStatus] = Query(None, description="项目状态筛选"),
     search: Optional[str] = Query(None, description="搜索关键词"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页的 next_cursor"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取项目列表"""
     try:
         service = ProjectService(db)
-        projects, total = service.get_projects(
+        page = await service.get_projects(
             skip=skip,
             limit=limit,
             project_type=project_type,
             status=status,
-            search=search
+            search=search,
+            cursor=cursor
         )
 
         # 手动构建项目列表项
         project_items = []
-        for project in projects:
+        for project in page.items:
             project_dict = {
                 'id': project.id,
                 'name': project.name,
@@ -91,10 +94,13 @@ async def get_projects(
 
         return ProjectListResponse(
             projects=project_items,
-            total=total,
+            total=page.total,
             skip=skip,
-            limit=limit
+            limit=limit,
+            next_cursor=page.next_cursor
         )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取项目列表失败: {e}")
         raise HTTPException(status_code=500, detail="获取项目列表失败")
@@ -103,12 +109,12 @@ async def get_projects(
 @router.post("/", response_model=ProjectResponse)
 async def create_project(
     project_data: ProjectCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建新项目"""
     try:
         service = ProjectService(db)
-        project = service.create_project(project_data)
+        project = await service.create_project(project_data)
 
         return ProjectResponse(**build_project_response(project))
     except ValueError as e:
@@ -121,12 +127,12 @@ async def create_project(
 @router.get("/{project_id}", response_model=ProjectResponse)
 async def get_project(
     project_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取项目详情"""
     try:
         service = ProjectService(db)
-        project = service.get_project(project_id)
+        project = await service.get_project(project_id)
         if not project:
             raise HTTPException(status_code=404, detail="项目不存在")
 
@@ -142,12 +148,12 @@ async def get_project(
 async def update_project(
     project_id: int,
     project_data: ProjectUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新项目"""
     try:
         service = ProjectService(db)
-        project = service.update_project(project_id, project_data)
+        project = await service.update_project(project_id, project_data)
         if not project:
             raise HTTPException(status_code=404, detail="项目不存在")
         return ProjectResponse(**build_project_response(project))
@@ -163,12 +169,12 @@ async def update_project(
 @router.delete("/{project_id}")
 async def delete_project(
     project_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除项目"""
     try:
         service = ProjectService(db)
-        success = service.delete_project(project_id)
+        success = await service.delete_project(project_id)
         if not success:
             raise HTTPException(status_code=404, detail="项目不存在")
         return {"message": "项目删除成功"}
@@ -182,12 +188,12 @@ async def delete_project(
 @router.get("/{project_id}/statistics")
 async def get_project_statistics(
     project_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取项目统计信息"""
     try:
         service = ProjectService(db)
-        stats = service.get_project_statistics(project_id)
+        stats = await service.get_project_statistics(project_id)
         if not stats:
             raise HTTPException(status_code=404, detail="项目不存在")
         return stats
@@ -202,12 +208,12 @@ async def get_project_statistics(
 async def duplicate_project(
     project_id: int,
     new_name: str = Query(..., description="新项目名称"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """复制项目"""
     try:
         service = ProjectService(db)
-        new_project = service.duplicate_project(project_id, new_name)
+        new_project = await service.duplicate_project(project_id, new_name)
         if not new_project:
             raise HTTPException(status_code=404, detail="原项目不存在")
         return ProjectResponse(**build_project_response(new_project))
@@ -222,12 +228,12 @@ async def duplicate_project(
 async def export_project(
     project_id: int,
     format: str = Query("json", description="导出格式"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """导出项目"""
     try:
         service = ProjectService(db)
-        export_data = service.export_project(project_id, format)
+        export_data = await service.export_project(project_id, format)
         if not export_data:
             raise HTTPException(status_code=404, detail="项目不存在")
         return export_data
@@ -243,12 +249,12 @@ async def export_project(
 @router.post("/import")
 async def import_project(
     import_data: dict,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """导入项目"""
     try:
         service = ProjectService(db)
-        project = service.import_project(import_data)
+        project = await service.import_project(import_data)
         return ProjectResponse(**build_project_response(project))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -260,12 +266,12 @@ async def import_project(
 @router.get("/{project_id}/backup")
 async def backup_project(
     project_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """备份项目"""
     try:
         service = ProjectService(db)
-        backup_info = service.backup_project(project_id)
+        backup_info = await service.backup_project(project_id)
         if not backup_info:
             raise HTTPException(status_code=404, detail="项目不存在")
         return backup_info
@@ -280,12 +286,12 @@ async def backup_project(
 async def restore_project(
     project_id: int,
     backup_id: str = Query(..., description="备份ID"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """恢复项目"""
     try:
         service = ProjectService(db)
-        success = service.restore_project(project_id, backup_id)
+        success = await service.restore_project(project_id, backup_id)
         if not success:
             raise HTTPException(status_code=404, detail="项目或备份不存在")
         return {"message": "项目恢复成功"}
@@ -2,11 +2,14 @@
 关系管理 API 端点
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import logging
 
-from ...core.database import get_db
+from ...core.database import get_async_db
+from ...services.pagination import InvalidCursor, paginate, recent_order
+from ...services.sparse_fields import InvalidFields, list_response, parse_fields, select_fields
 from ...models.relations import CharacterRelation, FactionRelation, RelationStatus
 
 logger = logging.getLogger(__name__)
@@ -20,26 +23,37 @@ async def get_character_relations(
     relation_type: Optional[str] = Query(None, description="关系类型"),
     skip: int = Query(0, ge=0, description="跳过数量"),
     limit: int = Query(100, ge=1, le=1000, description="限制数量"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页响应头 X-Next-Cursor"),
+    include_total: bool = Query(False, description="是否在响应头 X-Total-Count 中返回总数"),
+    fields: Optional[str] = Query(None, description="返回的字段，逗号分隔，不指定则返回完整记录"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取人物关系列表"""
     try:
-        query = db.query(CharacterRelation).filter(
-            CharacterRelation.project_id == project_id
+        query = select(CharacterRelation).where(
+            CharacterRelation.project_id == project_id,
+            CharacterRelation.is_deleted == False
         )
 
         if character_id is not None:
-            query = query.filter(
+            query = query.where(
                 (CharacterRelation.character_a_id == character_id) |
                 (CharacterRelation.character_b_id == character_id)
             )
 
         if relation_type is not None:
-            query = query.filter(CharacterRelation.relation_type == relation_type)
+            query = query.where(CharacterRelation.relation_type == relation_type)
 
-        relations = query.offset(skip).limit(limit).all()
+        selected = parse_fields(fields, CharacterRelation)
+        query = select_fields(query, CharacterRelation, selected)
 
-        return [relation.to_dict() for relation in relations]
+        page = await paginate(
+            db, query, recent_order(CharacterRelation), limit,
+            cursor=cursor, offset=skip, include_total=include_total
+        )
+        return list_response(page.items, selected, page.headers())
+    except (InvalidCursor, InvalidFields) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取人物关系列表失败: {e}")
         raise HTTPException(status_code=500, detail="获取人物关系列表失败")
@@ -52,26 +66,37 @@ async def get_faction_relations(
     relation_type: Optional[str] = Query(None, description="关系类型"),
     skip: int = Query(0, ge=0, description="跳过数量"),
     limit: int = Query(100, ge=1, le=1000, description="限制数量"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页响应头 X-Next-Cursor"),
+    include_total: bool = Query(False, description="是否在响应头 X-Total-Count 中返回总数"),
+    fields: Optional[str] = Query(None, description="返回的字段，逗号分隔，不指定则返回完整记录"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取势力关系列表"""
     try:
-        query = db.query(FactionRelation).filter(
-            FactionRelation.project_id == project_id
+        query = select(FactionRelation).where(
+            FactionRelation.project_id == project_id,
+            FactionRelation.is_deleted == False
         )
 
         if faction_id is not None:
-            query = query.filter(
+            query = query.where(
                 (FactionRelation.faction_a_id == faction_id) |
                 (FactionRelation.faction_b_id == faction_id)
             )
 
         if relation_type is not None:
-            query = query.filter(FactionRelation.relation_type == relation_type)
+            query = query.where(FactionRelation.relation_type == relation_type)
 
-        relations = query.offset(skip).limit(limit).all()
+        selected = parse_fields(fields, FactionRelation)
+        query = select_fields(query, FactionRelation, selected)
 
-        return [relation.to_dict() for relation in relations]
+        page = await paginate(
+            db, query, recent_order(FactionRelation), limit,
+            cursor=cursor, offset=skip, include_total=include_total
+        )
+        return list_response(page.items, selected, page.headers())
+    except (InvalidCursor, InvalidFields) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取势力关系列表失败: {e}")
         raise HTTPException(status_code=500, detail="获取势力关系列表失败")
@@ -80,19 +105,19 @@ async def get_faction_relations(
 @router.post("/character-relations")
 async def create_character_relation(
     relation_data: dict,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建人物关系"""
     try:
         relation = CharacterRelation(**relation_data)
         db.add(relation)
-        db.commit()
-        db.refresh(relation)
+        await db.commit()
+        await db.refresh(relation)
 
         logger.info(f"创建人物关系成功: {relation.id}")
         return relation.to_dict()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"创建人物关系失败: {e}")
         raise HTTPException(status_code=500, detail="创建人物关系失败")
 
@@ -100,19 +125,19 @@ async def create_character_relation(
 @router.post("/faction-relations")
 async def create_faction_relation(
     relation_data: dict,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建势力关系"""
     try:
         relation = FactionRelation(**relation_data)
         db.add(relation)
-        db.commit()
-        db.refresh(relation)
+        await db.commit()
+        await db.refresh(relation)
 
         logger.info(f"创建势力关系成功: {relation.id}")
         return relation.to_dict()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"创建势力关系失败: {e}")
         raise HTTPException(status_code=500, detail="创建势力关系失败")
 
@@ -121,13 +146,11 @@ async def create_faction_relation(
 async def update_character_relation(
     relation_id: int,
     relation_data: dict,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新人物关系"""
     try:
-        relation = db.query(CharacterRelation).filter(
-            CharacterRelation.id == relation_id
-        ).first()
+        relation = await db.get(CharacterRelation, relation_id)
 
         if not relation:
             raise HTTPException(status_code=404, detail="人物关系不存在")
@@ -137,15 +160,15 @@ async def update_character_relation(
             if hasattr(relation, field):
                 setattr(relation, field, value)
 
-        db.commit()
-        db.refresh(relation)
+        await db.commit()
+        await db.refresh(relation)
 
         logger.info(f"更新人物关系成功: {relation.id}")
         return relation.to_dict()
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"更新人物关系失败: {e}")
         raise HTTPException(status_code=500, detail="更新人物关系失败")
 
@@ -153,26 +176,24 @@ async def update_character_relation(
 @router.delete("/character-relations/{relation_id}")
 async def delete_character_relation(
     relation_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除人物关系"""
     try:
-        relation = db.query(CharacterRelation).filter(
-            CharacterRelation.id == relation_id
-        ).first()
+        relation = await db.get(CharacterRelation, relation_id)
 
         if not relation:
             raise HTTPException(status_code=404, detail="人物关系不存在")
 
-        db.delete(relation)
-        db.commit()
+        await db.delete(relation)
+        await db.commit()
 
         logger.info(f"删除人物关系成功: {relation_id}")
         return {"message": "删除成功"}
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"删除人物关系失败: {e}")
         raise HTTPException(status_code=500, detail="删除人物关系失败")
 
@@ -180,13 +201,11 @@ async def delete_character_relation(
 @router.get("/character-relations/{relation_id}/score")
 async def get_relation_score(
     relation_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取关系评分"""
     try:
-        relation = db.query(CharacterRelation).filter(
-            CharacterRelation.id == relation_id
-        ).first()
+        relation = await db.get(CharacterRelation, relation_id)
 
         if not relation:
             raise HTTPException(status_code=404, detail="人物关系不存在")
@@ -205,25 +224,23 @@ async def update_trust_level(
     relation_id: int,
     trust_change: float,
     reason: str = "",
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新信任度"""
     try:
-        relation = db.query(CharacterRelation).filter(
-            CharacterRelation.id == relation_id
-        ).first()
+        relation = await db.get(CharacterRelation, relation_id)
 
         if not relation:
             raise HTTPException(status_code=404, detail="人物关系不存在")
 
         relation.update_trust(trust_change, reason)
-        db.commit()
+        await db.commit()
 
         return {"message": "信任度更新成功", "new_trust_level": relation.trust_level}
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"更新信任度失败: {e}")
         raise HTTPException(status_code=500, detail="更新信任度失败")
 
@@ -231,19 +248,19 @@ async def update_trust_level(
 @router.get("/network-analysis")
 async def get_network_analysis(
     project_id: int = Query(..., description="项目ID"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取关系网络分析"""
     try:
         # 获取所有人物关系
-        character_relations = db.query(CharacterRelation).filter(
-            CharacterRelation.project_id == project_id
-        ).all()
+        character_relations = (await db.execute(
+            select(CharacterRelation).where(CharacterRelation.project_id == project_id, CharacterRelation.is_deleted == False)
+        )).scalars().all()
 
         # 获取所有势力关系
-        faction_relations = db.query(FactionRelation).filter(
-            FactionRelation.project_id == project_id
-        ).all()
+        faction_relations = (await db.execute(
+            select(FactionRelation).where(FactionRelation.project_id == project_id, FactionRelation.is_deleted == False)
+        )).scalars().all()
 
         # 统计分析
         total_relations = len(character_relations) + len(faction_relations)
@@ -2,11 +2,14 @@
 秘境分布管理 API 端点
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import logging
 
-from ...core.database import get_db
+from ...core.database import get_async_db
+from ...services.pagination import InvalidCursor, paginate, recent_order
+from ...services.sparse_fields import InvalidFields, list_response, parse_fields, select_fields
 from ...models.secret_realm_distribution import SecretRealmDistribution, RealmType, DangerLevel, AccessType
 from ...schemas.secret_realm_distribution import (
     SecretRealmDistributionCreate,
@@ -25,23 +28,34 @@ async def get_secret_realm_distributions(
     danger_level: Optional[DangerLevel] = Query(None, description="危险等级"),
     skip: int = Query(0, ge=0, description="跳过数量"),
     limit: int = Query(100, ge=1, le=1000, description="限制数量"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页响应头 X-Next-Cursor"),
+    include_total: bool = Query(False, description="是否在响应头 X-Total-Count 中返回总数"),
+    fields: Optional[str] = Query(None, description="返回的字段，逗号分隔，不指定则返回完整记录"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取秘境分布列表"""
     try:
-        query = db.query(SecretRealmDistribution).filter(
-            SecretRealmDistribution.project_id == project_id
+        query = select(SecretRealmDistribution).where(
+            SecretRealmDistribution.project_id == project_id,
+            SecretRealmDistribution.is_deleted == False
         )
 
         if realm_type is not None:
-            query = query.filter(SecretRealmDistribution.realm_type == realm_type)
+            query = query.where(SecretRealmDistribution.realm_type == realm_type)
 
         if danger_level is not None:
-            query = query.filter(SecretRealmDistribution.danger_level == danger_level)
+            query = query.where(SecretRealmDistribution.danger_level == danger_level)
 
-        distributions = query.offset(skip).limit(limit).all()
+        selected = parse_fields(fields, SecretRealmDistribution)
+        query = select_fields(query, SecretRealmDistribution, selected)
 
-        return [distribution.to_dict() for distribution in distributions]
+        page = await paginate(
+            db, query, recent_order(SecretRealmDistribution), limit,
+            cursor=cursor, offset=skip, include_total=include_total
+        )
+        return list_response(page.items, selected, page.headers(), schema=SecretRealmDistributionResponse)
+    except (InvalidCursor, InvalidFields) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取秘境分布列表失败: {e}")
         raise HTTPException(status_code=500, detail="获取秘境分布列表失败")
@@ -50,19 +64,23 @@ async def get_secret_realm_distributions(
 @router.post("/", response_model=SecretRealmDistributionResponse)
 async def create_secret_realm_distribution(
     distribution_data: SecretRealmDistributionCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """创建新秘境分布"""
     try:
-        distribution = SecretRealmDistribution(**distribution_data.dict())
+        # 创建模型中的部分字段（发现信息、备注等）没有对应的列，只取模型存在的字段
+        distribution = SecretRealmDistribution(**{
+            field: value for field, value in distribution_data.dict().items()
+            if hasattr(SecretRealmDistribution, field)
+        })
         db.add(distribution)
-        db.commit()
-        db.refresh(distribution)
+        await db.commit()
+        await db.refresh(distribution)
 
         logger.info(f"创建秘境分布成功: {distribution.name}")
         return distribution.to_dict()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"创建秘境分布失败: {e}")
         raise HTTPException(status_code=500, detail="创建秘境分布失败")
 
@@ -70,13 +88,11 @@ async def create_secret_realm_distribution(
 @router.get("/{distribution_id}", response_model=SecretRealmDistributionResponse)
 async def get_secret_realm_distribution(
     distribution_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取秘境分布详情"""
     try:
-        distribution = db.query(SecretRealmDistribution).filter(
-            SecretRealmDistribution.id == distribution_id
-        ).first()
+        distribution = await db.get(SecretRealmDistribution, distribution_id)
 
         if not distribution:
             raise HTTPException(status_code=404, detail="秘境分布不存在")
@@ -93,13 +109,11 @@ async def get_secret_realm_distribution(
 async def update_secret_realm_distribution(
     distribution_id: int,
     distribution_data: SecretRealmDistributionUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新秘境分布"""
     try:
-        distribution = db.query(SecretRealmDistribution).filter(
-            SecretRealmDistribution.id == distribution_id
-        ).first()
+        distribution = await db.get(SecretRealmDistribution, distribution_id)
 
         if not distribution:
             raise HTTPException(status_code=404, detail="秘境分布不存在")
@@ -109,15 +123,15 @@ async def update_secret_realm_distribution(
         for field, value in update_data.items():
             setattr(distribution, field, value)
 
-        db.commit()
-        db.refresh(distribution)
+        await db.commit()
+        await db.refresh(distribution)
 
         logger.info(f"更新秘境分布成功: {distribution.name}")
         return distribution.to_dict()
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"更新秘境分布失败: {e}")
         raise HTTPException(status_code=500, detail="更新秘境分布失败")
 
@@ -125,26 +139,24 @@ async def update_secret_realm_distribution(
 @router.delete("/{distribution_id}")
 async def delete_secret_realm_distribution(
     distribution_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除秘境分布"""
     try:
-        distribution = db.query(SecretRealmDistribution).filter(
-            SecretRealmDistribution.id == distribution_id
-        ).first()
+        distribution = await db.get(SecretRealmDistribution, distribution_id)
 
         if not distribution:
             raise HTTPException(status_code=404, detail="秘境分布不存在")
 
-        db.delete(distribution)
-        db.commit()
+        await db.delete(distribution)
+        await db.commit()
 
         logger.info(f"删除秘境分布成功: {distribution.name}")
         return {"message": "删除成功"}
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"删除秘境分布失败: {e}")
         raise HTTPException(status_code=500, detail="删除秘境分布失败")
 
@@ -152,13 +164,11 @@ async def delete_secret_realm_distribution(
 @router.get("/{distribution_id}/difficulty-score")
 async def get_difficulty_score(
     distribution_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取秘境难度评分"""
     try:
-        distribution = db.query(SecretRealmDistribution).filter(
-            SecretRealmDistribution.id == distribution_id
-        ).first()
+        distribution = await db.get(SecretRealmDistribution, distribution_id)
 
         if not distribution:
             raise HTTPException(status_code=404, detail="秘境分布不存在")
@@ -175,13 +185,11 @@ async def get_difficulty_score(
 @router.get("/{distribution_id}/validate")
 async def validate_distribution(
     distribution_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """验证秘境分布一致性"""
     try:
-        distribution = db.query(SecretRealmDistribution).filter(
-            SecretRealmDistribution.id == distribution_id
-        ).first()
+        distribution = await db.get(SecretRealmDistribution, distribution_id)
 
         if not distribution:
             raise HTTPException(status_code=404, detail="秘境分布不存在")
@@ -202,25 +210,23 @@ async def validate_distribution(
 async def add_treasure(
     distribution_id: int,
     treasure_data: dict,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加宝藏"""
     try:
-        distribution = db.query(SecretRealmDistribution).filter(
-            SecretRealmDistribution.id == distribution_id
-        ).first()
+        distribution = await db.get(SecretRealmDistribution, distribution_id)
 
         if not distribution:
             raise HTTPException(status_code=404, detail="秘境分布不存在")
 
         distribution.add_treasure(treasure_data)
-        db.commit()
+        await db.commit()
 
         return {"message": "添加宝藏成功"}
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"添加宝藏失败: {e}")
         raise HTTPException(status_code=500, detail="添加宝藏失败")
 
@@ -229,25 +235,23 @@ async def add_treasure(
 async def add_guardian_creature(
     distribution_id: int,
     creature_data: dict,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加守护生物"""
     try:
-        distribution = db.query(SecretRealmDistribution).filter(
-            SecretRealmDistribution.id == distribution_id
-        ).first()
+        distribution = await db.get(SecretRealmDistribution, distribution_id)
 
         if not distribution:
             raise HTTPException(status_code=404, detail="秘境分布不存在")
 
         distribution.add_guardian_creature(creature_data)
-        db.commit()
+        await db.commit()
 
         return {"message": "添加守护生物成功"}
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"添加守护生物失败: {e}")
         raise HTTPException(status_code=500, detail="添加守护生物失败")
 
@@ -256,24 +260,22 @@ async def add_guardian_creature(
 async def add_trap_system(
     distribution_id: int,
     trap_data: dict,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加陷阱系统"""
     try:
-        distribution = db.query(SecretRealmDistribution).filter(
-            SecretRealmDistribution.id == distribution_id
-        ).first()
+        distribution = await db.get(SecretRealmDistribution, distribution_id)
 
         if not distribution:
             raise HTTPException(status_code=404, detail="秘境分布不存在")
 
         distribution.add_trap_system(trap_data)
-        db.commit()
+        await db.commit()
 
         return {"message": "添加陷阱系统成功"}
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"添加陷阱系统失败: {e}")
         raise HTTPException(status_code=500, detail="添加陷阱系统失败")
@@ -6,7 +6,7 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 import logging
 
-from ...core.database import get_db
+from ...core.database import get_db, get_read_db
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -17,7 +17,7 @@ async def get_volumes(
     project_id: int = Query(..., description="项目ID"),
     skip: int = Query(0, ge=0, description="跳过的记录数"),
     limit: int = Query(20, ge=1, le=100, description="返回的记录数"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取卷宗列表"""
     return {"message": "卷宗列表功能待实现", "project_id": project_id}
@@ -35,7 +35,7 @@ async def create_volume(
 @router.get("/{volume_id}")
 async def get_volume(
     volume_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取卷宗详情"""
     return {"message": f"获取卷宗 {volume_id} 详情功能待实现"}
@@ -65,7 +65,7 @@ async def get_volume_chapters(
     volume_id: int,
     skip: int = Query(0, ge=0, description="跳过的记录数"),
     limit: int = Query(20, ge=1, le=100, description="返回的记录数"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取卷宗下的章节列表"""
     return {"message": f"获取卷宗 {volume_id} 章节列表功能待实现"}
@@ -84,7 +84,7 @@ async def create_chapter_in_volume(
 @router.get("/{volume_id}/statistics")
 async def get_volume_statistics(
     volume_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取卷宗统计信息"""
     return {"message": f"获取卷宗 {volume_id} 统计信息功能待实现"}
@@ -20,6 +20,25 @@ class Settings:
     # 数据库配置
     database_url: str = "sqlite:///./novelcraft.db"
     database_echo: bool = False
+    # 异步数据库连接，留空时根据 database_url 推导（sqlite+aiosqlite / postgresql+asyncpg）
+    database_async_url: Optional[str] = None
+    # 存储配置档：auto（按连接地址选择）/ sqlite / postgres / default（SQLAlchemy默认）
+    database_profile: str = "auto"
+    database_pool_size: int = 10  # 连接池大小（postgres）
+    database_max_overflow: int = 20  # 连接池满时允许额外创建的连接数（postgres）
+    database_pool_timeout: float = 30.0  # 等待空闲连接的超时（秒）
+    database_pool_recycle: int = 1800  # 连接最长复用时间（秒）
+    # SQLite配置档：写连接池与只读连接池分开，WAL模式下读不再排在写之后；
+    # 写事务由SQLite自身的写锁串行化，连接在 busy_timeout 内等待写锁
+    sqlite_write_pool_size: int = 5  # 写连接数（请求期间持有会话不会阻塞其他写请求取得连接）
+    sqlite_write_max_overflow: int = 10  # 写连接池满时允许额外创建的连接数
+    sqlite_read_pool_size: int = 8  # 只读连接数
+    sqlite_busy_timeout: float = 20.0  # 等待写锁的超时（秒）
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"  # WAL模式下 NORMAL 只在检查点时同步，断电最多丢失最近的事务
+    sqlite_cache_size: int = -65536  # 页缓存，负数表示KB（约64MB）
+    sqlite_mmap_size: int = 268435456  # 内存映射读取的大小（256MB），0为关闭
+    sqlite_temp_store: str = "MEMORY"  # 临时表与排序使用内存
 
     # 安全配置
     secret_key: str = "your-secret-key-here"
@@ -39,31 +58,43 @@ class Settings:
     openai_api_key: Optional[str] = None
     openai_base_url: str = "https://api.openai.com/v1"
     openai_model: str = "gpt-3.5-turbo"
+    openai_rpm: int = 0  # 每分钟请求数上限，0为不限
+    openai_tpm: int = 0  # 每分钟token数上限，0为不限
 
     # Claude配置
     claude_api_key: Optional[str] = None
     claude_base_url: str = "https://api.anthropic.com"
     claude_model: str = "claude-3-sonnet-20240229"
+    claude_rpm: int = 0  # 每分钟请求数上限，0为不限
+    claude_tpm: int = 0  # 每分钟token数上限，0为不限
 
     # 智谱AI配置
     zhipu_api_key: Optional[str] = None
     zhipu_base_url: str = "https://open.bigmodel.cn/api/paas/v4"
     zhipu_model: str = "glm-4"
+    zhipu_rpm: int = 0  # 每分钟请求数上限，0为不限
+    zhipu_tpm: int = 0  # 每分钟token数上限，0为不限
 
     # 硅基流动配置
     siliconflow_api_key: Optional[str] = None
     siliconflow_base_url: str = "https://api.siliconflow.cn/v1"
     siliconflow_model: str = "deepseek-chat"
+    siliconflow_rpm: int = 0  # 每分钟请求数上限，0为不限
+    siliconflow_tpm: int = 0  # 每分钟token数上限，0为不限
 
     # 谷歌AI配置
     google_api_key: Optional[str] = None
     google_base_url: str = "https://generativelanguage.googleapis.com/v1beta"
     google_model: str = "gemini-pro"
+    google_rpm: int = 0  # 每分钟请求数上限，0为不限
+    google_tpm: int = 0  # 每分钟token数上限，0为不限
 
     # GROK配置
     grok_api_key: Optional[str] = None
     grok_base_url: str = "https://api.x.ai/v1"
     grok_model: str = "grok-beta"
+    grok_rpm: int = 0  # 每分钟请求数上限，0为不限
+    grok_tpm: int = 0  # 每分钟token数上限，0为不限
 
     # Ollama配置
     ollama_base_url: str = "http://localhost:11434"
@@ -73,6 +104,8 @@ class Settings:
     custom_api_key: Optional[str] = None
     custom_base_url: Optional[str] = None
     custom_model: Optional[str] = None
+    custom_rpm: int = 0
+    custom_tpm: int = 0
 
     # 默认AI提供商和模型
     default_ai_provider: str = "ollama"  # openai, claude, zhipu, siliconflow, google, grok, ollama, custom
@@ -80,6 +113,44 @@ class Settings:
     max_tokens: int = 2000
     temperature: float = 0.7
 
+    # AI HTTP连接池配置
+    ai_http_max_connections: int = 100  # 每个提供商的最大连接数
+    ai_http_max_keepalive_connections: int = 20  # 每个提供商保持的空闲长连接数
+    ai_http_keepalive_expiry: float = 30.0  # 空闲连接保持时间（秒）
+    ai_http_connect_timeout: float = 10.0  # 建立连接超时（秒）
+    ai_http2_enabled: bool = True  # 提供商支持时启用HTTP/2
+
+    # AI服务健康监测配置
+    ai_health_check_interval: float = 30.0  # 后台探测间隔（秒）
+    ai_health_ttl: float = 60.0  # 健康状态缓存有效期（秒）
+    ai_circuit_failure_threshold: int = 3  # 连续失败多少次后熔断
+    ai_circuit_recovery_timeout: float = 30.0  # 熔断冷却时间（秒）
+
+    # AI提供商路由配置
+    ai_provider_pool: str = ""  # 逗号分隔的备用提供商（按优先级），留空则只使用当前提供商
+    ai_routing_latency_window: int = 50  # 每个提供商保留的最近延迟样本数
+    ai_routing_min_samples: int = 5  # 样本数不足时使用假定延迟
+    ai_routing_default_latency: float = 5.0  # 假定延迟（秒）
+    ai_routing_switch_ratio: float = 2.0  # 当前提供商延迟超过最快备用提供商的倍数时让位
+    ai_failover_timeout: float = 60.0  # 有备用提供商时，单次非流式请求的默认超时（秒，额度放行后按每次HTTP请求计时，不含本地排队与限流退避），提供商服务设置了请求超时（配置项 timeout）时以其为准
+    ai_failover_first_token_timeout: float = 20.0  # 有备用提供商时，流式请求等待首个数据块的超时（秒，同样不含排队与退避）
+    ai_hedge_after_ms: int = 0  # 超过该时间未响应则同时请求下一个提供商，0为关闭对冲
+
+    # AI限流配置（各提供商的每分钟请求数/token数上限见上方 *_rpm、*_tpm）
+    ai_rate_limit_enabled: bool = True
+    ai_rate_limit_max_wait: float = 30.0  # 预计排队超过该时间则立即拒绝（秒）
+    ai_rate_limit_queue_size: int = 100  # 每个提供商/模型的最大排队请求数
+    ai_rate_limit_max_retries: int = 2  # 收到429后按Retry-After等待重试的次数
+    ai_rate_limit_default_retry_after: float = 5.0  # 未返回Retry-After时的首次退避时间（秒），之后逐次翻倍
+
+    # AI批量生成配置
+    ai_batch_concurrency: int = 4  # 每个提供商的最大并发请求数
+    ai_batch_max_items: int = 500  # 单次批量请求的最大条目数
+
+    # 结构化输出配置
+    ai_structured_native: bool = True  # 优先使用提供商原生的JSON模式或工具调用
+    ai_structured_max_retries: int = 1  # 输出未通过校验时的最大重试次数
+
     # AI功能开关
     ai_enabled: bool = True
     ai_auto_save: bool = True
@@ -97,9 +168,55 @@ class Settings:
     # 缓存配置
     cache_ttl: int = 3600  # 1小时
 
+    # AI响应缓存配置
+    ai_cache_enabled: bool = True
+    ai_cache_memory_entries: int = 256  # 内存LRU层最大条目数
+    ai_cache_disk_path: str = "./cache/ai_responses.db"  # SQLite持久层路径，留空则只使用内存层
+    ai_cache_disk_entries: int = 5000  # 持久层最大条目数
+
+    # 对话会话存储配置
+    conversation_store_path: str = "./cache/conversation_sessions.db"  # SQLite持久层路径，留空则只保存在进程内
+    conversation_session_ttl: int = 7 * 24 * 3600  # 会话无活动后的保留时间（秒）
+    conversation_memory_sessions: int = 1024  # 进程内缓存的会话数
+    conversation_max_history: int = 50  # 每个会话保留的对话记录条数
+    conversation_summary_enabled: bool = True  # 对话记录过长时压缩为滚动摘要
+    conversation_summary_trigger_tokens: int = 1500  # 对话记录超过该token数时触发压缩
+    conversation_summary_keep_entries: int = 6  # 压缩时保留原文的最近记录条数
+    conversation_summary_max_tokens: int = 400  # 摘要的token上限
+    conversation_analysis_max_tokens: int = 512  # 每路输入分析调用的输出token上限
+    conversation_analysis_timeout: int = 30  # 每路输入分析调用的超时时间（秒）
+
+    # 后台任务队列配置
+    background_task_workers: int = 1  # 工作线程数，为1时按提交顺序执行
+    background_task_queue_size: int = 1000  # 队列上限，已满时任务改为同步执行
+    background_task_shutdown_timeout: int = 30  # 关闭服务时等待剩余任务的时间（秒）
+
+    # 整卷一致性检查配置
+    ai_consistency_max_chapters: int = 200  # 单次检查的最大章节数
+    ai_consistency_cache_path: str = "./cache/consistency_claims.db"  # 章节提取结果缓存，留空则只使用内存
+    ai_consistency_cache_ttl: int = 30 * 24 * 3600  # 提取结果缓存有效期（秒）
+    ai_consistency_fact_sheet_tokens: int = 800  # 设定表的token上限
+
+    # 提示词token预算配置
+    ai_context_window: Optional[int] = None  # 模型上下文窗口，留空则按模型名称推断
+    ai_prompt_safety_margin: int = 64  # 估算误差的安全余量（tokens）
+    ai_prompt_use_tiktoken: bool = True  # OpenAI 兼容接口在安装了 tiktoken 时使用真实分词器
+
+    # 项目资料检索（RAG）配置
+    rag_enabled: bool = True
+    rag_embedder: str = "hashing"  # hashing（离线哈希TF-IDF），或 sentence-transformers:<模型名>
+    rag_embedding_dim: int = 1024  # 哈希向量维度
+    rag_index_dir: str = "./cache/vectors"  # 向量索引目录，留空则只保存在内存中
+    rag_chunk_chars: int = 400  # 每个片段的最大字符数
+    rag_top_k: int = 8  # 每次最多选取的片段数
+    rag_token_budget: int = 1500  # 资料上下文的token预算
+    rag_min_score: float = 0.05  # 相似度低于该值的片段不选取
+
     # 分页配置
     default_page_size: int = 20
     max_page_size: int = 100
+    pagination_count_ttl: int = 30  # 列表总数缓存有效期（秒），本进程内写入时立即失效
+    pagination_count_cache_size: int = 1024  # 缓存的总数查询条数
 
 
 # 创建全局设置实例
@@ -115,8 +232,26 @@ def get_settings() -> Settings:
 DATABASE_CONFIG = {
     "url": settings.database_url,
     "echo": settings.database_echo,
+    "profile": settings.database_profile,
     "pool_pre_ping": True,
-    "pool_recycle": 300,
+    "pool_size": settings.database_pool_size,
+    "max_overflow": settings.database_max_overflow,
+    "pool_timeout": settings.database_pool_timeout,
+    "pool_recycle": settings.database_pool_recycle,
+    "sqlite": {
+        "write_pool_size": settings.sqlite_write_pool_size,
+        "write_max_overflow": settings.sqlite_write_max_overflow,
+        "read_pool_size": settings.sqlite_read_pool_size,
+        "busy_timeout": settings.sqlite_busy_timeout,
+        # 每个连接建立时执行的PRAGMA
+        "pragmas": {
+            "journal_mode": settings.sqlite_journal_mode,
+            "synchronous": settings.sqlite_synchronous,
+            "cache_size": settings.sqlite_cache_size,
+            "mmap_size": settings.sqlite_mmap_size,
+            "temp_store": settings.sqlite_temp_store,
+        },
+    },
 }
 
 # AI模型配置 - 多平台支持
@@ -127,6 +262,8 @@ AI_PROVIDERS_CONFIG = {
         "model": settings.openai_model,
         "max_tokens": settings.max_tokens,
         "temperature": settings.temperature,
+        "rpm": settings.openai_rpm,
+        "tpm": settings.openai_tpm,
     },
     "claude": {
         "api_key": settings.claude_api_key,
@@ -134,6 +271,8 @@ AI_PROVIDERS_CONFIG = {
         "model": settings.claude_model,
         "max_tokens": settings.max_tokens,
         "temperature": settings.temperature,
+        "rpm": settings.claude_rpm,
+        "tpm": settings.claude_tpm,
     },
     "zhipu": {
         "api_key": settings.zhipu_api_key,
@@ -141,6 +280,8 @@ AI_PROVIDERS_CONFIG = {
         "model": settings.zhipu_model,
         "max_tokens": settings.max_tokens,
         "temperature": settings.temperature,
+        "rpm": settings.zhipu_rpm,
+        "tpm": settings.zhipu_tpm,
     },
     "siliconflow": {
         "api_key": settings.siliconflow_api_key,
@@ -148,6 +289,8 @@ AI_PROVIDERS_CONFIG = {
         "model": settings.siliconflow_model,
         "max_tokens": settings.max_tokens,
         "temperature": settings.temperature,
+        "rpm": settings.siliconflow_rpm,
+        "tpm": settings.siliconflow_tpm,
     },
     "google": {
         "api_key": settings.google_api_key,
@@ -155,6 +298,8 @@ AI_PROVIDERS_CONFIG = {
         "model": settings.google_model,
         "max_tokens": settings.max_tokens,
         "temperature": settings.temperature,
+        "rpm": settings.google_rpm,
+        "tpm": settings.google_tpm,
     },
     "grok": {
         "api_key": settings.grok_api_key,
@@ -162,6 +307,8 @@ AI_PROVIDERS_CONFIG = {
         "model": settings.grok_model,
         "max_tokens": settings.max_tokens,
         "temperature": settings.temperature,
+        "rpm": settings.grok_rpm,
+        "tpm": settings.grok_tpm,
     },
     "ollama": {
         "base_url": settings.ollama_base_url,
@@ -175,6 +322,8 @@ AI_PROVIDERS_CONFIG = {
         "model": settings.custom_model,
         "max_tokens": settings.max_tokens,
         "temperature": settings.temperature,
+        "rpm": settings.custom_rpm,
+        "tpm": settings.custom_tpm,
     }
 }
 
@@ -187,6 +336,132 @@ AI_CONFIG = {
     "providers": AI_PROVIDERS_CONFIG
 }
 
+# AI HTTP连接池配置
+AI_HTTP_POOL_CONFIG = {
+    "max_connections": settings.ai_http_max_connections,
+    "max_keepalive_connections": settings.ai_http_max_keepalive_connections,
+    "keepalive_expiry": settings.ai_http_keepalive_expiry,
+    "connect_timeout": settings.ai_http_connect_timeout,
+    "http2": settings.ai_http2_enabled,
+}
+
+# AI服务健康监测配置
+AI_HEALTH_CONFIG = {
+    "interval": settings.ai_health_check_interval,
+    "ttl": settings.ai_health_ttl,
+    "failure_threshold": settings.ai_circuit_failure_threshold,
+    "recovery_timeout": settings.ai_circuit_recovery_timeout,
+}
+
+# AI提供商路由配置
+AI_ROUTING_CONFIG = {
+    "providers": [p.strip() for p in settings.ai_provider_pool.split(",") if p.strip()],
+    "latency_window": settings.ai_routing_latency_window,
+    "min_samples": settings.ai_routing_min_samples,
+    "default_latency": settings.ai_routing_default_latency,
+    "switch_ratio": settings.ai_routing_switch_ratio,
+    "timeout": settings.ai_failover_timeout,
+    "first_token_timeout": settings.ai_failover_first_token_timeout,
+    "hedge_after_ms": settings.ai_hedge_after_ms,
+}
+
+# AI限流配置
+AI_RATE_LIMIT_CONFIG = {
+    "enabled": settings.ai_rate_limit_enabled,
+    "max_wait": settings.ai_rate_limit_max_wait,
+    "queue_size": settings.ai_rate_limit_queue_size,
+    "max_retries": settings.ai_rate_limit_max_retries,
+    "default_retry_after": settings.ai_rate_limit_default_retry_after,
+}
+
+# AI响应缓存配置
+AI_CACHE_CONFIG = {
+    "enabled": settings.ai_cache_enabled,
+    "ttl": settings.cache_ttl,
+    "memory_entries": settings.ai_cache_memory_entries,
+    "disk_path": settings.ai_cache_disk_path,
+    "disk_entries": settings.ai_cache_disk_entries,
+}
+
+# AI批量生成配置
+AI_BATCH_CONFIG = {
+    "concurrency": settings.ai_batch_concurrency,
+    "max_items": settings.ai_batch_max_items,
+}
+
+# 结构化输出配置
+AI_STRUCTURED_CONFIG = {
+    "native": settings.ai_structured_native,
+    "max_retries": settings.ai_structured_max_retries,
+}
+
+# 对话会话存储配置
+CONVERSATION_STORE_CONFIG = {
+    "path": settings.conversation_store_path,
+    "ttl": settings.conversation_session_ttl,
+    "memory_entries": settings.conversation_memory_sessions,
+    "max_history": settings.conversation_max_history,
+    "purge_interval": 100,
+}
+
+# 对话历史滚动摘要配置
+CONVERSATION_SUMMARY_CONFIG = {
+    "enabled": settings.conversation_summary_enabled,
+    "trigger_tokens": settings.conversation_summary_trigger_tokens,
+    "keep_entries": settings.conversation_summary_keep_entries,
+    "summary_max_tokens": settings.conversation_summary_max_tokens,
+}
+
+# 对话输入分析配置
+CONVERSATION_ANALYSIS_CONFIG = {
+    "max_tokens": settings.conversation_analysis_max_tokens,
+    "timeout": settings.conversation_analysis_timeout,
+}
+
+# 后台任务队列配置
+BACKGROUND_TASK_CONFIG = {
+    "workers": settings.background_task_workers,
+    "queue_size": settings.background_task_queue_size,
+    "shutdown_timeout": settings.background_task_shutdown_timeout,
+}
+
+# 整卷一致性检查配置
+AI_CONSISTENCY_CONFIG = {
+    "max_chapters": settings.ai_consistency_max_chapters,
+    "cache_path": settings.ai_consistency_cache_path,
+    "cache_ttl": settings.ai_consistency_cache_ttl,
+    "fact_sheet_tokens": settings.ai_consistency_fact_sheet_tokens,
+    "extraction_max_tokens": 1024,
+    "review_max_tokens": 2000,
+}
+
+# 提示词token预算配置
+AI_PROMPT_CONFIG = {
+    "context_window": settings.ai_context_window,
+    "safety_margin": settings.ai_prompt_safety_margin,
+    "use_tiktoken": settings.ai_prompt_use_tiktoken,
+}
+
+# 项目资料检索（RAG）配置
+RAG_CONFIG = {
+    "enabled": settings.rag_enabled,
+    "embedder": settings.rag_embedder,
+    "embedding_dim": settings.rag_embedding_dim,
+    "index_dir": settings.rag_index_dir,
+    "chunk_chars": settings.rag_chunk_chars,
+    "top_k": settings.rag_top_k,
+    "token_budget": settings.rag_token_budget,
+    "min_score": settings.rag_min_score,
+}
+
+# 列表分页配置
+PAGINATION_CONFIG = {
+    "default_page_size": settings.default_page_size,
+    "max_page_size": settings.max_page_size,
+    "count_ttl": settings.pagination_count_ttl,
+    "count_cache_size": settings.pagination_count_cache_size,
+}
+
 # 文件上传配置
 UPLOAD_CONFIG = {
     "dir": settings.upload_dir,
@@ -1,28 +1,114 @@
 """
 数据库连接和会话管理模块
 """
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, event, MetaData
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import StaticPool
-from typing import Generator
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+from typing import Any, AsyncGenerator, Dict, Generator, List, Optional, TYPE_CHECKING
+import logging
 import os
 
-from .config import settings
+from .config import settings, DATABASE_CONFIG
 
+logger = logging.getLogger(__name__)
 
-# 创建数据库引擎
-engine = create_engine(
-    settings.database_url,
-    echo=settings.database_echo,
-    pool_pre_ping=True,
-    # SQLite特定配置
-    poolclass=StaticPool,
-    connect_args={
-        "check_same_thread": False,
-        "timeout": 20
-    } if "sqlite" in settings.database_url else {}
-)
+
+def get_database_profile(url: Optional[str] = None) -> str:
+    """获取存储配置档，auto 时按连接地址选择"""
+    url = url or settings.database_url
+    profile = DATABASE_CONFIG.get("profile", "auto")
+    if profile != "auto":
+        return profile
+    if url.startswith("sqlite"):
+        return "sqlite"
+    if url.startswith("postgres"):
+        return "postgres"
+    return "default"
+
+
+def is_memory_database(url: str) -> bool:
+    """是否为SQLite内存数据库（只能共享同一个连接）"""
+    path = url.split("://", 1)[-1].lstrip("/")
+    return path in ("", ":memory:") or "mode=memory" in url
+
+
+def get_engine_options(url: str, role: str = "write") -> Dict[str, Any]:
+    """
+    按配置档生成引擎参数
+
+    role: write（同步写连接）、read（同步只读连接）、async（异步连接）
+    - sqlite：写连接池按 write_pool_size / write_max_overflow，只读连接池按 read_pool_size，
+      异步连接池为两者之和；请求可能在整个处理期间持有会话，连接池不承担写入串行化，
+      并发的写事务由SQLite写锁串行化，在 busy_timeout 内等待；WAL模式下读连接不会等待写事务
+    - postgres：按 pool_size / max_overflow 建立连接池，读写共用
+    """
+    options: Dict[str, Any] = {"echo": DATABASE_CONFIG.get("echo", False), "pool_pre_ping": True}
+    profile = get_database_profile(url)
+    if url.startswith("sqlite"):
+        sqlite_config = DATABASE_CONFIG.get("sqlite", {})
+        connect_args: Dict[str, Any] = {"timeout": sqlite_config.get("busy_timeout", 20.0)}
+        if role != "async":
+            connect_args["check_same_thread"] = False
+        options["connect_args"] = connect_args
+        if is_memory_database(url):
+            options["poolclass"] = StaticPool
+        elif profile == "sqlite":
+            read_pool_size = max(int(sqlite_config.get("read_pool_size", 8)), 1)
+            write_pool_size = max(int(sqlite_config.get("write_pool_size", 5)), 1)
+            write_max_overflow = max(int(sqlite_config.get("write_max_overflow", 10)), 0)
+            options["poolclass"] = AsyncAdaptedQueuePool if role == "async" else QueuePool
+            if role == "read":
+                options["pool_size"] = read_pool_size
+                options["max_overflow"] = 0
+            elif role == "write":
+                options["pool_size"] = write_pool_size
+                options["max_overflow"] = write_max_overflow
+            else:
+                options["pool_size"] = read_pool_size + write_pool_size
+                options["max_overflow"] = write_max_overflow
+            options["pool_timeout"] = DATABASE_CONFIG.get("pool_timeout", 30.0)
+    elif profile == "postgres":
+        for key in ("pool_size", "max_overflow", "pool_timeout", "pool_recycle"):
+            options[key] = DATABASE_CONFIG[key]
+    return options
+
+
+def apply_sqlite_pragmas(target: Engine, read_only: bool = False):
+    """在每个新连接上执行SQLite配置档的PRAGMA（只读连接另外开启 query_only）"""
+    pragmas = DATABASE_CONFIG.get("sqlite", {}).get("pragmas", {})
+
+    @event.listens_for(target, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                if value is not None and value != "":
+                    cursor.execute(f"PRAGMA {name}={value}")
+            if read_only:
+                cursor.execute("PRAGMA query_only=ON")
+        finally:
+            cursor.close()
+
+
+def create_configured_engine(url: str, role: str = "write") -> Engine:
+    """按配置档创建同步引擎"""
+    configured = create_engine(url, **get_engine_options(url, role))
+    if url.startswith("sqlite") and get_database_profile(url) == "sqlite":
+        apply_sqlite_pragmas(configured, read_only=role == "read")
+    return configured
+
+
+# 创建数据库引擎（写入与一般用途）
+engine = create_configured_engine(settings.database_url)
+
+# 只读引擎：SQLite文件数据库使用独立的只读连接池，其他情况与写引擎共用
+if settings.database_url.startswith("sqlite") and get_database_profile() == "sqlite" \
+        and not is_memory_database(settings.database_url):
+    read_engine = create_configured_engine(settings.database_url, role="read")
+else:
+    read_engine = engine
 
 # 创建会话工厂
 SessionLocal = sessionmaker(
@@ -31,6 +117,71 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+# 只读会话工厂（SQLite配置档下写入会报错）
+ReadSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=read_engine
+)
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+
+def get_async_database_url(url: Optional[str] = None) -> str:
+    """根据同步连接地址推导异步驱动的连接地址"""
+    if settings.database_async_url and url is None:
+        return settings.database_async_url
+    url = url or settings.database_url
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:") or url.startswith("postgres:"):
+        return "postgresql+asyncpg:" + url.split(":", 1)[1]
+    return url
+
+
+_async_engine: Optional["AsyncEngine"] = None
+_async_session_factory: Optional["async_sessionmaker"] = None
+
+
+def get_async_engine() -> "AsyncEngine":
+    """获取异步数据库引擎（首次使用时创建，驱动缺失时在此处报错）"""
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        url = get_async_database_url()
+        _async_engine = create_async_engine(url, **get_engine_options(url, role="async"))
+        if url.startswith("sqlite") and get_database_profile(url) == "sqlite":
+            apply_sqlite_pragmas(_async_engine.sync_engine)
+    return _async_engine
+
+
+def get_async_session_factory() -> "async_sessionmaker":
+    """获取异步会话工厂"""
+    global _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+        # 提交后不使对象过期，避免在异步会话外触发隐式加载
+        _async_session_factory = async_sessionmaker(
+            bind=get_async_engine(),
+            class_=AsyncSession,
+            autoflush=False,
+            expire_on_commit=False
+        )
+    return _async_session_factory
+
+
+async def dispose_async_engine():
+    """释放异步数据库引擎的连接"""
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_session_factory = None
+
+
 # 创建基础模型类
 Base = declarative_base()
 
@@ -50,11 +201,73 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+def get_read_db() -> Generator[Session, None, None]:
+    """
+    获取只读数据库会话
+    用于只读接口的依赖注入，SQLite配置档下不占用写连接
+    """
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_pool_status() -> Dict[str, Any]:
+    """获取存储配置档与连接池状态"""
+    status = {"profile": get_database_profile(), "write_pool": engine.pool.status()}
+    if read_engine is not engine:
+        status["read_pool"] = read_engine.pool.status()
+    if _async_engine is not None:
+        status["async_pool"] = _async_engine.pool.status()
+    return status
+
+
+async def get_async_db() -> AsyncGenerator["AsyncSession", None]:
+    """
+    获取异步数据库会话
+    用于依赖注入，查询不会阻塞事件循环
+    """
+    async with get_async_session_factory()() as db:
+        yield db
+
+
 def create_tables():
     """创建所有表"""
     Base.metadata.create_all(bind=engine)
 
 
+def ensure_indexes(bind=None) -> List[str]:
+    """
+    为已存在的表补建模型声明的索引，返回新建的索引名
+
+    create_all 跳过已存在的表，表上后来声明的索引需要在这里单独创建；
+    索引涉及的列在旧表中不存在时跳过该索引。
+    """
+    from sqlalchemy import inspect
+
+    bind = bind or engine
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            missing = [column.name for column in index.columns if column.name not in columns]
+            if missing:
+                # 旧数据库中缺少模型后来增加的列，需先执行对应的迁移
+                logger.warning(f"表 {table.name} 缺少列 {missing}，跳过索引 {index.name}")
+                continue
+            index.create(bind=bind)
+            created.append(index.name)
+    return created
+
+
 def drop_tables():
     """删除所有表"""
     Base.metadata.drop_all(bind=engine)
@@ -67,8 +280,9 @@ def init_db():
     if db_dir and not os.path.exists(db_dir):
         os.makedirs(db_dir)
     
-    # 创建表
+    # 创建表，并为已存在的表补建索引
     create_tables()
+    ensure_indexes()
     
     print("数据库初始化完成")
 
@@ -0,0 +1,68 @@
+"""
+序列化
+按模型预先生成行转字典的编码器，响应使用 orjson 编码
+"""
+from typing import Any, Callable, Dict
+from datetime import datetime
+from operator import attrgetter, itemgetter
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import DateTime, Table
+
+
+def build_row_encoder(table: Table) -> Callable[[Any], Dict[str, Any]]:
+    """
+    为表生成行转字典的编码器
+
+    列名与取值函数在生成时确定，逐行只做一次批量取值：已加载的行直接读取实例字典，
+    有未加载或已过期的列时退回属性访问（由ORM加载）；
+    时间列转换为ISO格式字符串，与逐列转换的结果一致
+    """
+    names = tuple(column.name for column in table.columns)
+    loaded_getter = itemgetter(*names)
+    getter = attrgetter(*names)
+    single = len(names) == 1
+    datetime_columns = tuple(
+        (index, name) for index, (name, column) in enumerate(zip(names, table.columns))
+        if isinstance(column.type, DateTime)
+    )
+
+    def encode(row) -> Dict[str, Any]:
+        try:
+            values = loaded_getter(row.__dict__)
+        except KeyError:
+            values = getter(row)
+        if single:
+            values = (values,)
+        result = dict(zip(names, values))
+        for index, name in datetime_columns:
+            value = values[index]
+            if isinstance(value, datetime):
+                result[name] = value.isoformat()
+        return result
+
+    return encode
+
+
+def _encode_fallback(value: Any) -> Any:
+    """orjson 不支持的类型（Decimal、集合、Pydantic模型等）交给 jsonable_encoder"""
+    return jsonable_encoder(value)
+
+
+def dumps(content: Any) -> bytes:
+    """编码为JSON字节串"""
+    return orjson.dumps(content, default=_encode_fallback, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    应用默认的JSON响应
+
+    端点直接返回该响应时跳过 response_model 的校验与 jsonable_encoder 转换，
+    用于内容已是字典列表的热点列表与大批量导出
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
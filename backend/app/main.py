@@ -10,8 +10,13 @@ import logging
 from contextlib import asynccontextmanager
 
 from .core.config import settings
-from .core.database import init_db, create_tables
+from .core.serialization import FastJSONResponse
+from .core.database import init_db, create_tables, dispose_async_engine, get_pool_status
 from .api import api_router
+from .services.ai_service import ai_manager
+from .services.conversation_store import conversation_store
+from .services.conversation_service import conversation_summarizer
+from .services.task_queue import background_tasks
 
 
 # 配置日志
@@ -42,6 +47,9 @@ async def lifespan(app: FastAPI):
         create_tables()
         logger.info("数据表创建完成")
 
+        # 创建AI服务连接池
+        await ai_manager.startup()
+
         logger.info("NovelCraft 后端服务启动成功")
 
     except Exception as e:
@@ -53,6 +61,17 @@ async def lifespan(app: FastAPI):
     # 关闭时执行
     logger.info("正在关闭 NovelCraft 后端服务...")
 
+    # 先等待仍需调用AI与写入数据的后台任务完成，再关闭它们依赖的资源
+    await conversation_summarizer.wait_idle()
+    await background_tasks.shutdown()
+
+    # 关闭AI服务连接池
+    await ai_manager.shutdown()
+
+    # 释放异步数据库连接并关闭会话存储
+    await dispose_async_engine()
+    conversation_store.close()
+
 
 # 创建 FastAPI 应用实例
 app = FastAPI(
@@ -60,7 +79,8 @@ app = FastAPI(
     description=settings.description,
     version=settings.app_version,
     debug=settings.debug,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # 添加 CORS 中间件
@@ -70,6 +90,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 # 添加可信主机中间件
@@ -100,7 +121,8 @@ async def health_check():
     return {
         "status": "healthy",
         "service": settings.app_name,
-        "version": settings.app_version
+        "version": settings.app_version,
+        "database": get_pool_status()
     }
 
 
@@ -1,13 +1,71 @@
 """
 基础数据模型
 """
-from sqlalchemy import Column, Integer, DateTime, String, Text, Boolean
+from sqlalchemy import Column, Integer, DateTime, String, Text, Boolean, Index, event, text
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declared_attr
 from datetime import datetime
-from typing import Any, Dict
+from functools import wraps
+from typing import Any, Callable, Dict, Sequence, Tuple
 
 from ..core.database import Base
+from ..core.serialization import build_row_encoder
+
+
+_DERIVED_CACHE_ATTR = "_derived_cache"
+
+# 部分索引的条件，与查询中 is_deleted == False 的渲染结果一致（SQLite为0，PostgreSQL为false）
+_LIVE_ROWS_WHERE = {
+    "sqlite_where": text("is_deleted = 0"),
+    "postgresql_where": text("is_deleted = false"),
+}
+
+
+def live_index(table: str, *columns: str) -> Index:
+    """只包含未删除记录的部分索引，查询条件需包含 is_deleted == False 才会使用"""
+    return Index(f"ix_{table}_live_{'_'.join(columns)}", *columns, **_LIVE_ROWS_WHERE)
+
+
+def project_indexes(table: str, *extra: Tuple[str, ...]) -> Tuple[Index, ...]:
+    """
+    项目范围查询的索引，用于模型的 __table_args__
+
+    - (project_id, is_deleted) 复合索引：按项目读取、统计、删除与复制，含已删除记录的查询同样适用
+    - extra 中的每组列生成 (project_id, ...) 的部分索引，只覆盖未删除记录，
+      对应按关系类型、维度、章节序号等过滤或排序的常用查询
+    """
+    indexes = [Index(f"ix_{table}_project_id_is_deleted", "project_id", "is_deleted")]
+    indexes += [live_index(table, "project_id", *columns) for columns in extra]
+    return tuple(indexes)
+
+
+def derived_field(*depends_on: str) -> Callable:
+    """
+    派生字段声明
+
+    被装饰的无参方法的计算结果缓存在实例上，同一行多次调用（如 to_dict 与摘要方法
+    互相调用）只计算一次。depends_on 列出所依赖的列名，这些列被重新赋值时通过
+    SQLAlchemy 属性事件自动失效；实例过期或从数据库刷新时全部失效。
+    JSON 列原地修改（append/update）不会触发属性事件，修改方需调用 invalidate_derived。
+    列表、字典等结果直接返回缓存的对象（不逐次复制），调用方应视为只读，需要修改时自行复制。
+    """
+    def decorator(method: Callable) -> Callable:
+        name = method.__name__
+
+        @wraps(method)
+        def wrapper(self):
+            cache = self.__dict__.get(_DERIVED_CACHE_ATTR)
+            if cache is None:
+                cache = {}
+                self.__dict__[_DERIVED_CACHE_ATTR] = cache
+            if name not in cache:
+                cache[name] = method(self)
+            return cache[name]
+
+        wrapper.__derived_depends_on__: Tuple[str, ...] = depends_on
+        return wrapper
+
+    return decorator
 
 
 class BaseModel(Base):
@@ -35,15 +93,41 @@ class BaseModel(Base):
         return cls.__name__.lower()
 
     def to_dict(self) -> Dict[str, Any]:
-        """转换为字典"""
+        """转换为字典（使用映射完成时为模型生成的编码器）"""
+        return self.__row_encoder__(self)
+
+    def to_fields(self, fields: Sequence[str]) -> Dict[str, Any]:
+        """只转换指定的列（不计算派生字段，不会触发未加载列的读取）"""
         result = {}
-        for column in self.__table__.columns:
-            value = getattr(self, column.name)
+        for name in fields:
+            value = getattr(self, name)
             if isinstance(value, datetime):
                 value = value.isoformat()
-            result[column.name] = value
+            result[name] = value
         return result
 
+    def invalidate_derived(self, *names: str) -> None:
+        """使派生字段缓存失效，不指定名称时全部失效"""
+        cache = self.__dict__.get(_DERIVED_CACHE_ATTR)
+        if not cache:
+            return
+        if not names:
+            cache.clear()
+            return
+        for name in names:
+            cache.pop(name, None)
+
+    @classmethod
+    def get_derived_fields(cls) -> Dict[str, Tuple[str, ...]]:
+        """获取模型声明的派生字段及其依赖列"""
+        fields = {}
+        for klass in reversed(cls.__mro__):
+            for name, value in vars(klass).items():
+                depends_on = getattr(value, "__derived_depends_on__", None)
+                if depends_on is not None:
+                    fields[name] = depends_on
+        return fields
+
     def update_from_dict(self, data: Dict[str, Any]) -> None:
         """从字典更新属性"""
         for key, value in data.items():
@@ -54,12 +138,42 @@ class BaseModel(Base):
         return f"<{self.__class__.__name__}(id={self.id})>"
 
 
+def _invalidate_all_derived(target, *args) -> None:
+    """实例过期或刷新时清空派生字段缓存"""
+    target.invalidate_derived()
+
+
+@event.listens_for(BaseModel, "mapper_configured", propagate=True)
+def _register_derived_field_events(mapper, cls) -> None:
+    """为派生字段的依赖列注册属性事件"""
+    dependents: Dict[str, list] = {}
+    for name, depends_on in cls.get_derived_fields().items():
+        for column in depends_on:
+            dependents.setdefault(column, []).append(name)
+
+    for column, names in dependents.items():
+        def on_set(target, value, oldvalue, initiator, _names=tuple(names)):
+            target.invalidate_derived(*_names)
+
+        event.listen(getattr(cls, column), "set", on_set)
+
+
+@event.listens_for(BaseModel, "mapper_configured", propagate=True)
+def _build_row_encoder(mapper, cls) -> None:
+    """为模型生成行转字典的编码器"""
+    cls.__row_encoder__ = staticmethod(build_row_encoder(cls.__table__))
+
+
+event.listen(BaseModel, "expire", _invalidate_all_derived, propagate=True)
+event.listen(BaseModel, "refresh", _invalidate_all_derived, propagate=True)
+
+
 class ProjectBaseModel(BaseModel):
     """项目相关模型的基类"""
 
     __abstract__ = True
 
-    project_id = Column(Integer, index=True, comment="项目ID")
+    project_id = Column(Integer, comment="项目ID")  # 索引由子类的 project_indexes 声明
     name = Column(String(255), nullable=False, comment="名称")
     description = Column(Text, comment="描述")
 
@@ -7,7 +7,7 @@ from typing import Dict, Any, List
 from enum import Enum
 from datetime import datetime
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class ChapterStatus(str, Enum):
@@ -24,6 +24,7 @@ class Chapter(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """章节模型"""
 
     __tablename__ = "chapters"
+    __table_args__ = project_indexes("chapters", ("chapter_number",), ("volume_id", "chapter_number"))
 
     # 基本信息
     title = Column(String(500), comment="章节标题")
@@ -251,7 +252,7 @@ class Chapter(ProjectBaseModel, TaggedMixin, VersionedMixin):
         # 检查角色一致性
         if project_data and "characters" in project_data:
             project_character_ids = [char["id"] for char in project_data["characters"]]
-            for appearance in self.character_appearances:
+            for appearance in self.character_appearances or []:
                 char_id = appearance.get("character_id")
                 if char_id not in project_character_ids:
                     issues.append(f"角色ID {char_id} 在项目中不存在")
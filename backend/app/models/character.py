@@ -7,7 +7,7 @@ from typing import Dict, Any, List
 from enum import Enum
 from datetime import datetime
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, derived_field, project_indexes
 
 
 class CharacterType(str, Enum):
@@ -41,6 +41,7 @@ class Character(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """人物模型"""
 
     __tablename__ = "characters"
+    __table_args__ = project_indexes("characters")
 
     # 基本信息
     full_name = Column(String(200), comment="全名")
@@ -160,6 +161,7 @@ class Character(ProjectBaseModel, TaggedMixin, VersionedMixin):
         self.growth_events.append(event_data)
         # 按时间排序
         self.growth_events.sort(key=lambda x: x.get("timestamp", ""))
+        self.invalidate_derived()
 
     def update_power_level(self, cultivation_system_data: Dict[str, Any] = None):
         """更新实力等级"""
@@ -234,6 +236,7 @@ class Character(ProjectBaseModel, TaggedMixin, VersionedMixin):
             abilities.append(f"技能: {skill_count}项")
         return " | ".join(abilities)
 
+    @derived_field("character_type", "growth_events", "power_level")
     def calculate_importance_score(self) -> float:
         """计算人物重要性评分"""
         score = 0
@@ -5,7 +5,7 @@ from sqlalchemy import Column, Integer, String, Text, JSON, Float, ForeignKey
 from sqlalchemy.orm import relationship
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class SocialClass(str, Enum):
@@ -38,6 +38,7 @@ class CivilianSystem(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """生民体系模型"""
 
     __tablename__ = "civilian_systems"
+    __table_args__ = project_indexes("civilian_systems", ("dimension_id",), ("updated_at",))
 
     # 基本信息
     dimension_id = Column(Integer, comment="维度ID")
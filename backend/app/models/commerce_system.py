@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class EconomicSystem(str, Enum):
@@ -37,6 +37,7 @@ class CommerceSystem(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """商业体系模型"""
 
     __tablename__ = "commerce_systems"
+    __table_args__ = project_indexes("commerce_systems")
 
     # 基本信息
     economic_system = Column(SQLEnum(EconomicSystem), default=EconomicSystem.FEUDALISM, comment="经济制度")
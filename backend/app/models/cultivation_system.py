@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class PowerType(str, Enum):
@@ -25,6 +25,7 @@ class CultivationSystem(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """修炼体系模型"""
 
     __tablename__ = "cultivation_systems"
+    __table_args__ = project_indexes("cultivation_systems")
 
     # 基本信息
     system_type = Column(String(50), nullable=False, comment="体系类型")
@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class CurrencyType(str, Enum):
@@ -37,6 +37,7 @@ class CurrencySystem(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """货币体系模型"""
 
     __tablename__ = "currency_systems"
+    __table_args__ = project_indexes("currency_systems")
 
     # 基本信息
     monetary_system = Column(SQLEnum(MonetarySystem), default=MonetarySystem.GOLD_STANDARD, comment="货币制度")
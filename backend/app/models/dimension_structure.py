@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class DimensionType(str, Enum):
@@ -55,6 +55,7 @@ class DimensionStructure(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """维度结构模型"""
 
     __tablename__ = "dimension_structures"
+    __table_args__ = project_indexes("dimension_structures")
 
     # 基本信息
     dimension_type = Column(SQLEnum(DimensionType), default=DimensionType.MATERIAL, comment="维度类型")
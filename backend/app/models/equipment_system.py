@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class EquipmentType(str, Enum):
@@ -59,6 +59,7 @@ class EquipmentSystem(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """装备体系模型"""
 
     __tablename__ = "equipment_systems"
+    __table_args__ = project_indexes("equipment_systems")
 
     # 基本信息
     equipment_type = Column(SQLEnum(EquipmentType), default=EquipmentType.WEAPON, comment="装备类型")
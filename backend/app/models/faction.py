@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class FactionType(str, Enum):
@@ -38,6 +38,7 @@ class Faction(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """势力组织模型"""
 
     __tablename__ = "factions"
+    __table_args__ = project_indexes("factions")
 
     # 基本信息
     full_name = Column(String(300), comment="全称")
@@ -0,0 +1,207 @@
+"""
+架空历法时间解析
+将时间线中的时间表达式（纪元、年、月、日、相对时间）解析为可排序的数值键
+"""
+from typing import Any, Dict, Optional, NamedTuple
+from functools import lru_cache
+import re
+
+
+# 每年12个月、每月30天，数值键以“年”为单位
+MONTHS_PER_YEAR = 12
+DAYS_PER_MONTH = 30
+
+_DIGITS = {"零": 0, "〇": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4,
+           "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_UNITS = {"十": 10, "百": 100, "千": 1000}
+_SECTION_UNITS = {"万": 10 ** 4, "亿": 10 ** 8}
+_SPECIAL_MONTHS = {"正": 1, "冬": 11, "腊": 12}
+_DAY_PREFIXES = {"廿": 20, "卅": 30}
+_BEFORE_ERAS = ("公元前", "纪元前", "前")
+
+_NUMBER = r"-?\d+(?:\.\d+)?|[零〇一二两三四五六七八九十百千万亿]+"
+_ABSOLUTE_PATTERN = re.compile(
+    rf"^(?P<era>.*?)"
+    rf"(?:(?P<year>{_NUMBER}|元)年)?"
+    rf"(?:(?P<month>{_NUMBER}|正|冬|腊)月)?"
+    rf"(?:(?P<day>初?(?:{_NUMBER})|[廿卅][一二三四五六七八九]?)[日号]?)?$"
+)
+_RELATIVE_PATTERN = re.compile(
+    rf"^(?P<amount>{_NUMBER})(?P<unit>年|个月|月|天|日)(?P<direction>之?后|以后|之?前|以前)$"
+)
+
+
+class ParsedTime(NamedTuple):
+    """解析后的时间表达式"""
+    era: Optional[str] = None
+    year: Optional[float] = None
+    month: Optional[int] = None
+    day: Optional[int] = None
+    relative: bool = False
+    offset: float = 0.0  # 相对时间的偏移量（年）
+
+
+def parse_chinese_number(text: str) -> Optional[float]:
+    """解析阿拉伯数字或中文数字，如“三百二十”“一千零五”“二〇二四”"""
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+
+    if all(char in _DIGITS for char in text):
+        # 逐位书写的数字，如“二〇二四”
+        return float("".join(str(_DIGITS[char]) for char in text))
+
+    total = 0
+    section = 0
+    digit = None
+    for char in text:
+        if char in _DIGITS:
+            digit = _DIGITS[char]
+        elif char in _UNITS:
+            section += (1 if digit is None else digit) * _UNITS[char]
+            digit = None
+        elif char in _SECTION_UNITS:
+            section += digit or 0
+            total += section * _SECTION_UNITS[char]
+            section = 0
+            digit = None
+        else:
+            return None
+    return float(total + section + (digit or 0))
+
+
+def _parse_day(text: str) -> Optional[int]:
+    if text.startswith("初"):
+        text = text[1:]
+    if text[0] in _DAY_PREFIXES:
+        rest = parse_chinese_number(text[1:]) if len(text) > 1 else 0
+        return _DAY_PREFIXES[text[0]] + int(rest or 0)
+    value = parse_chinese_number(text)
+    return int(value) if value is not None else None
+
+
+@lru_cache(maxsize=8192)
+def parse_time_expression(text: str) -> Optional[ParsedTime]:
+    """
+    解析时间表达式（结果带缓存）
+
+    支持的形式：
+    - 纯数字：“100”“-50.5”
+    - 年月日：“100年”“三百年二月”“100年3月初五”“元年正月”
+    - 纪元：“天元三年”“公元前200年”
+    - 相对时间：“3年后”“五个月前”“10天后”
+    无法识别时返回 None。
+    """
+    if not text:
+        return None
+    text = text.strip().replace(" ", "")
+    if not text:
+        return None
+
+    try:
+        return ParsedTime(year=float(text))
+    except ValueError:
+        pass
+
+    match = _RELATIVE_PATTERN.match(text)
+    if match:
+        amount = parse_chinese_number(match.group("amount"))
+        if amount is None:
+            return None
+        unit = match.group("unit")
+        if unit in ("个月", "月"):
+            amount /= MONTHS_PER_YEAR
+        elif unit in ("天", "日"):
+            amount /= MONTHS_PER_YEAR * DAYS_PER_MONTH
+        if "前" in match.group("direction"):
+            amount = -amount
+        return ParsedTime(relative=True, offset=amount)
+
+    match = _ABSOLUTE_PATTERN.match(text)
+    if not match or not (match.group("year") or match.group("month")):
+        return None
+
+    year = None
+    if match.group("year"):
+        year = 1.0 if match.group("year") == "元" else parse_chinese_number(match.group("year"))
+        if year is None:
+            return None
+
+    month = None
+    if match.group("month"):
+        month_text = match.group("month")
+        month_value = _SPECIAL_MONTHS.get(month_text) or parse_chinese_number(month_text)
+        if month_value is None:
+            return None
+        month = int(month_value)
+
+    day = _parse_day(match.group("day")) if match.group("day") else None
+    era = match.group("era") or None
+    return ParsedTime(era=era, year=year, month=month, day=day)
+
+
+class FictionalCalendar:
+    """
+    架空历法
+
+    era_offsets 为纪元名称到起始年份的映射（如 {"天元": 0, "太初": 3000}），
+    纪元内的年份加上偏移量后得到统一的数值键；“公元前”“前”等前缀表示负年份，
+    未登记的纪元偏移量为0。
+    """
+
+    def __init__(self, era_offsets: Optional[Dict[str, float]] = None):
+        self.era_offsets = era_offsets or {}
+
+    @classmethod
+    def from_settings(cls, config: Optional[Dict[str, Any]]) -> "FictionalCalendar":
+        """
+        根据历法配置（项目设置中的 calendar 项）获取历法
+
+        未配置纪元时返回默认历法；相同配置返回同一实例，便于比较与复用解析缓存
+        """
+        era_offsets = (config or {}).get("era_offsets") or {}
+        if not era_offsets:
+            return default_calendar
+        return _calendar_for(tuple(sorted((era, float(offset)) for era, offset in era_offsets.items())))
+
+    def parse(self, text: str) -> Optional[ParsedTime]:
+        """解析时间表达式"""
+        return parse_time_expression(text) if text else None
+
+    def to_key(self, parsed: ParsedTime, base: float = 0.0) -> float:
+        """将解析结果转换为可排序的数值键（单位：年）"""
+        if parsed.relative:
+            return base + parsed.offset
+
+        year = parsed.year or 0.0
+        era = parsed.era
+        if era:
+            if era in _BEFORE_ERAS:
+                year = -year
+            else:
+                year += self.era_offsets.get(era, 0.0)
+
+        key = year
+        if parsed.month:
+            key += (parsed.month - 1) / MONTHS_PER_YEAR
+        if parsed.day:
+            key += (parsed.day - 1) / (MONTHS_PER_YEAR * DAYS_PER_MONTH)
+        return key
+
+    def sort_key(self, text: str, base: float = 0.0) -> float:
+        """获取时间表达式的排序键，无法识别时返回0；相对时间以 base 为基准"""
+        parsed = self.parse(text)
+        if parsed is None:
+            return 0.0
+        return self.to_key(parsed, base)
+
+
+default_calendar = FictionalCalendar()
+
+
+@lru_cache(maxsize=256)
+def _calendar_for(era_offsets: tuple) -> FictionalCalendar:
+    return FictionalCalendar(dict(era_offsets))
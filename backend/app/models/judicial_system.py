@@ -5,7 +5,7 @@ from sqlalchemy import Column, Integer, String, Text, JSON, Float, Boolean, Fore
 from sqlalchemy.orm import relationship
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class CourtType(str, Enum):
@@ -40,6 +40,7 @@ class JudicialSystem(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """司法体系模型"""
 
     __tablename__ = "judicial_systems"
+    __table_args__ = project_indexes("judicial_systems", ("dimension_id",), ("updated_at",))
 
     # 基本信息
     dimension_id = Column(Integer, comment="维度ID")
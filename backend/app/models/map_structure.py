@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, derived_field, project_indexes
 
 
 class MapType(str, Enum):
@@ -61,6 +61,7 @@ class MapStructure(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """地图结构模型"""
 
     __tablename__ = "map_structures"
+    __table_args__ = project_indexes("map_structures")
 
     # 基本信息
     map_type = Column(SQLEnum(MapType), default=MapType.REGION, comment="地图类型")
@@ -197,22 +198,27 @@ class MapStructure(ProjectBaseModel, TaggedMixin, VersionedMixin):
     def add_terrain_feature(self, feature_data: Dict[str, Any]):
         """添加地形特征"""
         self.terrain_features.append(feature_data)
+        self.invalidate_derived()
 
     def add_natural_landmark(self, landmark_data: Dict[str, Any]):
         """添加自然地标"""
         self.natural_landmarks.append(landmark_data)
+        self.invalidate_derived()
 
     def add_settlement(self, settlement_data: Dict[str, Any]):
         """添加定居点"""
         self.settlements.append(settlement_data)
+        self.invalidate_derived()
 
     def add_resource_node(self, resource_data: Dict[str, Any]):
         """添加资源节点"""
         self.resource_nodes.append(resource_data)
+        self.invalidate_derived()
 
     def add_magical_zone(self, zone_data: Dict[str, Any]):
         """添加魔法区域"""
         self.magical_zones.append(zone_data)
+        self.invalidate_derived()
 
     def add_child_map(self, child_map_data: Dict[str, Any]):
         """添加子地图"""
@@ -220,6 +226,7 @@ class MapStructure(ProjectBaseModel, TaggedMixin, VersionedMixin):
         child_map_data["level"] = self.level + 1
         return child_map_data
 
+    @derived_field("area_size", "natural_resources", "magical_resources", "rare_materials", "resource_nodes")
     def calculate_resource_density(self) -> float:
         """计算资源密度"""
         if not self.area_size or self.area_size == 0:
@@ -234,6 +241,10 @@ class MapStructure(ProjectBaseModel, TaggedMixin, VersionedMixin):
 
         return total_resources / self.area_size
 
+    @derived_field(
+        "exploration_difficulty", "environmental_hazards", "natural_disasters",
+        "monster_habitats", "forbidden_areas"
+    )
     def calculate_danger_level(self) -> float:
         """计算危险等级"""
         danger = 0.0
@@ -256,6 +267,10 @@ class MapStructure(ProjectBaseModel, TaggedMixin, VersionedMixin):
 
         return min(100.0, max(0.0, danger))
 
+    @derived_field(
+        "natural_resources", "magical_resources", "rare_materials", "transportation",
+        "trade_routes", "settlements", "sacred_sites", "ruins_and_artifacts"
+    )
     def calculate_strategic_value(self) -> float:
         """计算战略价值"""
         value = 50.0  # 基础分数
@@ -296,6 +311,10 @@ class MapStructure(ProjectBaseModel, TaggedMixin, VersionedMixin):
 
         return issues
 
+    @derived_field(
+        "description", "map_type", "terrain_type", "area_size", "exploration_difficulty",
+        "environmental_hazards", "natural_disasters", "monster_habitats", "forbidden_areas"
+    )
     def generate_summary(self) -> str:
         """生成地图摘要"""
         summary_parts = []
@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class TechniqueType(str, Enum):
@@ -42,6 +42,7 @@ class MartialArtsSystem(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """功法体系模型"""
 
     __tablename__ = "martial_arts_systems"
+    __table_args__ = project_indexes("martial_arts_systems")
 
     # 基本信息
     technique_type = Column(SQLEnum(TechniqueType), default=TechniqueType.INTERNAL, comment="功法类型")
@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class PetType(str, Enum):
@@ -58,6 +58,7 @@ class PetSystem(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """宠物体系模型"""
 
     __tablename__ = "pet_systems"
+    __table_args__ = project_indexes("pet_systems")
 
     # 基本信息
     pet_type = Column(SQLEnum(PetType), default=PetType.BEAST, comment="宠物类型")
@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class PlotType(str, Enum):
@@ -32,6 +32,7 @@ class Plot(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """剧情模型"""
 
     __tablename__ = "plots"
+    __table_args__ = project_indexes("plots")
 
     # 基本信息
     plot_type = Column(SQLEnum(PlotType), default=PlotType.SUB, comment="剧情类型")
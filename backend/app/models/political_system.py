@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class GovernmentType(str, Enum):
@@ -37,6 +37,7 @@ class PoliticalSystem(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """政治体系模型"""
 
     __tablename__ = "political_systems"
+    __table_args__ = project_indexes("political_systems", ("updated_at",))
 
     # 基本信息
     government_type = Column(SQLEnum(GovernmentType), default=GovernmentType.MONARCHY, comment="政府类型")
@@ -5,7 +5,7 @@ from sqlalchemy import Column, Integer, String, Text, JSON, Float, Boolean, Fore
 from sqlalchemy.orm import relationship
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class ProfessionCategory(str, Enum):
@@ -46,6 +46,7 @@ class ProfessionSystem(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """职业体系模型"""
 
     __tablename__ = "profession_systems"
+    __table_args__ = project_indexes("profession_systems", ("dimension_id",), ("updated_at",))
 
     # 基本信息
     dimension_id = Column(Integer, comment="维度ID")
@@ -6,7 +6,8 @@ from sqlalchemy.orm import relationship
 from enum import Enum
 from typing import Dict, Any, List
 
-from .base import BaseModel, TaggedMixin, VersionedMixin
+from .base import BaseModel, TaggedMixin, VersionedMixin, live_index
+from .fictional_calendar import FictionalCalendar
 
 
 class ProjectType(str, Enum):
@@ -37,6 +38,8 @@ class Project(BaseModel, TaggedMixin, VersionedMixin):
     """项目模型"""
 
     __tablename__ = "projects"
+    # 项目列表按更新时间倒序分页，只列出未删除的项目
+    __table_args__ = (live_index("projects", "updated_at"),)
 
     # 基本信息
     name = Column(String(255), nullable=False, index=True, comment="项目名称")
@@ -94,7 +97,9 @@ class Project(BaseModel, TaggedMixin, VersionedMixin):
             "chapter_target": 50,
             "writing_style": "third_person",
             "language": "zh-CN",
-            "theme": "default"
+            "theme": "default",
+            # 架空历法：纪元名称到起始年份的映射，如 {"天元": 0, "太初": 3000}
+            "calendar": {"era_offsets": {}}
         }
 
     def get_setting(self, key: str, default=None):
@@ -109,6 +114,10 @@ class Project(BaseModel, TaggedMixin, VersionedMixin):
             self.settings = {}
         self.settings[key] = value
 
+    def get_calendar(self) -> FictionalCalendar:
+        """获取项目的架空历法，时间线按该历法解析纪元年份"""
+        return FictionalCalendar.from_settings(self.get_setting("calendar"))
+
     def get_metadata(self, key: str, default=None):
         """获取元数据"""
         if self.project_metadata and key in self.project_metadata:
@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class PopulationDensity(str, Enum):
@@ -47,6 +47,7 @@ class RaceDistribution(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """种族分布模型"""
 
     __tablename__ = "race_distributions"
+    __table_args__ = project_indexes("race_distributions")
 
     # 基本信息
     race_name = Column(String(200), comment="种族名称")
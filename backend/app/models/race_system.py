@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class RaceType(str, Enum):
@@ -40,6 +40,7 @@ class RaceSystem(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """种族类别模型"""
 
     __tablename__ = "race_systems"
+    __table_args__ = project_indexes("race_systems")
 
     # 基本信息
     race_type = Column(SQLEnum(RaceType), default=RaceType.HUMANOID, comment="种族类型")
@@ -7,7 +7,7 @@ from typing import Dict, Any, List
 from enum import Enum
 from datetime import datetime
 
-from .base import BaseModel
+from .base import BaseModel, derived_field, project_indexes
 
 
 class RelationType(str, Enum):
@@ -49,6 +49,7 @@ class CharacterRelation(BaseModel):
     """人物关系模型"""
 
     __tablename__ = "character_relations"
+    __table_args__ = project_indexes("character_relations", ("relation_type",), ("updated_at",))
 
     # 关系双方
     character_a_id = Column(Integer, ForeignKey("characters.id"), comment="角色A的ID")
@@ -130,6 +131,7 @@ class CharacterRelation(BaseModel):
             "reason": reason
         })
 
+    @derived_field("strength", "trust_level", "intimacy_level", "conflict_level", "relation_type")
     def calculate_relationship_score(self) -> float:
         """计算关系综合评分"""
         # 基础评分基于关系强度
@@ -162,6 +164,7 @@ class CharacterRelation(BaseModel):
         else:
             return 1.0
 
+    @derived_field("relation_type", "strength", "status")
     def get_relationship_summary(self) -> str:
         """获取关系摘要"""
         summary_parts = []
@@ -195,6 +198,7 @@ class FactionRelation(BaseModel):
     """势力关系模型"""
 
     __tablename__ = "faction_relations"
+    __table_args__ = project_indexes("faction_relations", ("relation_type",), ("updated_at",))
 
     # 关系双方
     faction_a_id = Column(Integer, ForeignKey("factions.id"), comment="势力A的ID")
@@ -278,6 +282,7 @@ class EventAssociation(BaseModel):
     """事件关联模型"""
 
     __tablename__ = "event_associations"
+    __table_args__ = project_indexes("event_associations")
 
     # 事件信息
     event_id = Column(Integer, comment="事件ID")
@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class ResourceType(str, Enum):
@@ -41,6 +41,7 @@ class ResourceDistribution(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """资源分布模型"""
 
     __tablename__ = "resource_distributions"
+    __table_args__ = project_indexes("resource_distributions")
 
     # 基本信息
     resource_type = Column(SQLEnum(ResourceType), default=ResourceType.MINERAL, comment="资源类型")
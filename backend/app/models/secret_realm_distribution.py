@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class RealmType(str, Enum):
@@ -53,6 +53,7 @@ class SecretRealmDistribution(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """秘境分布模型"""
 
     __tablename__ = "secret_realm_distributions"
+    __table_args__ = project_indexes("secret_realm_distributions", ("realm_type",), ("updated_at",))
 
     # 基本信息
     realm_type = Column(SQLEnum(RealmType), default=RealmType.DUNGEON, comment="秘境类型")
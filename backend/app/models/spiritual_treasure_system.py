@@ -6,7 +6,7 @@ from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 from enum import Enum
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class TreasureType(str, Enum):
@@ -56,6 +56,7 @@ class SpiritualTreasureSystem(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """灵宝体系模型"""
 
     __tablename__ = "spiritual_treasure_systems"
+    __table_args__ = project_indexes("spiritual_treasure_systems")
 
     # 基本信息
     treasure_type = Column(SQLEnum(TreasureType), default=TreasureType.WEAPON, comment="灵宝类型")
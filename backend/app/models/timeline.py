@@ -3,10 +3,13 @@
 """
 from sqlalchemy import Column, String, Text, Integer, JSON, Float, ForeignKey, Boolean, DateTime
 from sqlalchemy.orm import relationship
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Callable, Optional, Tuple
+from collections import deque
 from enum import Enum
+import bisect
 
-from .base import ProjectBaseModel, TaggedMixin
+from .base import ProjectBaseModel, TaggedMixin, derived_field, project_indexes
+from .fictional_calendar import FictionalCalendar, default_calendar
 
 
 class EventType(str, Enum):
@@ -32,10 +35,135 @@ class EventImportance(str, Enum):
     TRIVIAL = "trivial"          # 微不足道
 
 
+class TimelineEventIndex:
+    """
+    时间线事件索引
+
+    保存按时间排序键排序的事件，每个事件的参与者编码为位集（bitset），
+    支持单个事件的增量插入、更新与删除，冲突检测与时间范围查询都基于该索引。
+    排序键只保存在索引中，不写入事件数据；context 记录计算排序键时的时间基准，
+    基准变化后索引需要重建。
+    """
+
+    # 时间差小于该窗口的事件视为时间相近
+    CONFLICT_WINDOW = 0.1
+
+    def __init__(self, time_key: Callable[[Dict[str, Any]], float]):
+        self._time_key = time_key
+        self._keys: List[Tuple[float, int]] = []
+        self._entries: Dict[int, Tuple[float, Dict[str, Any], int]] = {}
+        self._participant_bits: Dict[Any, int] = {}
+        self._participants: List[Any] = []
+        self.source: Optional[List[Dict[str, Any]]] = None
+        self.context: Any = None
+
+    def build(self, events: List[Dict[str, Any]], context: Any = None):
+        """根据事件列表重建索引"""
+        self._keys = []
+        self._entries = {}
+        self.source = events
+        self.context = context
+        for event in events:
+            # 旧版本曾把排序键写入事件数据，重建时清除
+            event.pop("time_key", None)
+            self.add(event)
+
+    def is_current(self, events: List[Dict[str, Any]], context: Any = None) -> bool:
+        """索引是否与给定的事件列表及时间基准一致"""
+        return (
+            self.source is events
+            and self.context == context
+            and len(self._entries) == len(events)
+        )
+
+    def _mask(self, participants: List[Any]) -> int:
+        mask = 0
+        for participant in participants:
+            bit = self._participant_bits.get(participant)
+            if bit is None:
+                bit = len(self._participants)
+                self._participant_bits[participant] = bit
+                self._participants.append(participant)
+            mask |= 1 << bit
+        return mask
+
+    def add(self, event: Dict[str, Any]):
+        """插入单个事件"""
+        time_value = self._time_key(event)
+        key = (time_value, id(event))
+        self._entries[id(event)] = (time_value, event, self._mask(event.get("participants", [])))
+        bisect.insort(self._keys, key)
+
+    def remove(self, event: Dict[str, Any]):
+        """删除单个事件"""
+        entry = self._entries.pop(id(event), None)
+        if entry is None:
+            return
+        key = (entry[0], id(event))
+        position = bisect.bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            del self._keys[position]
+
+    def update(self, event: Dict[str, Any]):
+        """事件时间或参与者变化后更新索引"""
+        self.remove(event)
+        self.add(event)
+
+    def range(self, start: float, end: float) -> List[Dict[str, Any]]:
+        """二分查找排序键位于 [start, end] 内的事件"""
+        low = bisect.bisect_left(self._keys, (start,))
+        high = bisect.bisect_right(self._keys, (end, float("inf")))
+        return [self._entries[event_key][1] for _, event_key in self._keys[low:high]]
+
+    def _decode(self, mask: int) -> List[Any]:
+        participants = []
+        while mask:
+            low = mask & -mask
+            participants.append(self._participants[low.bit_length() - 1])
+            mask ^= low
+        return participants
+
+    def find_participant_conflicts(self) -> List[Tuple[Dict[str, Any], Dict[str, Any], List[Any]]]:
+        """
+        扫描线检测相近时间内参与者重叠的事件对
+
+        按时间顺序扫描，每个参与者只保留窗口内的事件，候选事件对通过位集求交，
+        复杂度为 O(n log n + 冲突数)，返回 (较早事件, 较晚事件, 重叠参与者) 列表。
+        """
+        active: Dict[int, deque] = {}
+        pairs = []
+        for time_value, event_key in self._keys:
+            _, event, mask = self._entries[event_key]
+            candidates = {}
+            remaining = mask
+            while remaining:
+                low = remaining & -remaining
+                remaining ^= low
+                window = active.get(low)
+                if window is None:
+                    continue
+                while window and time_value - window[0][0] >= self.CONFLICT_WINDOW:
+                    window.popleft()
+                for other_time, other_key in window:
+                    candidates[other_key] = other_time
+
+            for other_key in candidates:
+                _, other_event, other_mask = self._entries[other_key]
+                pairs.append((other_event, event, self._decode(mask & other_mask)))
+
+            remaining = mask
+            while remaining:
+                low = remaining & -remaining
+                remaining ^= low
+                active.setdefault(low, deque()).append((time_value, event_key))
+        return pairs
+
+
 class Timeline(ProjectBaseModel, TaggedMixin):
     """时间线模型"""
 
     __tablename__ = "timelines"
+    __table_args__ = project_indexes("timelines")
 
     # 基本信息
     timeline_type = Column(String(50), comment="时间线类型")
@@ -91,56 +219,67 @@ class Timeline(ProjectBaseModel, TaggedMixin):
         event_data.setdefault("consequences", [])
         event_data.setdefault("id", len(self.events) + 1)
 
+        index = self._get_event_index()
         self.events.append(event_data)
+        index.add(event_data)
         self._sort_events()
+        self.invalidate_derived()
 
     def add_milestone(self, milestone_data: Dict[str, Any]):
         """添加里程碑事件"""
         milestone_data.setdefault("id", len(self.milestones) + 1)
         self.milestones.append(milestone_data)
         self._sort_milestones()
+        self.invalidate_derived()
+
+    def _get_event_index(self) -> TimelineEventIndex:
+        """获取事件索引，事件列表被整体替换、在外部修改或开始时间变化后自动重建"""
+        index = self.__dict__.get("_event_index")
+        if index is None:
+            index = TimelineEventIndex(self._event_time_key)
+            self.__dict__["_event_index"] = index
+        if self.events is None:
+            self.events = []
+        context = (self.start_time, self.calendar)
+        if not index.is_current(self.events, context):
+            index.build(self.events, context)
+        return index
 
     def _sort_events(self):
         """按时间排序事件"""
-        self.events.sort(key=lambda x: self._parse_time(x.get("time", "")))
+        self.events.sort(key=self._event_time_key)
 
     def _sort_milestones(self):
         """按时间排序里程碑"""
-        self.milestones.sort(key=lambda x: self._parse_time(x.get("time", "")))
+        self.milestones.sort(key=self._event_time_key)
+
+    @property
+    def calendar(self) -> FictionalCalendar:
+        """解析时间所用的历法，未指定时使用默认历法"""
+        return self.__dict__.get("_calendar") or default_calendar
+
+    def use_calendar(self, calendar: FictionalCalendar):
+        """指定解析时间所用的历法（通常为所属项目的历法，不持久化）"""
+        if calendar is self.calendar:
+            return
+        self.__dict__["_calendar"] = calendar
+        self.invalidate_derived()
 
     def _parse_time(self, time_str: str) -> float:
-        """解析时间字符串为数值（用于排序）"""
-        if not time_str:
-            return 0
-
-        try:
-            # 简单的时间解析，可以根据需要扩展
-            if "年" in time_str:
-                return float(time_str.replace("年", ""))
-            elif "月" in time_str:
-                parts = time_str.split("年")
-                if len(parts) == 2:
-                    year = float(parts[0])
-                    month = float(parts[1].replace("月", "")) / 12
-                    return year + month
-            else:
-                # 尝试直接转换为数字
-                return float(time_str)
-        except (ValueError, AttributeError):
-            return 0
+        """解析时间字符串为数值（用于排序），相对时间以时间线开始时间为基准"""
+        calendar = self.calendar
+        base = calendar.sort_key(self.start_time) if self.start_time else 0.0
+        return calendar.sort_key(time_str, base)
+
+    def _event_time_key(self, event: Dict[str, Any]) -> float:
+        """获取事件的排序键（不写入事件数据，解析结果由历法缓存）"""
+        return self._parse_time(event.get("time", ""))
 
     def get_events_by_time_range(self, start_time: str, end_time: str) -> List[Dict[str, Any]]:
         """获取指定时间范围内的事件"""
         start_num = self._parse_time(start_time)
         end_num = self._parse_time(end_time)
-
-        filtered_events = []
-        for event in self.events:
-            event_time = self._parse_time(event.get("time", ""))
-            if start_num <= event_time <= end_num:
-                filtered_events.append(event)
-
-        return filtered_events
+        return self._get_event_index().range(start_num, end_num)
 
     def get_events_by_type(self, event_type: str) -> List[Dict[str, Any]]:
         """根据类型获取事件"""
@@ -170,17 +309,29 @@ class Timeline(ProjectBaseModel, TaggedMixin):
 
     def update_event(self, event_id: int, update_data: Dict[str, Any]):
         """更新事件"""
+        index = self._get_event_index()
         for i, event in enumerate(self.events):
             if event.get("id") == event_id:
                 event.update(update_data)
+                index.update(event)
                 self._sort_events()
+                self.invalidate_derived()
                 return True
         return False
 
     def remove_event(self, event_id: int):
         """删除事件"""
-        self.events = [event for event in self.events if event.get("id") != event_id]
+        index = self._get_event_index()
+        remaining = []
+        for event in self.events:
+            if event.get("id") == event_id:
+                index.remove(event)
+            else:
+                remaining.append(event)
+        self.events = remaining
+        index.source = remaining
 
+    @derived_field("events", "milestones", "time_unit", "start_time")
     def get_timeline_summary(self) -> Dict[str, Any]:
         """获取时间线摘要"""
         if not self.events:
@@ -204,8 +355,8 @@ class Timeline(ProjectBaseModel, TaggedMixin):
 
         # 计算时间跨度
         if len(self.events) >= 2:
-            first_time = self._parse_time(self.events[0].get("time", ""))
-            last_time = self._parse_time(self.events[-1].get("time", ""))
+            first_time = self._event_time_key(self.events[0])
+            last_time = self._event_time_key(self.events[-1])
             time_span = f"{last_time - first_time}{self.time_unit}"
         else:
             time_span = "单一时间点"
@@ -218,6 +369,7 @@ class Timeline(ProjectBaseModel, TaggedMixin):
             "milestones": len(self.milestones)
         }
 
+    @derived_field("events", "start_time")
     def detect_conflicts(self) -> List[Dict[str, Any]]:
         """检测时间冲突"""
         conflicts = []
@@ -241,29 +393,27 @@ class Timeline(ProjectBaseModel, TaggedMixin):
                         "description": f"同一时间发生多个重大事件"
                     })
 
-        # 检查角色参与冲突
-        for i, event1 in enumerate(self.events):
-            for j, event2 in enumerate(self.events[i+1:], i+1):
-                # 检查时间相近的事件中是否有相同角色参与
-                time1 = self._parse_time(event1.get("time", ""))
-                time2 = self._parse_time(event2.get("time", ""))
-
-                if abs(time1 - time2) < 0.1:  # 时间很接近
-                    participants1 = set(event1.get("participants", []))
-                    participants2 = set(event2.get("participants", []))
-                    overlap = participants1 & participants2
-
-                    if overlap:
-                        conflicts.append({
-                            "type": "character_conflict",
-                            "time": event1.get("time"),
-                            "events": [event1.get("name"), event2.get("name")],
-                            "characters": list(overlap),
-                            "description": "角色在相近时间参与多个事件"
-                        })
+        # 检查角色参与冲突：基于排序索引的扫描线，只比较时间窗口内参与者重叠的事件
+        positions = {id(event): position for position, event in enumerate(self.events)}
+        pairs = []
+        for event1, event2, overlap in self._get_event_index().find_participant_conflicts():
+            if positions[id(event1)] > positions[id(event2)]:
+                event1, event2 = event2, event1
+            pairs.append((positions[id(event1)], positions[id(event2)], event1, event2, overlap))
+        pairs.sort(key=lambda item: (item[0], item[1]))
+
+        for _, _, event1, event2, overlap in pairs:
+            conflicts.append({
+                "type": "character_conflict",
+                "time": event1.get("time"),
+                "events": [event1.get("name"), event2.get("name")],
+                "characters": overlap,
+                "description": "角色在相近时间参与多个事件"
+            })
 
         return conflicts
 
+    @derived_field("name", "timeline_type", "start_time", "end_time", "time_unit", "events", "milestones")
     def generate_timeline_visualization_data(self) -> Dict[str, Any]:
         """生成时间线可视化数据"""
         return {
@@ -7,7 +7,7 @@ from typing import Dict, Any, List
 from enum import Enum
 from datetime import datetime
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class VolumeStatus(str, Enum):
@@ -24,6 +24,7 @@ class Volume(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """卷宗模型"""
 
     __tablename__ = "volumes"
+    __table_args__ = project_indexes("volumes", ("volume_number",))
 
     # 基本信息
     title = Column(String(500), nullable=False, comment="卷宗标题")
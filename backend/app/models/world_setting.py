@@ -5,13 +5,14 @@ from sqlalchemy import Column, String, Text, Integer, JSON, Float, ForeignKey
 from sqlalchemy.orm import relationship
 from typing import Dict, Any, List
 
-from .base import ProjectBaseModel, TaggedMixin, VersionedMixin
+from .base import ProjectBaseModel, TaggedMixin, VersionedMixin, project_indexes
 
 
 class WorldSetting(ProjectBaseModel, TaggedMixin, VersionedMixin):
     """世界设定模型"""
 
     __tablename__ = "world_settings"
+    __table_args__ = project_indexes("world_settings")
 
     # 基本信息
     setting_type = Column(String(50), nullable=False, comment="设定类型")
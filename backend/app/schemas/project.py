@@ -191,6 +191,7 @@ class ProjectListResponse(BaseModel):
     total: int = Field(description="总数量")
     skip: int = Field(description="跳过数量")
     limit: int = Field(description="限制数量")
+    next_cursor: Optional[str] = Field(None, description="下一页游标，没有更多数据时为空")
 
 
 class ProjectExport(BaseModel):
@@ -139,7 +139,7 @@ class SecretRealmDistributionResponse(SecretRealmDistributionBase):
     
     # 标签和版本
     tags: Optional[List[str]] = Field(None, description="标签")
-    version: str = Field("1.0", description="版本")
+    version: int = Field(1, description="版本号")
     notes: Optional[str] = Field(None, description="备注")
     
     # 时间戳
@@ -0,0 +1,261 @@
+"""
+AI响应缓存
+对确定性生成（temperature 为 0 或调用方显式开启）的结果进行缓存，
+内存LRU层 + SQLite持久层，支持TTL与容量淘汰
+"""
+from typing import Dict, Optional, Any, List
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from ..core.config import AI_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryCacheTier:
+    """内存LRU缓存层"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def close(self):
+        pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions
+        }
+
+
+class SQLiteCacheTier:
+    """SQLite持久缓存层，跨进程重启保留"""
+
+    name = "disk"
+
+    def __init__(self, path: str, max_entries: int = 5000):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            cache_dir = os.path.dirname(self.path)
+            if cache_dir and not os.path.exists(cache_dir):
+                os.makedirs(cache_dir)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS ai_response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_ai_response_cache_accessed_at "
+                "ON ai_response_cache (accessed_at)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at FROM ai_response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if row[1] < now:
+                conn.execute("DELETE FROM ai_response_cache WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE ai_response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            conn.commit()
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, expires_at: float):
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO ai_response_cache (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at, now)
+            )
+            conn.execute("DELETE FROM ai_response_cache WHERE expires_at < ?", (now,))
+            count = conn.execute("SELECT COUNT(*) FROM ai_response_cache").fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM ai_response_cache WHERE key IN ("
+                    "SELECT key FROM ai_response_cache ORDER BY accessed_at LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+            conn.commit()
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM ai_response_cache")
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._connect().execute("SELECT COUNT(*) FROM ai_response_cache").fetchone()[0]
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "path": self.path
+        }
+
+
+class AIResponseCache:
+    """
+    AI响应缓存
+
+    按顺序查询各缓存层，命中下层时回填上层。
+    temperature 大于 0 的请求默认不缓存，调用方可通过 use_cache=True 显式开启，
+    use_cache=False 则始终跳过缓存。
+    """
+
+    def __init__(self, tiers: Optional[List[Any]] = None, config: Optional[Dict[str, Any]] = None):
+        self.config = config or AI_CACHE_CONFIG
+        self.enabled = self.config.get("enabled", True)
+        self.ttl = self.config.get("ttl", 3600)
+        if tiers is None:
+            tiers = [MemoryCacheTier(self.config.get("memory_entries", 256))]
+            if self.config.get("disk_path"):
+                tiers.append(SQLiteCacheTier(self.config["disk_path"], self.config.get("disk_entries", 5000)))
+        self.tiers = tiers
+        self.metrics = {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0, "errors": 0}
+        self.metrics.update({f"{tier.name}_hits": 0 for tier in self.tiers})
+
+    @staticmethod
+    def make_key(provider: str, model: Optional[str], method: str, payload: Any, params: Dict[str, Any]) -> str:
+        """根据提供商、模型、调用方式、提示词和参数生成缓存键"""
+        raw = json.dumps(
+            {"provider": provider, "model": model, "method": method, "payload": payload, "params": params},
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def should_cache(self, temperature: Optional[float], use_cache: Optional[bool] = None) -> bool:
+        """判断本次请求是否使用缓存"""
+        if not self.enabled or use_cache is False:
+            return False
+        if use_cache:
+            return True
+        return not temperature
+
+    def record_bypass(self):
+        """记录一次跳过缓存的请求"""
+        self.metrics["bypassed"] += 1
+
+    async def get(self, key: str) -> Optional[Any]:
+        """查询缓存"""
+        for index, tier in enumerate(self.tiers):
+            try:
+                value = await self._run(tier.get, key)
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logger.warning(f"读取AI响应缓存失败 ({tier.name}): {e}")
+                continue
+            if value is not None:
+                self.metrics["hits"] += 1
+                self.metrics[f"{tier.name}_hits"] += 1
+                expires_at = time.time() + self.ttl
+                for upper in self.tiers[:index]:
+                    await self._run(upper.set, key, value, expires_at)
+                return value
+        self.metrics["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any):
+        """写入所有缓存层"""
+        expires_at = time.time() + self.ttl
+        for tier in self.tiers:
+            try:
+                await self._run(tier.set, key, value, expires_at)
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logger.warning(f"写入AI响应缓存失败 ({tier.name}): {e}")
+        self.metrics["stores"] += 1
+
+    async def clear(self):
+        """清空所有缓存层"""
+        for tier in self.tiers:
+            await self._run(tier.clear)
+
+    def close(self):
+        """释放缓存层资源"""
+        for tier in self.tiers:
+            tier.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        tiers = {}
+        for tier in self.tiers:
+            try:
+                tiers[tier.name] = tier.get_stats()
+            except Exception as e:
+                tiers[tier.name] = {"error": str(e)}
+        return {
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            **self.metrics,
+            "hit_rate": round(self.metrics["hits"] / lookups, 4) if lookups else 0.0,
+            "tiers": tiers
+        }
+
+    @staticmethod
+    async def _run(func, *args):
+        """内存层直接调用，磁盘层放到线程池中执行，避免阻塞事件循环"""
+        if isinstance(func.__self__, MemoryCacheTier):
+            return func(*args)
+        return await asyncio.to_thread(func, *args)
@@ -0,0 +1,188 @@
+"""
+AI服务健康监测
+后台定时探测提供商状态并缓存结果，真实请求的成败同时反馈到状态中（熔断器）
+"""
+from typing import Dict, Optional, Any, Callable, Awaitable, Set
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from ..core.config import AI_HEALTH_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderHealth:
+    """单个提供商的健康状态"""
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.healthy: Optional[bool] = None  # None 表示尚未探测
+        self.checked_at: float = 0.0  # 最近一次状态更新的单调时间
+        self.consecutive_failures: int = 0
+        self.circuit_open_until: float = 0.0
+        self.last_error: Optional[str] = None
+        self.last_checked: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            "provider": self.provider,
+            "healthy": self.healthy,
+            "consecutive_failures": self.consecutive_failures,
+            "circuit_open": self.circuit_open_until > time.monotonic(),
+            "last_error": self.last_error,
+            "last_checked": self.last_checked
+        }
+
+
+class ProviderHealthMonitor:
+    """
+    提供商健康监测器
+
+    - 后台任务按间隔探测被关注的提供商，结果带TTL缓存
+    - 端点通过 is_available 读取缓存状态，状态新鲜时无需网络请求
+    - 连续失败达到阈值后熔断，冷却期内直接判定不可用，冷却结束后放行请求（半开）
+    - 探测函数返回 None 表示该提供商不支持主动探测，状态只由真实请求的成败更新
+    """
+
+    def __init__(self, probe: Callable[[str], Awaitable[Optional[bool]]], config: Optional[Dict[str, Any]] = None):
+        self.probe = probe
+        self.config = config or AI_HEALTH_CONFIG
+        self.interval = self.config.get("interval", 30.0)
+        self.ttl = self.config.get("ttl", 60.0)
+        self.failure_threshold = self.config.get("failure_threshold", 3)
+        self.recovery_timeout = self.config.get("recovery_timeout", 30.0)
+        self._states: Dict[str, ProviderHealth] = {}
+        self._watched: Set[str] = set()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _get_state(self, provider: str) -> ProviderHealth:
+        state = self._states.get(provider)
+        if state is None:
+            state = ProviderHealth(provider)
+            self._states[provider] = state
+        return state
+
+    def watch(self, provider: str):
+        """将提供商加入后台探测列表"""
+        self._watched.add(provider)
+
+    def unwatch(self, provider: str):
+        """将提供商移出后台探测列表"""
+        self._watched.discard(provider)
+
+    def reset(self, provider: str):
+        """清除提供商的缓存状态（如配置变更后）"""
+        self._states.pop(provider, None)
+
+    def is_fresh(self, provider: str) -> bool:
+        """缓存状态是否仍在TTL内"""
+        state = self._states.get(provider)
+        return bool(state and state.healthy is not None and time.monotonic() - state.checked_at < self.ttl)
+
+    def is_available(self, provider: str) -> bool:
+        """根据缓存状态判断提供商是否可用（O(1)，不发起网络请求）"""
+        state = self._states.get(provider)
+        if state is None or state.healthy is None:
+            return True
+        now = time.monotonic()
+        if state.circuit_open_until > now:
+            return False
+        if state.circuit_open_until:
+            # 熔断冷却结束，放行请求试探恢复
+            return True
+        if now - state.checked_at >= self.ttl:
+            return True
+        return state.healthy
+
+    def record_success(self, provider: str):
+        """记录一次成功（探测或真实请求）"""
+        state = self._get_state(provider)
+        if state.circuit_open_until:
+            logger.info(f"AI服务 ({provider}) 已恢复，关闭熔断")
+        state.healthy = True
+        state.consecutive_failures = 0
+        state.circuit_open_until = 0.0
+        state.last_error = None
+        state.checked_at = time.monotonic()
+        state.last_checked = datetime.now().isoformat()
+
+    def record_failure(self, provider: str, error: Optional[str] = None):
+        """记录一次失败（探测或真实请求），达到阈值后熔断"""
+        state = self._get_state(provider)
+        state.healthy = False
+        state.consecutive_failures += 1
+        state.last_error = error
+        state.checked_at = time.monotonic()
+        state.last_checked = datetime.now().isoformat()
+        if state.consecutive_failures >= self.failure_threshold:
+            state.circuit_open_until = state.checked_at + self.recovery_timeout
+            logger.warning(
+                f"AI服务 ({provider}) 连续失败 {state.consecutive_failures} 次，熔断 {self.recovery_timeout} 秒"
+            )
+
+    async def refresh(self, provider: str) -> bool:
+        """立即探测提供商状态，同一提供商的并发探测会合并"""
+        lock = self._locks.setdefault(provider, asyncio.Lock())
+        if lock.locked():
+            async with lock:
+                return self._get_state(provider).healthy is True
+
+        async with lock:
+            try:
+                healthy = await self.probe(provider)
+                error = None
+            except Exception as e:
+                healthy = False
+                error = str(e)
+
+            if healthy is None:
+                return self.is_available(provider)
+            if healthy:
+                self.record_success(provider)
+            else:
+                self.record_failure(provider, error or "健康探测失败")
+            return healthy
+
+    async def ensure_available(self, provider: str) -> bool:
+        """状态新鲜时直接返回缓存结果，否则先探测一次"""
+        if self.is_fresh(provider) or self._get_state(provider).circuit_open_until > time.monotonic():
+            return self.is_available(provider)
+        await self.refresh(provider)
+        return self.is_available(provider)
+
+    def get_status(self, provider: str) -> Dict[str, Any]:
+        """获取提供商的健康状态"""
+        return self._get_state(provider).to_dict()
+
+    def get_all_status(self) -> Dict[str, Dict[str, Any]]:
+        """获取所有已知提供商的健康状态"""
+        return {provider: state.to_dict() for provider, state in self._states.items()}
+
+    async def _run(self):
+        """后台探测循环"""
+        while True:
+            providers = list(self._watched)
+            if providers:
+                await asyncio.gather(*(self.refresh(p) for p in providers), return_exceptions=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """启动后台探测任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"AI服务健康监测已启动，探测间隔 {self.interval} 秒")
+
+    async def stop(self):
+        """停止后台探测任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("AI服务健康监测已停止")
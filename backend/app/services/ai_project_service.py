@@ -9,6 +9,7 @@ import json
 from datetime import datetime
 
 from .project_data_service import ProjectDataService
+from .search_index import project_search_index
 from .ai_service import ai_manager
 from ..models.project import Project
 
@@ -163,11 +164,60 @@ class AIProjectService:
             }
         }
 
-    def search_project_data(self, query: str, data_types: Optional[List[str]] = None) -> Dict[str, Any]:
-        """AI助手搜索项目数据"""
+    def search_project_data(self, query: str, data_types: Optional[List[str]] = None, limit: int = 50) -> Dict[str, Any]:
+        """
+        AI助手搜索项目数据
+
+        优先使用全文索引，按相关度返回命中记录及摘要片段；
+        数据库不支持全文索引时退回逐条文本匹配。
+        """
         if not self.current_project_id:
             raise ValueError("未设置当前操作项目")
 
+        for data_type in data_types or []:
+            if data_type not in self.project_data_service.project_models:
+                raise ValueError(f"未知的模型类型: {data_type}")
+
+        hits = project_search_index.search(
+            self.db, self.current_project_id, query, data_types, limit=limit
+        )
+        if hits is None:
+            search_results = self._scan_project_data(query, data_types)
+        else:
+            search_results = self._group_search_hits(hits)
+
+        # 记录搜索操作
+        self._log_ai_operation("search", "multiple", success=True, query=query)
+
+        return search_results
+
+    def _group_search_hits(self, hits: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """按模型分组检索结果，并一次性加载各模型命中的记录"""
+        ids_by_model: Dict[str, List[int]] = {}
+        for hit in hits:
+            ids_by_model.setdefault(hit["model_name"], []).append(hit["id"])
+
+        items_by_key = {}
+        for model_name, item_ids in ids_by_model.items():
+            model_class = self.project_data_service.project_models[model_name]
+            for item in self.db.query(model_class).filter(model_class.id.in_(item_ids)).all():
+                items_by_key[(model_name, item.id)] = item.to_dict()
+
+        search_results: Dict[str, Any] = {}
+        for hit in hits:
+            item = items_by_key.get((hit["model_name"], hit["id"]))
+            if item is None:
+                continue
+            item["_search"] = {
+                "score": hit["score"],
+                "snippet": hit["snippet"],
+                "exact": hit["exact"]
+            }
+            search_results.setdefault(hit["model_name"], []).append(item)
+        return search_results
+
+    def _scan_project_data(self, query: str, data_types: Optional[List[str]] = None) -> Dict[str, Any]:
+        """逐条文本匹配（不支持全文索引的数据库使用）"""
         search_results = {}
 
         # 确定搜索范围
@@ -180,7 +230,6 @@ class AIProjectService:
                     self.current_project_id, data_type
                 )
 
-                # 简单的文本搜索（可以后续优化为更智能的搜索）
                 matches = []
                 for item in data:
                     item_str = json.dumps(item, ensure_ascii=False).lower()
@@ -193,9 +242,6 @@ class AIProjectService:
             except Exception as e:
                 logger.warning(f"搜索 {data_type} 时出错: {e}")
 
-        # 记录搜索操作
-        self._log_ai_operation("search", "multiple", success=True, query=query)
-
         return search_results
 
     def get_project_context(self) -> Dict[str, Any]:
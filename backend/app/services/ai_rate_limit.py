@@ -0,0 +1,268 @@
+"""
+AI提供商限流
+按提供商/模型维护每分钟请求数与token数的令牌桶，跨项目公平排队，遵守429响应的Retry-After
+"""
+from typing import Dict, Optional, Any, Tuple
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+import asyncio
+import logging
+import math
+import time
+
+from ..core.config import AI_RATE_LIMIT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 当前请求所属的项目，用于跨项目公平排队（由API端点设置）
+quota_project: ContextVar[Optional[int]] = ContextVar("quota_project", default=None)
+
+
+def set_quota_project(project_id: Optional[int]):
+    """设置当前请求所属的项目"""
+    quota_project.set(project_id)
+
+
+class RateLimitExceeded(Exception):
+    """预计排队时间过长或队列已满，请求在发出前被拒绝"""
+
+    def __init__(self, key: str, retry_after: float, reason: str = "预计等待时间过长"):
+        super().__init__(f"AI服务 ({key}) 限流：{reason}，请 {math.ceil(retry_after)} 秒后重试")
+        self.key = key
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """每分钟额度的令牌桶（容量为每分钟上限，按秒匀速补充），容量为0表示不限"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = max(int(per_minute or 0), 0)
+        self.rate = self.capacity / 60
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        return self.tokens
+
+    def time_until(self, amount: float, now: float) -> float:
+        """累计 amount 个令牌还需等待的秒数"""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        return max(amount - self.tokens, 0.0) / self.rate
+
+    def consume(self, amount: float, now: float):
+        if self.capacity:
+            self._refill(now)
+            self.tokens -= amount  # 实际用量超出预留时允许为负，相当于欠额
+
+    def refund(self, amount: float, now: float):
+        if self.capacity:
+            self._refill(now)
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class QuotaLimiter:
+    """
+    单个提供商/模型的限流器
+
+    - 请求数与token数两个令牌桶同时满足时放行，token按提示词估算值加输出上限预留，完成后退还多余部分
+    - 排队的请求按项目轮转放行，单个项目的大量请求不会阻塞其他项目
+    - 收到429后整体暂停到Retry-After指定的时间
+    - 新请求到达时先估算排队时间，超过 max_wait 或队列已满时立即拒绝，而不是等到超时
+    """
+
+    def __init__(self, key: str, rpm: int = 0, tpm: int = 0, config: Optional[Dict[str, Any]] = None):
+        self.key = key
+        self.config = config or AI_RATE_LIMIT_CONFIG
+        self.max_wait = self.config.get("max_wait", 30.0)
+        self.queue_size = self.config.get("queue_size", 100)
+        self.configure(rpm, tpm)
+        self.paused_until = 0.0
+        self._waiters: "OrderedDict[Optional[int], deque]" = OrderedDict()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.metrics = {"admitted": 0, "throttled": 0, "rejected": 0, "backoffs": 0}
+
+    def configure(self, rpm: int, tpm: int):
+        """更新额度（配置变更时调用，已消耗的额度不保留）"""
+        self.limits = (int(rpm or 0), int(tpm or 0))
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def _wait_time(self, requests: int, tokens: int, now: float) -> float:
+        return max(
+            self.paused_until - now, self.requests.time_until(requests, now), self.tokens.time_until(tokens, now)
+        )
+
+    def estimate_wait(self, tokens: int) -> float:
+        """估算新请求排在现有队列之后需要等待的秒数"""
+        queued_tokens = sum(amount for waiters in self._waiters.values() for _, amount in waiters)
+        return self._wait_time(self.queued + 1, queued_tokens + tokens, time.monotonic())
+
+    def _grant(self, tokens: int, now: float):
+        self.requests.consume(1, now)
+        self.tokens.consume(tokens, now)
+        self.metrics["admitted"] += 1
+
+    async def acquire(self, tokens: int, project: Optional[int] = None) -> int:
+        """等待额度，返回实际预留的token数"""
+        if self.tokens.capacity:
+            tokens = min(tokens, self.tokens.capacity)  # 单次请求超过每分钟上限时按上限预留，避免永远无法放行
+        now = time.monotonic()
+        if not self._waiters and self._wait_time(1, tokens, now) <= 0:
+            self._grant(tokens, now)
+            return tokens
+
+        wait = self.estimate_wait(tokens)
+        if self.queued >= self.queue_size:
+            self.metrics["rejected"] += 1
+            raise RateLimitExceeded(self.key, wait, "排队请求已满")
+        if wait > self.max_wait:
+            self.metrics["rejected"] += 1
+            raise RateLimitExceeded(self.key, wait)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(project, deque()).append((future, tokens))
+        self.metrics["throttled"] += 1  # 需要排队等待的请求数
+        self._schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(tokens, 0)  # 已放行但调用方取消，退还额度
+            else:
+                self._remove(project, future)
+            raise
+        return tokens
+
+    def _remove(self, project: Optional[int], future: asyncio.Future):
+        waiters = self._waiters.get(project)
+        if waiters is None:
+            return
+        for entry in waiters:
+            if entry[0] is future:
+                waiters.remove(entry)
+                break
+        if not waiters:
+            del self._waiters[project]
+
+    def _schedule(self):
+        """在队首请求的额度就绪时唤醒分发"""
+        if self._timer is not None or not self._waiters:
+            return
+        waiters = next(iter(self._waiters.values()))
+        delay = self._wait_time(1, waiters[0][1], time.monotonic())
+        self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _dispatch(self):
+        """按项目轮转放行排队的请求，额度不足时等待下一次唤醒"""
+        self._timer = None
+        while self._waiters:
+            project, waiters = next(iter(self._waiters.items()))
+            future, tokens = waiters[0]
+            if future.done():
+                waiters.popleft()
+            else:
+                now = time.monotonic()
+                if self._wait_time(1, tokens, now) > 0:
+                    break
+                self._grant(tokens, now)
+                waiters.popleft()
+                future.set_result(None)
+            # 放行一个请求后轮到下一个项目
+            del self._waiters[project]
+            if waiters:
+                self._waiters[project] = waiters
+        self._schedule()
+
+    def release(self, reserved: int, used: int):
+        """请求结束后按实际用量结算预留的token"""
+        self.tokens.refund(reserved - used, time.monotonic())
+        if self._waiters:
+            # 退还的额度可能让队首提前放行
+            if self._timer is not None:
+                self._timer.cancel()
+            self._dispatch()
+
+    def backoff(self, delay: float):
+        """收到429后暂停放行"""
+        paused_until = time.monotonic() + delay
+        if paused_until > self.paused_until:
+            self.paused_until = paused_until
+        self.metrics["backoffs"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取限流状态"""
+        now = time.monotonic()
+        rpm, tpm = self.limits
+        return {
+            "rpm": rpm,
+            "tpm": tpm,
+            "available_requests": int(self.requests.available(now)) if rpm else None,
+            "available_tokens": int(self.tokens.available(now)) if tpm else None,
+            "queued": self.queued,
+            "queued_projects": len(self._waiters),
+            "paused_for": round(max(self.paused_until - now, 0.0), 1),
+            **self.metrics
+        }
+
+
+class ProviderQuotaManager:
+    """按提供商/模型管理限流器，额度读取自提供商配置的 rpm、tpm（可用 rate_limits 按模型覆盖）"""
+
+    def __init__(self, provider_configs: Dict[str, Dict[str, Any]], config: Optional[Dict[str, Any]] = None):
+        self.provider_configs = provider_configs
+        self.config = config or AI_RATE_LIMIT_CONFIG
+        self.enabled = self.config.get("enabled", True)
+        self.max_retries = self.config.get("max_retries", 2)
+        self.default_retry_after = self.config.get("default_retry_after", 5.0)
+        self._limiters: Dict[str, QuotaLimiter] = {}
+
+    def _limits(self, provider: str, model: Optional[str]) -> Tuple[int, int]:
+        config = self.provider_configs.get(provider, {})
+        limits = (config.get("rate_limits") or {}).get(model, config)
+        return limits.get("rpm", 0), limits.get("tpm", 0)
+
+    def get_limiter(self, provider: str, model: Optional[str]) -> QuotaLimiter:
+        """获取限流器，配置中的额度变化时同步更新"""
+        key = f"{provider}/{model}" if model else provider
+        rpm, tpm = self._limits(provider, model)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            limiter = QuotaLimiter(key, rpm, tpm, self.config)
+            self._limiters[key] = limiter
+        elif limiter.limits != (int(rpm or 0), int(tpm or 0)):
+            limiter.configure(rpm, tpm)
+        return limiter
+
+    async def acquire(self, provider: str, model: Optional[str], tokens: int) -> int:
+        """为当前项目的请求等待额度，返回预留的token数"""
+        if not self.enabled:
+            return tokens
+        return await self.get_limiter(provider, model).acquire(tokens, quota_project.get())
+
+    def release(self, provider: str, model: Optional[str], reserved: int, used: int):
+        if self.enabled:
+            self.get_limiter(provider, model).release(reserved, used)
+
+    def backoff(self, provider: str, model: Optional[str], retry_after: Optional[float], attempt: int = 0) -> float:
+        """按Retry-After（缺省时指数退避）暂停提供商，返回暂停秒数"""
+        delay = retry_after if retry_after is not None else self.default_retry_after * (2 ** attempt)
+        if self.enabled:
+            self.get_limiter(provider, model).backoff(delay)
+        logger.warning(f"AI服务 ({provider}) 限流，暂停 {delay:.1f} 秒")
+        return delay
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各提供商/模型的限流状态"""
+        return {key: limiter.get_stats() for key, limiter in self._limiters.items()}
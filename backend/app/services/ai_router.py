@@ -0,0 +1,372 @@
+"""
+AI提供商路由
+按有序的提供商池转发请求：近期延迟感知的选择、出错或超时自动切换、可选的对冲请求
+"""
+from typing import Dict, List, Optional, Any, Callable, Awaitable, AsyncIterator, Tuple, TypeVar
+from collections import deque
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+import httpx
+
+from ..core.config import AI_ROUTING_CONFIG
+from .ai_rate_limit import RateLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ProviderTimeoutError(TimeoutError):
+    """提供商在规定时间内没有响应"""
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """判断错误是否可通过切换提供商解决（超时、网络错误、限流或服务端错误）"""
+    if isinstance(error, (TimeoutError, httpx.TransportError, RateLimitExceeded)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+
+async def run_with_timeout(provider: str, awaitable: Awaitable[T], timeout: Optional[float],
+                           action: str = "未完成") -> T:
+    """限时等待单次请求，超时抛出 ProviderTimeoutError；timeout 为空时不限时"""
+    if not timeout:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise ProviderTimeoutError(f"AI服务 ({provider}) 超过 {timeout} 秒{action}")
+
+
+class ProviderStats:
+    """单个提供商的近期调用统计"""
+
+    def __init__(self, provider: str, window: int = 50):
+        self.provider = provider
+        self.latencies: deque = deque(maxlen=window)  # 非流式请求的完整耗时（秒）
+        self.first_token_latencies: deque = deque(maxlen=window)  # 流式请求的首个数据块耗时（秒）
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.cancelled = 0  # 对冲中落败被取消的请求
+        self.failovers = 0  # 失败后转交给下一个提供商的次数
+        self.hedges = 0  # 作为对冲请求被启动的次数
+        self.hedge_wins = 0  # 对冲请求先于原请求完成的次数
+        self.last_error: Optional[str] = None
+        self.last_used: Optional[str] = None
+
+    @staticmethod
+    def percentile(samples, q: float) -> Optional[float]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)]
+
+    def samples(self, kind: str = "call"):
+        return self.first_token_latencies if kind == "stream" else self.latencies
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典（延迟单位为毫秒）"""
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            "provider": self.provider,
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "failovers": self.failovers,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "latency_p50_ms": ms(self.percentile(self.latencies, 0.5)),
+            "latency_p95_ms": ms(self.percentile(self.latencies, 0.95)),
+            "first_token_p50_ms": ms(self.percentile(self.first_token_latencies, 0.5)),
+            "first_token_p95_ms": ms(self.percentile(self.first_token_latencies, 0.95)),
+            "last_error": self.last_error,
+            "last_used": self.last_used
+        }
+
+
+class ProviderRouter:
+    """
+    提供商路由器
+
+    - 候选顺序：当前提供商优先；其近期延迟明显劣于其他提供商（超过 switch_ratio 倍）时让位，
+      其余提供商按 p50/p95 加权延迟排序，样本不足时使用假定延迟；熔断中的提供商排在最后
+    - 超时、网络错误、限流或服务端错误时转交下一个候选，全部失败时抛出最后一个错误；
+      其他错误（如密钥未配置、请求无效）换提供商也无法解决，直接抛出
+    - 非流式调用的超时按提供商确定（timeout_for），未提供时使用配置的 timeout；
+      per_attempt 为真时超时交给调用方（invoke/open_stream 的第二个参数），由调用方只对实际发出的
+      每次HTTP请求计时，本地排队与限流退避不计入超时，也不会因此计为提供商故障
+    - 开启对冲（hedge_after 大于0）时，首个候选超过该时间仍未完成（流式为未产出首个数据块），
+      同时请求下一个候选，采用先到的结果并取消另一个
+    - 流式输出产出首个数据块后不再切换提供商，避免内容重复或不连贯
+    """
+
+    def __init__(self, health_monitor, config: Optional[Dict[str, Any]] = None,
+                 timeout_for: Optional[Callable[[str], Optional[float]]] = None):
+        self.health_monitor = health_monitor
+        self._timeout_for = timeout_for
+        self.config = config or AI_ROUTING_CONFIG
+        self.pool: List[str] = list(self.config.get("providers") or [])
+        self.window = self.config.get("latency_window", 50)
+        self.min_samples = self.config.get("min_samples", 5)
+        self.default_latency = self.config.get("default_latency", 5.0)
+        self.switch_ratio = self.config.get("switch_ratio", 2.0)
+        self.timeout = self.config.get("timeout", 60.0)
+        self.first_token_timeout = self.config.get("first_token_timeout", 20.0)
+        self.hedge_after = self.config.get("hedge_after_ms", 0) / 1000
+        self._stats: Dict[str, ProviderStats] = {}
+
+    def timeout_for(self, provider: str) -> float:
+        """单次非流式调用的超时（秒）"""
+        timeout = self._timeout_for(provider) if self._timeout_for else None
+        return timeout or self.timeout
+
+    def get_stats(self, provider: str) -> ProviderStats:
+        stats = self._stats.get(provider)
+        if stats is None:
+            stats = ProviderStats(provider, self.window)
+            self._stats[provider] = stats
+        return stats
+
+    def score(self, provider: str, kind: str = "call") -> float:
+        """近期延迟评分（p50 与 p95 的平均值，秒）"""
+        samples = self.get_stats(provider).samples(kind)
+        if len(samples) < self.min_samples:
+            return self.default_latency
+        return (ProviderStats.percentile(samples, 0.5) + ProviderStats.percentile(samples, 0.95)) / 2
+
+    def candidates(self, primary: str, kind: str = "call") -> List[str]:
+        """获取本次请求的候选提供商顺序"""
+        others = [provider for provider in self.pool if provider != primary]
+        if not others:
+            return [primary]
+
+        available = [p for p in others if self.health_monitor.is_available(p)]
+        unavailable = [p for p in others if p not in available]
+        available.sort(key=lambda provider: self.score(provider, kind))
+
+        if not self.health_monitor.is_available(primary):
+            return available + unavailable + [primary]
+        if available and self.score(primary, kind) > self.score(available[0], kind) * self.switch_ratio:
+            return available[:1] + [primary] + available[1:] + unavailable
+        return [primary] + available + unavailable
+
+    def _record_failure(self, provider: str, error: BaseException):
+        stats = self.get_stats(provider)
+        stats.failures += 1
+        stats.last_error = str(error) or type(error).__name__
+        if isinstance(error, ProviderTimeoutError):
+            stats.timeouts += 1
+            self.health_monitor.record_failure(provider, stats.last_error)
+
+    async def _timed(self, provider: str, invoke: Callable[..., Awaitable[T]], use_timeout: bool,
+                     per_attempt: bool = False) -> T:
+        stats = self.get_stats(provider)
+        timeout = self.timeout_for(provider) if use_timeout else None
+        stats.requests += 1
+        stats.last_used = datetime.now().isoformat()
+        started = time.monotonic()
+        try:
+            if per_attempt:
+                result = await invoke(provider, timeout)
+            else:
+                result = await run_with_timeout(provider, invoke(provider), timeout)
+        except asyncio.CancelledError:
+            stats.cancelled += 1
+            raise
+        except Exception as e:
+            self._record_failure(provider, e)
+            raise
+        stats.successes += 1
+        stats.latencies.append(time.monotonic() - started)
+        return result
+
+    async def _hedge(self, primary: asyncio.Task, pending: List[str], start: Callable[[str], asyncio.Task],
+                     provider: str):
+        """首个请求超过对冲时间仍未完成（流式为未产出首个数据块）时启动下一个候选"""
+        if not self.hedge_after or not pending:
+            return
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+        if not done:
+            backup = pending.pop(0)
+            self.get_stats(backup).hedges += 1
+            logger.info(f"AI服务 ({provider}) {self.hedge_after * 1000:.0f}ms 内未响应，对冲请求 {backup}")
+            start(backup)
+
+    async def _race(self, tasks: Dict[asyncio.Task, str],
+                    primary: asyncio.Task) -> Tuple[Optional[str], Any, Optional[BaseException]]:
+        """等待第一个成功的请求，返回 (提供商, 结果, 最后的错误)"""
+        error = None
+        while tasks:
+            done, _ = await asyncio.wait(set(tasks), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    provider = tasks.pop(task)
+                    if task is not primary:
+                        self.get_stats(provider).hedge_wins += 1
+                    return provider, task.result(), error
+            for task in done:
+                error = task.exception()
+                tasks.pop(task)
+        return None, None, error
+
+    async def call(self, providers: List[str], invoke: Callable[..., Awaitable[T]],
+                   per_attempt: bool = False) -> T:
+        """按候选顺序调用，失败或超时时切换，必要时发起对冲请求"""
+        _, result = await self.call_with_provider(providers, invoke, per_attempt)
+        return result
+
+    async def call_with_provider(self, providers: List[str], invoke: Callable[..., Awaitable[T]],
+                                 per_attempt: bool = False) -> Tuple[str, T]:
+        """同 call，同时返回实际给出结果的提供商"""
+        # 只有一个候选时无处切换，沿用服务自身的HTTP超时
+        use_timeout = len(providers) > 1
+        pending = list(providers)
+        error: Optional[BaseException] = None
+        while pending:
+            provider = pending.pop(0)
+            tasks: Dict[asyncio.Task, str] = {}
+
+            def start(name: str) -> asyncio.Task:
+                task = asyncio.ensure_future(self._timed(name, invoke, use_timeout, per_attempt))
+                tasks[task] = name
+                return task
+
+            primary = start(provider)
+            try:
+                await self._hedge(primary, pending, start, provider)
+                label, result, error = await self._race(tasks, primary)
+                if label is not None:
+                    return label, result
+            finally:
+                for task in tasks:
+                    task.cancel()
+            if not is_transient_error(error):
+                raise error
+            if pending:
+                self.get_stats(provider).failovers += 1
+                logger.warning(f"AI服务 ({provider}) 调用失败，切换到 {pending[0]}: {error}")
+        raise error
+
+    async def _first_chunk(self, provider: str, stream: AsyncIterator[str], timeout: Optional[float]) -> Optional[str]:
+        """读取首个数据块并记录首字延迟，流为空时返回None"""
+        stats = self.get_stats(provider)
+        stats.requests += 1
+        stats.last_used = datetime.now().isoformat()
+        started = time.monotonic()
+        try:
+            try:
+                chunk = await run_with_timeout(provider, stream.__anext__(), timeout, "未输出内容")
+            except StopAsyncIteration:
+                chunk = None
+        except asyncio.CancelledError:
+            stats.cancelled += 1
+            raise
+        except Exception as e:
+            self._record_failure(provider, e)
+            raise
+        stats.successes += 1
+        stats.first_token_latencies.append(time.monotonic() - started)
+        return chunk
+
+    async def stream(self, providers: List[str], open_stream: Callable[..., AsyncIterator[str]],
+                     per_attempt: bool = False) -> AsyncIterator[str]:
+        """流式调用：首个数据块到达前可切换或对冲，之后固定使用该提供商"""
+        timeout = self.first_token_timeout if len(providers) > 1 else None
+        pending = list(providers)
+        error: Optional[BaseException] = None
+        while pending:
+            provider = pending.pop(0)
+            tasks: Dict[asyncio.Task, Tuple[str, AsyncIterator[str]]] = {}
+
+            def start(name: str) -> asyncio.Task:
+                if per_attempt:
+                    stream = open_stream(name, timeout)
+                    task = asyncio.ensure_future(self._first_chunk(name, stream, None))
+                else:
+                    stream = open_stream(name)
+                    task = asyncio.ensure_future(self._first_chunk(name, stream, timeout))
+                tasks[task] = (name, stream)
+                return task
+
+            primary = start(provider)
+            winner = None
+            try:
+                await self._hedge(primary, pending, start, provider)
+                label, first, error = await self._race_streams(tasks, primary)
+                if label is not None:
+                    winner = (label, first)
+            finally:
+                for task, (_, stream) in tasks.items():
+                    task.cancel()
+                    try:
+                        await task
+                    except BaseException:
+                        pass
+                    await stream.aclose()
+
+            if winner is not None:
+                (name, stream), first = winner
+                try:
+                    if first is not None:
+                        yield first
+                        async for chunk in stream:
+                            yield chunk
+                finally:
+                    await stream.aclose()
+                return
+            if not is_transient_error(error):
+                raise error
+            if pending:
+                self.get_stats(provider).failovers += 1
+                logger.warning(f"AI服务 ({provider}) 流式调用失败，切换到 {pending[0]}: {error}")
+        raise error
+
+    async def _race_streams(self, tasks, primary):
+        """等待第一个产出数据块的流，失败的流立即关闭"""
+        error = None
+        while tasks:
+            done, _ = await asyncio.wait(set(tasks), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    label = tasks.pop(task)
+                    if task is not primary:
+                        self.get_stats(label[0]).hedge_wins += 1
+                    return label, task.result(), error
+            for task in done:
+                error = task.exception()
+                _, stream = tasks.pop(task)
+                await stream.aclose()
+        return None, None, error
+
+    def get_status(self, primary: str) -> Dict[str, Any]:
+        """获取路由状态与各提供商统计"""
+        providers = [primary] + [provider for provider in self.pool if provider != primary]
+        return {
+            "pool": providers,
+            "order": self.candidates(primary),
+            "stream_order": self.candidates(primary, "stream"),
+            "hedge_after_ms": int(self.hedge_after * 1000),
+            "timeout": self.timeout,
+            "provider_timeouts": {provider: self.timeout_for(provider) for provider in providers},
+            "first_token_timeout": self.first_token_timeout,
+            "providers": {
+                provider: {
+                    **self.get_stats(provider).to_dict(),
+                    "score_ms": round(self.score(provider) * 1000, 1),
+                    "health": self.health_monitor.get_status(provider)
+                }
+                for provider in providers
+            }
+        }
@@ -2,17 +2,112 @@
 AI服务抽象层 - 支持多平台AI模型调用
 """
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, Any, Union, Tuple
+from typing import Dict, List, Optional, Any, Union, Tuple, AsyncIterator, Type
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import asyncio
 import httpx
 import json
 import logging
 import re
 from enum import Enum
 
-from ..core.config import AI_CONFIG, AI_PROVIDERS_CONFIG
+from ..core.config import AI_CONFIG, AI_PROVIDERS_CONFIG, AI_HTTP_POOL_CONFIG, AI_BATCH_CONFIG, AI_STRUCTURED_CONFIG
+from .ai_health import ProviderHealthMonitor
+from .ai_router import ProviderRouter, run_with_timeout
+from .ai_rate_limit import ProviderQuotaManager, RateLimitExceeded
+from .ai_cache import AIResponseCache
+from .prompt_builder import estimate_tokens
+from .structured_output import SchemaT, JSONRepairParser, generate_with_retries, with_schema_instructions
 
 logger = logging.getLogger(__name__)
 
+try:
+    import h2  # noqa: F401  HTTP/2 支持为可选依赖（httpx[http2]）
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class ThinkingChainParser:
+    """
+    增量思维链解析器
+
+    逐块接收AI输出，实时区分 <think>...</think> 中的思维过程和正文内容。
+    标签可能被拆分在多个数据块之间，解析器会暂存可能构成标签前缀的尾部字符。
+    """
+
+    OPEN_TAG = "<think>"
+    CLOSE_TAG = "</think>"
+    _open_pattern = re.compile(re.escape(OPEN_TAG), re.IGNORECASE)
+    _close_pattern = re.compile(re.escape(CLOSE_TAG), re.IGNORECASE)
+
+    def __init__(self):
+        self.in_thinking = False
+        self._buffer = ""
+        self._content_parts: List[str] = []
+        self._thinking_segments: List[List[str]] = []
+
+    @staticmethod
+    def _partial_tag_length(text: str, tag: str) -> int:
+        """文本末尾可能构成标签前缀的字符数"""
+        for length in range(min(len(tag) - 1, len(text)), 0, -1):
+            if text[-length:].lower() == tag[:length]:
+                return length
+        return 0
+
+    def _emit(self, text: str, events: List[Tuple[str, str]]):
+        if not text:
+            return
+        if self.in_thinking:
+            self._thinking_segments[-1].append(text)
+            events.append(("thinking", text))
+        else:
+            self._content_parts.append(text)
+            events.append(("content", text))
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        """
+        输入一个数据块
+
+        Returns:
+            List[Tuple[str, str]]: [(类型, 文本)]，类型为 "thinking" 或 "content"
+        """
+        events: List[Tuple[str, str]] = []
+        self._buffer += chunk
+        while self._buffer:
+            pattern, tag = (self._close_pattern, self.CLOSE_TAG) if self.in_thinking \
+                else (self._open_pattern, self.OPEN_TAG)
+            match = pattern.search(self._buffer)
+            if match:
+                self._emit(self._buffer[:match.start()], events)
+                self._buffer = self._buffer[match.end():]
+                self.in_thinking = not self.in_thinking
+                if self.in_thinking:
+                    self._thinking_segments.append([])
+                continue
+
+            keep = self._partial_tag_length(self._buffer, tag)
+            self._emit(self._buffer[:len(self._buffer) - keep], events)
+            self._buffer = self._buffer[len(self._buffer) - keep:]
+            break
+        return events
+
+    def flush(self) -> List[Tuple[str, str]]:
+        """输出暂存的剩余字符"""
+        events: List[Tuple[str, str]] = []
+        self._emit(self._buffer, events)
+        self._buffer = ""
+        return events
+
+    def result(self) -> Tuple[str, Optional[str]]:
+        """获取累计的 (最终结果, 思维过程)"""
+        content = "".join(self._content_parts).strip()
+        thinking = None
+        if self._thinking_segments:
+            thinking = "\n\n".join("".join(segment) for segment in self._thinking_segments).strip()
+        return content, thinking
+
 
 def process_thinking_chain(text: str) -> Tuple[str, Optional[str]]:
     """
@@ -24,19 +119,63 @@ def process_thinking_chain(text: str) -> Tuple[str, Optional[str]]:
     Returns:
         Tuple[str, Optional[str]]: (最终结果, 思维过程)
     """
-    # 匹配 <think>...</think> 标签
-    think_pattern = r'<think>(.*?)</think>'
-    thinking_matches = re.findall(think_pattern, text, re.DOTALL | re.IGNORECASE)
-
-    # 移除思维链标签，获取纯净结果
-    clean_text = re.sub(think_pattern, '', text, flags=re.DOTALL | re.IGNORECASE).strip()
-
-    # 合并所有思维过程
-    thinking_process = None
-    if thinking_matches:
-        thinking_process = '\n\n'.join(thinking_matches).strip()
-
-    return clean_text, thinking_process
+    parser = ThinkingChainParser()
+    parser.feed(text)
+    parser.flush()
+    return parser.result()
+
+
+async def iter_sse_data(response: httpx.Response) -> AsyncIterator[str]:
+    """逐条读取SSE响应中的 data 字段"""
+    async for line in response.aiter_lines():
+        line = line.strip()
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        if data:
+            yield data
+
+
+def is_provider_failure(error: Exception) -> bool:
+    """判断异常是否表示提供商不可用（网络错误、超时或服务端错误；限流由额度管理器处理，不计入）"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """判断异常是否为限流（提供商返回429，或本地额度不足被拒绝）"""
+    if isinstance(error, RateLimitExceeded):
+        return True
+    return isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 429
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """获取限流异常建议的等待秒数"""
+    if isinstance(error, RateLimitExceeded):
+        return error.retry_after
+    if isinstance(error, httpx.HTTPStatusError):
+        return parse_retry_after(error.response.headers.get("Retry-After"))
+    return None
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 响应头（秒数或HTTP日期），返回需要等待的秒数"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
 
 
 class AIProvider(str, Enum):
@@ -51,12 +190,97 @@ class AIProvider(str, Enum):
     CUSTOM = "custom"
 
 
+class HTTPClientPool:
+    """
+    AI服务HTTP连接池
+
+    每个服务地址持有一个长连接的 httpx.AsyncClient，避免每次调用都重新进行
+    TCP/TLS 握手。由应用生命周期统一创建和关闭，未启动时按需懒加载。
+    """
+
+    def __init__(self, pool_config: Optional[Dict[str, Any]] = None):
+        self.pool_config = pool_config or AI_HTTP_POOL_CONFIG
+        self._clients: Dict[Tuple[str, bool], httpx.AsyncClient] = {}
+
+    def _create_client(self, http2: bool) -> httpx.AsyncClient:
+        """创建带连接池限制的客户端"""
+        limits = httpx.Limits(
+            max_connections=self.pool_config.get("max_connections", 100),
+            max_keepalive_connections=self.pool_config.get("max_keepalive_connections", 20),
+            keepalive_expiry=self.pool_config.get("keepalive_expiry", 30.0)
+        )
+        timeout = httpx.Timeout(60.0, connect=self.pool_config.get("connect_timeout", 10.0))
+        return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+    def get_client(self, base_url: str, http2: bool = False) -> httpx.AsyncClient:
+        """获取指定服务地址的共享客户端"""
+        http2 = http2 and HTTP2_AVAILABLE and self.pool_config.get("http2", True)
+        key = (base_url or "", http2)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            client = self._create_client(http2)
+            self._clients[key] = client
+        return client
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池状态"""
+        return {
+            "clients": [
+                {"base_url": base_url, "http2": http2, "closed": client.is_closed}
+                for (base_url, http2), client in self._clients.items()
+            ],
+            "http2_available": HTTP2_AVAILABLE,
+            "limits": {
+                "max_connections": self.pool_config.get("max_connections"),
+                "max_keepalive_connections": self.pool_config.get("max_keepalive_connections"),
+                "keepalive_expiry": self.pool_config.get("keepalive_expiry")
+            }
+        }
+
+    async def close(self):
+        """关闭所有客户端"""
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"关闭HTTP客户端失败: {e}")
+
+
+# 全局HTTP连接池实例
+http_client_pool = HTTPClientPool()
+
+
 class AIServiceBase(ABC):
     """AI服务基类"""
 
+    # 提供商是否支持HTTP/2（通过TLS ALPN协商，不支持时自动回退到HTTP/1.1）
+    supports_http2: bool = False
+    # 结构化输出方式：json_object（OpenAI兼容的JSON模式）、json_format（Ollama 的 format=json）、
+    # tool（强制工具调用）、json_mime（Gemini 的 responseMimeType）、prompt（提示词约束 + 流式修复解析）
+    structured_mode: str = "prompt"
+    # 各原生模式使用的请求参数名，服务端的错误信息提到这些参数时才认为不支持该模式
+    structured_mode_params: Dict[str, Tuple[str, ...]] = {
+        "json_object": ("response_format",),
+        "json_format": ("format",),
+        "tool": ("tool",),
+        "json_mime": ("responseMimeType", "response_mime_type"),
+    }
+    # 是否参与后台主动探测，没有免费探测端点的提供商只由真实请求的成败跟踪健康状态
+    active_probe: bool = True
+    # 单次补全请求的超时（秒），可由提供商配置的 timeout 覆盖；路由切换提供商时使用同一超时
+    request_timeout: float = 60.0
+
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.client = None
+        self.base_url = config.get("base_url")
+        self.request_timeout = float(config.get("timeout") or self.request_timeout)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """当前服务地址的共享长连接客户端"""
+        return http_client_pool.get_client(self.base_url, http2=self.supports_http2)
 
     @abstractmethod
     async def generate_text(self, prompt: str, **kwargs) -> str:
@@ -73,6 +297,28 @@ class AIServiceBase(ABC):
         """检查连接状态"""
         pass
 
+    async def probe_health(self) -> bool:
+        """
+        轻量健康探测，供后台健康监测使用
+
+        默认退化为 check_connection，提供免费探测端点的子类应覆盖此方法，
+        避免每次探测都消耗一次付费补全；没有免费端点的子类应将 active_probe 设为 False。
+        """
+        return await self.check_connection()
+
+    async def stream_chat(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """
+        流式聊天补全，逐块产出生成的文本
+
+        默认实现退化为一次性返回完整结果，支持流式接口的子类应覆盖此方法。
+        """
+        yield await self.chat_completion(messages, **kwargs)
+
+    async def stream_generate(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """流式生成文本，逐块产出生成的文本"""
+        async for chunk in self.stream_chat([{"role": "user", "content": prompt}], **kwargs):
+            yield chunk
+
     async def generate_text_with_thinking(self, prompt: str, **kwargs) -> Dict[str, Any]:
         """
         生成文本并处理思维链
@@ -113,10 +359,84 @@ class AIServiceBase(ABC):
             "raw_response": raw_response
         }
 
+    async def generate_json(self, prompt: str, schema: Dict[str, Any], **kwargs) -> str:
+        """
+        单次生成符合JSON Schema的输出（返回原始文本，由调用方解析校验）
+
+        优先使用提供商原生的结构化输出。服务端明确拒绝该模式的参数时记住并改用提示词约束；
+        其他 400/404/422（上下文过长、max_tokens 无效、模型不存在等）只对本次请求退回提示词约束，
+        不改变服务的结构化输出方式。
+        """
+        if self.structured_mode != "prompt" and AI_STRUCTURED_CONFIG.get("native", True):
+            mode = self.structured_mode
+            try:
+                return await self._generate_native_json(prompt, schema, **kwargs)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code not in (400, 404, 422):
+                    raise
+                if self._rejects_structured_mode(e, mode):
+                    logger.warning(
+                        f"{type(self).__name__} 不支持 {mode} 结构化输出"
+                        f"（{e.response.status_code}），改用提示词约束"
+                    )
+                    self.structured_mode = "prompt"
+                else:
+                    logger.warning(f"{type(self).__name__} {mode} 结构化输出请求失败，本次改用提示词约束: {e}")
+        return await self._stream_json(with_schema_instructions(prompt, schema), **kwargs)
+
+    def _rejects_structured_mode(self, error: httpx.HTTPStatusError, mode: str) -> bool:
+        """判断错误是否为服务端拒绝结构化输出模式所用的参数"""
+        try:
+            detail = error.response.text
+        except httpx.ResponseNotRead:
+            return False
+        return any(param in detail for param in self.structured_mode_params.get(mode, ()))
+
+    async def _generate_native_json(self, prompt: str, schema: Dict[str, Any], **kwargs) -> str:
+        """
+        使用原生JSON模式生成
+
+        基类实现通过 chat_completion 的参数支持 json_object 与 json_format，
+        其他模式（tool、json_mime）由对应的子类覆盖本方法
+        """
+        messages = [{"role": "user", "content": with_schema_instructions(prompt, schema)}]
+        if self.structured_mode == "json_object":
+            return await self.chat_completion(messages, response_format={"type": "json_object"}, **kwargs)
+        return await self.chat_completion(messages, format="json", **kwargs)
+
+    async def _stream_json(self, prompt: str, **kwargs) -> str:
+        """流式读取输出，根JSON值闭合后立即停止接收，不为JSON之后的多余文字等待和付费"""
+        thinking = ThinkingChainParser()
+        parser = JSONRepairParser(roots="{")
+        chunks: List[str] = []
+        stream = self.stream_generate(prompt, **kwargs)
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                for kind, text in thinking.feed(chunk):
+                    if kind == "content" and parser.feed(text):
+                        break
+                if parser.complete:
+                    break
+        finally:
+            await stream.aclose()
+        return parser.text if parser.started else "".join(chunks)
+
+    async def generate_structured(self, prompt: str, schema: Type[SchemaT],
+                                  max_retries: Optional[int] = None, **kwargs) -> SchemaT:
+        """按Pydantic模型生成结构化结果，输出未通过校验时附上错误原因有限次重试"""
+        json_schema = schema.model_json_schema()
+        return await generate_with_retries(
+            lambda current: self.generate_json(current, json_schema, **kwargs), prompt, schema, max_retries
+        )
+
 
 class OpenAIService(AIServiceBase):
     """OpenAI服务实现"""
 
+    supports_http2 = True
+    structured_mode = "json_object"
+
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.api_key = config.get("api_key")
@@ -128,8 +448,8 @@ class OpenAIService(AIServiceBase):
         messages = [{"role": "user", "content": prompt}]
         return await self.chat_completion(messages, **kwargs)
 
-    async def chat_completion(self, messages: List[Dict[str, str]], **kwargs) -> str:
-        """聊天补全"""
+    def _build_request(self, messages: List[Dict[str, str]], **kwargs) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """构建请求头和请求体"""
         if not self.api_key:
             raise ValueError("OpenAI API密钥未配置")
 
@@ -152,21 +472,52 @@ class OpenAIService(AIServiceBase):
             data["frequency_penalty"] = kwargs["frequency_penalty"]
         if "presence_penalty" in kwargs:
             data["presence_penalty"] = kwargs["presence_penalty"]
+        if "response_format" in kwargs:
+            data["response_format"] = kwargs["response_format"]
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json=data,
-                    timeout=60.0
-                )
+        return headers, data
+
+    async def chat_completion(self, messages: List[Dict[str, str]], **kwargs) -> str:
+        """聊天补全"""
+        headers, data = self._build_request(messages, **kwargs)
+
+        try:
+            response = await self.client.post(
+                f"{self.base_url}/chat/completions",
+                headers=headers,
+                json=data,
+                timeout=self.request_timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result["choices"][0]["message"]["content"]
+        except Exception as e:
+            logger.error(f"OpenAI API调用失败: {e}")
+            raise
+
+    async def stream_chat(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """流式聊天补全"""
+        headers, data = self._build_request(messages, **kwargs)
+        data["stream"] = True
+
+        try:
+            async with self.client.stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                headers=headers,
+                json=data,
+                timeout=self.request_timeout
+            ) as response:
                 response.raise_for_status()
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
-            except Exception as e:
-                logger.error(f"OpenAI API调用失败: {e}")
-                raise
+                async for payload in iter_sse_data(response):
+                    choices = json.loads(payload).get("choices") or []
+                    if choices:
+                        text = (choices[0].get("delta") or {}).get("content")
+                        if text:
+                            yield text
+        except Exception as e:
+            logger.error(f"OpenAI 流式API调用失败: {e}")
+            raise
 
     async def check_connection(self) -> bool:
         """检查连接状态"""
@@ -176,18 +527,34 @@ class OpenAIService(AIServiceBase):
         except Exception:
             return False
 
+    async def probe_health(self) -> bool:
+        """通过模型列表端点探测，不产生补全费用"""
+        if not self.api_key:
+            return False
+        response = await self.client.get(
+            f"{self.base_url}/models",
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=10.0
+        )
+        response.raise_for_status()
+        return True
+
 
 class ClaudeService(AIServiceBase):
     """Claude服务实现"""
 
+    supports_http2 = True
+    structured_mode = "tool"
+    structured_tool_name = "record_result"
+
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.api_key = config.get("api_key")
         self.base_url = config.get("base_url", "https://api.anthropic.com")
         self.model = config.get("model", "claude-3-sonnet-20240229")
 
-    async def generate_text(self, prompt: str, **kwargs) -> str:
-        """生成文本"""
+    def _build_request(self, prompt: str, **kwargs) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """构建请求头和请求体"""
         if not self.api_key:
             raise ValueError("Claude API密钥未配置")
 
@@ -203,20 +570,25 @@ class ClaudeService(AIServiceBase):
             "messages": [{"role": "user", "content": prompt}]
         }
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/v1/messages",
-                    headers=headers,
-                    json=data,
-                    timeout=60.0
-                )
-                response.raise_for_status()
-                result = response.json()
-                return result["content"][0]["text"]
-            except Exception as e:
-                logger.error(f"Claude API调用失败: {e}")
-                raise
+        return headers, data
+
+    async def generate_text(self, prompt: str, **kwargs) -> str:
+        """生成文本"""
+        headers, data = self._build_request(prompt, **kwargs)
+
+        try:
+            response = await self.client.post(
+                f"{self.base_url}/v1/messages",
+                headers=headers,
+                json=data,
+                timeout=self.request_timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result["content"][0]["text"]
+        except Exception as e:
+            logger.error(f"Claude API调用失败: {e}")
+            raise
 
     async def chat_completion(self, messages: List[Dict[str, str]], **kwargs) -> str:
         """聊天补全"""
@@ -224,6 +596,64 @@ class ClaudeService(AIServiceBase):
         prompt = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
         return await self.generate_text(prompt, **kwargs)
 
+    async def _generate_native_json(self, prompt: str, schema: Dict[str, Any], **kwargs) -> str:
+        """强制调用一个以目标结构为参数的工具，直接取工具参数作为结果"""
+        headers, data = self._build_request(prompt, **kwargs)
+        data["tools"] = [{
+            "name": self.structured_tool_name,
+            "description": "按要求的结构记录结果",
+            "input_schema": schema
+        }]
+        data["tool_choice"] = {"type": "tool", "name": self.structured_tool_name}
+
+        try:
+            response = await self.client.post(
+                f"{self.base_url}/v1/messages",
+                headers=headers,
+                json=data,
+                timeout=self.request_timeout
+            )
+            response.raise_for_status()
+            for block in response.json().get("content", []):
+                if block.get("type") == "tool_use":
+                    return json.dumps(block.get("input", {}), ensure_ascii=False)
+            raise ValueError("Claude 未返回工具调用结果")
+        except Exception as e:
+            logger.error(f"Claude 结构化输出调用失败: {e}")
+            raise
+
+    async def stream_generate(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """流式生成文本"""
+        headers, data = self._build_request(prompt, **kwargs)
+        data["stream"] = True
+
+        try:
+            async with self.client.stream(
+                "POST",
+                f"{self.base_url}/v1/messages",
+                headers=headers,
+                json=data,
+                timeout=self.request_timeout
+            ) as response:
+                response.raise_for_status()
+                async for payload in iter_sse_data(response):
+                    event = json.loads(payload)
+                    if event.get("type") == "content_block_delta":
+                        text = (event.get("delta") or {}).get("text")
+                        if text:
+                            yield text
+                    elif event.get("type") == "message_stop":
+                        break
+        except Exception as e:
+            logger.error(f"Claude 流式API调用失败: {e}")
+            raise
+
+    async def stream_chat(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """流式聊天补全"""
+        prompt = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
+        async for chunk in self.stream_generate(prompt, **kwargs):
+            yield chunk
+
     async def check_connection(self) -> bool:
         """检查连接状态"""
         try:
@@ -232,42 +662,86 @@ class ClaudeService(AIServiceBase):
         except Exception:
             return False
 
+    async def probe_health(self) -> bool:
+        """通过模型列表端点探测，不产生补全费用"""
+        if not self.api_key:
+            return False
+        response = await self.client.get(
+            f"{self.base_url}/v1/models",
+            headers={"x-api-key": self.api_key, "anthropic-version": "2023-06-01"},
+            timeout=10.0
+        )
+        response.raise_for_status()
+        return True
+
 
 class OllamaService(AIServiceBase):
     """Ollama服务实现"""
 
+    structured_mode = "json_format"
+    # 本地模型生成较慢
+    request_timeout = 120.0
+
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.base_url = config.get("base_url", "http://localhost:11434")
         self.model = config.get("model", "llama2")
 
+    def _build_options(self, **kwargs) -> Dict[str, Any]:
+        """构建生成参数"""
+        return {
+            "temperature": kwargs.get("temperature", self.config.get("temperature", 0.7)),
+            "num_predict": kwargs.get("max_tokens", self.config.get("max_tokens", 2000)),
+            "top_p": kwargs.get("top_p", 1.0),
+            "repeat_penalty": kwargs.get("frequency_penalty", 0.0) + 1.0  # Ollama使用repeat_penalty
+        }
+
+    async def _stream_ndjson(self, path: str, data: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """逐行读取Ollama的NDJSON流式响应"""
+        try:
+            async with self.client.stream(
+                "POST",
+                f"{self.base_url}{path}",
+                json=data,
+                timeout=self.request_timeout
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    result = json.loads(line)
+                    if result.get("error"):
+                        raise RuntimeError(result["error"])
+                    yield result
+                    if result.get("done"):
+                        break
+        except Exception as e:
+            logger.error(f"Ollama 流式API调用失败: {e}")
+            raise
+
     async def generate_text(self, prompt: str, **kwargs) -> str:
         """生成文本"""
         data = {
             "model": self.model,
             "prompt": prompt,
             "stream": False,
-            "options": {
-                "temperature": kwargs.get("temperature", self.config.get("temperature", 0.7)),
-                "num_predict": kwargs.get("max_tokens", self.config.get("max_tokens", 2000)),
-                "top_p": kwargs.get("top_p", 1.0),
-                "repeat_penalty": kwargs.get("frequency_penalty", 0.0) + 1.0  # Ollama使用repeat_penalty
-            }
+            "options": self._build_options(**kwargs)
         }
+        if kwargs.get("format"):
+            data["format"] = kwargs["format"]
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/api/generate",
-                    json=data,
-                    timeout=120.0
-                )
-                response.raise_for_status()
-                result = response.json()
-                return result["response"]
-            except Exception as e:
-                logger.error(f"Ollama API调用失败: {e}")
-                raise
+        try:
+            response = await self.client.post(
+                f"{self.base_url}/api/generate",
+                json=data,
+                timeout=self.request_timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result["response"]
+        except Exception as e:
+            logger.error(f"Ollama API调用失败: {e}")
+            raise
 
     async def chat_completion(self, messages: List[Dict[str, str]], **kwargs) -> str:
         """聊天补全"""
@@ -275,74 +749,95 @@ class OllamaService(AIServiceBase):
             "model": self.model,
             "messages": messages,
             "stream": False,
-            "options": {
-                "temperature": kwargs.get("temperature", self.config.get("temperature", 0.7)),
-                "num_predict": kwargs.get("max_tokens", self.config.get("max_tokens", 2000)),
-                "top_p": kwargs.get("top_p", 1.0),
-                "repeat_penalty": kwargs.get("frequency_penalty", 0.0) + 1.0  # Ollama使用repeat_penalty
-            }
+            "options": self._build_options(**kwargs)
         }
+        if kwargs.get("format"):
+            data["format"] = kwargs["format"]
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/api/chat",
-                    json=data,
-                    timeout=120.0
-                )
-                response.raise_for_status()
-                result = response.json()
-                return result["message"]["content"]
-            except Exception as e:
-                logger.error(f"Ollama API调用失败: {e}")
-                raise
+        try:
+            response = await self.client.post(
+                f"{self.base_url}/api/chat",
+                json=data,
+                timeout=self.request_timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result["message"]["content"]
+        except Exception as e:
+            logger.error(f"Ollama API调用失败: {e}")
+            raise
+
+    async def stream_generate(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """流式生成文本"""
+        data = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": True,
+            "options": self._build_options(**kwargs)
+        }
+        async for result in self._stream_ndjson("/api/generate", data):
+            if result.get("response"):
+                yield result["response"]
+
+    async def stream_chat(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """流式聊天补全"""
+        data = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "options": self._build_options(**kwargs)
+        }
+        async for result in self._stream_ndjson("/api/chat", data):
+            text = (result.get("message") or {}).get("content")
+            if text:
+                yield text
 
     async def check_connection(self) -> bool:
         """检查连接状态"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/api/tags", timeout=10.0)
-                response.raise_for_status()
-                return True
+            response = await self.client.get(f"{self.base_url}/api/tags", timeout=10.0)
+            response.raise_for_status()
+            return True
         except Exception:
             return False
 
     async def get_available_models(self) -> List[Dict[str, Any]]:
         """获取本地可用的模型列表"""
         try:
-            # 增加连接超时时间和重试机制
-            async with httpx.AsyncClient(timeout=httpx.Timeout(60.0, connect=10.0)) as client:
-                # 直接获取模型列表，不进行健康检查（因为Ollama根路径可能不支持GET请求）
-                response = await client.get(f"{self.base_url}/api/tags", timeout=30.0)
-
-                # 详细记录响应信息
-                logger.info(f"Ollama API响应状态码: {response.status_code}")
-                logger.info(f"Ollama API响应头: {dict(response.headers)}")
-
-                if response.status_code == 502:
-                    logger.error("Ollama服务返回502错误，可能服务未正确启动")
-                    # 尝试重新启动Ollama服务的建议
-                    return []
-
-                response.raise_for_status()
-                result = response.json()
-
-                logger.info(f"Ollama API原始响应: {result}")
-
-                models = []
-                for model in result.get("models", []):
-                    model_info = {
-                        "name": model.get("name", ""),
-                        "size": model.get("size", 0),
-                        "modified_at": model.get("modified_at", ""),
-                        "digest": model.get("digest", ""),
-                        "details": model.get("details", {})
-                    }
-                    models.append(model_info)
-                    logger.debug(f"处理模型: {model_info}")
-
-                logger.info(f"成功获取到 {len(models)} 个Ollama模型")
-                return models
+            # 直接获取模型列表，不进行健康检查（因为Ollama根路径可能不支持GET请求）
+            response = await self.client.get(
+                f"{self.base_url}/api/tags",
+                timeout=httpx.Timeout(30.0, connect=10.0)
+            )
+
+            # 详细记录响应信息
+            logger.info(f"Ollama API响应状态码: {response.status_code}")
+            logger.info(f"Ollama API响应头: {dict(response.headers)}")
+
+            if response.status_code == 502:
+                logger.error("Ollama服务返回502错误，可能服务未正确启动")
+                # 尝试重新启动Ollama服务的建议
+                return []
+
+            response.raise_for_status()
+            result = response.json()
+
+            logger.info(f"Ollama API原始响应: {result}")
+
+            models = []
+            for model in result.get("models", []):
+                model_info = {
+                    "name": model.get("name", ""),
+                    "size": model.get("size", 0),
+                    "modified_at": model.get("modified_at", ""),
+                    "digest": model.get("digest", ""),
+                    "details": model.get("details", {})
+                }
+                models.append(model_info)
+                logger.debug(f"处理模型: {model_info}")
+
+            logger.info(f"成功获取到 {len(models)} 个Ollama模型")
+            return models
 
         except httpx.ConnectError as e:
             logger.error(f"无法连接到Ollama服务 ({self.base_url}): {e}")
@@ -367,17 +862,16 @@ class OllamaService(AIServiceBase):
     async def get_model_info(self, model_name: str) -> Optional[Dict[str, Any]]:
         """获取指定模型的详细信息"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/api/show",
-                    json={"name": model_name},
-                    timeout=30.0
-                )
-                response.raise_for_status()
-                result = response.json()
-
-                logger.info(f"成功获取模型 {model_name} 的详细信息")
-                return result
+            response = await self.client.post(
+                f"{self.base_url}/api/show",
+                json={"name": model_name},
+                timeout=30.0
+            )
+            response.raise_for_status()
+            result = response.json()
+
+            logger.info(f"成功获取模型 {model_name} 的详细信息")
+            return result
         except httpx.ConnectError:
             logger.warning(f"无法连接到Ollama服务 ({self.base_url})")
             return None
@@ -400,6 +894,10 @@ class OllamaService(AIServiceBase):
 class ZhipuService(AIServiceBase):
     """智谱AI服务实现"""
 
+    structured_mode = "json_object"
+    # 没有免费的探测端点，不主动探测
+    active_probe = False
+
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.api_key = config.get("api_key")
@@ -431,21 +929,22 @@ class ZhipuService(AIServiceBase):
         # 添加高级参数支持
         if "top_p" in kwargs:
             data["top_p"] = kwargs["top_p"]
+        if "response_format" in kwargs:
+            data["response_format"] = kwargs["response_format"]
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json=data,
-                    timeout=60.0
-                )
-                response.raise_for_status()
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
-            except Exception as e:
-                logger.error(f"智谱AI API调用失败: {e}")
-                raise
+        try:
+            response = await self.client.post(
+                f"{self.base_url}/chat/completions",
+                headers=headers,
+                json=data,
+                timeout=self.request_timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result["choices"][0]["message"]["content"]
+        except Exception as e:
+            logger.error(f"智谱AI API调用失败: {e}")
+            raise
 
     async def check_connection(self) -> bool:
         """检查连接状态"""
@@ -456,6 +955,7 @@ class ZhipuService(AIServiceBase):
             return False
 
 
+
 class SiliconFlowService(OpenAIService):
     """硅基流动服务实现（兼容OpenAI格式）"""
 
@@ -468,14 +968,19 @@ class SiliconFlowService(OpenAIService):
 class GoogleService(AIServiceBase):
     """谷歌AI服务实现"""
 
+    supports_http2 = True
+
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.api_key = config.get("api_key")
         self.base_url = config.get("base_url", "https://generativelanguage.googleapis.com/v1beta")
         self.model = config.get("model", "gemini-pro")
+        # gemini-1.5 起支持 responseMimeType 约束JSON输出
+        if not self.model.startswith(("gemini-pro", "gemini-1.0")):
+            self.structured_mode = "json_mime"
 
-    async def generate_text(self, prompt: str, **kwargs) -> str:
-        """生成文本"""
+    def _build_request(self, prompt: str, **kwargs) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """构建请求头和请求体"""
         if not self.api_key:
             raise ValueError("Google AI API密钥未配置")
 
@@ -492,21 +997,28 @@ class GoogleService(AIServiceBase):
                 "temperature": kwargs.get("temperature", self.config.get("temperature", 0.7))
             }
         }
+        if kwargs.get("response_mime_type"):
+            data["generationConfig"]["responseMimeType"] = kwargs["response_mime_type"]
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/models/{self.model}:generateContent?key={self.api_key}",
-                    headers=headers,
-                    json=data,
-                    timeout=60.0
-                )
-                response.raise_for_status()
-                result = response.json()
-                return result["candidates"][0]["content"]["parts"][0]["text"]
-            except Exception as e:
-                logger.error(f"Google AI API调用失败: {e}")
-                raise
+        return headers, data
+
+    async def generate_text(self, prompt: str, **kwargs) -> str:
+        """生成文本"""
+        headers, data = self._build_request(prompt, **kwargs)
+
+        try:
+            response = await self.client.post(
+                f"{self.base_url}/models/{self.model}:generateContent?key={self.api_key}",
+                headers=headers,
+                json=data,
+                timeout=self.request_timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result["candidates"][0]["content"]["parts"][0]["text"]
+        except Exception as e:
+            logger.error(f"Google AI API调用失败: {e}")
+            raise
 
     async def chat_completion(self, messages: List[Dict[str, str]], **kwargs) -> str:
         """聊天补全"""
@@ -514,6 +1026,42 @@ class GoogleService(AIServiceBase):
         prompt = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
         return await self.generate_text(prompt, **kwargs)
 
+    async def _generate_native_json(self, prompt: str, schema: Dict[str, Any], **kwargs) -> str:
+        """通过 responseMimeType 约束输出为JSON"""
+        return await self.generate_text(
+            with_schema_instructions(prompt, schema), response_mime_type="application/json", **kwargs
+        )
+
+    async def stream_generate(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """流式生成文本"""
+        headers, data = self._build_request(prompt, **kwargs)
+
+        try:
+            async with self.client.stream(
+                "POST",
+                f"{self.base_url}/models/{self.model}:streamGenerateContent?alt=sse&key={self.api_key}",
+                headers=headers,
+                json=data,
+                timeout=self.request_timeout
+            ) as response:
+                response.raise_for_status()
+                async for payload in iter_sse_data(response):
+                    candidates = json.loads(payload).get("candidates") or []
+                    if not candidates:
+                        continue
+                    for part in (candidates[0].get("content") or {}).get("parts", []):
+                        if part.get("text"):
+                            yield part["text"]
+        except Exception as e:
+            logger.error(f"Google AI 流式API调用失败: {e}")
+            raise
+
+    async def stream_chat(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """流式聊天补全"""
+        prompt = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
+        async for chunk in self.stream_generate(prompt, **kwargs):
+            yield chunk
+
     async def check_connection(self) -> bool:
         """检查连接状态"""
         try:
@@ -522,6 +1070,17 @@ class GoogleService(AIServiceBase):
         except Exception:
             return False
 
+    async def probe_health(self) -> bool:
+        """通过模型信息端点探测，不产生补全费用"""
+        if not self.api_key:
+            return False
+        response = await self.client.get(
+            f"{self.base_url}/models/{self.model}?key={self.api_key}",
+            timeout=10.0
+        )
+        response.raise_for_status()
+        return True
+
 
 class GrokService(OpenAIService):
     """GROK服务实现（兼容OpenAI格式）"""
@@ -579,6 +1138,18 @@ class AIManager:
         self.current_provider = AI_CONFIG.get("provider", "ollama")
         self.service = None
         self.provider_configs = AI_PROVIDERS_CONFIG.copy()
+        self.health_monitor = ProviderHealthMonitor(self._probe_provider)
+        self.health_monitor.watch(self.current_provider)
+        # 备用提供商池：失败切换、延迟感知排序与对冲请求
+        self.router = ProviderRouter(self.health_monitor, timeout_for=self._provider_timeout)
+        for provider in self.router.pool:
+            self.health_monitor.watch(provider)
+        self._pool_services: Dict[str, AIServiceBase] = {}
+        # 各提供商/模型的请求数与token数额度
+        self.quota = ProviderQuotaManager(self.provider_configs)
+        self.response_cache = AIResponseCache()
+        self.batch_config = AI_BATCH_CONFIG
+        self._provider_semaphores: Dict[str, asyncio.Semaphore] = {}
         self._initialize_service()
 
     def _initialize_service(self):
@@ -592,7 +1163,12 @@ class AIManager:
 
     async def switch_provider(self, provider: Union[str, AIProvider]):
         """切换AI提供商"""
+        if isinstance(provider, AIProvider):
+            provider = provider.value
+        if self.current_provider not in self.router.pool:
+            self.health_monitor.unwatch(self.current_provider)
         self.current_provider = provider
+        self.health_monitor.watch(provider)
         self._initialize_service()
 
     async def update_provider_config(self, provider: str, config: Dict[str, Any]):
@@ -602,6 +1178,8 @@ class AIManager:
 
         # 更新配置
         self.provider_configs[provider].update(config)
+        self.health_monitor.reset(provider)
+        self._pool_services.pop(provider, None)
 
         # 如果是当前提供商，重新初始化服务
         if provider == self.current_provider:
@@ -618,35 +1196,327 @@ class AIManager:
             config['api_key'] = '***' + config['api_key'][-4:] if len(config['api_key']) > 4 else '***'
         return config
 
-    async def generate_text(self, prompt: str, **kwargs) -> str:
-        """生成文本"""
+    async def _probe_provider(self, provider: str) -> Optional[bool]:
+        """健康监测使用的探测函数"""
+        if provider == self.current_provider and self.service:
+            service = self.service
+        else:
+            service = AIServiceFactory.create_service(provider, self.provider_configs.get(provider, {}))
+        if not service.active_probe:
+            return None
+        return await service.probe_health()
+
+    def _provider_timeout(self, provider: str) -> Optional[float]:
+        """路由时单个提供商的调用超时，与该服务自身的请求超时一致"""
+        try:
+            return self._get_service(provider).request_timeout
+        except Exception:
+            return None
+
+    def _get_service(self, provider: str) -> AIServiceBase:
+        """获取提供商的服务实例（当前提供商之外的实例按需创建并复用）"""
+        if provider == self.current_provider:
+            if not self.service:
+                raise RuntimeError("AI服务未初始化")
+            return self.service
+        service = self._pool_services.get(provider)
+        if service is None:
+            service = AIServiceFactory.create_service(provider, self.provider_configs.get(provider, {}))
+            self._pool_services[provider] = service
+        return service
+
+    def _estimate_request(self, provider: str, payload: Any, kwargs: Dict[str, Any]) -> Tuple[int, int]:
+        """估算请求的提示词token数与需预留的额度（提示词加输出上限）"""
+        if isinstance(payload, str):
+            text = payload
+        else:
+            text = "\n".join(str(message.get("content", "")) for message in payload)
+        prompt_tokens = estimate_tokens(text, provider)
+        max_tokens = kwargs.get("max_tokens") or self.provider_configs.get(provider, {}).get("max_tokens") or 0
+        return prompt_tokens, prompt_tokens + int(max_tokens)
+
+    async def _invoke(self, provider: str, method: str, payload: Any,
+                      attempt_timeout: Optional[float] = None, limit_concurrency: bool = False, **kwargs):
+        """
+        调用指定提供商，并将结果反馈给健康监测
+
+        发出前按额度排队；收到429时按Retry-After暂停该提供商并重试，最多 quota.max_retries 次。
+        attempt_timeout 为路由器给出的超时，在额度放行后对每次HTTP请求单独计时，
+        排队与429退避的等待不计入。
+        limit_concurrency 为真时（批量生成）先占用该提供商的并发信号量，
+        切换或对冲到备用提供商时同样受备用提供商的并发上限约束。
+        """
+        if limit_concurrency:
+            async with self._get_provider_semaphore(provider):
+                return await self._invoke(provider, method, payload, attempt_timeout, **kwargs)
+        service = self._get_service(provider)
+        model = self.provider_configs.get(provider, {}).get("model")
+        prompt_tokens, reserve = self._estimate_request(provider, payload, kwargs)
+        attempt = 0
+        while True:
+            reserved = await self.quota.acquire(provider, model, reserve)
+            try:
+                result = await run_with_timeout(provider, getattr(service, method)(payload, **kwargs), attempt_timeout)
+            except Exception as e:
+                self.quota.release(provider, model, reserved, prompt_tokens)
+                if is_rate_limited(e) and attempt < self.quota.max_retries:
+                    delay = self.quota.backoff(provider, model, get_retry_after(e), attempt)
+                    if not self.quota.enabled:
+                        # 未启用额度管理时没有限流器暂停放行，在此等待
+                        await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                if is_provider_failure(e):
+                    self.health_monitor.record_failure(provider, str(e))
+                raise
+            text = result.get("raw_response", "") if isinstance(result, dict) else str(result)
+            self.quota.release(provider, model, reserved, prompt_tokens + estimate_tokens(text, provider))
+            self.health_monitor.record_success(provider)
+            return result
+
+    async def _call_service(self, method: str, payload: Any, use_cache: Optional[bool] = None,
+                            limit_concurrency: bool = False, **kwargs):
+        """
+        经路由器调用服务（当前提供商优先，失败或超时切换到备用提供商）
+
+        确定性请求（temperature 为 0，或 use_cache=True）优先读取响应缓存，
+        结果按实际给出结果的提供商与模型写入缓存。
+        limit_concurrency 为真时每个实际调用的提供商都按其并发上限排队。
+        """
         if not self.service:
             raise RuntimeError("AI服务未初始化")
-        return await self.service.generate_text(prompt, **kwargs)
+        provider = self.current_provider
+        config = self.provider_configs.get(provider, {})
+
+        cache_key = None
+        temperature = kwargs.get("temperature", config.get("temperature"))
+        if self.response_cache.should_cache(temperature, use_cache):
+            cache_key = self.response_cache.make_key(provider, config.get("model"), method, payload, kwargs)
+            cached = await self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        else:
+            self.response_cache.record_bypass()
+
+        answered, result = await self.router.call_with_provider(
+            self.router.candidates(provider),
+            lambda candidate, timeout: self._invoke(
+                candidate, method, payload, attempt_timeout=timeout, limit_concurrency=limit_concurrency, **kwargs
+            ),
+            per_attempt=True
+        )
+
+        if cache_key is not None:
+            if answered != provider:
+                model = self.provider_configs.get(answered, {}).get("model")
+                cache_key = self.response_cache.make_key(answered, model, method, payload, kwargs)
+            await self.response_cache.set(cache_key, result)
+        return result
+
+    async def generate_text(self, prompt: str, **kwargs) -> str:
+        """生成文本"""
+        return await self._call_service("generate_text", prompt, **kwargs)
 
     async def chat_completion(self, messages: List[Dict[str, str]], **kwargs) -> str:
         """聊天补全"""
-        if not self.service:
-            raise RuntimeError("AI服务未初始化")
-        return await self.service.chat_completion(messages, **kwargs)
+        return await self._call_service("chat_completion", messages, **kwargs)
 
     async def generate_text_with_thinking(self, prompt: str, **kwargs) -> Dict[str, Any]:
         """生成文本并处理思维链"""
-        if not self.service:
-            raise RuntimeError("AI服务未初始化")
-        return await self.service.generate_text_with_thinking(prompt, **kwargs)
+        return await self._call_service("generate_text_with_thinking", prompt, **kwargs)
 
     async def chat_completion_with_thinking(self, messages: List[Dict[str, str]], **kwargs) -> Dict[str, Any]:
         """聊天补全并处理思维链"""
+        return await self._call_service("chat_completion_with_thinking", messages, **kwargs)
+
+    async def generate_structured(self, prompt: str, schema: Type[SchemaT],
+                                  max_retries: Optional[int] = None, **kwargs) -> SchemaT:
+        """
+        按Pydantic模型生成结构化结果
+
+        每次尝试经 _call_service 调用当前服务的 generate_json（参与健康监测与响应缓存），
+        输出无法解析或校验失败时附上错误原因重试，最多 max_retries 次。
+        """
+        json_schema = schema.model_json_schema()
+        return await generate_with_retries(
+            lambda current: self._call_service("generate_json", current, schema=json_schema, **kwargs),
+            prompt, schema, max_retries
+        )
+
+    async def _invoke_stream(self, provider: str, method: str, payload: Any,
+                             attempt_timeout: Optional[float] = None, **kwargs) -> AsyncIterator[str]:
+        """
+        流式调用指定提供商，并将结果反馈给健康监测（尚未输出内容时遇到429可重试）
+
+        attempt_timeout 只限制额度放行后每次请求等待首个数据块的时间
+        """
+        service = self._get_service(provider)
+        model = self.provider_configs.get(provider, {}).get("model")
+        prompt_tokens, reserve = self._estimate_request(provider, payload, kwargs)
+        attempt = 0
+        while True:
+            reserved = await self.quota.acquire(provider, model, reserve)
+            received: List[str] = []
+            released = False
+
+            def settle():
+                used = prompt_tokens + estimate_tokens("".join(received), provider)
+                self.quota.release(provider, model, reserved, used)
+
+            chunks = getattr(service, method)(payload, **kwargs)
+            try:
+                timeout = attempt_timeout
+                while True:
+                    try:
+                        chunk = await run_with_timeout(provider, chunks.__anext__(), timeout, "未输出内容")
+                    except StopAsyncIteration:
+                        break
+                    timeout = None
+                    received.append(chunk)
+                    yield chunk
+            except Exception as e:
+                settle()
+                released = True
+                if not received and is_rate_limited(e) and attempt < self.quota.max_retries:
+                    delay = self.quota.backoff(provider, model, get_retry_after(e), attempt)
+                    if not self.quota.enabled:
+                        # 未启用额度管理时没有限流器暂停放行，在此等待
+                        await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                if is_provider_failure(e):
+                    self.health_monitor.record_failure(provider, str(e))
+                raise
+            finally:
+                if not released:
+                    settle()
+                await chunks.aclose()
+            self.health_monitor.record_success(provider)
+            return
+
+    async def _stream_service(self, method: str, payload: Any, **kwargs) -> AsyncIterator[str]:
+        """经路由器流式调用服务，首个数据块到达前可切换提供商（流式结果不缓存）"""
         if not self.service:
             raise RuntimeError("AI服务未初始化")
-        return await self.service.chat_completion_with_thinking(messages, **kwargs)
+        kwargs.pop("use_cache", None)
+        stream = self.router.stream(
+            self.router.candidates(self.current_provider, "stream"),
+            lambda candidate, timeout: self._invoke_stream(candidate, method, payload, attempt_timeout=timeout, **kwargs),
+            per_attempt=True
+        )
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    def stream_chat(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """流式聊天补全"""
+        return self._stream_service("stream_chat", messages, **kwargs)
+
+    def stream_generate(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """流式生成文本"""
+        return self._stream_service("stream_generate", prompt, **kwargs)
 
     async def check_connection(self) -> bool:
-        """检查连接状态"""
+        """
+        立即探测当前提供商的连接状态并更新健康缓存
+
+        不参与主动探测的提供商由用户发起检查时才发送一次真实请求
+        """
+        if not self.service:
+            return False
+        if not self.service.active_probe:
+            healthy = await self.service.check_connection()
+            if healthy:
+                self.health_monitor.record_success(self.current_provider)
+            else:
+                self.health_monitor.record_failure(self.current_provider, "连接检查失败")
+            return healthy
+        return await self.health_monitor.refresh(self.current_provider)
+
+    async def is_available(self) -> bool:
+        """
+        判断当前提供商是否可用
+
+        读取健康监测的缓存状态，仅在缓存过期且后台尚未探测时才同步探测一次。
+        """
         if not self.service:
             return False
-        return await self.service.check_connection()
+        return await self.health_monitor.ensure_available(self.current_provider)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取响应缓存命中统计"""
+        return self.response_cache.get_stats()
+
+    def get_health_status(self) -> Dict[str, Any]:
+        """获取当前提供商的健康状态"""
+        return self.health_monitor.get_status(self.current_provider)
+
+    def get_quota_stats(self) -> Dict[str, Any]:
+        """获取各提供商/模型的限流额度与排队状态"""
+        return self.quota.get_stats()
+
+    def get_routing_stats(self) -> Dict[str, Any]:
+        """获取提供商池的路由顺序、延迟分位数与切换/对冲统计"""
+        return {"current_provider": self.current_provider, **self.router.get_status(self.current_provider)}
+
+    async def startup(self):
+        """启动时为各提供商预建HTTP连接池"""
+        for provider, config in self.provider_configs.items():
+            base_url = config.get("base_url")
+            if not base_url:
+                continue
+            service_class = AIServiceFactory._services.get(AIProvider(provider))
+            http_client_pool.get_client(base_url, http2=service_class.supports_http2)
+        logger.info("AI服务HTTP连接池已创建")
+        self.health_monitor.start()
+
+    async def shutdown(self):
+        """关闭时停止健康监测并释放所有HTTP连接"""
+        await self.health_monitor.stop()
+        await http_client_pool.close()
+        self.response_cache.close()
+        logger.info("AI服务HTTP连接池已关闭")
+
+    def _get_provider_semaphore(self, provider: str) -> asyncio.Semaphore:
+        """获取提供商的并发信号量"""
+        semaphore = self._provider_semaphores.get(provider)
+        if semaphore is None:
+            concurrency = self.provider_configs.get(provider, {}).get(
+                "concurrency", self.batch_config.get("concurrency", 4)
+            )
+            semaphore = asyncio.Semaphore(max(int(concurrency), 1))
+            self._provider_semaphores[provider] = semaphore
+        return semaphore
+
+    async def _generate_one(self, index: int, prompt: str, **kwargs) -> Dict[str, Any]:
+        """
+        批量生成中的单个条目
+
+        并发上限按实际调用的提供商在路由器的每次调用中占用；429的等待与重试由额度管理器统一处理
+        """
+        try:
+            result = await self._call_service("generate_text_with_thinking", prompt, limit_concurrency=True, **kwargs)
+            return {"index": index, "status": "success", **result}
+        except Exception as e:
+            return {"index": index, "status": "error", "error": str(e)}
+
+    async def generate_many(self, prompts: List[str], **kwargs) -> List[Dict[str, Any]]:
+        """
+        批量生成文本
+
+        按提供商并发上限并行请求，429响应按Retry-After暂停该提供商的所有请求后重试。
+        结果与输入顺序一致，单条失败不影响其他条目。
+
+        Returns:
+            List[Dict[str, Any]]: 每条包含 index、status（success/error），
+            成功时附带 content、thinking、raw_response，失败时附带 error
+        """
+        if not self.service:
+            raise RuntimeError("AI服务未初始化")
+        tasks = [self._generate_one(index, prompt, **kwargs) for index, prompt in enumerate(prompts)]
+        return list(await asyncio.gather(*tasks))
 
     def get_available_providers(self) -> List[str]:
         """获取可用的AI提供商列表"""
@@ -656,6 +1526,10 @@ class AIManager:
         """获取当前AI提供商"""
         return self.current_provider
 
+    def get_current_model(self) -> Optional[str]:
+        """获取当前提供商配置的模型"""
+        return self.provider_configs.get(self.current_provider, {}).get("model")
+
     async def get_ollama_models(self) -> List[Dict[str, Any]]:
         """获取Ollama本地可用模型列表"""
         try:
@@ -0,0 +1,491 @@
+"""
+整卷一致性检查
+map-reduce 流程：各章节（超长时再分段）对照精简设定表并行提取事实断言，
+合并去重后按规则找出相互矛盾的断言，只把冲突交给最后一次AI判断。
+章节的提取结果按内容哈希缓存，重新检查时只处理修改过的章节。
+"""
+from typing import Dict, List, Optional, Any, Tuple
+import hashlib
+import json
+import logging
+import re
+
+from sqlalchemy.orm import Session
+
+from ..core.config import AI_CONSISTENCY_CONFIG
+from ..models.chapter import Chapter
+from ..models.character import Character
+from ..models.cultivation_system import CultivationSystem
+from ..models.timeline import Timeline
+from .ai_cache import AIResponseCache, MemoryCacheTier, SQLiteCacheTier
+from .ai_service import ai_manager
+from .context_retrieval import split_text
+from .prompt_builder import PromptBuilder, estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# 提取结果格式变化时递增，使旧缓存失效
+EXTRACTION_VERSION = "v1"
+
+# 断言属性的同义词归一
+ATTRIBUTE_ALIASES = {
+    "境界": "修为", "修炼等级": "修为", "等级": "修为", "实力": "修为", "修为境界": "修为",
+    "生死": "状态", "存活状态": "状态", "生存状态": "状态",
+    "位置": "所在地", "地点": "所在地", "当前位置": "所在地",
+    "门派": "所属势力", "宗门": "所属势力", "势力": "所属势力",
+    "师父": "师承", "师傅": "师承",
+}
+# 经常变化、不参与矛盾判断的属性
+VOLATILE_ATTRIBUTES = {"所在地", "出场", "物品", "事件"}
+DEATH_VALUES = {"死亡", "已死", "陨落", "身亡", "战死", "死"}
+VALUE_ALIASES = {"男性": "男", "女性": "女"}
+GENDER_LABELS = {"male": "男", "female": "女", "other": "其他"}
+STATUS_LABELS = {"alive": "存活", "dead": "死亡", "missing": "失踪"}
+
+EXTRACTION_TEMPLATE = """你是小说设定审校助手。请阅读下面的章节片段，提取其中关于人物的事实断言，用于跨章节一致性检查。
+
+只输出JSON数组，不要输出其他内容。每个元素格式为：
+{{"subject": "人物名", "attribute": "属性", "value": "取值", "evidence": "原文依据（不超过30字）"}}
+属性尽量使用：修为、状态、所在地、年龄、性别、身份、所属势力、师承、血脉、种族、出场。
+人物名使用设定表中的正式名称；章节中出现的每个人物都输出一条 "出场" 断言，取值为 "是"。
+
+{fact_sheet}
+
+【第{chapter_number}章 {title}】
+"""
+
+REVIEW_TEMPLATE = """你是小说设定审校助手。以下是从多个章节提取的、彼此可能矛盾的事实断言，请判断哪些是真正的设定矛盾。
+
+只输出JSON数组，不要输出其他内容。每个元素格式为：
+{{"subject": "人物名", "attribute": "属性", "chapters": [章节序号], "severity": "high/medium/low",
+"description": "矛盾说明", "suggestion": "修改建议"}}
+剧情上合理的变化（如修为提升、身份转变有交代）不算矛盾。
+
+{fact_sheet}
+
+【待判断的冲突】
+"""
+
+
+def content_hash(text: str) -> str:
+    """章节内容哈希"""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def extract_json_array(text: str) -> Optional[List[Any]]:
+    """从模型输出中提取JSON数组（容忍前后多余文字与代码块标记）"""
+    if not text:
+        return None
+    text = re.sub(r"```(?:json)?", "", text).strip()
+    try:
+        value = json.loads(text)
+        return value if isinstance(value, list) else [value] if isinstance(value, dict) else None
+    except json.JSONDecodeError:
+        pass
+    start, end = text.find("["), text.rfind("]")
+    if start >= 0 and end > start:
+        try:
+            value = json.loads(text[start:end + 1])
+            return value if isinstance(value, list) else None
+        except json.JSONDecodeError:
+            return None
+    return None
+
+
+def _level_name(level: Any) -> Optional[str]:
+    if isinstance(level, dict):
+        return level.get("name")
+    return level if isinstance(level, str) else None
+
+
+def load_consistency_material(
+    session: Session,
+    project_id: int,
+    volume_id: Optional[int] = None,
+    chapter_ids: Optional[List[int]] = None
+) -> Dict[str, Any]:
+    """读取检查所需的设定与章节，返回与会话无关的普通数据"""
+    characters = session.query(Character).filter(
+        Character.project_id == project_id, Character.is_deleted == False
+    ).all()
+    systems = session.query(CultivationSystem).filter(
+        CultivationSystem.project_id == project_id, CultivationSystem.is_deleted == False
+    ).all()
+    timelines = session.query(Timeline).filter(
+        Timeline.project_id == project_id, Timeline.is_deleted == False
+    ).all()
+
+    query = session.query(Chapter).filter(Chapter.project_id == project_id, Chapter.is_deleted == False)
+    if volume_id is not None:
+        query = query.filter(Chapter.volume_id == volume_id)
+    if chapter_ids:
+        query = query.filter(Chapter.id.in_(chapter_ids))
+    chapters = query.order_by(Chapter.chapter_number, Chapter.id).all()
+
+    project_data = {"characters": [{"id": character.id} for character in characters]}
+    return {
+        "fact_sheet": {
+            "characters": [
+                {
+                    "name": character.name,
+                    "aliases": [alias for alias in (character.full_name, character.nickname, character.title) if alias],
+                    "gender": GENDER_LABELS.get(character.gender.value) if character.gender else None,
+                    "age": character.age,
+                    "race": character.race,
+                    "bloodline": character.bloodline,
+                    "cultivation_level": character.cultivation_level,
+                    "status": STATUS_LABELS.get(character.status.value) if character.status else None,
+                }
+                for character in characters
+            ],
+            "cultivation_levels": {
+                system.name: [name for name in map(_level_name, system.levels or []) if name]
+                for system in systems
+            },
+            "timeline": [
+                {"time": event.get("time"), "name": event.get("name")}
+                for timeline in timelines for event in (timeline.events or [])
+            ],
+        },
+        "chapters": [
+            {
+                "id": chapter.id,
+                "chapter_number": chapter.chapter_number,
+                "title": chapter.title or chapter.name,
+                "content": chapter.content or "",
+                "structural_issues": chapter.check_consistency(project_data),
+            }
+            for chapter in chapters
+        ],
+    }
+
+
+def render_fact_sheet(fact_sheet: Dict[str, Any], max_tokens: int, provider: Optional[str] = None) -> str:
+    """将设定整理为紧凑的文本，超出预算时截断（时间线排在最后，最先被截掉）"""
+    lines = ["【设定表】"]
+    for character in fact_sheet.get("characters", []):
+        fields = [
+            f"别名:{'/'.join(character['aliases'])}" if character.get("aliases") else None,
+            f"性别:{character['gender']}" if character.get("gender") else None,
+            f"年龄:{character['age']}" if character.get("age") else None,
+            f"种族:{character['race']}" if character.get("race") else None,
+            f"血脉:{character['bloodline']}" if character.get("bloodline") else None,
+            f"修为:{character['cultivation_level']}" if character.get("cultivation_level") else None,
+            f"状态:{character['status']}" if character.get("status") else None,
+        ]
+        lines.append(f"人物 {character['name']}：" + "，".join(field for field in fields if field))
+    for system_name, levels in fact_sheet.get("cultivation_levels", {}).items():
+        if levels:
+            lines.append(f"修炼体系 {system_name}（由低到高）：" + " < ".join(levels))
+    for event in fact_sheet.get("timeline", []):
+        lines.append(f"时间线 {event.get('time')}：{event.get('name')}")
+    return truncate_to_tokens("\n".join(lines), max_tokens, provider)
+
+
+class ClaimMerger:
+    """
+    断言合并
+
+    人物名按设定表的别名归一，属性按同义词归一，同一断言只保留一次（记录出现的章节）。
+    冲突规则：
+    - 固定属性（性别、血脉、师承等）出现不同取值，或与设定表不一致
+    - 修为按修炼体系等级排序，后面章节的等级低于前面章节
+    - 年龄在后面章节变小
+    - 人物在某章死亡后又在后续章节出场
+    """
+
+    def __init__(self, fact_sheet: Dict[str, Any]):
+        self.fact_sheet = fact_sheet
+        self.aliases: Dict[str, str] = {}
+        self.settings: Dict[Tuple[str, str], str] = {}
+        for character in fact_sheet.get("characters", []):
+            name = character["name"]
+            self.aliases[name] = name
+            for alias in character.get("aliases", []):
+                self.aliases.setdefault(alias, name)
+            for attribute, field in (("性别", "gender"), ("种族", "race"), ("血脉", "bloodline")):
+                if character.get(field):
+                    self.settings[(name, attribute)] = str(character[field])
+        self.level_order: Dict[str, int] = {}
+        for levels in fact_sheet.get("cultivation_levels", {}).values():
+            for order, level in enumerate(levels):
+                self.level_order.setdefault(level, order)
+
+    def normalize(self, claim: Dict[str, Any]) -> Optional[Tuple[str, str, str]]:
+        subject = str(claim.get("subject") or "").strip()
+        attribute = str(claim.get("attribute") or "").strip()
+        value = str(claim.get("value") or "").strip()
+        if not subject or not attribute or not value:
+            return None
+        return (
+            self.aliases.get(subject, subject),
+            ATTRIBUTE_ALIASES.get(attribute, attribute),
+            VALUE_ALIASES.get(value, value)
+        )
+
+    def merge(self, chapter_claims: List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]) -> Dict[Tuple[str, str], Dict[str, Dict[str, Any]]]:
+        """合并各章节断言：(人物, 属性) -> 取值 -> {chapters, evidence}"""
+        merged: Dict[Tuple[str, str], Dict[str, Dict[str, Any]]] = {}
+        for chapter, claims in chapter_claims:
+            for claim in claims:
+                normalized = self.normalize(claim)
+                if normalized is None:
+                    continue
+                subject, attribute, value = normalized
+                entry = merged.setdefault((subject, attribute), {}).setdefault(
+                    value, {"chapters": [], "evidence": claim.get("evidence")}
+                )
+                if chapter["chapter_number"] not in entry["chapters"]:
+                    entry["chapters"].append(chapter["chapter_number"])
+        return merged
+
+    @staticmethod
+    def _first_chapter(entry: Dict[str, Any]) -> int:
+        return min((number for number in entry["chapters"] if number is not None), default=0)
+
+    def find_conflicts(self, merged: Dict[Tuple[str, str], Dict[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """按规则找出可能矛盾的断言组"""
+        conflicts = []
+
+        def add(subject, attribute, rule, values):
+            conflicts.append({
+                "subject": subject,
+                "attribute": attribute,
+                "rule": rule,
+                "values": [
+                    {"value": value, "chapters": sorted(entry["chapters"], key=lambda n: n or 0),
+                     "evidence": entry.get("evidence")}
+                    for value, entry in values.items()
+                ]
+            })
+
+        for (subject, attribute), values in merged.items():
+            if attribute in VOLATILE_ATTRIBUTES:
+                continue
+            if attribute == "修为":
+                ranked = [
+                    (self._first_chapter(entry), self.level_order[value], value)
+                    for value, entry in values.items() if value in self.level_order
+                ]
+                ranked.sort()
+                if any(later[1] < earlier[1] for earlier, later in zip(ranked, ranked[1:])):
+                    add(subject, attribute, "修为倒退", values)
+                continue
+            if attribute == "年龄":
+                ages = []
+                for value, entry in values.items():
+                    match = re.search(r"\d+", value)
+                    if match:
+                        ages.append((self._first_chapter(entry), int(match.group())))
+                ages.sort()
+                if any(later[1] < earlier[1] for earlier, later in zip(ages, ages[1:])):
+                    add(subject, attribute, "年龄倒退", values)
+                continue
+            if attribute == "状态":
+                death_chapters = [
+                    self._first_chapter(entry) for value, entry in values.items() if value in DEATH_VALUES
+                ]
+                appearances = merged.get((subject, "出场"), {})
+                if death_chapters:
+                    died = min(death_chapters)
+                    later = {
+                        value: entry for value, entry in appearances.items()
+                        if any((number or 0) > died for number in entry["chapters"])
+                    }
+                    if later:
+                        add(subject, "状态", "死亡后再次出场", {**values, **{f"出场:{k}": v for k, v in later.items()}})
+                continue
+
+            setting = self.settings.get((subject, attribute))
+            if setting is not None and any(value != setting for value in values):
+                add(subject, attribute, "与设定不符", {**values, setting: {"chapters": [], "evidence": "设定表"}})
+            elif len(values) > 1:
+                add(subject, attribute, "取值不一致", values)
+        return conflicts
+
+
+class VolumeConsistencyChecker:
+    """整卷一致性检查器"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, manager=None, cache: Optional[AIResponseCache] = None):
+        self.config = config or AI_CONSISTENCY_CONFIG
+        self.ai_manager = manager or ai_manager
+        if cache is None:
+            tiers = [MemoryCacheTier(self.config.get("memory_entries", 512))]
+            if self.config.get("cache_path"):
+                tiers.append(SQLiteCacheTier(self.config["cache_path"], self.config.get("cache_entries", 20000)))
+            cache = AIResponseCache(tiers=tiers, config={"enabled": True, "ttl": self.config.get("cache_ttl", 30 * 86400)})
+        self.cache = cache
+
+    def _builder(self, max_output_tokens: int) -> PromptBuilder:
+        return PromptBuilder(
+            self.ai_manager.get_current_provider(),
+            self.ai_manager.get_current_model(),
+            max_output_tokens=max_output_tokens
+        )
+
+    def _cache_key(self, chapter: Dict[str, Any], fact_sheet_text: str) -> str:
+        """
+        章节提取结果的缓存键
+
+        提取提示词嵌入了设定摘要（人物正式名称、别名、境界），设定修改后断言的归一化对象随之变化，
+        因此键同时包含章节内容与设定摘要的哈希
+        """
+        return AIResponseCache.make_key(
+            self.ai_manager.get_current_provider(),
+            self.ai_manager.get_current_model(),
+            f"consistency_claims:{EXTRACTION_VERSION}",
+            content_hash(chapter["content"]),
+            {"fact_sheet": content_hash(fact_sheet_text)}
+        )
+
+    def _map_prompts(self, chapter: Dict[str, Any], fact_sheet_text: str) -> List[str]:
+        """构建章节的提取提示词，章节超出预算时按段落切分为多段"""
+        builder = self._builder(self.config.get("extraction_max_tokens", 1024))
+        provider = builder.provider
+        header = EXTRACTION_TEMPLATE.format(
+            fact_sheet=fact_sheet_text,
+            chapter_number=chapter["chapter_number"],
+            title=chapter["title"]
+        )
+        available = builder.input_budget - estimate_tokens(header, provider)
+        content = chapter["content"]
+        content_tokens = estimate_tokens(content, provider)
+        if content_tokens <= available:
+            return [header + content]
+        if available <= 0:
+            return [header]
+        chars_per_token = len(content) / max(content_tokens, 1)
+        max_chars = max(int(available * chars_per_token * 0.9), 200)
+        return [header + piece for piece in split_text(content, max_chars)]
+
+    async def _extract_claims(self, chapters: List[Dict[str, Any]], fact_sheet_text: str,
+                              use_cache: bool) -> Tuple[List[Tuple[Dict[str, Any], List[Dict[str, Any]]]], Dict[str, Any]]:
+        """map 阶段：读取缓存，未命中的章节（分段）并行提取"""
+        results: Dict[int, List[Dict[str, Any]]] = {}
+        reports: Dict[int, Dict[str, Any]] = {}
+        prompts: List[str] = []
+        owners: List[int] = []
+
+        for position, chapter in enumerate(chapters):
+            reports[position] = {
+                "id": chapter["id"],
+                "chapter_number": chapter["chapter_number"],
+                "title": chapter["title"],
+                "cached": False,
+                "segments": 0,
+                "status": "success"
+            }
+            if not chapter["content"].strip():
+                results[position] = []
+                continue
+            cached = await self.cache.get(self._cache_key(chapter, fact_sheet_text)) if use_cache else None
+            if cached is not None:
+                results[position] = cached
+                reports[position]["cached"] = True
+                continue
+            chapter_prompts = self._map_prompts(chapter, fact_sheet_text)
+            reports[position]["segments"] = len(chapter_prompts)
+            prompts.extend(chapter_prompts)
+            owners.extend([position] * len(chapter_prompts))
+
+        failed = set()
+        if prompts:
+            outputs = await self.ai_manager.generate_many(
+                prompts, temperature=0, use_cache=False,
+                max_tokens=self.config.get("extraction_max_tokens", 1024)
+            )
+            for owner, output in zip(owners, outputs):
+                claims = extract_json_array(output.get("content")) if output["status"] == "success" else None
+                if claims is None:
+                    failed.add(owner)
+                    reports[owner]["status"] = "error"
+                    reports[owner]["error"] = output.get("error") or "提取结果不是有效的JSON"
+                    continue
+                results.setdefault(owner, []).extend(claim for claim in claims if isinstance(claim, dict))
+
+        for position, chapter in enumerate(chapters):
+            claims = results.get(position, [])
+            reports[position]["claims"] = len(claims)
+            if reports[position]["segments"] and position not in failed:
+                await self.cache.set(self._cache_key(chapter, fact_sheet_text), claims)
+
+        stats = {
+            "map_calls": len(prompts),
+            "cache_hits": sum(1 for report in reports.values() if report["cached"]),
+            "failed_chapters": len(failed)
+        }
+        chapter_claims = [(chapters[position], results.get(position, [])) for position in range(len(chapters))]
+        return chapter_claims, {"reports": [reports[position] for position in range(len(chapters))], **stats}
+
+    async def _review_conflicts(self, conflicts: List[Dict[str, Any]], fact_sheet_text: str) -> Tuple[List[Dict[str, Any]], Optional[str], Optional[Dict[str, Any]]]:
+        """reduce 阶段：把冲突交给AI判断，无冲突时不调用"""
+        if not conflicts:
+            return [], None, None
+        lines = []
+        for conflict in conflicts:
+            values = "；".join(
+                f"{item['value']}（"
+                + (f"第{','.join(str(n) for n in item['chapters'])}章" if item["chapters"] else "设定表")
+                + (f"，依据：{item['evidence']}" if item["chapters"] and item.get("evidence") else "") + "）"
+                for item in conflict["values"]
+            )
+            lines.append(f"- {conflict['subject']}.{conflict['attribute']}［{conflict['rule']}］：{values}")
+
+        builder = self._builder(self.config.get("review_max_tokens", 2000))
+        builder.separator = ""
+        builder.add("instruction", REVIEW_TEMPLATE.format(fact_sheet=fact_sheet_text), required=True)
+        builder.add("conflicts", "\n".join(lines), priority=1, min_tokens=64)
+        prompt, usage = builder.build()
+
+        result = await self.ai_manager.generate_text_with_thinking(
+            prompt, temperature=0, max_tokens=self.config.get("review_max_tokens", 2000)
+        )
+        issues = extract_json_array(result["content"])
+        return [issue for issue in issues or [] if isinstance(issue, dict)], result["content"], usage
+
+    async def check(self, material: Dict[str, Any], use_cache: bool = True) -> Dict[str, Any]:
+        """
+        检查一组章节的一致性
+
+        Args:
+            material: load_consistency_material 返回的设定与章节
+            use_cache: 是否复用章节提取缓存
+        """
+        max_chapters = self.config.get("max_chapters", 200)
+        chapters = material["chapters"]
+        if len(chapters) > max_chapters:
+            raise ValueError(f"单次最多检查 {max_chapters} 个章节")
+
+        fact_sheet = material["fact_sheet"]
+        fact_sheet_text = render_fact_sheet(
+            fact_sheet, self.config.get("fact_sheet_tokens", 800), self.ai_manager.get_current_provider()
+        )
+
+        chapter_claims, map_stats = await self._extract_claims(chapters, fact_sheet_text, use_cache)
+        merger = ClaimMerger(fact_sheet)
+        merged = merger.merge(chapter_claims)
+        conflicts = merger.find_conflicts(merged)
+        issues, report, usage = await self._review_conflicts(conflicts, fact_sheet_text)
+
+        return {
+            "issues": issues,
+            "conflicts": conflicts,
+            "report": report,
+            "structural_issues": [
+                {"id": chapter["id"], "chapter_number": chapter["chapter_number"], "issues": chapter["structural_issues"]}
+                for chapter in chapters if chapter.get("structural_issues")
+            ],
+            "chapters": map_stats.pop("reports"),
+            "stats": {
+                "chapters": len(chapters),
+                "claims": sum(len(claims) for _, claims in chapter_claims),
+                "distinct_facts": sum(len(values) for values in merged.values()),
+                "conflicts": len(conflicts),
+                **map_stats
+            },
+            "usage": usage
+        }
+
+
+consistency_checker = VolumeConsistencyChecker()
@@ -0,0 +1,453 @@
+"""
+项目资料检索（RAG）
+将章节、人物、世界设定、时间线切分为片段并向量化，按与请求的相关度在token预算内选取上下文，
+替代用户在提示词中粘贴大段资料
+"""
+from typing import Dict, List, Optional, Any, Tuple
+from collections import OrderedDict
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+from sqlalchemy import event, select, func, literal, union_all
+from sqlalchemy.orm import Session
+
+from ..core.config import RAG_CONFIG
+from ..models.chapter import Chapter
+from ..models.character import Character
+from ..models.world_setting import WorldSetting
+from ..models.timeline import Timeline
+from .search_index import project_search_index, tokenize_text
+from .prompt_builder import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 参与检索的资料类型：模型名称 -> (模型类, 显示名称)
+CONTEXT_SOURCES = {
+    "chapter": (Chapter, "章节"),
+    "character": (Character, "人物"),
+    "world_setting": (WorldSetting, "世界设定"),
+    "timeline": (Timeline, "时间线"),
+}
+
+_PARAGRAPH_PATTERN = re.compile(r"\n\s*\n|\n")
+_SENTENCE_PATTERN = re.compile(r"(?<=[。！？；!?;])")
+_MAX_MEMORY_INDEXES = 16
+_CONTEXT_MODEL_CLASSES = tuple(model_class for model_class, _ in CONTEXT_SOURCES.values())
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """按段落切分文本，相邻短段落合并，超长段落再按句子切分"""
+    pieces: List[str] = []
+    for paragraph in _PARAGRAPH_PATTERN.split(text or ""):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        sentence_buffer = ""
+        for sentence in _SENTENCE_PATTERN.split(paragraph):
+            while len(sentence) > max_chars:
+                if sentence_buffer:
+                    pieces.append(sentence_buffer)
+                    sentence_buffer = ""
+                pieces.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+            if len(sentence_buffer) + len(sentence) > max_chars:
+                pieces.append(sentence_buffer)
+                sentence_buffer = ""
+            sentence_buffer += sentence
+        if sentence_buffer:
+            pieces.append(sentence_buffer)
+
+    chunks: List[str] = []
+    buffer = ""
+    for piece in pieces:
+        if buffer and len(buffer) + len(piece) + 1 > max_chars:
+            chunks.append(buffer)
+            buffer = ""
+        buffer = f"{buffer}\n{piece}" if buffer else piece
+    if buffer:
+        chunks.append(buffer)
+    return chunks
+
+
+class HashingEmbedder:
+    """
+    离线哈希向量化
+
+    文本按全文检索的切分规则（中文单字+双字）得到词项，经 CRC32 哈希到固定维度并带符号累加，
+    词频取对数；索引构建时再乘以按项目统计的 IDF 权重，即哈希 TF-IDF。
+    不依赖模型文件，结果在不同进程间稳定。
+    """
+
+    name = "hashing"
+    uses_idf = True
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts: Dict[int, float] = {}
+            for token in tokenize_text(text).split():
+                hashed = zlib.crc32(token.encode("utf-8"))
+                column = hashed % self.dim
+                sign = 1.0 if hashed & 0x80000000 else -1.0
+                counts[column] = counts.get(column, 0.0) + sign
+            for column, value in counts.items():
+                vectors[row, column] = math.copysign(1.0 + math.log(abs(value)), value) if value else 0.0
+        return vectors
+
+
+class SentenceTransformerEmbedder:
+    """基于 sentence-transformers 本地模型的语义向量化（可选依赖）"""
+
+    uses_idf = False
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.name = f"sentence-transformers:{model_name}"
+        self._model = SentenceTransformer(model_name)
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self._model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+
+def create_embedder(spec: Optional[str] = None, dim: Optional[int] = None):
+    """根据配置创建向量化器，语义模型不可用时退回哈希向量化"""
+    spec = spec or RAG_CONFIG.get("embedder", "hashing")
+    dim = dim or RAG_CONFIG.get("embedding_dim", 1024)
+    if spec.startswith("sentence-transformers:"):
+        try:
+            return SentenceTransformerEmbedder(spec.split(":", 1)[1])
+        except Exception as e:
+            logger.warning(f"加载向量模型 {spec} 失败，改用哈希向量化: {e}")
+    elif spec != "hashing":
+        logger.warning(f"未知的向量化器 {spec}，改用哈希向量化")
+    return HashingEmbedder(dim)
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class ProjectVectorIndex:
+    """单个项目的片段向量索引"""
+
+    def __init__(self, project_id: int, fingerprint: str, embedder_name: str,
+                 chunks: List[Dict[str, Any]], vectors: np.ndarray, idf: Optional[np.ndarray] = None):
+        self.project_id = project_id
+        self.fingerprint = fingerprint
+        self.embedder_name = embedder_name
+        self.chunks = chunks
+        self.vectors = vectors
+        self.idf = idf
+
+    @classmethod
+    def build(cls, project_id: int, fingerprint: str, chunks: List[Dict[str, Any]], embedder) -> "ProjectVectorIndex":
+        """向量化全部片段，哈希向量按片段集合计算 IDF 后归一化"""
+        texts = [chunk["text"] for chunk in chunks]
+        vectors = embedder.embed(texts) if texts else np.zeros((0, embedder.dim), dtype=np.float32)
+        idf = None
+        if embedder.uses_idf:
+            document_frequency = np.count_nonzero(vectors, axis=0)
+            idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+            vectors = vectors * idf
+        return cls(project_id, fingerprint, embedder.name, chunks, _normalize_rows(vectors).astype(np.float32), idf)
+
+    def query_vector(self, query: str, embedder) -> np.ndarray:
+        vector = embedder.embed([query])
+        if self.idf is not None:
+            vector = vector * self.idf
+        return _normalize_rows(vector)[0]
+
+    def search(self, query_vector: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """返回相似度最高的片段序号与余弦相似度"""
+        if not len(self.chunks) or top_k <= 0:
+            return []
+        scores = self.vectors @ query_vector
+        top_k = min(top_k, len(scores))
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        ordered = candidates[np.argsort(-scores[candidates])]
+        return [(int(position), float(scores[position])) for position in ordered]
+
+    def save(self, directory: str):
+        """保存为 .npy 向量文件与 .json 片段元数据，先写临时文件再替换"""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"project_{self.project_id}")
+        with open(f"{base}.npy.tmp", "wb") as file:
+            np.save(file, self.vectors)
+        meta = {
+            "fingerprint": self.fingerprint,
+            "embedder": self.embedder_name,
+            "idf": self.idf.tolist() if self.idf is not None else None,
+            "chunks": self.chunks
+        }
+        with open(f"{base}.json.tmp", "w", encoding="utf-8") as file:
+            json.dump(meta, file, ensure_ascii=False)
+        os.replace(f"{base}.npy.tmp", f"{base}.npy")
+        os.replace(f"{base}.json.tmp", f"{base}.json")
+
+    @classmethod
+    def load(cls, directory: str, project_id: int) -> Optional["ProjectVectorIndex"]:
+        """加载已保存的索引，向量以内存映射方式打开"""
+        base = os.path.join(directory, f"project_{project_id}")
+        if not (os.path.exists(f"{base}.npy") and os.path.exists(f"{base}.json")):
+            return None
+        with open(f"{base}.json", "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        vectors = np.load(f"{base}.npy", mmap_mode="r")
+        idf = np.asarray(meta["idf"], dtype=np.float32) if meta.get("idf") is not None else None
+        return cls(project_id, meta["fingerprint"], meta["embedder"], meta["chunks"], vectors, idf)
+
+
+class ContextRetriever:
+    """
+    项目资料检索器
+
+    - 项目索引按需构建：以各资料表的记录数与最后更新时间作为指纹，指纹变化时重建；
+      本进程内通过ORM提交的修改会立即标记项目待重建，不受更新时间精度（秒）的限制
+    - 索引保存在内存（LRU）与磁盘（内存映射的 .npy），进程重启后无需重新向量化
+    - 选取时按相似度从高到低加入片段，直到达到片段数上限或token预算
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, embedder=None):
+        self.config = config or RAG_CONFIG
+        self.enabled = self.config.get("enabled", True)
+        self.index_dir = self.config.get("index_dir")
+        self._embedder = embedder
+        self._indexes: "OrderedDict[int, ProjectVectorIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stale_projects = set()
+        self.metrics = {"builds": 0, "disk_loads": 0, "queries": 0}
+
+    @property
+    def embedder(self):
+        if self._embedder is None:
+            self._embedder = create_embedder(self.config.get("embedder"), self.config.get("embedding_dim"))
+        return self._embedder
+
+    def _fingerprint(self, session: Session, project_id: int) -> str:
+        """一次 UNION ALL 查询获取各资料表的记录数与最后更新时间"""
+        selects = []
+        for model_name, (model_class, _) in CONTEXT_SOURCES.items():
+            selects.append(
+                select(
+                    literal(model_name).label("model_name"),
+                    func.count().label("count"),
+                    func.max(model_class.updated_at).label("updated_at")
+                ).where(model_class.project_id == project_id, model_class.is_deleted == False)
+            )
+        rows = session.execute(union_all(*selects)).all()
+        parts = sorted(f"{row.model_name}:{row.count}:{row.updated_at}" for row in rows)
+        return f"{self.embedder.name}|" + "|".join(parts)
+
+    def _instance_texts(self, model_name: str, instance: Any) -> Tuple[str, List[str]]:
+        """将一条记录转换为标题与片段文本"""
+        chunk_chars = self.config.get("chunk_chars", 400)
+        if model_name == "chapter":
+            title = f"第{instance.chapter_number}章 {instance.title or ''}".strip() \
+                if instance.chapter_number else (instance.title or instance.name)
+            texts = split_text(instance.content or "", chunk_chars)
+            if instance.summary:
+                texts.insert(0, f"摘要：{instance.summary}")
+            return title, texts
+        if model_name == "timeline":
+            texts = split_text(instance.description or "", chunk_chars)
+            for event in instance.events or []:
+                line = f"{event.get('time', '')} {event.get('name', '')}：{event.get('description', '')}"
+                texts.extend(split_text(line, chunk_chars))
+            return instance.name, texts
+        title, content = project_search_index.extract_document(instance)
+        return title or instance.name, split_text(content, chunk_chars)
+
+    def _collect_chunks(self, session: Session, project_id: int) -> List[Dict[str, Any]]:
+        chunks = []
+        for model_name, (model_class, label) in CONTEXT_SOURCES.items():
+            query = session.query(model_class).filter(
+                model_class.project_id == project_id,
+                model_class.is_deleted == False
+            )
+            for instance in query.yield_per(200):
+                title, texts = self._instance_texts(model_name, instance)
+                for position, text in enumerate(texts):
+                    chunks.append({
+                        "model_name": model_name,
+                        "label": label,
+                        "item_id": instance.id,
+                        "title": title,
+                        "position": position,
+                        "text": text,
+                        "tokens": estimate_tokens(text)
+                    })
+        return chunks
+
+    def get_index(self, session: Session, project_id: int) -> ProjectVectorIndex:
+        """获取项目索引，依次查找内存、磁盘，指纹不一致时重建"""
+        fingerprint = self._fingerprint(session, project_id)
+        with self._lock:
+            stale = project_id in self._stale_projects
+            self._stale_projects.discard(project_id)
+            index = self._indexes.get(project_id)
+            if not stale and index is not None and index.fingerprint == fingerprint:
+                self._indexes.move_to_end(project_id)
+                return index
+
+        index = None
+        if self.index_dir and not stale:
+            try:
+                index = ProjectVectorIndex.load(self.index_dir, project_id)
+            except Exception as e:
+                logger.warning(f"加载项目 {project_id} 向量索引失败: {e}")
+            if index is not None and index.fingerprint == fingerprint:
+                self.metrics["disk_loads"] += 1
+            else:
+                index = None
+
+        if index is None:
+            index = ProjectVectorIndex.build(project_id, fingerprint, self._collect_chunks(session, project_id), self.embedder)
+            self.metrics["builds"] += 1
+            logger.info(f"项目 {project_id} 向量索引已构建，共 {len(index.chunks)} 个片段")
+            if self.index_dir:
+                try:
+                    index.save(self.index_dir)
+                except Exception as e:
+                    logger.warning(f"保存项目 {project_id} 向量索引失败: {e}")
+
+        with self._lock:
+            self._indexes[project_id] = index
+            self._indexes.move_to_end(project_id)
+            while len(self._indexes) > _MAX_MEMORY_INDEXES:
+                self._indexes.popitem(last=False)
+        return index
+
+    def retrieve(
+        self,
+        session: Session,
+        project_id: int,
+        query: str,
+        top_k: Optional[int] = None,
+        token_budget: Optional[int] = None,
+        source_types: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """检索与查询最相关的片段，结果不超过片段数上限与token预算"""
+        top_k = top_k or self.config.get("top_k", 8)
+        token_budget = token_budget if token_budget is not None else self.config.get("token_budget", 1500)
+        min_score = self.config.get("min_score", 0.0)
+
+        index = self.get_index(session, project_id)
+        self.metrics["queries"] += 1
+        # 多取一些候选，以便跳过超出预算或类型不符的片段
+        candidates = index.search(index.query_vector(query, self.embedder), top_k * 4)
+
+        selected = []
+        used_tokens = 0
+        for position, score in candidates:
+            if score < min_score or len(selected) >= top_k:
+                break
+            chunk = index.chunks[position]
+            if source_types and chunk["model_name"] not in source_types:
+                continue
+            if used_tokens + chunk["tokens"] > token_budget:
+                continue
+            selected.append({**chunk, "score": round(score, 4)})
+            used_tokens += chunk["tokens"]
+        return selected
+
+    @staticmethod
+    def format_context(chunks: List[Dict[str, Any]]) -> str:
+        """将片段整理为提示词中的资料段落，同一记录的片段按原文顺序合并"""
+        grouped: "OrderedDict[Tuple[str, int], List[Dict[str, Any]]]" = OrderedDict()
+        for chunk in chunks:
+            grouped.setdefault((chunk["model_name"], chunk["item_id"]), []).append(chunk)
+        sections = []
+        for items in grouped.values():
+            items.sort(key=lambda item: item["position"])
+            header = f"【{items[0]['label']}】{items[0]['title']}"
+            sections.append(header + "\n" + "\n".join(item["text"] for item in items))
+        return "\n\n".join(sections)
+
+    def build_context(self, session: Session, project_id: int, query: str, **kwargs) -> Dict[str, Any]:
+        """检索并整理上下文，返回资料文本、选中的片段信息和估算的token数"""
+        chunks = self.retrieve(session, project_id, query, **kwargs)
+        return {
+            "text": self.format_context(chunks),
+            "tokens": sum(chunk["tokens"] for chunk in chunks),
+            "chunks": [
+                {
+                    "model_name": chunk["model_name"],
+                    "id": chunk["item_id"],
+                    "title": chunk["title"],
+                    "score": chunk["score"],
+                    "tokens": chunk["tokens"]
+                }
+                for chunk in chunks
+            ]
+        }
+
+    async def build_project_context(self, project_id: int, query: str, **kwargs) -> Dict[str, Any]:
+        """在线程池中使用独立会话构建上下文，向量化与查询不阻塞事件循环"""
+        from ..core.database import SessionLocal
+
+        def run():
+            with SessionLocal() as session:
+                return self.build_context(session, project_id, query, **kwargs)
+
+        return await asyncio.to_thread(run)
+
+    def invalidate(self, project_id: Optional[int] = None):
+        """标记项目索引待重建（不指定项目时丢弃全部内存索引）"""
+        with self._lock:
+            if project_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(project_id, None)
+                self._stale_projects.add(project_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取检索器统计信息"""
+        with self._lock:
+            loaded = {project_id: len(index.chunks) for project_id, index in self._indexes.items()}
+        return {
+            "enabled": self.enabled,
+            "embedder": self.embedder.name,
+            "index_dir": self.index_dir,
+            "loaded_indexes": loaded,
+            **self.metrics
+        }
+
+
+context_retriever = ContextRetriever()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_projects(session: Session, flush_context):
+    """记录本次事务中修改过资料的项目"""
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, _CONTEXT_MODEL_CLASSES) and instance.project_id is not None:
+            session.info.setdefault("context_changed_projects", set()).add(instance.project_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_projects(session: Session):
+    """事务提交后再标记索引待重建，避免重建时读到未提交的数据"""
+    for project_id in session.info.pop("context_changed_projects", ()):
+        context_retriever.invalidate(project_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_projects(session: Session):
+    session.info.pop("context_changed_projects", None)
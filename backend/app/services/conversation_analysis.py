@@ -0,0 +1,75 @@
+"""
+对话输入分析
+实体、意图情感、设定信息三路提取的输出模型与提示词要求
+"""
+from typing import Dict, List, Any
+
+from pydantic import BaseModel, Field, field_validator
+
+USER_INTENTS = ("provide_info", "ask_question", "confirm", "modify", "continue_conversation")
+SENTIMENTS = ("positive", "neutral", "negative")
+
+
+class ExtractedEntity(BaseModel):
+    """输入中提到的实体或概念"""
+    name: str
+    type: str = "concept"  # character / location / faction / item / concept
+    description: str = ""
+
+
+class EntityExtraction(BaseModel):
+    """实体提取结果"""
+    entities: List[ExtractedEntity] = Field(default_factory=list)
+
+    @field_validator("entities", mode="before")
+    @classmethod
+    def _accept_names(cls, value: Any) -> Any:
+        # 部分模型只返回名称列表
+        if isinstance(value, list):
+            return [{"name": item} if isinstance(item, str) else item for item in value]
+        return value
+
+
+class IntentSentiment(BaseModel):
+    """意图与情感分析结果"""
+    user_intent: str = "continue_conversation"
+    sentiment: str = "neutral"
+    confidence: float = Field(0.5, ge=0.0, le=1.0)
+
+    @field_validator("user_intent")
+    @classmethod
+    def _normalize_intent(cls, value: str) -> str:
+        value = (value or "").strip().lower()
+        return value if value in USER_INTENTS else "continue_conversation"
+
+    @field_validator("sentiment")
+    @classmethod
+    def _normalize_sentiment(cls, value: str) -> str:
+        value = (value or "").strip().lower()
+        return value if value in SENTIMENTS else "neutral"
+
+
+class SettingsExtraction(BaseModel):
+    """设定信息提取结果"""
+    settings: Dict[str, Any] = Field(default_factory=dict)
+    preferences: Dict[str, Any] = Field(default_factory=dict)
+
+
+ENTITY_REQUIREMENTS = """请列出用户输入中提到的人物、地点、势力、物品和概念。
+只返回JSON对象，格式：
+{"entities": [{"name": "名称", "type": "character|location|faction|item|concept", "description": "一句话说明"}]}
+没有实体时返回 {"entities": []}。"""
+
+SENTIMENT_REQUIREMENTS = """请判断用户本轮输入的意图与情感倾向。
+user_intent 取值：provide_info（提供设定）、ask_question（提问）、confirm（确认）、modify（修改已有设定）、continue_conversation（其他）。
+sentiment 取值：positive、neutral、negative；confidence 为0到1之间的数字。
+只返回JSON对象，格式：
+{"user_intent": "provide_info", "sentiment": "neutral", "confidence": 0.8}"""
+
+SETTINGS_REQUIREMENTS = """请提取用户确定的具体设定与创作偏好。
+当前阶段需要收集的字段：{fields}
+settings 使用上述字段名作为键（用户未提及的字段不要输出），其他设定可使用简短的英文键名；
+涉及具体人物时，另在 settings.characters 中给出人物列表（每项至少包含 name）；
+preferences 记录写作风格、篇幅、节奏等创作偏好。
+只返回JSON对象，格式：
+{{"settings": {{"字段名": "取值"}}, "preferences": {{"偏好": "取值"}}}}"""
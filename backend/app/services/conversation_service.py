@@ -2,15 +2,27 @@
 智能对话引擎服务
 实现AI助手与用户的智能对话，引导用户完成项目创建和设定管理
 """
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Type, Callable
 from sqlalchemy.orm import Session
 from enum import Enum
+import asyncio
+import copy
 import logging
 import json
 from datetime import datetime
 
 from .ai_project_service import AIProjectService
 from .ai_service import ai_manager
+from .prompt_builder import PromptBuilder
+from .conversation_store import ConversationSessionStore, conversation_store
+from .conversation_summarizer import ConversationSummarizer, render_history
+from .conversation_analysis import (
+    EntityExtraction, IntentSentiment, SettingsExtraction,
+    ENTITY_REQUIREMENTS, SENTIMENT_REQUIREMENTS, SETTINGS_REQUIREMENTS
+)
+from .structured_output import SchemaT
+from .task_queue import BackgroundTaskQueue, background_tasks
+from ..core.config import CONVERSATION_STORE_CONFIG, CONVERSATION_ANALYSIS_CONFIG
 from ..models.project import Project
 
 logger = logging.getLogger(__name__)
@@ -31,6 +43,40 @@ class ConversationStage(Enum):
     COMPLETED = "completed"                 # 完成
 
 
+# 各阶段进入下一阶段前需要收集的字段（完成70%即可进入下一阶段）
+STAGE_REQUIRED_FIELDS = {
+    ConversationStage.THEME_SETTING: ["project_type", "theme"],
+    ConversationStage.WORLD_BUILDING: ["world_type", "setting"],
+    ConversationStage.SYSTEM_DESIGN: ["political_system", "currency_system"],
+    ConversationStage.CHARACTER_CREATION: ["main_character", "supporting_characters"],
+    ConversationStage.STRUCTURE_DESIGN: ["volume_structure", "chapter_plan"]
+}
+
+
+def persist_stage_data(project_id: int, stage: str, stage_data: Dict[str, Any],
+                       session_factory: Optional[Callable[[], Session]] = None):
+    """在独立的数据库会话中把阶段数据写入项目（由后台任务队列执行，请求的会话此时可能已关闭）"""
+    if session_factory is None:
+        from ..core.database import SessionLocal
+        session_factory = SessionLocal
+
+    db = session_factory()
+    try:
+        service = AIProjectService(db)
+        if not service.set_current_project(project_id):
+            return
+
+        # 根据阶段类型保存到相应的数据模型
+        if stage == ConversationStage.WORLD_BUILDING.value:
+            service.write_project_data("world_setting", stage_data)
+        elif stage == ConversationStage.CHARACTER_CREATION.value:
+            for char_data in stage_data.get("characters", []):
+                service.write_project_data("character", char_data)
+        # 添加更多阶段的数据保存逻辑
+    finally:
+        db.close()
+
+
 class ConversationContext:
     """对话上下文"""
 
@@ -42,16 +88,84 @@ class ConversationContext:
         self.conversation_history: List[Dict[str, Any]] = []
         self.current_questions: List[str] = []
         self.pending_confirmations: List[Dict[str, Any]] = []
+        self.last_usage: Optional[Dict[str, Any]] = None  # 最近一次AI调用的token估算
+        self.summary: str = ""  # 较早对话记录的滚动摘要
+        self.summarized_entries: int = 0  # 已压缩进摘要的记录条数
+        self.history_offset: int = 0  # conversation_history[0] 在整个对话中的序号（已压缩或截断移除的记录数）
+
+    def add_history(self, entry: Dict[str, Any], max_history: Optional[int] = None, trim: bool = True):
+        """
+        追加对话记录，超过上限时丢弃最早的记录
+
+        后台压缩进行中时应传入 trim=False：被截断的记录尚未进入摘要，压缩完成后记录数会随之减少
+        """
+        self.conversation_history.append(entry)
+        max_history = max_history or CONVERSATION_STORE_CONFIG.get("max_history", 50)
+        if trim and len(self.conversation_history) > max_history:
+            removed = len(self.conversation_history) - max_history
+            del self.conversation_history[:removed]
+            self.history_offset += removed
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化为字典，省略空字段"""
+        data = {
+            "stage": self.stage.value,
+            "project_id": self.project_id,
+            "user_preferences": self.user_preferences,
+            "collected_data": self.collected_data,
+            "conversation_history": self.conversation_history,
+            "current_questions": self.current_questions,
+            "pending_confirmations": self.pending_confirmations,
+            "last_usage": self.last_usage,
+            "summary": self.summary,
+            "summarized_entries": self.summarized_entries,
+            "history_offset": self.history_offset,
+        }
+        return {key: value for key, value in data.items() if value not in (None, {}, [], "", 0)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ConversationContext":
+        """从字典还原对话上下文"""
+        context = cls()
+        context.stage = ConversationStage(data.get("stage", ConversationStage.INIT.value))
+        context.project_id = data.get("project_id")
+        context.user_preferences = data.get("user_preferences", {})
+        context.collected_data = data.get("collected_data", {})
+        context.conversation_history = data.get("conversation_history", [])
+        context.current_questions = data.get("current_questions", [])
+        context.pending_confirmations = data.get("pending_confirmations", [])
+        context.last_usage = data.get("last_usage")
+        context.summary = data.get("summary", "")
+        context.summarized_entries = data.get("summarized_entries", 0)
+        context.history_offset = data.get("history_offset", context.summarized_entries)
+        return context
 
 
 class ConversationService:
     """智能对话引擎服务类"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, store: Optional[ConversationSessionStore] = None,
+                 summarizer: Optional[ConversationSummarizer] = None,
+                 task_queue: Optional[BackgroundTaskQueue] = None,
+                 session_factory: Optional[Callable[[], Session]] = None):
         self.db = db
         self.ai_project_service = AIProjectService(db)
         self.ai_manager = ai_manager
-        self.contexts: Dict[str, ConversationContext] = {}  # 用户会话上下文
+        # 用户会话上下文存储（全局共享，跨请求与工作进程）
+        self.store = store or conversation_store
+        if summarizer is None:
+            summarizer = conversation_summarizer if self.store is conversation_store \
+                else ConversationSummarizer(self.store, self.ai_manager)
+        self.summarizer = summarizer
+        # 阶段数据落库在后台执行，使用独立的数据库会话
+        self.task_queue = task_queue or background_tasks
+        self.session_factory = session_factory
+
+    def _get_context(self, user_id: str) -> Optional[ConversationContext]:
+        return self.store.get(user_id, ConversationContext.from_dict)
+
+    def _save_context(self, user_id: str, context: ConversationContext):
+        self.store.save(user_id, context, context.to_dict())
 
     def start_conversation(self, user_id: str, project_id: Optional[int] = None) -> Dict[str, Any]:
         """开始智能对话"""
@@ -67,10 +181,10 @@ class ConversationService:
             # 新项目创建流程
             context.stage = ConversationStage.THEME_SETTING
 
-        self.contexts[user_id] = context
-
         # 生成初始问题
         initial_response = self._generate_stage_questions(context)
+        context.current_questions = initial_response["questions"]
+        self._save_context(user_id, context)
 
         return {
             "session_id": user_id,
@@ -82,19 +196,21 @@ class ConversationService:
 
     async def process_user_input(self, user_id: str, user_input: str, additional_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """处理用户输入"""
-        if user_id not in self.contexts:
+        context = self._get_context(user_id)
+        if context is None:
             raise ValueError("对话会话不存在，请先开始对话")
+        if context.project_id:
+            self.ai_project_service.set_current_project(context.project_id)
 
-        context = self.contexts[user_id]
-
-        # 记录用户输入
-        context.conversation_history.append({
+        # 记录用户输入（后台压缩进行中时暂不截断，避免丢弃尚未压缩的记录）
+        trim = not self.summarizer.is_pending(user_id)
+        context.add_history({
             "timestamp": datetime.now().isoformat(),
             "type": "user_input",
             "stage": context.stage.value,
             "content": user_input,
             "additional_data": additional_data
-        })
+        }, trim=trim)
 
         # 分析用户输入
         analysis_result = await self._analyze_user_input(context, user_input, additional_data)
@@ -102,12 +218,14 @@ class ConversationService:
         # 更新收集的数据
         if analysis_result.get("extracted_data"):
             self._update_collected_data(context, analysis_result["extracted_data"])
+        if analysis_result.get("preferences"):
+            context.user_preferences.update(analysis_result["preferences"])
 
         # 检查是否可以进入下一阶段
         stage_completion = self._check_stage_completion(context)
 
         if stage_completion["is_complete"]:
-            # 保存当前阶段的数据
+            # 保存当前阶段的数据（交给后台任务队列，不阻塞本次响应）
             self._save_stage_data(context)
 
             # 进入下一阶段
@@ -123,12 +241,16 @@ class ConversationService:
             response = self._continue_current_stage(context, analysis_result)
 
         # 记录AI响应
-        context.conversation_history.append({
+        context.add_history({
             "timestamp": datetime.now().isoformat(),
             "type": "ai_response",
             "stage": context.stage.value,
             "content": response
-        })
+        }, trim=trim)
+        context.current_questions = response.get("questions", [])
+        self._save_context(user_id, context)
+        # 对话记录过长时在后台压缩为摘要
+        self.summarizer.schedule(user_id, context)
 
         return {
             "session_id": user_id,
@@ -137,55 +259,93 @@ class ConversationService:
             "questions": response.get("questions", []),
             "options": response.get("options", []),
             "progress": self._calculate_progress(context),
-            "collected_data": context.collected_data
+            "collected_data": context.collected_data,
+            "usage": context.last_usage
         }
 
     async def _analyze_user_input(self, context: ConversationContext, user_input: str, additional_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
-        """分析用户输入，提取关键信息"""
-        try:
-            # 使用AI服务分析用户输入
-            ai_service = self.ai_manager.get_current_service()
+        """分析用户输入：实体、意图情感、设定信息三路提取并发执行，各路独立校验与降级"""
+        fields = STAGE_REQUIRED_FIELDS.get(context.stage, [])
+        tasks = {
+            "entities": (EntityExtraction, ENTITY_REQUIREMENTS),
+            "sentiment": (IntentSentiment, SENTIMENT_REQUIREMENTS),
+            "settings": (SettingsExtraction, SETTINGS_REQUIREMENTS.format(fields="、".join(fields) or "（无固定字段）")),
+        }
+        prompts, usages = {}, []
+        for name, (_, requirements) in tasks.items():
+            prompts[name], usage = self._build_analysis_prompt(context, user_input, additional_data, requirements)
+            usages.append(usage)
+        # 记录最大的一路提示词用量，并附上总调用数与总token数
+        context.last_usage = {
+            **max(usages, key=lambda usage: usage["prompt_tokens"]),
+            "calls": len(usages),
+            "total_prompt_tokens": sum(usage["prompt_tokens"] for usage in usages)
+        }
 
-            analysis_prompt = f"""
-            分析以下用户输入，提取关键信息：
+        results = await asyncio.gather(*(
+            self._extract(name, schema, prompts[name]) for name, (schema, _) in tasks.items()
+        ))
+        entities, sentiment, settings = results
+        failed = [name for name, result in zip(tasks, results) if result is None]
+        if failed:
+            logger.warning(f"用户输入分析中 {', '.join(failed)} 未得到有效结果，已使用默认值")
 
-            当前对话阶段：{context.stage.value}
-            用户输入：{user_input}
-            附加数据：{json.dumps(additional_data or {}, ensure_ascii=False)}
-
-            请提取以下信息：
-            1. 用户意图
-            2. 关键实体和概念
-            3. 情感倾向
-            4. 创作偏好
-            5. 具体的设定信息
-
-            返回JSON格式的分析结果。
-            """
-
-            analysis_result = await ai_service.generate_text(analysis_prompt)
-
-            # 尝试解析JSON结果
-            try:
-                return json.loads(analysis_result)
-            except json.JSONDecodeError:
-                # 如果解析失败，返回基础分析
-                return {
-                    "user_intent": "continue_conversation",
-                    "extracted_data": {"raw_input": user_input},
-                    "sentiment": "neutral",
-                    "confidence": 0.5
-                }
+        sentiment = sentiment or IntentSentiment(confidence=0.0)
+        return {
+            "user_intent": sentiment.user_intent,
+            "sentiment": sentiment.sentiment,
+            "confidence": sentiment.confidence,
+            "entities": [entity.model_dump() for entity in entities.entities] if entities else [],
+            "extracted_data": settings.settings if settings and settings.settings else {"raw_input": user_input},
+            "preferences": settings.preferences if settings else {},
+            "failed": failed
+        }
 
+    async def _extract(self, name: str, schema: Type[SchemaT], prompt: str) -> Optional[SchemaT]:
+        """执行一路结构化提取，调用失败、超时或重试后仍未通过校验时返回None"""
+        try:
+            return await asyncio.wait_for(
+                self.ai_manager.generate_structured(
+                    prompt, schema, temperature=0, max_tokens=CONVERSATION_ANALYSIS_CONFIG.get("max_tokens", 512)
+                ),
+                timeout=CONVERSATION_ANALYSIS_CONFIG.get("timeout", 30)
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"用户输入分析 {name} 超时")
         except Exception as e:
-            logger.error(f"分析用户输入时出错: {e}")
-            return {
-                "user_intent": "continue_conversation",
-                "extracted_data": {"raw_input": user_input},
-                "sentiment": "neutral",
-                "confidence": 0.0,
-                "error": str(e)
-            }
+            logger.warning(f"用户输入分析 {name} 失败: {e}")
+        return None
+
+    def _build_analysis_prompt(self, context: ConversationContext, user_input: str,
+                               additional_data: Optional[Dict[str, Any]],
+                               requirements: str) -> Tuple[str, Dict[str, Any]]:
+        """按当前模型的上下文窗口组装分析提示词，超长时依次裁剪附加数据、最近对话、摘要和用户输入"""
+        provider = self.ai_manager.get_current_provider()
+        builder = PromptBuilder(
+            provider,
+            self.ai_manager.get_current_model(),
+            max_output_tokens=CONVERSATION_ANALYSIS_CONFIG.get("max_tokens", 512),
+            separator="\n"
+        )
+        builder.add("instruction", f"""
+            分析以下用户输入，提取关键信息：
+
+            当前对话阶段：{context.stage.value}""", required=True)
+        if context.summary:
+            builder.add("summary", f"此前对话摘要：{context.summary}", priority=2, min_tokens=32)
+        # 最近的对话原文（不含本轮输入），较早的部分已压缩进摘要
+        builder.add(
+            "history", f"最近对话：\n{render_history(context.conversation_history[:-1])}"
+            if len(context.conversation_history) > 1 else None,
+            priority=1, keep="tail", min_tokens=32
+        )
+        builder.add("user_input", f"用户输入：{user_input}", priority=3, min_tokens=32)
+        builder.add(
+            "additional_data", f"附加数据：{json.dumps(additional_data or {}, ensure_ascii=False)}",
+            priority=0, min_tokens=16
+        )
+        builder.add("requirements", requirements, required=True)
+        return builder.build()
 
     def _generate_stage_questions(self, context: ConversationContext) -> Dict[str, Any]:
         """根据当前阶段生成问题"""
@@ -254,16 +414,7 @@ class ConversationService:
         """检查当前阶段是否完成"""
         stage_data = context.collected_data.get(context.stage.value, {})
 
-        # 简单的完成度检查（可以根据具体需求优化）
-        required_fields = {
-            ConversationStage.THEME_SETTING: ["project_type", "theme"],
-            ConversationStage.WORLD_BUILDING: ["world_type", "setting"],
-            ConversationStage.SYSTEM_DESIGN: ["political_system", "currency_system"],
-            ConversationStage.CHARACTER_CREATION: ["main_character", "supporting_characters"],
-            ConversationStage.STRUCTURE_DESIGN: ["volume_structure", "chapter_plan"]
-        }
-
-        required = required_fields.get(context.stage, [])
+        required = STAGE_REQUIRED_FIELDS.get(context.stage, [])
         completed_fields = [field for field in required if field in stage_data]
 
         completion_rate = len(completed_fields) / len(required) if required else 1.0
@@ -275,24 +426,16 @@ class ConversationService:
         }
 
     def _save_stage_data(self, context: ConversationContext):
-        """保存当前阶段的数据到项目中"""
+        """把当前阶段的数据提交到后台任务队列写入项目"""
         if not context.project_id:
             return
 
-        try:
-            stage_data = context.collected_data.get(context.stage.value, {})
-
-            # 根据阶段类型保存到相应的数据模型
-            if context.stage == ConversationStage.WORLD_BUILDING:
-                self.ai_project_service.write_project_data("world_setting", stage_data)
-            elif context.stage == ConversationStage.CHARACTER_CREATION:
-                if "characters" in stage_data:
-                    for char_data in stage_data["characters"]:
-                        self.ai_project_service.write_project_data("character", char_data)
-            # 添加更多阶段的数据保存逻辑
-
-        except Exception as e:
-            logger.error(f"保存阶段数据时出错: {e}")
+        stage_data = copy.deepcopy(context.collected_data.get(context.stage.value, {}))
+        self.task_queue.submit(
+            persist_stage_data, context.project_id, context.stage.value, stage_data,
+            session_factory=self.session_factory,
+            description=f"保存项目 {context.project_id} 的 {context.stage.value} 阶段数据"
+        )
 
     def _get_next_stage(self, current_stage: ConversationStage) -> Optional[ConversationStage]:
         """获取下一个对话阶段"""
@@ -339,23 +482,24 @@ class ConversationService:
 
     def get_conversation_summary(self, user_id: str) -> Optional[Dict[str, Any]]:
         """获取对话总结"""
-        if user_id not in self.contexts:
+        context = self._get_context(user_id)
+        if context is None:
             return None
 
-        context = self.contexts[user_id]
-
         return {
             "session_id": user_id,
             "current_stage": context.stage.value,
             "progress": self._calculate_progress(context),
             "collected_data": context.collected_data,
-            "conversation_length": len(context.conversation_history),
+            "conversation_length": len(context.conversation_history) + context.history_offset,
+            "history_summary": context.summary,
             "project_id": context.project_id
         }
 
     def end_conversation(self, user_id: str) -> bool:
         """结束对话"""
-        if user_id in self.contexts:
-            del self.contexts[user_id]
-            return True
-        return False
+        return self.store.delete(user_id)
+
+
+# 全局对话摘要器（与全局会话存储配套，跟踪各会话的后台压缩任务）
+conversation_summarizer = ConversationSummarizer(conversation_store, ai_manager)
@@ -0,0 +1,275 @@
+"""
+对话会话存储
+进程内LRU + SQLite持久层，会话可跨请求、跨进程重启以及多个 uvicorn 工作进程共享
+"""
+from typing import Dict, Optional, Any, Tuple
+from collections import OrderedDict
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from ..core.config import CONVERSATION_STORE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+def encode_session(data: Dict[str, Any]) -> bytes:
+    """紧凑序列化：去掉空白的JSON再压缩"""
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+    return zlib.compress(raw.encode("utf-8"))
+
+
+def decode_session(blob: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class MemorySessionTier:
+    """进程内LRU层，缓存反序列化后的会话对象及其版本号"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[int, Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Tuple[int, Any, float]]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            if entry[2] < time.time():
+                del self._entries[session_id]
+                return None
+            self._entries.move_to_end(session_id)
+            return entry
+
+    def set(self, session_id: str, version: int, value: Any, expires_at: float):
+        with self._lock:
+            self._entries[session_id] = (version, value, expires_at)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._entries.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteSessionTier:
+    """
+    SQLite持久层
+
+    WAL模式下多个工作进程可并发读写；每次保存递增版本号，
+    进程内缓存据此判断是否已被其他进程更新。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversation_sessions ("
+                "session_id TEXT PRIMARY KEY, version INTEGER NOT NULL, data BLOB NOT NULL, "
+                "expires_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_conversation_sessions_expires_at "
+                "ON conversation_sessions (expires_at)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get_version(self, session_id: str) -> Optional[Tuple[int, float]]:
+        """只读取版本号与过期时间（不读取会话数据）"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT version, expires_at FROM conversation_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def get(self, session_id: str) -> Optional[Tuple[int, bytes, float]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT version, data, expires_at FROM conversation_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return (row[0], row[1], row[2]) if row else None
+
+    def set(self, session_id: str, data: bytes, expires_at: float) -> int:
+        """写入会话并返回新的版本号"""
+        with self._lock:
+            conn = self._connect()
+            now = time.time()
+            conn.execute(
+                "INSERT INTO conversation_sessions (session_id, version, data, expires_at, updated_at) "
+                "VALUES (?, 1, ?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET version = version + 1, data = excluded.data, "
+                "expires_at = excluded.expires_at, updated_at = excluded.updated_at",
+                (session_id, data, expires_at, now)
+            )
+            version = conn.execute(
+                "SELECT version FROM conversation_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+            conn.commit()
+        return version
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            conn = self._connect()
+            deleted = conn.execute(
+                "DELETE FROM conversation_sessions WHERE session_id = ?", (session_id,)
+            ).rowcount
+            conn.commit()
+        return deleted > 0
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            conn = self._connect()
+            deleted = conn.execute(
+                "DELETE FROM conversation_sessions WHERE expires_at < ?", (time.time(),)
+            ).rowcount
+            conn.commit()
+        return deleted
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM conversation_sessions").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class ConversationSessionStore:
+    """
+    对话会话存储
+
+    - 会话以字典形式序列化（由调用方提供 to_dict/from_dict），持久层保存压缩后的JSON
+    - 每次保存刷新过期时间（滑动TTL），过期会话在读取时或定期清理时删除
+    - 配置了持久层时，读取先比对持久层版本号：未被其他进程修改则直接使用进程内缓存的对象
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, persistent: Optional[SQLiteSessionTier] = None):
+        self.config = config or CONVERSATION_STORE_CONFIG
+        self.ttl = self.config.get("ttl", 7 * 24 * 3600)
+        self.memory = MemorySessionTier(self.config.get("memory_entries", 1024))
+        if persistent is None and self.config.get("path"):
+            persistent = SQLiteSessionTier(self.config["path"])
+        self.persistent = persistent
+        self._saves = 0
+        self.metrics = {"memory_hits": 0, "persistent_loads": 0, "misses": 0, "saves": 0, "errors": 0}
+
+    def get(self, session_id: str, loader) -> Optional[Any]:
+        """
+        读取会话
+
+        Args:
+            loader: 将字典还原为会话对象的函数
+        """
+        cached = self.memory.get(session_id)
+        if self.persistent is None:
+            if cached is None:
+                self.metrics["misses"] += 1
+                return None
+            self.metrics["memory_hits"] += 1
+            return cached[1]
+
+        try:
+            current = self.persistent.get_version(session_id)
+            if current is None or current[1] < time.time():
+                self.memory.delete(session_id)
+                if current is not None:
+                    self.persistent.delete(session_id)
+                self.metrics["misses"] += 1
+                return None
+            if cached is not None and cached[0] == current[0]:
+                self.metrics["memory_hits"] += 1
+                return cached[1]
+
+            row = self.persistent.get(session_id)
+            if row is None:
+                self.metrics["misses"] += 1
+                return None
+            version, blob, expires_at = row
+            value = loader(decode_session(blob))
+            self.memory.set(session_id, version, value, expires_at)
+            self.metrics["persistent_loads"] += 1
+            return value
+        except Exception as e:
+            self.metrics["errors"] += 1
+            logger.warning(f"读取对话会话 {session_id} 失败: {e}")
+            return cached[1] if cached else None
+
+    def save(self, session_id: str, value: Any, data: Dict[str, Any]):
+        """
+        保存会话
+
+        Args:
+            value: 会话对象（缓存在进程内）
+            data: 会话对象的可序列化字典（写入持久层）
+        """
+        expires_at = time.time() + self.ttl
+        version = 0
+        if self.persistent is not None:
+            try:
+                version = self.persistent.set(session_id, encode_session(data), expires_at)
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logger.warning(f"保存对话会话 {session_id} 失败: {e}")
+        self.memory.set(session_id, version, value, expires_at)
+        self.metrics["saves"] += 1
+
+        self._saves += 1
+        if self.persistent is not None and self._saves % self.config.get("purge_interval", 100) == 0:
+            try:
+                purged = self.persistent.purge_expired()
+                if purged:
+                    logger.info(f"已清理 {purged} 个过期对话会话")
+            except Exception as e:
+                logger.warning(f"清理过期对话会话失败: {e}")
+
+    def delete(self, session_id: str) -> bool:
+        """删除会话"""
+        existed = self.memory.get(session_id) is not None
+        self.memory.delete(session_id)
+        if self.persistent is not None:
+            try:
+                existed = self.persistent.delete(session_id) or existed
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logger.warning(f"删除对话会话 {session_id} 失败: {e}")
+        return existed
+
+    def close(self):
+        if self.persistent is not None:
+            self.persistent.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取会话存储统计"""
+        stats = {"ttl": self.ttl, "memory_sessions": len(self.memory), **self.metrics}
+        if self.persistent is not None:
+            try:
+                stats["persistent_sessions"] = self.persistent.count()
+                stats["path"] = self.persistent.path
+            except Exception as e:
+                stats["persistent_error"] = str(e)
+        return stats
+
+
+conversation_store = ConversationSessionStore()
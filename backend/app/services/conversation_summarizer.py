@@ -0,0 +1,150 @@
+"""
+对话历史滚动摘要
+对话记录超过token阈值时，在后台把较早的记录压缩进会话的累积摘要，
+使每轮提示词大小与会话内存基本保持不变
+"""
+from typing import Dict, List, Optional, Any, Set
+import asyncio
+import logging
+
+from ..core.config import CONVERSATION_STORE_CONFIG, CONVERSATION_SUMMARY_CONFIG
+from .prompt_builder import estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_TEMPLATE = """请将以下小说创作对话压缩为一份简洁的摘要，供后续对话参考。
+保留：用户确定的设定与偏好、已经完成的阶段、尚未解决的问题；省略寒暄和重复内容。
+摘要不超过{max_chars}字，直接输出摘要正文。
+
+【已有摘要】
+{summary}
+
+【新增对话】
+{history}
+"""
+
+
+def render_history_entry(entry: Dict[str, Any]) -> str:
+    """将一条对话记录渲染为单行文本"""
+    content = entry.get("content")
+    if entry.get("type") == "ai_response":
+        message = content.get("message", "") if isinstance(content, dict) else str(content or "")
+        return f"助手：{message}"
+    return f"用户：{content or ''}"
+
+
+def render_history(entries: List[Dict[str, Any]]) -> str:
+    return "\n".join(render_history_entry(entry) for entry in entries)
+
+
+class ConversationSummarizer:
+    """
+    对话摘要器
+
+    - 对话记录的估算token数超过 trigger_tokens，或记录条数接近会话保留上限 max_history 时，
+      保留最近 keep_entries 条原文，其余记录与已有摘要一起交给AI压缩为新摘要；
+      后者保证记录在被截断之前先进入摘要
+    - 压缩在后台任务中执行，不阻塞当前请求；同一会话同时只有一个压缩任务
+    - 压缩期间新增或截断的记录按记录序号（history_offset）与压缩时的快照对齐，不按列表位置比较
+    - AI不可用时退回截断拼接，保证摘要长度有上限
+    """
+
+    def __init__(self, store, manager, config: Optional[Dict[str, Any]] = None, provider: Optional[str] = None):
+        self.store = store
+        self.ai_manager = manager
+        self.config = config or CONVERSATION_SUMMARY_CONFIG
+        self.provider = provider
+        self._pending: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def history_tokens(self, context) -> int:
+        return estimate_tokens(render_history(context.conversation_history), self.provider)
+
+    @property
+    def max_history(self) -> int:
+        return self.config.get("max_history") or CONVERSATION_STORE_CONFIG.get("max_history", 50)
+
+    def needs_summary(self, context) -> bool:
+        if not self.config.get("enabled", True):
+            return False
+        keep = self.config.get("keep_entries", 6)
+        entries = len(context.conversation_history)
+        if entries <= keep:
+            return False
+        # 为压缩期间的新记录留出 keep_entries 条余量
+        return entries >= self.max_history - keep or self.history_tokens(context) > self.config.get("trigger_tokens", 1500)
+
+    def is_pending(self, session_id: str) -> bool:
+        """会话是否有正在进行的压缩任务"""
+        return session_id in self._pending
+
+    def schedule(self, session_id: str, context) -> bool:
+        """需要时在后台启动压缩任务，返回是否已启动"""
+        if session_id in self._pending or not self.needs_summary(context):
+            return False
+        self._pending.add(session_id)
+        task = asyncio.create_task(self._run(session_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, session_id: str):
+        try:
+            await self.summarize(session_id)
+        except Exception as e:
+            logger.error(f"压缩对话 {session_id} 的历史记录失败: {e}")
+        finally:
+            self._pending.discard(session_id)
+
+    async def _compress(self, summary: str, entries: List[Dict[str, Any]]) -> str:
+        max_tokens = self.config.get("summary_max_tokens", 400)
+        history = render_history(entries)
+        try:
+            prompt = SUMMARY_TEMPLATE.format(max_chars=max_tokens, summary=summary or "（无）", history=history)
+            result = await self.ai_manager.generate_text(prompt, temperature=0, max_tokens=max_tokens * 2)
+            if result and result.strip():
+                return truncate_to_tokens(result.strip(), max_tokens, self.provider)
+        except Exception as e:
+            logger.warning(f"AI压缩对话历史失败，改为截断保留: {e}")
+        # 退回方案：保留已有摘要与新增对话的结尾部分
+        combined = f"{summary}\n{history}" if summary else history
+        return truncate_to_tokens(combined, max_tokens, self.provider, keep="tail")
+
+    async def summarize(self, session_id: str) -> bool:
+        """压缩会话中较早的对话记录，返回是否有更新"""
+        from .conversation_service import ConversationContext
+
+        context = self.store.get(session_id, ConversationContext.from_dict)
+        if context is None or not self.needs_summary(context):
+            return False
+
+        keep = self.config.get("keep_entries", 6)
+        start = context.history_offset
+        older = context.conversation_history[:-keep]
+        summary = await self._compress(context.summary, older)
+
+        # 压缩期间会话可能新增或截断了记录，重新读取后按记录序号对齐：
+        # 快照中仍保留在会话里的部分必须与会话一致（会话未被重置、未被其他进程压缩）
+        latest = self.store.get(session_id, ConversationContext.from_dict)
+        if latest is None:
+            return False
+        overlap = older[latest.history_offset - start:]
+        if (
+            latest.summarized_entries != context.summarized_entries
+            or latest.history_offset < start
+            or latest.conversation_history[:len(overlap)] != overlap
+        ):
+            logger.info(f"对话 {session_id} 的历史记录已变化，跳过本次压缩")
+            return False
+        latest.conversation_history = latest.conversation_history[len(overlap):]
+        latest.history_offset += len(overlap)
+        latest.summary = summary
+        latest.summarized_entries += len(older)
+        self.store.save(session_id, latest, latest.to_dict())
+        logger.info(f"对话 {session_id} 已压缩 {len(older)} 条历史记录")
+        return True
+
+    async def wait_idle(self):
+        """等待所有后台压缩任务结束（用于关闭服务与测试）"""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
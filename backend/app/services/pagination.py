@@ -0,0 +1,220 @@
+"""
+游标分页服务
+按 (updated_at, id)、(chapter_number, id) 等排序键做键集分页，游标对客户端不透明；
+总数按需计算并单独缓存，不在每一页都执行COUNT
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+from datetime import datetime
+import base64
+import json
+import time
+
+from sqlalchemy import DateTime, String, event, func, select, tuple_, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
+
+from ..core.config import PAGINATION_CONFIG
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析，或与当前排序方式不匹配"""
+
+
+class KeysetOrder:
+    """
+    键集分页的排序方式
+
+    最后一个排序键必须唯一（通常是主键），保证翻页时不重复、不遗漏；
+    排序键不应为NULL，NULL值的记录无法参与游标比较
+    """
+
+    def __init__(self, *columns, descending: bool = False):
+        self.columns = columns
+        self.descending = descending
+        table = columns[0].table.name
+        direction = "desc" if descending else "asc"
+        self.signature = f"{table}:{','.join(column.key for column in columns)}:{direction}"
+
+    def order_by(self) -> List[Any]:
+        return [column.desc() if self.descending else column.asc() for column in self.columns]
+
+
+def recent_order(model) -> KeysetOrder:
+    """按更新时间倒序，最近修改的记录在前"""
+    return KeysetOrder(model.updated_at, model.id, descending=True)
+
+
+def chapter_order(model) -> KeysetOrder:
+    """按章节序号正序"""
+    return KeysetOrder(model.chapter_number, model.id)
+
+
+def encode_cursor(values: Sequence[Any], signature: str) -> str:
+    """将排序键的取值编码为游标"""
+    payload = {
+        "o": signature,
+        "v": [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    }
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, signature: str) -> List[Any]:
+    """解析游标，返回排序键的取值"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw.decode("utf-8"))
+        values = payload["v"]
+    except (ValueError, TypeError, KeyError, UnicodeDecodeError):
+        raise InvalidCursor("无效的分页游标")
+    if payload.get("o") != signature or not isinstance(values, list):
+        raise InvalidCursor("分页游标与当前排序方式不匹配")
+    return values
+
+
+class Page:
+    """一页查询结果"""
+
+    def __init__(self, items: List[Any], next_cursor: Optional[str] = None, total: Optional[int] = None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.total = total
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+    def headers(self) -> Dict[str, str]:
+        """列表直接作为响应体的端点通过响应头返回分页信息"""
+        headers = {}
+        if self.next_cursor:
+            headers["X-Next-Cursor"] = self.next_cursor
+        if self.total is not None:
+            headers["X-Total-Count"] = str(self.total)
+        return headers
+
+
+class CountCache:
+    """
+    列表总数缓存
+
+    按查询语句与参数缓存COUNT结果；本进程内写入相关表时立即失效，
+    其他进程的写入在 ttl 秒后反映，因此总数是估计值
+    """
+
+    def __init__(self, ttl: float = 30, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Tuple[float, int, frozenset]]" = OrderedDict()
+
+    @staticmethod
+    def _key(query: Select, dialect) -> Tuple:
+        compiled = query.compile(dialect=dialect)
+        params = tuple(sorted((name, repr(value)) for name, value in compiled.params.items()))
+        return str(compiled), params
+
+    async def count(self, db: AsyncSession, query: Select) -> int:
+        """获取查询的总数（命中缓存时不访问数据库）"""
+        key = self._key(query, db.bind.dialect)
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and entry[0] > now:
+            self._entries.move_to_end(key)
+            return entry[1]
+
+        total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+        tables = frozenset(getattr(table, "name", None) for table in query.get_final_froms())
+        self._entries[key] = (now + self.ttl, total, tables)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return total
+
+    def invalidate(self, tables: Optional[Sequence[str]] = None):
+        """清除涉及指定表的缓存，不指定时全部清除"""
+        if tables is None:
+            self._entries.clear()
+            return
+        tables = set(tables)
+        for key in [key for key, entry in self._entries.items() if entry[2] & tables]:
+            del self._entries[key]
+
+
+count_cache = CountCache(PAGINATION_CONFIG["count_ttl"], PAGINATION_CONFIG["count_cache_size"])
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_counts(session, flush_context):
+    """写入后清除相关表的总数缓存"""
+    tables = {
+        obj.__table__.name
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if hasattr(obj, "__table__")
+    }
+    if tables:
+        count_cache.invalidate(tables)
+
+
+def _raw_key(column, dialect_name: str):
+    """
+    取排序键在数据库中的原始值
+
+    SQLite以文本保存时间，服务端默认值与Python写入值的格式不同（是否带微秒），
+    按原始文本比较才能与存储顺序一致
+    """
+    if dialect_name == "sqlite" and isinstance(column.type, DateTime):
+        return type_coerce(column, String())
+    return column
+
+
+def _restore_value(column, value: Any, dialect_name: str) -> Any:
+    if value is not None and dialect_name != "sqlite" and isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    return value
+
+
+async def paginate(
+    db: AsyncSession,
+    query: Select,
+    order: KeysetOrder,
+    limit: int,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+    include_total: bool = False
+) -> Page:
+    """
+    键集分页查询
+
+    query 只选择单个模型，不含排序；cursor 为上一页返回的 next_cursor。
+    翻页期间新插入的记录不会使后续页面重复或遗漏；
+    offset 仅为兼容旧的 skip 参数，与 cursor 同时给出时忽略
+    """
+    dialect_name = db.bind.dialect.name
+    keys = [_raw_key(column, dialect_name) for column in order.columns]
+    labels = [key.label(f"_cursor_{index}") for index, key in enumerate(keys)]
+
+    page_query = query
+    if cursor:
+        values = decode_cursor(cursor, order.signature)
+        if len(values) != len(keys):
+            raise InvalidCursor("分页游标与当前排序方式不匹配")
+        values = [_restore_value(column, value, dialect_name) for column, value in zip(order.columns, values)]
+        position = tuple_(*keys)
+        bound = tuple_(*values)
+        page_query = page_query.where(position < bound if order.descending else position > bound)
+    elif offset:
+        page_query = page_query.offset(offset)
+
+    rows = (await db.execute(
+        page_query.add_columns(*labels).order_by(*order.order_by()).limit(limit + 1)
+    )).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(list(rows[-1][1:]), order.signature)
+
+    total = await count_cache.count(db, query) if include_total else None
+    return Page([row[0] for row in rows], next_cursor, total)
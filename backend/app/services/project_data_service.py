@@ -4,16 +4,51 @@
 """
 from typing import List, Optional, Dict, Any, Type, Union
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc
+from sqlalchemy import and_, or_, desc, select, func, literal, union_all
 from sqlalchemy.inspection import inspect
 import logging
 
 from ..models.base import ProjectBaseModel
 from ..models.project import Project
+from ..models.fictional_calendar import FictionalCalendar
 from ..models import *  # 导入所有模型
+from .search_index import project_search_index
+from .sparse_fields import parse_fields, parse_fields_across, select_fields, serialize
 
 logger = logging.getLogger(__name__)
 
+# 项目相关的所有模型类映射
+PROJECT_MODELS = {
+    'world_setting': WorldSetting,
+    'cultivation_system': CultivationSystem,
+    'character': Character,
+    'faction': Faction,
+    'plot': Plot,
+    'chapter': Chapter,
+    'volume': Volume,
+    'timeline': Timeline,
+    'character_relation': CharacterRelation,
+    'faction_relation': FactionRelation,
+    'event_association': EventAssociation,
+    'political_system': PoliticalSystem,
+    'currency_system': CurrencySystem,
+    'commerce_system': CommerceSystem,
+    'race_system': RaceSystem,
+    'martial_arts_system': MartialArtsSystem,
+    'equipment_system': EquipmentSystem,
+    'pet_system': PetSystem,
+    'map_structure': MapStructure,
+    'dimension_structure': DimensionStructure,
+    'resource_distribution': ResourceDistribution,
+    'race_distribution': RaceDistribution,
+    'secret_realm_distribution': SecretRealmDistribution,
+    'spiritual_treasure_system': SpiritualTreasureSystem,
+    'civilian_system': CivilianSystem,
+    'judicial_system': JudicialSystem,
+    'profession_system': ProfessionSystem
+}
+
+
 
 class ProjectDataService:
     """项目数据管理服务类"""
@@ -21,38 +56,83 @@ class ProjectDataService:
     def __init__(self, db: Session):
         self.db = db
         # 项目相关的所有模型类映射
-        self.project_models = {
-            'world_setting': WorldSetting,
-            'cultivation_system': CultivationSystem,
-            'character': Character,
-            'faction': Faction,
-            'plot': Plot,
-            'chapter': Chapter,
-            'volume': Volume,
-            'timeline': Timeline,
-            'character_relation': CharacterRelation,
-            'faction_relation': FactionRelation,
-            'event_association': EventAssociation,
-            'political_system': PoliticalSystem,
-            'currency_system': CurrencySystem,
-            'commerce_system': CommerceSystem,
-            'race_system': RaceSystem,
-            'martial_arts_system': MartialArtsSystem,
-            'equipment_system': EquipmentSystem,
-            'pet_system': PetSystem,
-            'map_structure': MapStructure,
-            'dimension_structure': DimensionStructure,
-            'resource_distribution': ResourceDistribution,
-            'race_distribution': RaceDistribution,
-            'secret_realm_distribution': SecretRealmDistribution,
-            'spiritual_treasure_system': SpiritualTreasureSystem,
-            'civilian_system': CivilianSystem,
-            'judicial_system': JudicialSystem,
-            'profession_system': ProfessionSystem
-        }
+        self.project_models = PROJECT_MODELS
+
+    def _project_calendar(self, project_id: int, project: Optional[Project] = None) -> FictionalCalendar:
+        """获取项目设置中的架空历法"""
+        if project is None:
+            settings = self.db.query(Project.settings).filter(Project.id == project_id).scalar()
+            return FictionalCalendar.from_settings((settings or {}).get("calendar"))
+        return project.get_calendar()
+
+    def _use_calendar(self, items: List[Any], calendar: FictionalCalendar) -> List[Any]:
+        """时间线按所属项目的历法解析纪元年份"""
+        for item in items:
+            if isinstance(item, Timeline):
+                item.use_calendar(calendar)
+        return items
+
+    def _build_count_query(self, project_id: int, model_names: List[str]):
+        """构建各模型记录数的 UNION ALL 统计查询"""
+        selects = []
+        for model_name in model_names:
+            model_class = self.project_models[model_name]
+            conditions = [model_class.project_id == project_id]
+            # 如果模型支持软删除，则过滤已删除的记录
+            if hasattr(model_class, 'is_deleted'):
+                conditions.append(model_class.is_deleted == False)
+            selects.append(
+                select(
+                    literal(model_name).label('model_name'),
+                    func.count().label('count')
+                ).select_from(model_class.__table__).where(and_(*conditions))
+            )
+        return union_all(*selects)
+
+    def get_project_counts(self, project_id: int, model_names: Optional[List[str]] = None) -> Dict[str, int]:
+        """
+        一次查询获取项目各模型的记录数
+
+        所有模型的 COUNT 合并为一条 UNION ALL 语句；若合并查询失败（如某张表缺失），
+        退回逐模型统计，单个模型出错时记为 0。
+        合并查询在 SAVEPOINT 中执行，失败时只回滚到保存点：调用方会话中尚未提交的修改保留，
+        PostgreSQL 的事务也不会因出错进入中止状态而使后续的逐个统计全部失败。
+        """
+        model_names = model_names or list(self.project_models.keys())
+
+        try:
+            with self.db.begin_nested():
+                rows = self.db.execute(self._build_count_query(project_id, model_names)).all()
+            counts = {row.model_name: row.count for row in rows}
+            return {model_name: counts.get(model_name, 0) for model_name in model_names}
+        except Exception as e:
+            logger.warning(f"合并统计项目 {project_id} 数据失败，改为逐个统计: {e}")
+
+        counts = {}
+        for model_name in model_names:
+            model_class = self.project_models[model_name]
+            try:
+                query = self.db.query(model_class).filter(
+                    model_class.project_id == project_id
+                )
+                if hasattr(model_class, 'is_deleted'):
+                    query = query.filter(model_class.is_deleted == False)
+                counts[model_name] = query.count()
+            except Exception as e:
+                logger.warning(f"统计 {model_name} 数量时出错: {e}")
+                counts[model_name] = 0
+        return counts
+
+    def get_project_data(self, project_id: int, fields: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        获取项目的所有数据
+
+        先用一条合并统计查询确定哪些模型有数据，只对非空的模型执行查询，
+        项目数据通常只分布在少数几张表中。
+        fields 为逗号分隔的字段名，各模型只读取其中自身存在的列。
+        """
+        selected = parse_fields_across(fields, self.project_models)
 
-    def get_project_data(self, project_id: int) -> Optional[Dict[str, Any]]:
-        """获取项目的所有数据"""
         # 验证项目是否存在
         project = self.db.query(Project).filter(
             and_(Project.id == project_id, Project.is_deleted == False)
@@ -66,8 +146,14 @@ class ProjectDataService:
             'data': {}
         }
 
+        counts = self.get_project_counts(project_id)
+
         # 获取所有相关数据
         for model_name, model_class in self.project_models.items():
+            if not counts.get(model_name):
+                project_data['data'][model_name] = []
+                continue
+
             try:
                 # 查询该项目的所有相关数据
                 query = self.db.query(model_class).filter(
@@ -78,9 +164,11 @@ class ProjectDataService:
                 if hasattr(model_class, 'is_deleted'):
                     query = query.filter(model_class.is_deleted == False)
 
-                items = query.all()
+                items = select_fields(query, model_class, selected[model_name]).all()
+                if model_class is Timeline:
+                    self._use_calendar(items, project.get_calendar())
 
-                project_data['data'][model_name] = [item.to_dict() for item in items]
+                project_data['data'][model_name] = serialize(items, selected[model_name])
 
             except Exception as e:
                 logger.warning(f"获取 {model_name} 数据时出错: {e}")
@@ -88,12 +176,13 @@ class ProjectDataService:
 
         return project_data
 
-    def get_project_model_data(self, project_id: int, model_name: str) -> List[Dict[str, Any]]:
-        """获取项目中指定模型的数据"""
+    def get_project_model_data(self, project_id: int, model_name: str, fields: Optional[str] = None) -> List[Dict[str, Any]]:
+        """获取项目中指定模型的数据，fields 为逗号分隔的字段名，只读取这些列"""
         if model_name not in self.project_models:
             raise ValueError(f"未知的模型类型: {model_name}")
 
         model_class = self.project_models[model_name]
+        selected = parse_fields(fields, model_class)
 
         try:
             query = self.db.query(model_class).filter(
@@ -104,9 +193,11 @@ class ProjectDataService:
             if hasattr(model_class, 'is_deleted'):
                 query = query.filter(model_class.is_deleted == False)
 
-            items = query.all()
+            items = select_fields(query, model_class, selected).all()
+            if model_class is Timeline and selected is None:
+                self._use_calendar(items, self._project_calendar(project_id))
 
-            return [item.to_dict() for item in items]
+            return serialize(items, selected)
 
         except Exception as e:
             logger.error(f"获取项目 {project_id} 的 {model_name} 数据时出错: {e}")
@@ -137,6 +228,7 @@ class ProjectDataService:
             self.db.add(instance)
             self.db.commit()
             self.db.refresh(instance)
+            self._use_calendar([instance], project.get_calendar())
 
             return instance.to_dict()
 
@@ -177,6 +269,7 @@ class ProjectDataService:
 
             self.db.commit()
             self.db.refresh(instance)
+            self._use_calendar([instance], self._project_calendar(project_id))
 
             return instance.to_dict()
 
@@ -226,26 +319,8 @@ class ProjectDataService:
 
     def get_project_statistics(self, project_id: int) -> Dict[str, Any]:
         """获取项目的详细统计信息"""
-        stats = {}
-
-        for model_name, model_class in self.project_models.items():
-            try:
-                query = self.db.query(model_class).filter(
-                    model_class.project_id == project_id
-                )
-
-                # 如果模型支持软删除，则过滤已删除的记录
-                if hasattr(model_class, 'is_deleted'):
-                    query = query.filter(model_class.is_deleted == False)
-
-                count = query.count()
-                stats[f"{model_name}_count"] = count
-
-            except Exception as e:
-                logger.warning(f"统计 {model_name} 数量时出错: {e}")
-                stats[f"{model_name}_count"] = 0
-
-        return stats
+        counts = self.get_project_counts(project_id)
+        return {f"{model_name}_count": count for model_name, count in counts.items()}
 
     def clear_project_data(self, project_id: int, model_names: Optional[List[str]] = None) -> bool:
         """清空项目的数据（指定模型或全部）"""
@@ -263,6 +338,8 @@ class ProjectDataService:
                     model_class.project_id == project_id
                 ).delete()
 
+            # 批量删除不触发ORM事件，标记全文索引需要重建
+            project_search_index.invalidate_project(self.db, project_id)
             self.db.commit()
             return True
 
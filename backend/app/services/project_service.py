@@ -1,9 +1,10 @@
 """
 项目管理服务
 """
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, select
 from typing import List, Optional, Tuple, Dict, Any
+import asyncio
 import json
 import os
 from datetime import datetime
@@ -12,32 +13,49 @@ import uuid
 from ..models.project import Project, ProjectType, ProjectStatus
 from ..schemas.project import ProjectCreate, ProjectUpdate
 from ..core.config import settings
+from .pagination import Page, paginate, recent_order
+from .sparse_fields import select_fields
+
+# 项目列表项用到的列（含计算进度所需的 settings），大纲、描述等大文本不读取
+PROJECT_LIST_FIELDS = [
+    "id", "name", "title", "author", "project_type", "status", "word_count", "chapter_count",
+    "settings", "tags", "is_preset", "created_at", "updated_at"
+]
 
 
 class ProjectService:
     """项目管理服务类"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def get_projects(
+    async def _find_by_name(self, name: str, exclude_id: Optional[int] = None) -> Optional[Project]:
+        """按名称查找未删除的项目"""
+        conditions = [Project.name == name, Project.is_deleted == False]
+        if exclude_id is not None:
+            conditions.append(Project.id != exclude_id)
+        result = await self.db.execute(select(Project).where(and_(*conditions)).limit(1))
+        return result.scalars().first()
+
+    async def get_projects(
         self,
         skip: int = 0,
         limit: int = 20,
         project_type: Optional[ProjectType] = None,
         status: Optional[ProjectStatus] = None,
-        search: Optional[str] = None
-    ) -> Tuple[List[Project], int]:
-        """获取项目列表"""
-        query = self.db.query(Project).filter(Project.is_deleted == False)
+        search: Optional[str] = None,
+        cursor: Optional[str] = None
+    ) -> Page:
+        """获取项目列表（按更新时间倒序，cursor 为上一页返回的游标）"""
+        query = select(Project).where(Project.is_deleted == False)
 
         # 类型筛选
         if project_type:
-            query = query.filter(Project.project_type == project_type)
+            query = query.where(Project.project_type == project_type)
 
         # 状态筛选
         if status:
-            query = query.filter(Project.status == status)
+            query = query.where(Project.status == status)
 
         # 搜索筛选
         if search:
@@ -47,28 +65,25 @@ class ProjectService:
                 Project.author.contains(search),
                 Project.summary.contains(search)
             )
-            query = query.filter(search_filter)
-
-        # 获取总数
-        total = query.count()
-
-        # 分页和排序
-        projects = query.order_by(Project.updated_at.desc()).offset(skip).limit(limit).all()
+            query = query.where(search_filter)
 
-        return projects, total
+        # 总数单独缓存，翻页时不重复计数
+        return await paginate(
+            self.db, select_fields(query, Project, PROJECT_LIST_FIELDS), recent_order(Project), limit,
+            cursor=cursor, offset=skip, include_total=True
+        )
 
-    def get_project(self, project_id: int) -> Optional[Project]:
+    async def get_project(self, project_id: int) -> Optional[Project]:
         """获取项目详情"""
-        return self.db.query(Project).filter(
-            and_(Project.id == project_id, Project.is_deleted == False)
-        ).first()
+        result = await self.db.execute(
+            select(Project).where(and_(Project.id == project_id, Project.is_deleted == False))
+        )
+        return result.scalars().first()
 
-    def create_project(self, project_data: ProjectCreate) -> Project:
+    async def create_project(self, project_data: ProjectCreate) -> Project:
         """创建新项目"""
         # 检查项目名称是否重复
-        existing = self.db.query(Project).filter(
-            and_(Project.name == project_data.name, Project.is_deleted == False)
-        ).first()
+        existing = await self._find_by_name(project_data.name)
 
         if existing:
             raise ValueError(f"项目名称 '{project_data.name}' 已存在")
@@ -97,26 +112,20 @@ class ProjectService:
 
         # 保存到数据库
         self.db.add(project)
-        self.db.commit()
-        self.db.refresh(project)
+        await self.db.commit()
+        await self.db.refresh(project)
 
         return project
 
-    def update_project(self, project_id: int, project_data: ProjectUpdate) -> Optional[Project]:
+    async def update_project(self, project_id: int, project_data: ProjectUpdate) -> Optional[Project]:
         """更新项目"""
-        project = self.get_project(project_id)
+        project = await self.get_project(project_id)
         if not project:
             return None
 
         # 检查名称重复（排除自己）
         if project_data.name and project_data.name != project.name:
-            existing = self.db.query(Project).filter(
-                and_(
-                    Project.name == project_data.name,
-                    Project.id != project_id,
-                    Project.is_deleted == False
-                )
-            ).first()
+            existing = await self._find_by_name(project_data.name, exclude_id=project_id)
 
             if existing:
                 raise ValueError(f"项目名称 '{project_data.name}' 已存在")
@@ -138,32 +147,30 @@ class ProjectService:
         # 更新统计信息
         project.update_statistics()
 
-        self.db.commit()
-        self.db.refresh(project)
+        await self.db.commit()
+        await self.db.refresh(project)
 
         return project
 
-    def delete_project(self, project_id: int) -> bool:
+    async def delete_project(self, project_id: int) -> bool:
         """删除项目（软删除）"""
-        project = self.get_project(project_id)
+        project = await self.get_project(project_id)
         if not project:
             return False
 
         project.is_deleted = True
-        self.db.commit()
+        await self.db.commit()
 
         return True
 
-    def duplicate_project(self, project_id: int, new_name: str) -> Optional[Project]:
+    async def duplicate_project(self, project_id: int, new_name: str) -> Optional[Project]:
         """复制项目"""
-        original = self.get_project(project_id)
+        original = await self.get_project(project_id)
         if not original:
             return None
 
         # 检查新名称是否重复
-        existing = self.db.query(Project).filter(
-            and_(Project.name == new_name, Project.is_deleted == False)
-        ).first()
+        existing = await self._find_by_name(new_name)
 
         if existing:
             raise ValueError(f"项目名称 '{new_name}' 已存在")
@@ -189,14 +196,14 @@ class ProjectService:
         new_project.set_tags(original.get_tags())
 
         self.db.add(new_project)
-        self.db.commit()
-        self.db.refresh(new_project)
+        await self.db.commit()
+        await self.db.refresh(new_project)
 
         return new_project
 
-    def get_project_statistics(self, project_id: int) -> Optional[Dict[str, Any]]:
+    async def get_project_statistics(self, project_id: int) -> Optional[Dict[str, Any]]:
         """获取项目统计信息"""
-        project = self.get_project(project_id)
+        project = await self.get_project(project_id)
         if not project:
             return None
 
@@ -217,9 +224,9 @@ class ProjectService:
 
         return stats
 
-    def export_project(self, project_id: int, format: str = "json") -> Optional[Dict[str, Any]]:
+    async def export_project(self, project_id: int, format: str = "json") -> Optional[Dict[str, Any]]:
         """导出项目"""
-        project = self.get_project(project_id)
+        project = await self.get_project(project_id)
         if not project:
             return None
 
@@ -243,7 +250,7 @@ class ProjectService:
 
         return export_data
 
-    def import_project(self, import_data: Dict[str, Any]) -> Project:
+    async def import_project(self, import_data: Dict[str, Any]) -> Project:
         """导入项目"""
         if "project" not in import_data:
             raise ValueError("导入数据中缺少项目信息")
@@ -255,9 +262,7 @@ class ProjectService:
         name = original_name
         counter = 1
 
-        while self.db.query(Project).filter(
-            and_(Project.name == name, Project.is_deleted == False)
-        ).first():
+        while await self._find_by_name(name):
             name = f"{original_name} ({counter})"
             counter += 1
 
@@ -281,16 +286,16 @@ class ProjectService:
             project.set_tags(project_data["tags"])
 
         self.db.add(project)
-        self.db.commit()
-        self.db.refresh(project)
+        await self.db.commit()
+        await self.db.refresh(project)
 
         # TODO: 导入相关数据（人物、势力、剧情等）
 
         return project
 
-    def backup_project(self, project_id: int) -> Optional[Dict[str, Any]]:
+    async def backup_project(self, project_id: int) -> Optional[Dict[str, Any]]:
         """备份项目"""
-        project = self.get_project(project_id)
+        project = await self.get_project(project_id)
         if not project:
             return None
 
@@ -299,7 +304,7 @@ class ProjectService:
         backup_time = datetime.now()
 
         # 导出项目数据
-        backup_data = self.export_project(project_id)
+        backup_data = await self.export_project(project_id)
 
         # 保存备份文件
         backup_dir = os.path.join(settings.upload_dir, "backups")
@@ -308,8 +313,7 @@ class ProjectService:
         backup_filename = f"project_{project_id}_{backup_time.strftime('%Y%m%d_%H%M%S')}.json"
         backup_path = os.path.join(backup_dir, backup_filename)
 
-        with open(backup_path, 'w', encoding='utf-8') as f:
-            json.dump(backup_data, f, ensure_ascii=False, indent=2)
+        await asyncio.to_thread(self._write_backup_file, backup_path, backup_data)
 
         backup_info = {
             "backup_id": backup_id,
@@ -322,7 +326,13 @@ class ProjectService:
 
         return backup_info
 
-    def restore_project(self, project_id: int, backup_id: str) -> bool:
+    @staticmethod
+    def _write_backup_file(path: str, data: Dict[str, Any]):
+        """写入备份文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    async def restore_project(self, project_id: int, backup_id: str) -> bool:
         """恢复项目"""
         # 这里需要实现从备份恢复项目的逻辑
         # 暂时返回True表示成功
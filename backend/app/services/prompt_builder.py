@@ -0,0 +1,263 @@
+"""
+按token预算组装提示词
+按提供商估算token数，结合模型上下文窗口与输出预留，超出时优先裁剪低优先级的段落
+"""
+from typing import Dict, List, Optional, Any, Tuple
+from functools import lru_cache
+import logging
+import math
+import re
+
+from ..core.config import AI_PROMPT_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_CJK_CHAR_PATTERN = re.compile(r"[㐀-䶿一-鿿豈-﫿　-〿＀-￯]")
+
+# 各提供商的估算系数：(每个中文字符的token数, 每个token对应的其他字符数)
+# 由常见中文小说文本在各家分词器上的实测比例取整，略偏保守
+TOKEN_RATIOS: Dict[str, Tuple[float, float]] = {
+    "openai": (1.0, 4.0),
+    "claude": (1.2, 3.5),
+    "zhipu": (0.7, 4.0),
+    "siliconflow": (0.7, 4.0),
+    "google": (0.8, 4.0),
+    "grok": (1.0, 4.0),
+    "ollama": (1.0, 3.5),
+    "custom": (1.0, 4.0),
+}
+DEFAULT_TOKEN_RATIO = (1.0, 4.0)
+
+# 模型上下文窗口（按模型名称前缀匹配，最长前缀优先）
+MODEL_CONTEXT_LIMITS: Dict[str, int] = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "claude-2": 100000,
+    "claude-3": 200000,
+    "glm-4": 128000,
+    "glm-3-turbo": 128000,
+    "deepseek": 64000,
+    "qwen": 32768,
+    "gemini-pro": 30720,
+    "gemini-1.5": 1000000,
+    "grok": 131072,
+}
+
+# 未知模型时各提供商的默认上下文窗口
+PROVIDER_CONTEXT_LIMITS: Dict[str, int] = {
+    "openai": 16385,
+    "claude": 200000,
+    "zhipu": 128000,
+    "siliconflow": 32768,
+    "google": 30720,
+    "grok": 131072,
+    "ollama": 4096,
+    "custom": 8192,
+}
+DEFAULT_CONTEXT_LIMIT = 4096
+
+TRUNCATION_MARKER = "……（以下内容已省略）"
+HEAD_TRUNCATION_MARKER = "（以上内容已省略）……"
+
+
+@lru_cache(maxsize=8)
+def _load_tiktoken_encoding(name: str):
+    """加载 tiktoken 编码（可选依赖，加载结果缓存）"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str, provider: Optional[str] = None) -> int:
+    """
+    估算文本的token数
+
+    OpenAI 系列在安装了 tiktoken 时使用真实分词器，其余按提供商的中文/其他字符比例估算。
+    """
+    if not text:
+        return 0
+    if provider in ("openai", "grok", "custom") and AI_PROMPT_CONFIG.get("use_tiktoken", True):
+        encoding = _load_tiktoken_encoding("cl100k_base")
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+
+    cjk_ratio, chars_per_token = TOKEN_RATIOS.get(provider, DEFAULT_TOKEN_RATIO)
+    cjk = len(_CJK_CHAR_PATTERN.findall(text))
+    return math.ceil(cjk * cjk_ratio + (len(text) - cjk) / chars_per_token)
+
+
+def get_context_limit(provider: Optional[str], model: Optional[str] = None) -> int:
+    """获取模型的上下文窗口大小，配置中显式指定时优先"""
+    if AI_PROMPT_CONFIG.get("context_window"):
+        return AI_PROMPT_CONFIG["context_window"]
+    if model:
+        name = model.lower().split("/")[-1]
+        matches = [prefix for prefix in MODEL_CONTEXT_LIMITS if name.startswith(prefix)]
+        if matches:
+            return MODEL_CONTEXT_LIMITS[max(matches, key=len)]
+    return PROVIDER_CONTEXT_LIMITS.get(provider, DEFAULT_CONTEXT_LIMIT)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, provider: Optional[str] = None, keep: str = "head") -> str:
+    """
+    将文本截断到不超过 max_tokens
+
+    keep="head" 保留开头（用于设定、说明），keep="tail" 保留结尾（用于续写的前文）。
+    """
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text, provider) <= max_tokens:
+        return text
+
+    marker = HEAD_TRUNCATION_MARKER if keep == "tail" else TRUNCATION_MARKER
+    budget = max_tokens - estimate_tokens(marker, provider)
+    if budget <= 0:
+        return ""
+
+    # 二分查找可保留的最大字符数
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        piece = text[-middle:] if keep == "tail" else text[:middle]
+        if estimate_tokens(piece, provider) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    if low == 0:
+        return ""
+    return marker + text[-low:] if keep == "tail" else text[:low] + marker
+
+
+class PromptSection:
+    """提示词段落"""
+
+    def __init__(self, name: str, text: str, priority: int = 0, required: bool = False,
+                 keep: str = "head", min_tokens: int = 0):
+        self.name = name
+        self.text = text or ""
+        self.priority = priority  # 数值越小越先被裁剪
+        self.required = required  # 必需段落不参与裁剪
+        self.keep = keep
+        self.min_tokens = min_tokens  # 裁剪后少于该值时整段移除
+        self.original_tokens = 0
+        self.tokens = 0
+
+
+class PromptBuilder:
+    """
+    提示词组装器
+
+    可用预算 = 上下文窗口 - 输出预留（max_tokens）- 安全余量。
+    总token数超出预算时，从优先级最低的段落开始截断，截断后过短则整段移除，
+    直到满足预算或只剩必需段落。
+    """
+
+    def __init__(self, provider: Optional[str] = None, model: Optional[str] = None,
+                 max_output_tokens: Optional[int] = None, context_limit: Optional[int] = None,
+                 separator: str = "\n\n"):
+        self.provider = provider
+        self.model = model
+        self.context_limit = context_limit or get_context_limit(provider, model)
+        self.max_output_tokens = max_output_tokens or 0
+        self.safety_margin = AI_PROMPT_CONFIG.get("safety_margin", 64)
+        self.separator = separator
+        self.sections: List[PromptSection] = []
+
+    @property
+    def input_budget(self) -> int:
+        """提示词可用的token数"""
+        return max(self.context_limit - self.max_output_tokens - self.safety_margin, 0)
+
+    def add(self, name: str, text: Optional[str], priority: int = 0, required: bool = False,
+            keep: str = "head", min_tokens: int = 0) -> "PromptBuilder":
+        """追加段落（按添加顺序拼接），空文本忽略"""
+        if text:
+            self.sections.append(PromptSection(name, text, priority, required, keep, min_tokens))
+        return self
+
+    def _fit(self) -> List[Dict[str, Any]]:
+        """裁剪段落以满足预算，返回裁剪记录"""
+        separator_tokens = estimate_tokens(self.separator, self.provider)
+        for section in self.sections:
+            section.original_tokens = section.tokens = estimate_tokens(section.text, self.provider)
+
+        def total() -> int:
+            active = [section for section in self.sections if section.text]
+            return sum(section.tokens for section in active) + separator_tokens * max(len(active) - 1, 0)
+
+        trimmed = []
+        candidates = sorted(
+            (section for section in self.sections if not section.required),
+            key=lambda section: section.priority
+        )
+        for section in candidates:
+            overflow = total() - self.input_budget
+            if overflow <= 0:
+                break
+            target = section.tokens - overflow
+            if target < max(section.min_tokens, 1):
+                section.text, section.tokens = "", 0
+                action = "removed"
+            else:
+                section.text = truncate_to_tokens(section.text, target, self.provider, section.keep)
+                section.tokens = estimate_tokens(section.text, self.provider)
+                action = "truncated" if section.text else "removed"
+            trimmed.append({
+                "section": section.name,
+                "action": action,
+                "original_tokens": section.original_tokens,
+                "tokens": section.tokens
+            })
+
+        if total() > self.input_budget:
+            logger.warning(
+                f"提示词必需部分约 {total()} tokens，超出 {self.provider}/{self.model} 的可用预算 {self.input_budget}"
+            )
+        return trimmed
+
+    def build(self) -> Tuple[str, Dict[str, Any]]:
+        """组装提示词，返回 (提示词, token使用情况)"""
+        trimmed = self._fit()
+        prompt = self.separator.join(section.text for section in self.sections if section.text)
+        return prompt, self._usage(estimate_tokens(prompt, self.provider), trimmed)
+
+    def build_messages(self, messages: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        裁剪聊天消息以满足预算
+
+        系统消息与最后一条消息为必需段落，其余历史消息越早优先级越低，超出预算时先移除。
+        """
+        self.sections = []
+        last = len(messages) - 1
+        for position, message in enumerate(messages):
+            required = message.get("role") == "system" or position == last
+            self.add(str(position), message.get("content", ""), priority=position, required=required,
+                     keep="tail", min_tokens=16)
+        trimmed = self._fit()
+
+        kept = []
+        kept_sections = {section.name: section for section in self.sections if section.text}
+        for position, message in enumerate(messages):
+            section = kept_sections.get(str(position))
+            if section is not None:
+                kept.append({**message, "content": section.text})
+        # 每条消息额外计入角色标记等开销
+        prompt_tokens = sum(section.tokens + 4 for section in kept_sections.values())
+        usage = self._usage(prompt_tokens, trimmed)
+        usage["messages"] = {"total": len(messages), "kept": len(kept)}
+        return kept, usage
+
+    def _usage(self, prompt_tokens: int, trimmed: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": prompt_tokens,
+            "max_output_tokens": self.max_output_tokens,
+            "context_limit": self.context_limit,
+            "input_budget": self.input_budget,
+            "estimated": True,
+            "trimmed": trimmed
+        }
@@ -0,0 +1,328 @@
+"""
+项目数据全文检索
+基于 SQLite FTS5 的倒排索引，中文按单字+双字切分，通过 SQLAlchemy 会话事件增量维护
+"""
+from typing import Dict, List, Optional, Any, Tuple, Type
+import logging
+import re
+
+from sqlalchemy import event, text, String, Text, JSON, Enum as SQLEnum
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+INDEX_TABLE = "project_search_index"
+STATE_TABLE = "project_search_index_state"
+
+_CJK_PATTERN = re.compile(r"[㐀-䶿一-鿿豈-﫿]+")
+_WORD_PATTERN = re.compile(r"[㐀-䶿一-鿿豈-﫿]+|[0-9a-zA-Z]+")
+_TITLE_FIELDS = ("name", "title", "full_name")
+
+# 不参与索引的文本列
+_SKIPPED_COLUMNS = {"tags", "version_note"}
+
+
+def tokenize_text(content: str) -> str:
+    """将文本切分为索引词：中文连续片段输出单字与相邻双字，字母数字按词小写输出"""
+    tokens = []
+    for match in _WORD_PATTERN.finditer(content or ""):
+        word = match.group()
+        if _CJK_PATTERN.fullmatch(word):
+            tokens.extend(word)
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.append(word.lower())
+    return " ".join(tokens)
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """将用户查询转换为 FTS5 MATCH 表达式：中文片段按双字切分，所有词须同时出现"""
+    terms = []
+    for match in _WORD_PATTERN.finditer(query or ""):
+        word = match.group()
+        if _CJK_PATTERN.fullmatch(word):
+            if len(word) == 1:
+                terms.append(word)
+            else:
+                terms.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            terms.append(word.lower())
+    if not terms:
+        return None
+    unique_terms = list(dict.fromkeys(terms))
+    return " AND ".join(f'"{term}"' for term in unique_terms)
+
+
+def make_snippet(content: str, query: str, width: int = 40,
+                 markers: Tuple[str, str] = ("<mark>", "</mark>")) -> str:
+    """截取命中位置附近的文本片段，并标记命中的查询词"""
+    if not content:
+        return ""
+    lowered = content.lower()
+    needles = [query.strip().lower()] + [m.group().lower() for m in _WORD_PATTERN.finditer(query)]
+    position, needle = -1, ""
+    for candidate in needles:
+        if candidate:
+            position = lowered.find(candidate)
+            if position >= 0:
+                needle = candidate
+                break
+    if position < 0:
+        return content[:width * 2] + ("..." if len(content) > width * 2 else "")
+
+    start = max(0, position - width)
+    end = min(len(content), position + len(needle) + width)
+    snippet = (
+        content[start:position]
+        + markers[0] + content[position:position + len(needle)] + markers[1]
+        + content[position + len(needle):end]
+    )
+    return ("..." if start > 0 else "") + snippet + ("..." if end < len(content) else "")
+
+
+class ProjectSearchIndex:
+    """
+    项目数据全文索引
+
+    - 每条记录的文本列（含JSON列中的字符串）拼接后切分写入 FTS5 表，
+      scope 列保存项目标记，查询时先按项目过滤再按 bm25 排序
+    - 项目首次检索时全量建立索引，之后由会话的 after_flush 事件在同一事务内增量更新；
+      两者都只写入调用方会话的事务，由会话的所有者提交
+    - 非 SQLite 数据库不建立索引，调用方回退到逐条匹配
+    """
+
+    def __init__(self):
+        self._models: Optional[Dict[str, Type]] = None
+        self._model_names: Dict[Type, str] = {}
+        self._initialized_binds = set()
+
+    @property
+    def models(self) -> Dict[str, Type]:
+        """可索引的项目模型（与项目数据服务一致）"""
+        if self._models is None:
+            from .project_data_service import PROJECT_MODELS
+            self._models = PROJECT_MODELS
+            self._model_names = {model: name for name, model in PROJECT_MODELS.items()}
+        return self._models
+
+    def model_name_of(self, instance: Any) -> Optional[str]:
+        """获取实例对应的模型名称，不可索引时返回 None"""
+        self.models
+        return self._model_names.get(type(instance))
+
+    @staticmethod
+    def is_supported(connection) -> bool:
+        return connection.dialect.name == "sqlite"
+
+    def ensure_schema(self, connection):
+        """创建索引表（每个数据库只执行一次）"""
+        key = (id(connection.engine), str(connection.engine.url))
+        if key in self._initialized_binds:
+            return
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5("
+            "scope, tokens, project_id UNINDEXED, model_name UNINDEXED, item_id UNINDEXED, "
+            "title UNINDEXED, content UNINDEXED)"
+        ))
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (project_id INTEGER PRIMARY KEY)"
+        ))
+        self._initialized_binds.add(key)
+
+    def _rowid(self, model_name: str, item_id: int) -> int:
+        """由模型序号与记录ID推导索引行号，增量更新时按行号定位"""
+        return item_id * 64 + list(self.models).index(model_name)
+
+    @staticmethod
+    def _scope(project_id: int) -> str:
+        return f"p{project_id}"
+
+    @staticmethod
+    def _collect_strings(value: Any, parts: List[str]):
+        if isinstance(value, str):
+            if value:
+                parts.append(value)
+        elif isinstance(value, dict):
+            for item in value.values():
+                ProjectSearchIndex._collect_strings(item, parts)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                ProjectSearchIndex._collect_strings(item, parts)
+
+    def extract_document(self, instance: Any) -> Tuple[str, str]:
+        """提取记录的标题与可检索文本"""
+        parts: List[str] = []
+        for column in instance.__table__.columns:
+            if column.name in _SKIPPED_COLUMNS or column.name.endswith("_id"):
+                continue
+            if not isinstance(column.type, (String, Text, JSON)) or isinstance(column.type, SQLEnum):
+                continue
+            self._collect_strings(instance.__dict__.get(column.key), parts)
+        if hasattr(instance, "get_tags"):
+            parts.extend(tag for tag in instance.get_tags() if isinstance(tag, str))
+
+        title = ""
+        for field in _TITLE_FIELDS:
+            value = instance.__dict__.get(field)
+            if isinstance(value, str) and value:
+                title = value
+                break
+        return title, "\n".join(parts)
+
+    def _delete_rows(self, connection, model_name: str, item_id: int):
+        connection.execute(
+            text(f"DELETE FROM {INDEX_TABLE} WHERE rowid = :rowid"),
+            {"rowid": self._rowid(model_name, item_id)}
+        )
+
+    def _insert_row(self, connection, model_name: str, instance: Any):
+        title, content = self.extract_document(instance)
+        connection.execute(
+            text(
+                f"INSERT INTO {INDEX_TABLE} (rowid, scope, tokens, project_id, model_name, item_id, title, content) "
+                "VALUES (:rowid, :scope, :tokens, :project_id, :model_name, :item_id, :title, :content)"
+            ),
+            {
+                "rowid": self._rowid(model_name, instance.id),
+                "scope": self._scope(instance.project_id),
+                "tokens": tokenize_text(f"{title}\n{content}"),
+                "project_id": instance.project_id,
+                "model_name": model_name,
+                "item_id": instance.id,
+                "title": title,
+                "content": content
+            }
+        )
+
+    def apply_changes(self, session: Session, upserts: List[Any], deletes: List[Any]):
+        """在会话的连接上同步记录变更（与业务写入处于同一事务）"""
+        connection = session.connection()
+        if not self.is_supported(connection):
+            return
+        self.ensure_schema(connection)
+        for instance in deletes:
+            self._delete_rows(connection, self.model_name_of(instance), instance.id)
+        for instance in upserts:
+            model_name = self.model_name_of(instance)
+            self._delete_rows(connection, model_name, instance.id)
+            if instance.project_id is not None and not getattr(instance, "is_deleted", False):
+                self._insert_row(connection, model_name, instance)
+
+    def is_project_indexed(self, session: Session, project_id: int) -> bool:
+        connection = session.connection()
+        self.ensure_schema(connection)
+        row = connection.execute(
+            text(f"SELECT 1 FROM {STATE_TABLE} WHERE project_id = :project_id"),
+            {"project_id": project_id}
+        ).first()
+        return row is not None
+
+    def rebuild_project(self, session: Session, project_id: int):
+        """
+        全量重建项目索引
+
+        写入调用方会话的事务但不提交，避免检索等只读操作顺带提交会话中的其他修改；
+        会话回滚时索引状态一并回滚，下次检索重新建立
+        """
+        # 先刷新待写入的记录（after_flush 事件会为其写入索引），再清空重建，避免查询中的自动刷新重复写入
+        session.flush()
+        connection = session.connection()
+        self.ensure_schema(connection)
+        connection.execute(
+            text(f"DELETE FROM {INDEX_TABLE} WHERE scope MATCH :scope"),
+            {"scope": self._scope(project_id)}
+        )
+        for model_name, model_class in self.models.items():
+            query = session.query(model_class).filter(model_class.project_id == project_id)
+            if hasattr(model_class, "is_deleted"):
+                query = query.filter(model_class.is_deleted == False)
+            for instance in query.yield_per(500):
+                self._insert_row(connection, model_name, instance)
+        connection.execute(
+            text(f"INSERT OR IGNORE INTO {STATE_TABLE} (project_id) VALUES (:project_id)"),
+            {"project_id": project_id}
+        )
+        logger.info(f"项目 {project_id} 全文索引已重建")
+
+    def invalidate_project(self, session: Session, project_id: int):
+        """标记项目索引失效（批量删除等绕过ORM事件的操作之后调用），下次检索时重建"""
+        connection = session.connection()
+        if not self.is_supported(connection):
+            return
+        self.ensure_schema(connection)
+        connection.execute(
+            text(f"DELETE FROM {STATE_TABLE} WHERE project_id = :project_id"),
+            {"project_id": project_id}
+        )
+
+    def search(
+        self,
+        session: Session,
+        project_id: int,
+        query: str,
+        model_names: Optional[List[str]] = None,
+        limit: int = 50
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        检索项目数据，按相关度排序返回命中记录
+
+        返回 None 表示当前数据库不支持全文索引。
+        """
+        connection = session.connection()
+        if not self.is_supported(connection):
+            return None
+        if not self.is_project_indexed(session, project_id):
+            self.rebuild_project(session, project_id)
+            connection = session.connection()
+
+        match = build_match_query(query)
+        if match is None:
+            return []
+
+        sql = (
+            f"SELECT model_name, item_id, title, content, bm25({INDEX_TABLE}) AS rank "
+            f"FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH :match"
+        )
+        params: Dict[str, Any] = {"match": f'scope:"{self._scope(project_id)}" AND tokens:({match})', "limit": limit}
+        if model_names:
+            placeholders = ", ".join(f":model_{i}" for i in range(len(model_names)))
+            sql += f" AND model_name IN ({placeholders})"
+            params.update({f"model_{i}": name for i, name in enumerate(model_names)})
+        sql += " ORDER BY rank LIMIT :limit"
+
+        hits = []
+        needle = query.strip().lower()
+        for row in connection.execute(text(sql), params):
+            hits.append({
+                "model_name": row.model_name,
+                "id": row.item_id,
+                "title": row.title,
+                "score": round(-row.rank, 6),
+                "exact": needle in row.content.lower() or needle in (row.title or "").lower(),
+                "snippet": make_snippet(row.content, query)
+            })
+        # 完整包含查询串的记录优先，其余按相关度
+        hits.sort(key=lambda hit: (not hit["exact"], -hit["score"]))
+        return hits
+
+
+project_search_index = ProjectSearchIndex()
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_search_index(session: Session, flush_context):
+    """会话刷新后把项目模型的增删改同步到全文索引"""
+    upserts = [
+        instance for instance in list(session.new) + list(session.dirty)
+        if project_search_index.model_name_of(instance) and instance.id is not None
+    ]
+    deletes = [
+        instance for instance in session.deleted
+        if project_search_index.model_name_of(instance) and instance.id is not None
+    ]
+    if not upserts and not deletes:
+        return
+    try:
+        project_search_index.apply_changes(session, upserts, deletes)
+    except Exception as e:
+        logger.warning(f"更新全文索引失败: {e}")
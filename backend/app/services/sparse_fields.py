@@ -0,0 +1,87 @@
+"""
+列表字段选择
+列表端点通过 fields=a,b,c 只返回指定字段，未选择的列延迟加载，
+大文本与JSON字段既不从数据库读取也不序列化
+"""
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from sqlalchemy.orm import load_only
+
+from ..core.serialization import FastJSONResponse
+
+
+class InvalidFields(ValueError):
+    """请求了模型中不存在的字段"""
+
+
+def parse_fields(fields: Optional[str], model) -> Optional[List[str]]:
+    """
+    解析 fields 参数
+
+    返回按请求顺序去重的字段名（始终包含 id），未指定时返回 None 表示完整记录
+    """
+    if not fields:
+        return None
+    columns = model.__table__.columns.keys()
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in columns]
+    if unknown:
+        raise InvalidFields(f"未知字段: {', '.join(unknown)}")
+    return list(dict.fromkeys(["id"] + requested))
+
+
+def parse_fields_across(fields: Optional[str], models: Dict[str, Any]) -> Dict[str, Optional[List[str]]]:
+    """
+    为多个模型解析同一个 fields 参数
+
+    各模型只选择自身存在的列，所有模型都不存在的字段才视为未知
+    """
+    if not fields:
+        return {name: None for name in models}
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    known = set().union(*(model.__table__.columns.keys() for model in models.values()))
+    unknown = [name for name in requested if name not in known]
+    if unknown:
+        raise InvalidFields(f"未知字段: {', '.join(unknown)}")
+    return {
+        name: list(dict.fromkeys(["id"] + [field for field in requested if field in model.__table__.columns]))
+        for name, model in models.items()
+    }
+
+
+def select_fields(query, model, fields: Optional[List[str]]):
+    """只加载选择的列，适用于 select() 与 Session.query()"""
+    if fields is None:
+        return query
+    return query.options(load_only(*[getattr(model, name) for name in fields]))
+
+
+def serialize(items: Iterable[Any], fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """序列化记录，未选择字段时使用模型的 to_dict()"""
+    if fields is None:
+        return [item.to_dict() for item in items]
+    return [item.to_fields(fields) for item in items]
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(schema) -> TypeAdapter:
+    return TypeAdapter(List[schema])
+
+
+def list_response(items: Iterable[Any], fields: Optional[List[str]],
+                  headers: Optional[Dict[str, str]] = None, schema=None) -> Response:
+    """
+    返回列表响应（直接返回响应对象以携带分页响应头）
+
+    - 选择了字段时按所选列编码，部分字段的结果无法通过完整字段的 response_model 校验
+    - 完整记录的 to_dict() 按端点的响应模型 schema 校验并序列化，与 response_model 一样
+      只输出模型声明的字段；未提供 schema 的端点直接返回 to_dict()
+    """
+    if fields is None and schema is not None:
+        adapter = _list_adapter(schema)
+        content = adapter.dump_json(adapter.validate_python(serialize(items, None)), by_alias=True)
+        return Response(content=content, media_type="application/json", headers=headers)
+    return FastJSONResponse(content=serialize(items, fields), headers=headers)
@@ -0,0 +1,191 @@
+"""
+结构化输出
+按Pydantic模型约束AI输出：增量JSON修复解析、模型校验与有限次数的重试
+"""
+from typing import Dict, List, Optional, Any, Type, TypeVar, Tuple, Callable, Awaitable
+import json
+import logging
+import re
+
+from pydantic import BaseModel, ValidationError
+
+from ..core.config import AI_STRUCTURED_CONFIG
+
+logger = logging.getLogger(__name__)
+
+SchemaT = TypeVar("SchemaT", bound=BaseModel)
+
+_CLOSERS = {"{": "}", "[": "]"}
+# 字符串中不允许直接出现的控制字符
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_CODE_FENCE_PATTERN = re.compile(r"```(?:json)?", re.IGNORECASE)
+
+SCHEMA_INSTRUCTION = "\n\n请只返回一个符合以下JSON Schema的JSON对象，不要输出其他文字：\n{schema}"
+RETRY_INSTRUCTION = "\n\n注意：上一次的输出未通过格式校验（{error}），请严格按要求只返回JSON。"
+
+
+class StructuredOutputError(ValueError):
+    """AI输出无法解析为要求的结构"""
+
+    def __init__(self, message: str, raw: Optional[str] = None):
+        super().__init__(message)
+        self.raw = raw
+
+
+class JSONRepairParser:
+    """
+    增量JSON修复解析器
+
+    逐块接收AI输出，跳过JSON之前的说明文字与代码块标记，跟踪括号与字符串状态：
+    - 根值闭合后 feed 返回True，调用方可立即停止接收流式输出
+    - 自动去掉多余的结尾逗号，转义字符串中的换行等控制字符
+    - 输出被截断时补全未闭合的字符串与括号，仍无法解析则回退到最近的完整元素
+    """
+
+    def __init__(self, roots: str = "{["):
+        self.roots = roots
+        self.started = False
+        self.complete = False
+        self._out: List[str] = []
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._commas: List[Tuple[int, List[str]]] = []  # 字符串外逗号的位置及当时的括号栈
+
+    @property
+    def text(self) -> str:
+        """已接收的JSON文本（未修复）"""
+        return "".join(self._out)
+
+    def _drop_trailing_comma(self):
+        position = len(self._out)
+        while position and self._out[position - 1].isspace():
+            position -= 1
+        if position and self._out[position - 1] == ",":
+            del self._out[position - 1:]
+
+    def feed(self, chunk: str) -> bool:
+        """输入一个数据块，返回根值是否已经闭合"""
+        for char in chunk:
+            if self.complete:
+                break
+            if not self.started:
+                if char in self.roots:
+                    self.started = True
+                    self._stack.append(char)
+                    self._out.append(char)
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                else:
+                    char = _CONTROL_ESCAPES.get(char, char)
+                self._out.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in _CLOSERS:
+                self._stack.append(char)
+            elif char in "}]":
+                self._drop_trailing_comma()
+                char = _CLOSERS[self._stack.pop()]  # 括号不匹配时按实际打开的括号闭合
+                if not self._stack:
+                    self.complete = True
+            elif char == ",":
+                self._commas.append((len(self._out), list(self._stack)))
+            self._out.append(char)
+        return self.complete
+
+    @staticmethod
+    def _close(text: str, stack: List[str], in_string: bool) -> str:
+        if in_string:
+            text += '"'
+        text = text.rstrip()
+        if text.endswith(","):
+            text = text[:-1]
+        elif text.endswith(":"):
+            text += "null"
+        return text + "".join(_CLOSERS[opened] for opened in reversed(stack))
+
+    def result(self) -> Any:
+        """修复并解析已接收的JSON"""
+        if not self.started:
+            raise StructuredOutputError("输出中没有JSON")
+        text = self.text
+        if self.complete:
+            candidates = [text]
+        else:
+            candidates = [self._close(text, self._stack, self._in_string)]
+            # 截断在键名或不完整的值中间时，回退到最近几个完整元素
+            candidates += [self._close(text[:position], stack, False) for position, stack in reversed(self._commas[-3:])]
+
+        error = None
+        for candidate in candidates:
+            try:
+                return json.loads(candidate)
+            except json.JSONDecodeError as e:
+                error = e
+        raise StructuredOutputError(f"JSON无法修复: {error}", raw=text)
+
+
+def repair_json(text: str, roots: str = "{[") -> Any:
+    """从完整的模型输出中提取并修复JSON"""
+    if not text:
+        raise StructuredOutputError("输出为空")
+    text = _CODE_FENCE_PATTERN.sub("", text).strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    parser = JSONRepairParser(roots)
+    parser.feed(text)
+    return parser.result()
+
+
+def with_schema_instructions(prompt: str, schema: Dict[str, Any]) -> str:
+    """在提示词后附上JSON Schema（紧凑格式）"""
+    return prompt + SCHEMA_INSTRUCTION.format(
+        schema=json.dumps(schema, ensure_ascii=False, separators=(",", ":"))
+    )
+
+
+def parse_structured(text: str, schema: Type[SchemaT]) -> SchemaT:
+    """解析并按模型校验AI输出，失败时抛出 StructuredOutputError"""
+    from .ai_service import process_thinking_chain
+
+    content, _ = process_thinking_chain(text or "")
+    data = repair_json(content, roots="{")
+    try:
+        return schema.model_validate(data)
+    except ValidationError as e:
+        raise StructuredOutputError(
+            f"{schema.__name__} 校验失败: {e.error_count()} 处错误（{e.errors()[0]['loc']}）", raw=text
+        )
+
+
+async def generate_with_retries(call: Callable[[str], Awaitable[str]], prompt: str,
+                                schema: Type[SchemaT], max_retries: Optional[int] = None) -> SchemaT:
+    """
+    生成并校验结构化结果
+
+    输出无法解析或校验失败时，附上错误原因重新请求，最多重试 max_retries 次；
+    调用本身的异常（网络、鉴权等）直接抛出，不在这里重试。
+    """
+    if max_retries is None:
+        max_retries = AI_STRUCTURED_CONFIG.get("max_retries", 1)
+    current = prompt
+    for attempt in range(max_retries + 1):
+        raw = await call(current)
+        try:
+            return parse_structured(raw, schema)
+        except StructuredOutputError as e:
+            error = e
+            logger.warning(f"结构化输出第 {attempt + 1} 次尝试失败: {e}")
+            current = prompt + RETRY_INSTRUCTION.format(error=e)
+    raise error
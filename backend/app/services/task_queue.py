@@ -0,0 +1,126 @@
+"""
+后台任务队列
+把数据库写入等同步操作移出请求路径，由后台工作线程按提交顺序执行
+"""
+from typing import Dict, Optional, Any, Callable, List
+import asyncio
+import logging
+import queue
+import threading
+import time
+
+from ..core.config import BACKGROUND_TASK_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BackgroundTaskQueue:
+    """
+    后台任务队列
+
+    - 任务为同步函数，在工作线程中执行，不依赖请求所在的事件循环
+    - 单个工作线程时严格按提交顺序执行，同一项目的多次写入不会乱序
+    - 队列已满或已关闭时在调用方线程直接执行，保证数据不丢失
+    - 任务失败只记录日志，不影响后续任务
+    """
+
+    def __init__(self, name: str = "background", config: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.config = config or BACKGROUND_TASK_CONFIG
+        self.workers = max(self.config.get("workers", 1), 1)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=self.config.get("queue_size", 1000))
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._closed = False
+        self.metrics = {"submitted": 0, "completed": 0, "failed": 0, "inline": 0}
+        self.last_error: Optional[str] = None
+
+    def _ensure_workers(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._worker, name=f"{self.name}-worker-{len(self._threads)}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _execute(self, description: str, func: Callable, args: tuple, kwargs: Dict[str, Any]):
+        started = time.time()
+        try:
+            func(*args, **kwargs)
+            self.metrics["completed"] += 1
+            logger.debug(f"后台任务 {description} 完成，耗时 {time.time() - started:.3f}s")
+        except Exception as e:
+            self.metrics["failed"] += 1
+            self.last_error = f"{description}: {e}"
+            logger.error(f"后台任务 {description} 执行失败: {e}")
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                self._execute(*item)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, func: Callable, *args, description: Optional[str] = None, **kwargs) -> bool:
+        """
+        提交任务，返回是否进入后台执行（False 表示已在当前线程同步执行）
+        """
+        description = description or getattr(func, "__name__", "task")
+        self.metrics["submitted"] += 1
+        if not self._closed:
+            try:
+                self._queue.put_nowait((description, func, args, kwargs))
+                self._ensure_workers()
+                return True
+            except queue.Full:
+                logger.warning(f"后台任务队列 {self.name} 已满，任务 {description} 改为同步执行")
+        self.metrics["inline"] += 1
+        self._execute(description, func, args, kwargs)
+        return False
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """等待已提交的任务执行完毕，返回是否在超时前完成"""
+        deadline = time.time() + timeout if timeout is not None else None
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """在事件循环中等待任务执行完毕"""
+        return await asyncio.to_thread(self.join, timeout)
+
+    async def shutdown(self, timeout: Optional[float] = None):
+        """停止接收新任务，等待剩余任务完成后结束工作线程"""
+        self._closed = True
+        timeout = timeout if timeout is not None else self.config.get("shutdown_timeout", 30)
+        if not await self.drain(timeout):
+            logger.warning(f"后台任务队列 {self.name} 关闭时仍有 {self._queue.qsize()} 个任务未完成")
+            return
+        with self._lock:
+            for _ in self._threads:
+                self._queue.put(_STOP)
+            self._threads = []
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列统计"""
+        return {
+            "name": self.name,
+            "workers": self.workers,
+            "pending": self._queue.unfinished_tasks,
+            "closed": self._closed,
+            "last_error": self.last_error,
+            **self.metrics
+        }
+
+
+# 全局后台任务队列（对话阶段数据落库等）
+background_tasks = BackgroundTaskQueue("background")
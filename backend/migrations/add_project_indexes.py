@@ -0,0 +1,44 @@
+"""
+添加项目范围查询索引的数据库迁移脚本
+各模型 __table_args__ 中声明的 (project_id, is_deleted) 复合索引与未删除记录的部分索引
+"""
+from sqlalchemy import inspect
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import engine, Base, ensure_indexes
+import app.models  # noqa: F401  注册全部模型
+
+
+def upgrade():
+    """创建模型声明但数据库中缺失的索引"""
+    created = ensure_indexes(engine)
+    for name in created:
+        print(f"✓ 创建索引 {name}")
+    print(f"成功创建 {len(created)} 个索引")
+
+
+def downgrade():
+    """移除本次添加的索引（保留主键、名称等原有索引）"""
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    removed = 0
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            declared = index.name == f"ix_{table.name}_project_id_is_deleted" \
+                or index.name.startswith(f"ix_{table.name}_live_")
+            if declared and index.name in existing:
+                index.drop(bind=engine)
+                removed += 1
+    print(f"成功移除 {removed} 个索引")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "downgrade":
+        downgrade()
+    else:
+        upgrade()
@@ -283,7 +283,7 @@ const AIConfigPanel = () => {
   const testConnection = async () => {
     try {
       setLoading(true);
-      const response = await axios.get('/api/ai/status');
+      const response = await axios.get('/api/ai/status', { params: { probe: true } });
       setAiStatus(response.data);
 
       if (response.data.connected) {
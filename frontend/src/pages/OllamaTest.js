@@ -57,7 +57,7 @@ const OllamaTest = () => {
       await axios.post('/api/ai/switch-provider', { provider: 'ollama' });
 
       // 然后检查状态
-      const response = await axios.get('/api/ai/status');
+      const response = await axios.get('/api/ai/status', { params: { probe: true } });
       setOllamaStatus(response.data);
     } catch (error) {
       console.error('检查Ollama状态失败:', error);
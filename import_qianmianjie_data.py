@@ -102,41 +102,75 @@ class QianMianJieImporter:
             return ""
 
     def extract_characters_from_concept(self, concept_content: str) -> List[Dict]:
-        """从构思文档中提取人物信息"""
-        characters = []
+        """从构思文档中提取人物信息（优先使用AI结构化提取，AI不可用时按表格格式解析）"""
+        if not concept_content.strip():
+            return []
 
-        # 解析构思文档中的角色信息
         character_section = re.search(r'现有角色.*?后续新增角色', concept_content, re.DOTALL)
-        if character_section:
-            lines = character_section.group(0).split('\n')
-            for line in lines:
-                if '男/' in line or '女/' in line:
-                    parts = line.split('\t')
-                    if len(parts) >= 6:
-                        name = parts[0].strip()
-                        gender_age = parts[1].strip()
-                        tag = parts[2].strip()
-                        appearance = parts[3].strip()
-                        personality = parts[4].strip()
-                        ability = parts[5].strip()
-
-                        # 解析性别和年龄
-                        gender = "男" if "男/" in gender_age else "女"
-                        age_match = re.search(r'/(\d+|未知)', gender_age)
-                        age = age_match.group(1) if age_match else "未知"
-
-                        characters.append({
-                            "name": name,
-                            "gender": gender,
-                            "age": age,
-                            "appearance": appearance,
-                            "personality": personality,
-                            "background": tag,
-                            "abilities": ability,
-                            "importance": "主要" if name in ["宋少雨", "盛百威", "灵蜗"] else "次要",
-                            "status": "活跃",
-                            "notes": f"标签: {tag}"
-                        })
+        section_text = character_section.group(0) if character_section else concept_content
+
+        characters = self.extract_characters_with_ai(section_text)
+        if characters:
+            return characters
+
+        print("⚠️ AI人物提取不可用，改为按表格格式解析")
+        return self.parse_character_table(section_text) if character_section else []
+
+    def extract_characters_with_ai(self, text: str) -> List[Dict]:
+        """调用AI人物提取接口（结构化输出，服务端按人物模型校验）"""
+        try:
+            response = requests.post(
+                f"{self.base_url}/ai/extract-characters",
+                json={"text": text},
+                timeout=180
+            )
+            if response.status_code != 200:
+                print(f"⚠️ AI人物提取失败: {response.text}")
+                return []
+
+            characters = response.json()["characters"]
+            for char_data in characters:
+                char_data["status"] = "活跃"
+                if not char_data.get("notes") and char_data.get("background"):
+                    char_data["notes"] = f"标签: {char_data['background']}"
+            print(f"🤖 AI提取到 {len(characters)} 个人物")
+            return characters
+        except Exception as e:
+            print(f"⚠️ 调用AI人物提取时出错: {e}")
+            return []
+
+    def parse_character_table(self, section_text: str) -> List[Dict]:
+        """按制表符分隔的角色表解析人物信息"""
+        characters = []
+
+        for line in section_text.split('\n'):
+            if '男/' in line or '女/' in line:
+                parts = line.split('\t')
+                if len(parts) >= 6:
+                    name = parts[0].strip()
+                    gender_age = parts[1].strip()
+                    tag = parts[2].strip()
+                    appearance = parts[3].strip()
+                    personality = parts[4].strip()
+                    ability = parts[5].strip()
+
+                    # 解析性别和年龄
+                    gender = "男" if "男/" in gender_age else "女"
+                    age_match = re.search(r'/(\d+|未知)', gender_age)
+                    age = age_match.group(1) if age_match else "未知"
+
+                    characters.append({
+                        "name": name,
+                        "gender": gender,
+                        "age": age,
+                        "appearance": appearance,
+                        "personality": personality,
+                        "background": tag,
+                        "abilities": ability,
+                        "importance": "主要" if name in ["宋少雨", "盛百威", "灵蜗"] else "次要",
+                        "status": "活跃",
+                        "notes": f"标签: {tag}"
+                    })
 
         return characters
 
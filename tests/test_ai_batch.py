@@ -0,0 +1,183 @@
+"""
+AI批量生成测试
+"""
+import sys
+import os
+import asyncio
+import httpx
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+# 应用导入时即打开日志文件，日志目录需事先存在
+os.makedirs(os.path.dirname(os.path.abspath("./logs/app.log")), exist_ok=True)
+
+from backend.app.main import app
+from backend.app.api.endpoints import ai_assistant
+from backend.app.services.ai_cache import AIResponseCache, MemoryCacheTier
+from backend.app.services.ai_rate_limit import ProviderQuotaManager
+from backend.app.services.ai_service import AIManager, AIServiceBase
+
+
+def rate_limited(retry_after: str = "0") -> httpx.HTTPStatusError:
+    """构造429错误"""
+    request = httpx.Request("POST", "http://provider.test/chat")
+    response = httpx.Response(429, headers={"Retry-After": retry_after}, request=request)
+    return httpx.HTTPStatusError("429 Too Many Requests", request=request, response=response)
+
+
+class FakeService(AIServiceBase):
+    """按提示词返回预设结果的AI服务，failures 记录每条提示词还需返回几次429"""
+
+    def __init__(self, failures=None, error=None, retry_after="0"):
+        super().__init__({})
+        self.failures = dict(failures or {})
+        self.error = error
+        self.retry_after = retry_after
+        self.calls = []
+
+    async def generate_text(self, prompt: str, **kwargs) -> str:
+        self.calls.append(prompt)
+        if self.error is not None:
+            raise self.error
+        if self.failures.get(prompt):
+            self.failures[prompt] -= 1
+            raise rate_limited(self.retry_after)
+        if prompt == "坏":
+            raise ValueError("无效的提示词")
+        return f"回答：{prompt}"
+
+    async def chat_completion(self, messages, **kwargs) -> str:
+        return await self.generate_text(messages[-1]["content"], **kwargs)
+
+    async def check_connection(self) -> bool:
+        return True
+
+
+class SlowService(FakeService):
+    """记录同时进行的请求数的AI服务"""
+
+    def __init__(self):
+        super().__init__()
+        self.active = 0
+        self.peak = 0
+
+    async def generate_text(self, prompt: str, **kwargs) -> str:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            return await super().generate_text(prompt, **kwargs)
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    """使用假服务的AI管理器，429重试最多2次且不等待"""
+    manager = AIManager()
+    manager.service = FakeService()
+    manager.quota = ProviderQuotaManager(manager.provider_configs, {
+        "enabled": True, "max_retries": 2, "default_retry_after": 0
+    })
+    manager.response_cache = AIResponseCache(tiers=[MemoryCacheTier()], config={"enabled": True, "ttl": 60})
+    monkeypatch.setattr(ai_assistant, "ai_manager", manager)
+    return manager
+
+
+class TestGenerateMany:
+    """批量生成测试类"""
+
+    def test_rate_limit_retried_by_quota_only(self, manager):
+        """测试429只由额度管理器重试，不再叠加批量生成自己的重试"""
+        manager.service.failures = {"甲": 1, "乙": 10}
+        results = asyncio.run(manager.generate_many(["甲", "乙", "丙"], temperature=0.7))
+
+        assert [item["status"] for item in results] == ["success", "error", "success"]
+        assert results[0]["content"] == "回答：甲"
+        assert manager.service.calls.count("甲") == 2
+        assert manager.service.calls.count("乙") == 3  # 首次请求加 max_retries 次重试
+
+
+    def test_rate_limit_does_not_open_circuit(self, manager):
+        """测试限流不计为提供商故障"""
+        manager.service.failures = {"乙": 10}
+        asyncio.run(manager.generate_many(["乙"], temperature=0.7))
+        assert manager.health_monitor.get_status(manager.current_provider)["consecutive_failures"] == 0
+
+
+    def test_failover_respects_backup_concurrency(self, manager):
+        """测试切换到备用提供商的条目按备用提供商的并发上限执行"""
+        primary = manager.current_provider
+        backup = next(provider for provider in manager.provider_configs if provider != primary)
+        manager.router.pool = [primary, backup]
+        manager.service.error = httpx.ConnectError("连接被拒绝")
+        manager.provider_configs[backup] = {**manager.provider_configs[backup], "concurrency": 1}
+        manager._pool_services[backup] = SlowService()
+
+        results = asyncio.run(manager.generate_many(["甲", "乙", "丙"], temperature=0.7))
+        assert [item["status"] for item in results] == ["success"] * 3
+        assert manager._pool_services[backup].peak == 1
+
+    def test_long_retry_after_does_not_open_circuit(self, manager):
+        """测试Retry-After超过路由超时时，退避等待不计为超时，熔断器保持关闭"""
+        primary = manager.current_provider
+        backup = next(provider for provider in manager.provider_configs if provider != primary)
+        manager.router.pool = [primary, backup]
+        manager.service.request_timeout = 0.1
+        manager.service.retry_after = "0.3"
+        manager.service.failures = {"甲": 1}
+
+        assert asyncio.run(manager.generate_text("甲", temperature=0.7)) == "回答：甲"
+        assert manager.service.calls == ["甲", "甲"]
+        status = manager.health_monitor.get_status(primary)
+        assert status["consecutive_failures"] == 0
+        assert not status["circuit_open"]
+        assert manager.router.get_stats(primary).timeouts == 0
+
+
+class TestResponseCacheKey:
+    """响应缓存键测试类"""
+
+    def test_failover_result_keyed_by_answering_provider(self, manager):
+        """测试切换到备用提供商后，结果按实际给出结果的提供商写入缓存"""
+        primary = manager.current_provider
+        backup = next(provider for provider in manager.provider_configs if provider != primary)
+        manager.router.pool = [primary, backup]
+        manager.service.error = httpx.ConnectError("连接被拒绝")
+        manager._pool_services[backup] = FakeService()
+
+        assert asyncio.run(manager.generate_text("甲", temperature=0)) == "回答：甲"
+
+        def cached(provider):
+            model = manager.provider_configs.get(provider, {}).get("model")
+            key = manager.response_cache.make_key(provider, model, "generate_text", "甲", {"temperature": 0})
+            return asyncio.run(manager.response_cache.get(key))
+
+        assert cached(backup) == "回答：甲"
+        assert cached(primary) is None
+
+
+class TestBatchEndpoint:
+    """批量生成端点测试类"""
+
+    def test_batch(self, manager):
+        """测试结果与输入顺序一致，单条失败不影响其他条目"""
+        client = TestClient(app, base_url="http://localhost")
+        response = client.post("/api/ai/batch", json={"prompts": ["甲", "坏", "丙"], "temperature": 0.7})
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert [item["index"] for item in data["results"]] == [0, 1, 2]
+        assert [item["status"] for item in data["results"]] == ["success", "error", "success"]
+        assert data["results"][1]["error"] == "无效的提示词"
+        assert data["summary"] == {"total": 3, "success": 2, "errors": 1}
+        assert data["status"] == "partial"
+
+    def test_batch_validation(self, manager):
+        """测试空列表、超出条数与未知生成类型返回400"""
+        client = TestClient(app, base_url="http://localhost")
+        assert client.post("/api/ai/batch", json={"prompts": []}).status_code == 400
+        assert client.post("/api/ai/batch", json={"prompts": ["甲"] * 501}).status_code == 400
+        assert client.post("/api/ai/batch", json={"prompts": ["甲"], "generation_type": "poem"}).status_code == 400
+        assert manager.service.calls == []
@@ -0,0 +1,67 @@
+"""
+AI响应缓存测试
+"""
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.ai_cache import AIResponseCache, MemoryCacheTier, SQLiteCacheTier
+
+
+class TestAIResponseCache:
+    """响应缓存测试类"""
+
+    def _make_cache(self, tmp_path, memory_entries=2):
+        return AIResponseCache(
+            tiers=[
+                MemoryCacheTier(memory_entries),
+                SQLiteCacheTier(str(tmp_path / "ai_cache.db"), max_entries=3)
+            ],
+            config={"enabled": True, "ttl": 60}
+        )
+
+    def test_temperature_bypass(self):
+        """测试 temperature 大于 0 时默认跳过缓存"""
+        cache = AIResponseCache(tiers=[MemoryCacheTier()], config={"enabled": True, "ttl": 60})
+        assert cache.should_cache(0) is True
+        assert cache.should_cache(0.7) is False
+        assert cache.should_cache(0.7, use_cache=True) is True
+        assert cache.should_cache(0, use_cache=False) is False
+
+    def test_key_depends_on_params(self):
+        """测试缓存键包含模型与参数"""
+        key = AIResponseCache.make_key("ollama", "m1", "generate_text", "提示词", {"max_tokens": 10})
+        assert key == AIResponseCache.make_key("ollama", "m1", "generate_text", "提示词", {"max_tokens": 10})
+        assert key != AIResponseCache.make_key("ollama", "m2", "generate_text", "提示词", {"max_tokens": 10})
+        assert key != AIResponseCache.make_key("ollama", "m1", "generate_text", "提示词", {"max_tokens": 20})
+
+    def test_disk_tier_survives_memory_eviction(self, tmp_path):
+        """测试内存层淘汰后从持久层命中并回填"""
+        cache = self._make_cache(tmp_path)
+
+        async def run():
+            for i in range(3):
+                await cache.set(f"k{i}", {"content": f"结果{i}"})
+            value = await cache.get("k0")
+            return value
+
+        assert asyncio.run(run()) == {"content": "结果0"}
+        stats = cache.get_stats()
+        assert stats["disk_hits"] == 1
+        # k0 写入后被淘汰，回填 k0 时又淘汰 k1
+        assert stats["tiers"]["memory"]["evictions"] == 2
+        cache.close()
+
+    def test_disk_tier_size_eviction(self, tmp_path):
+        """测试持久层超出容量后淘汰最久未访问的条目"""
+        cache = self._make_cache(tmp_path, memory_entries=1)
+
+        async def run():
+            for i in range(5):
+                await cache.set(f"k{i}", f"结果{i}")
+            return await cache.get("k0"), await cache.get("k4")
+
+        assert asyncio.run(run()) == (None, "结果4")
+        assert cache.get_stats()["tiers"]["disk"]["entries"] == 3
+        cache.close()
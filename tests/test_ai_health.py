@@ -0,0 +1,130 @@
+"""
+AI服务健康监测测试
+"""
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+# 应用导入时即打开日志文件，日志目录需事先存在
+os.makedirs(os.path.dirname(os.path.abspath("./logs/app.log")), exist_ok=True)
+
+from backend.app.main import app
+from backend.app.api.endpoints import ai_assistant
+from backend.app.services.ai_health import ProviderHealthMonitor
+from backend.app.services.ai_service import AIManager, AIServiceBase
+
+
+class TestProviderHealthMonitor:
+    """健康监测与熔断测试类"""
+
+    def setup_method(self):
+        """测试前准备"""
+        self.probe_results = {"ollama": True}
+        self.probe_calls = 0
+
+        async def probe(provider):
+            self.probe_calls += 1
+            return self.probe_results.get(provider, False)
+
+        self.monitor = ProviderHealthMonitor(probe, {
+            "interval": 30.0,
+            "ttl": 60.0,
+            "failure_threshold": 2,
+            "recovery_timeout": 30.0
+        })
+
+    def test_cached_status_avoids_probe(self):
+        """测试状态新鲜时不重复探测"""
+        assert asyncio.run(self.monitor.ensure_available("ollama")) is True
+        assert asyncio.run(self.monitor.ensure_available("ollama")) is True
+        assert self.probe_calls == 1
+
+    def test_unknown_provider_is_optimistic(self):
+        """测试未探测的提供商默认放行"""
+        assert self.monitor.is_available("openai") is True
+
+    def test_circuit_opens_after_threshold(self):
+        """测试连续失败达到阈值后熔断"""
+        self.monitor.record_failure("openai", "timeout")
+        assert self.monitor.get_status("openai")["circuit_open"] is False
+        self.monitor.record_failure("openai", "timeout")
+        assert self.monitor.get_status("openai")["circuit_open"] is True
+        assert self.monitor.is_available("openai") is False
+
+    def test_success_closes_circuit(self):
+        """测试成功请求关闭熔断"""
+        self.monitor.record_failure("openai")
+        self.monitor.record_failure("openai")
+        self.monitor.record_success("openai")
+        status = self.monitor.get_status("openai")
+        assert status["circuit_open"] is False
+        assert status["consecutive_failures"] == 0
+        assert self.monitor.is_available("openai") is True
+
+    def test_failed_probe_marks_unavailable(self):
+        """测试探测失败后判定不可用"""
+        assert asyncio.run(self.monitor.ensure_available("claude")) is False
+        assert self.monitor.get_status("claude")["healthy"] is False
+
+    def test_passive_provider_keeps_request_status(self):
+        """测试不支持主动探测的提供商只由真实请求更新状态"""
+        self.probe_results["zhipu"] = None
+        assert asyncio.run(self.monitor.refresh("zhipu")) is True
+        assert self.monitor.get_status("zhipu")["healthy"] is None
+
+        self.monitor.record_failure("zhipu", "timeout")
+        self.monitor.record_failure("zhipu", "timeout")
+        assert asyncio.run(self.monitor.refresh("zhipu")) is False
+        assert self.monitor.get_status("zhipu")["circuit_open"] is True
+        assert self.monitor.get_status("zhipu")["consecutive_failures"] == 2
+
+    def test_zhipu_not_probed(self):
+        """测试智谱AI不发送付费的探测请求"""
+        manager = AIManager()
+        manager.provider_configs["zhipu"] = {"api_key": "key"}
+        assert asyncio.run(manager._probe_provider("zhipu")) is None
+
+
+class PassiveService(AIServiceBase):
+    """不参与主动探测、记录连接检查次数的AI服务"""
+
+    active_probe = False
+
+    def __init__(self):
+        super().__init__({})
+        self.checks = 0
+
+    async def generate_text(self, prompt, **kwargs):
+        return prompt
+
+    async def chat_completion(self, messages, **kwargs):
+        return messages[-1]["content"]
+
+    async def check_connection(self):
+        self.checks += 1
+        return True
+
+
+class TestStatusEndpoint:
+    """AI服务状态端点测试类"""
+
+    def test_status_reads_cache_unless_probe_requested(self, monkeypatch):
+        """测试状态轮询只读取健康缓存，probe=true 时才对不主动探测的提供商发送真实请求"""
+        manager = AIManager()
+        manager.service = PassiveService()
+        monkeypatch.setattr(ai_assistant, "ai_manager", manager)
+        client = TestClient(app, base_url="http://localhost")
+
+        data = client.get("/api/ai/status").json()
+        assert data["status"] == "unknown" and data["connected"] is False
+        manager.health_monitor.record_success(manager.current_provider)
+        data = client.get("/api/ai/status").json()
+        assert data["status"] == "online" and data["connected"] is True
+        assert manager.service.checks == 0
+
+        data = client.get("/api/ai/status", params={"probe": True}).json()
+        assert data["status"] == "online"
+        assert manager.service.checks == 1
@@ -0,0 +1,120 @@
+"""
+AI提供商限流测试
+"""
+import sys
+import os
+import asyncio
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.ai_rate_limit import (
+    ProviderQuotaManager, QuotaLimiter, RateLimitExceeded, TokenBucket, quota_project
+)
+
+LIMIT_CONFIG = {"max_wait": 5.0, "queue_size": 10, "max_retries": 2, "default_retry_after": 0.05}
+
+
+class TestTokenBucket:
+    """令牌桶测试类"""
+
+    def test_refill_and_wait(self):
+        """测试按每分钟额度匀速补充，不限额度时无需等待"""
+        bucket = TokenBucket(60)
+        now = bucket.updated
+        bucket.consume(60, now)
+        assert bucket.time_until(2, now) == pytest.approx(2.0)
+        assert bucket.available(now + 1) == pytest.approx(1.0)
+        assert TokenBucket(0).time_until(10 ** 6, now) == 0.0
+
+
+class TestQuotaLimiter:
+    """限流器测试类"""
+
+    def test_rejects_early_when_wait_too_long(self):
+        """测试预计等待超过上限时立即拒绝，并给出重试时间"""
+        limiter = QuotaLimiter("openai/gpt-4o", rpm=60, tpm=1000, config=LIMIT_CONFIG)
+
+        async def run():
+            assert await limiter.acquire(800) == 800
+            with pytest.raises(RateLimitExceeded) as info:
+                await limiter.acquire(900)
+            return info.value
+
+        error = asyncio.run(run())
+        # 还差700个token，每秒补充约16.7个
+        assert error.retry_after == pytest.approx(42, abs=1)
+        assert limiter.metrics["rejected"] == 1
+
+    def test_fair_queueing_across_projects(self):
+        """测试排队请求按项目轮转放行"""
+        limiter = QuotaLimiter("zhipu/glm-4", rpm=1200, config=LIMIT_CONFIG)
+        limiter.requests.tokens = 0
+        order = []
+
+        async def request(project):
+            await limiter.acquire(1, project)
+            order.append(project)
+
+        async def run():
+            tasks = [asyncio.create_task(request(1)) for _ in range(4)]
+            await asyncio.sleep(0)
+            tasks += [asyncio.create_task(request(2)) for _ in range(2)]
+            await asyncio.gather(*tasks)
+
+        asyncio.run(run())
+        assert order == [1, 2, 1, 2, 1, 1]
+        assert limiter.metrics["throttled"] == 6
+
+    def test_backoff_pauses_and_release_refunds(self):
+        """测试429后暂停放行，结束后退还未用完的token"""
+        limiter = QuotaLimiter("siliconflow/deepseek-chat", tpm=600, config=LIMIT_CONFIG)
+
+        async def run():
+            reserved = await limiter.acquire(500)
+            limiter.release(reserved, 100)
+            assert limiter.tokens.available(limiter.tokens.updated) == pytest.approx(500, abs=1)
+            limiter.backoff(0.1)
+            start = asyncio.get_running_loop().time()
+            await limiter.acquire(10)
+            return asyncio.get_running_loop().time() - start
+
+        assert asyncio.run(run()) >= 0.09
+        assert limiter.metrics["backoffs"] == 1
+
+
+class TestProviderQuotaManager:
+    """额度管理测试类"""
+
+    def test_limits_from_provider_config(self):
+        """测试额度读取自提供商配置，支持按模型覆盖与运行时更新"""
+        configs = {
+            "openai": {"model": "gpt-4o", "rpm": 500, "tpm": 30000, "rate_limits": {"gpt-4o-mini": {"rpm": 5000}}},
+            "ollama": {"model": "qwen2"},
+        }
+        quota = ProviderQuotaManager(configs, config=LIMIT_CONFIG)
+        assert quota.get_limiter("openai", "gpt-4o").limits == (500, 30000)
+        assert quota.get_limiter("openai", "gpt-4o-mini").limits == (5000, 0)
+        assert quota.get_limiter("ollama", "qwen2").limits == (0, 0)
+
+        configs["openai"]["rpm"] = 100
+        assert quota.get_limiter("openai", "gpt-4o").limits == (100, 30000)
+        assert set(quota.get_stats()) == {"openai/gpt-4o", "openai/gpt-4o-mini", "ollama/qwen2"}
+        assert quota.backoff("openai", "gpt-4o", None, attempt=2) == pytest.approx(0.2)
+
+    def test_project_from_context(self):
+        """测试按当前请求所属项目排队"""
+        quota = ProviderQuotaManager({"openai": {"model": "gpt-4o", "rpm": 60}}, config=LIMIT_CONFIG)
+        limiter = quota.get_limiter("openai", "gpt-4o")
+        limiter.requests.tokens = 0
+
+        async def run():
+            quota_project.set(7)
+            task = asyncio.create_task(quota.acquire("openai", "gpt-4o", 10))
+            await asyncio.sleep(0)
+            assert list(limiter._waiters) == [7]
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        assert limiter.queued == 0
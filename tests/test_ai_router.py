@@ -0,0 +1,228 @@
+"""
+AI提供商路由测试
+"""
+import sys
+import os
+import asyncio
+import httpx
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.ai_health import ProviderHealthMonitor
+from backend.app.services.ai_router import ProviderRouter, ProviderTimeoutError, run_with_timeout
+from backend.app.services.ai_service import AIManager, AIServiceBase
+
+
+async def _always_healthy(provider):
+    return True
+
+
+def _server_error(status: int = 503) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://provider.test/chat")
+    response = httpx.Response(status, request=request)
+    return httpx.HTTPStatusError(f"{status}", request=request, response=response)
+
+
+def _make_router(timeout_for=None, **overrides):
+    config = {
+        "providers": ["openai", "zhipu", "ollama"],
+        "min_samples": 2,
+        "default_latency": 1.0,
+        "switch_ratio": 2.0,
+        "timeout": 0.2,
+        "first_token_timeout": 0.2,
+        "hedge_after_ms": 0,
+    }
+    config.update(overrides)
+    monitor = ProviderHealthMonitor(_always_healthy, config={"failure_threshold": 1, "recovery_timeout": 60})
+    return ProviderRouter(monitor, config=config, timeout_for=timeout_for)
+
+
+class TestProviderRouter:
+    """非流式调用路由测试类"""
+
+    def test_failover_on_error_and_timeout(self):
+        """测试出错或超时后切换到下一个提供商"""
+        router = _make_router()
+        calls = []
+
+        async def invoke(provider):
+            calls.append(provider)
+            if provider == "openai":
+                raise _server_error()
+            if provider == "zhipu":
+                await asyncio.sleep(1)
+            return f"来自{provider}"
+
+        result = asyncio.run(router.call(["openai", "zhipu", "ollama"], invoke))
+        assert result == "来自ollama"
+        assert calls == ["openai", "zhipu", "ollama"]
+        assert router.get_stats("openai").failovers == 1
+        assert router.get_stats("zhipu").timeouts == 1
+        # 超时计入健康监测，熔断后排到最后
+        assert router.candidates("openai")[-1] == "zhipu"
+
+    def test_non_transient_error_not_failed_over(self):
+        """测试密钥缺失、请求无效等错误直接抛出，不切换提供商"""
+        router = _make_router()
+        calls = []
+
+        async def invoke(provider):
+            calls.append(provider)
+            if provider == "openai":
+                raise ValueError("API密钥未配置")
+            raise _server_error(400)
+
+        with pytest.raises(ValueError):
+            asyncio.run(router.call(["openai", "zhipu"], invoke))
+        with pytest.raises(httpx.HTTPStatusError):
+            asyncio.run(router.call(["zhipu", "openai"], invoke))
+        assert calls == ["openai", "zhipu"]
+
+    def test_timeout_per_provider(self):
+        """测试按提供商的超时等待，慢速的本地模型不会被统一超时取消"""
+        router = _make_router(timeout_for=lambda provider: 1.0 if provider == "ollama" else None)
+
+        async def invoke(provider):
+            await asyncio.sleep(0.4)
+            return provider
+
+        assert asyncio.run(router.call(["ollama", "openai"], invoke)) == "ollama"
+        assert router.get_stats("ollama").timeouts == 0
+        assert router.get_status("ollama")["provider_timeouts"] == {"ollama": 1.0, "openai": 0.2, "zhipu": 0.2}
+
+    def test_per_attempt_timeout(self):
+        """测试调用方自行计时时，排队等待不计入超时；实际请求超时才计为提供商故障"""
+        router = _make_router()
+        received = []
+
+        async def invoke(provider, timeout):
+            received.append(timeout)
+            await asyncio.sleep(0.3)  # 本地排队，超过路由超时
+            return await run_with_timeout(provider, asyncio.sleep(0.5 if provider == "openai" else 0.01, provider), timeout)
+
+        assert asyncio.run(router.call(["zhipu", "openai"], invoke, per_attempt=True)) == "zhipu"
+        assert received == [0.2]
+        assert router.health_monitor.get_status("zhipu")["consecutive_failures"] == 0
+
+        assert asyncio.run(router.call(["openai", "zhipu"], invoke, per_attempt=True)) == "zhipu"
+        assert router.get_stats("openai").timeouts == 1
+        assert router.health_monitor.get_status("openai")["consecutive_failures"] == 1
+
+    def test_manager_uses_service_timeouts(self):
+        """测试AI管理器按各服务的请求超时设置路由超时"""
+        manager = AIManager()
+        manager.provider_configs["openai"] = {"timeout": 90}
+        assert manager.router.timeout_for("ollama") == 120.0
+        assert manager.router.timeout_for("openai") == 90.0
+
+    def test_all_failed_raises_last_error(self):
+        """测试全部失败时抛出最后一个错误"""
+        router = _make_router()
+
+        async def invoke(provider):
+            await asyncio.sleep(1)
+
+        with pytest.raises(ProviderTimeoutError):
+            asyncio.run(router.call(["openai", "zhipu"], invoke))
+
+    def test_hedged_request_wins(self):
+        """测试首个提供商响应过慢时对冲请求先返回，落败的请求被取消"""
+        router = _make_router(hedge_after_ms=20)
+
+        async def invoke(provider):
+            await asyncio.sleep(0.5 if provider == "openai" else 0.01)
+            return provider
+
+        assert asyncio.run(router.call(["openai", "zhipu"], invoke)) == "zhipu"
+        assert router.get_stats("zhipu").hedges == 1
+        assert router.get_stats("zhipu").hedge_wins == 1
+        assert router.get_stats("openai").cancelled == 1
+
+    def test_latency_aware_order(self):
+        """测试当前提供商明显变慢时让位给最快的提供商"""
+        router = _make_router()
+        for latency in (3.0, 3.2):
+            router.get_stats("openai").latencies.append(latency)
+        for latency in (0.5, 0.6):
+            router.get_stats("ollama").latencies.append(latency)
+        # zhipu 样本不足，按假定延迟1秒计
+        assert router.candidates("openai") == ["ollama", "openai", "zhipu"]
+        assert router.candidates("zhipu") == ["zhipu", "ollama", "openai"]
+        status = router.get_status("openai")
+        assert status["order"][0] == "ollama"
+        assert status["providers"]["openai"]["latency_p50_ms"] == 3000.0
+
+
+class TestProviderStreamRouter:
+    """流式调用路由测试类"""
+
+    def test_stream_hedge_closes_loser(self):
+        """测试首个数据块先到的流胜出，另一个流被关闭"""
+        router = _make_router(hedge_after_ms=20)
+        closed = []
+
+        async def open_stream(provider):
+            try:
+                await asyncio.sleep(0.5 if provider == "openai" else 0.01)
+                for chunk in ("你好", "，", provider):
+                    yield chunk
+            finally:
+                closed.append(provider)
+
+        async def collect():
+            return [chunk async for chunk in router.stream(["openai", "zhipu"], open_stream)]
+
+        assert asyncio.run(collect()) == ["你好", "，", "zhipu"]
+        assert sorted(closed) == ["openai", "zhipu"]
+        assert len(router.get_stats("zhipu").first_token_latencies) == 1
+
+    def test_stream_failover_before_first_chunk(self):
+        """测试首个数据块之前出错时切换提供商"""
+        router = _make_router()
+
+        async def open_stream(provider):
+            if provider == "openai":
+                raise httpx.ConnectError("连接失败")
+            yield provider
+
+        async def collect():
+            return [chunk async for chunk in router.stream(["openai", "ollama"], open_stream)]
+
+        assert asyncio.run(collect()) == ["ollama"]
+        assert router.get_stats("openai").failures == 1
+
+    def test_stream_queue_wait_not_timed(self, monkeypatch):
+        """测试AI管理器的流式调用在额度放行后才开始计算首个数据块的超时"""
+
+        class EchoService(AIServiceBase):
+            request_timeout = 0.2
+
+            async def generate_text(self, prompt, **kwargs):
+                return prompt
+
+            async def chat_completion(self, messages, **kwargs):
+                return messages[-1]["content"]
+
+            async def check_connection(self):
+                return True
+
+        manager = AIManager()
+        manager.service = EchoService({})
+        manager.router = _make_router()
+        manager.router.health_monitor = manager.health_monitor
+        manager.router.pool = [manager.current_provider, "zhipu"]
+        manager.router.first_token_timeout = 0.2
+        acquire = manager.quota.acquire
+
+        async def slow_acquire(*args):
+            await asyncio.sleep(0.3)
+            return await acquire(*args)
+
+        monkeypatch.setattr(manager.quota, "acquire", slow_acquire)
+
+        async def collect():
+            return [chunk async for chunk in manager.stream_generate("你好")]
+
+        assert asyncio.run(collect()) == ["你好"]
+        assert manager.router.get_stats(manager.current_provider).timeouts == 0
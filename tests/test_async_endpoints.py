@@ -0,0 +1,212 @@
+"""
+异步会话端点测试
+各路由改用 AsyncSession 后的创建、列表、更新、删除往返，以及 AsyncSession 下的延迟加载
+"""
+import sys
+import os
+import asyncio
+import logging
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import MissingGreenlet
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+# 应用导入时即打开日志文件，日志目录需事先存在
+os.makedirs(os.path.dirname(os.path.abspath("./logs/app.log")), exist_ok=True)
+
+from backend.app.main import app
+from backend.app.api.endpoints import political_systems
+from backend.app.core.database import Base, get_async_db
+from backend.app.models.project import Project
+from backend.app.schemas.project import ProjectUpdate
+from backend.app.services.project_service import ProjectService
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """建好表的临时异步数据库"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+@pytest.fixture
+def session_factory(engine):
+    """与应用一致的会话工厂（提交后不过期）"""
+    return async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+@pytest.fixture
+def client(session_factory, caplog):
+    """使用临时数据库的测试客户端，结束时检查日志中没有 MissingGreenlet"""
+    async def override_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_db
+    try:
+        with caplog.at_level(logging.ERROR):
+            yield TestClient(app, base_url="http://localhost")
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+    assert "greenlet" not in caplog.text.lower()
+
+
+@pytest.fixture
+def project(client):
+    """测试项目"""
+    response = client.post("/api/projects/", json={"name": "测试项目"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def round_trip(client, base, body, changes, list_url=None):
+    """创建、列表、更新、删除一条记录，删除后列表中不再出现"""
+    list_url = list_url or f"{base}?project_id={body.get('project_id', 1)}"
+
+    response = client.post(base, json=body)
+    assert response.status_code == 200, response.text
+    record_id = response.json()["id"]
+
+    response = client.get(list_url)
+    assert response.status_code == 200, response.text
+    assert record_id in [item["id"] for item in response.json()]
+
+    response = client.put(f"{base.rstrip('/')}/{record_id}", json=changes)
+    assert response.status_code == 200, response.text
+    assert {key: response.json()[key] for key in changes} == changes
+
+    response = client.delete(f"{base.rstrip('/')}/{record_id}")
+    assert response.status_code == 200, response.text
+
+    response = client.get(list_url)
+    assert response.status_code == 200, response.text
+    assert record_id not in [item["id"] for item in response.json()]
+
+
+class TestAsyncRoundTrip:
+    """异步端点往返测试类"""
+
+    def test_projects(self, client):
+        """测试项目"""
+        response = client.post("/api/projects/", json={"name": "天元纪"})
+        assert response.status_code == 200, response.text
+        project_id = response.json()["id"]
+
+        response = client.get("/api/projects/")
+        assert response.status_code == 200, response.text
+        assert [item["name"] for item in response.json()["projects"]] == ["天元纪"]
+
+        response = client.put(f"/api/projects/{project_id}", json={"name": "太初纪"})
+        assert response.status_code == 200, response.text
+        assert response.json()["name"] == "太初纪"
+
+        assert client.delete(f"/api/projects/{project_id}").status_code == 200
+        assert client.get("/api/projects/").json()["projects"] == []
+        assert client.get(f"/api/projects/{project_id}").status_code == 404
+
+    @pytest.mark.parametrize("base", [
+        "/api/civilian-systems/",
+        "/api/judicial-systems/",
+        "/api/profession-systems/",
+        "/api/secret-realm-distributions/",
+    ])
+    def test_world_systems(self, client, base):
+        """测试世界设定类路由"""
+        round_trip(client, base, {"name": "旧名", "project_id": 1}, {"name": "新名"})
+
+    def test_political_systems(self, session_factory):
+        """测试政治体系（路由未挂载到应用，单独挂载测试）"""
+        political_app = FastAPI()
+        political_app.include_router(political_systems.router, prefix="/api/political-systems")
+
+        async def override_db():
+            async with session_factory() as session:
+                yield session
+
+        political_app.dependency_overrides[get_async_db] = override_db
+        client = TestClient(political_app, base_url="http://localhost")
+        round_trip(client, "/api/political-systems/", {"name": "旧名", "project_id": 1}, {"name": "新名"})
+
+    def test_character_relations(self, client):
+        """测试角色关系"""
+        round_trip(
+            client, "/api/relations/character-relations",
+            {"project_id": 1, "character_a_id": 1, "character_b_id": 2, "relation_type": "friend"},
+            {"relation_type": "enemy"},
+        )
+
+    def test_faction_relations(self, client):
+        """测试势力关系（只有创建与列表）"""
+        response = client.post("/api/relations/faction-relations", json={
+            "project_id": 1, "faction_a_id": 1, "faction_b_id": 2, "relation_type": "alliance"
+        })
+        assert response.status_code == 200, response.text
+        relation_id = response.json()["id"]
+
+        response = client.get("/api/relations/faction-relations?project_id=1")
+        assert response.status_code == 200, response.text
+        assert [item["id"] for item in response.json()] == [relation_id]
+
+    def test_project_data(self, client, project):
+        """测试项目数据"""
+        base = f"/api/project-data/projects/{project['id']}/data"
+
+        response = client.post(f"{base}/map_structure", json={"data": {"name": "九州"}})
+        assert response.status_code == 200, response.text
+        record_id = response.json()["data"]["id"]
+
+        def names():
+            response = client.get(f"{base}?model_name=map_structure")
+            assert response.status_code == 200, response.text
+            return [item["name"] for item in response.json()["data"]["map_structure"]]
+
+        assert names() == ["九州"]
+
+        response = client.put(f"{base}/map_structure/{record_id}", json={"data": {"name": "十洲"}})
+        assert response.status_code == 200, response.text
+        assert names() == ["十洲"]
+
+        assert client.delete(f"{base}/map_structure/{record_id}").status_code == 200
+        assert names() == []
+
+
+class TestMissingGreenlet:
+    """AsyncSession 延迟加载测试类"""
+
+    def test_service_results_usable_outside_session(self, session_factory):
+        """测试服务返回的对象在提交后读取属性不再触发数据库加载"""
+        async def update():
+            async with session_factory() as db:
+                project = Project(name="旧名")
+                db.add(project)
+                await db.commit()
+                return await ProjectService(db).update_project(project.id, ProjectUpdate(name="新名"))
+
+        project = asyncio.run(update())
+        assert project.name == "新名"
+        assert project.to_dict()["name"] == "新名"
+        assert project.get_progress()["status"] == "planning"
+
+    def test_expired_attribute_raises(self, engine):
+        """测试提交后过期的属性在异步上下文之外读取会抛出 MissingGreenlet，应用的会话工厂因此不在提交时过期"""
+        expiring = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=True)
+
+        async def create():
+            async with expiring() as db:
+                project = Project(name="项目")
+                db.add(project)
+                await db.commit()
+                with pytest.raises(MissingGreenlet):
+                    project.name
+
+        asyncio.run(create())
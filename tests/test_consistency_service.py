@@ -0,0 +1,148 @@
+"""
+整卷一致性检查测试
+"""
+import sys
+import os
+import asyncio
+import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.ai_cache import AIResponseCache, MemoryCacheTier
+from backend.app.services.consistency_service import (
+    ClaimMerger, VolumeConsistencyChecker, extract_json_array
+)
+
+FACT_SHEET = {
+    "characters": [
+        {"name": "林动", "aliases": ["小貂"], "gender": "男", "age": 16, "race": None,
+         "bloodline": None, "cultivation_level": "地元境", "status": "存活"},
+    ],
+    "cultivation_levels": {"元力体系": ["淬体境", "地元境", "天元境"]},
+    "timeline": [],
+}
+
+CHAPTER_CLAIMS = {
+    "第一章": [{"subject": "林动", "attribute": "境界", "value": "天元境"},
+               {"subject": "林动", "attribute": "性别", "value": "男性"}],
+    "第二章": [{"subject": "小貂", "attribute": "修为", "value": "地元境"},
+               {"subject": "林动", "attribute": "出场", "value": "是"}],
+    "第三章": [{"subject": "林动", "attribute": "性别", "value": "女"}],
+}
+
+
+class FakeManager:
+    """按章节标题返回固定断言的AI管理器"""
+
+    def __init__(self):
+        self.map_calls = 0
+        self.review_prompts = []
+
+    def get_current_provider(self):
+        return "ollama"
+
+    def get_current_model(self):
+        return "test-model"
+
+    async def generate_many(self, prompts, **kwargs):
+        self.map_calls += len(prompts)
+        results = []
+        for index, prompt in enumerate(prompts):
+            title = next(name for name in CHAPTER_CLAIMS if name in prompt)
+            results.append({"index": index, "status": "success",
+                            "content": "```json\n" + json.dumps(CHAPTER_CLAIMS[title], ensure_ascii=False) + "\n```"})
+        return results
+
+    async def generate_text_with_thinking(self, prompt, **kwargs):
+        self.review_prompts.append(prompt)
+        return {"content": '[{"subject": "林动", "attribute": "修为", "chapters": [1, 2], "severity": "high"}]'}
+
+
+def make_material(contents):
+    return {
+        "fact_sheet": FACT_SHEET,
+        "chapters": [
+            {"id": number, "chapter_number": number, "title": title, "content": contents[title], "structural_issues": []}
+            for number, title in enumerate(contents, start=1)
+        ],
+    }
+
+
+class TestConsistencyChecker:
+    """一致性检查测试类"""
+
+    def test_extract_json_array(self):
+        """测试从带说明文字的输出中提取JSON数组"""
+        assert extract_json_array('结果如下：[{"a": 1}] 以上') == [{"a": 1}]
+        assert extract_json_array("无法解析") is None
+
+    def test_conflict_rules(self):
+        """测试别名归一、修为倒退与设定不符"""
+        merger = ClaimMerger(FACT_SHEET)
+        merged = merger.merge([
+            ({"chapter_number": 1}, CHAPTER_CLAIMS["第一章"]),
+            ({"chapter_number": 2}, CHAPTER_CLAIMS["第二章"]),
+            ({"chapter_number": 3}, CHAPTER_CLAIMS["第三章"]),
+        ])
+        conflicts = {(c["subject"], c["attribute"]): c["rule"] for c in merger.find_conflicts(merged)}
+        assert conflicts == {("林动", "修为"): "修为倒退", ("林动", "性别"): "与设定不符"}
+
+    def test_death_then_appearance(self):
+        """测试死亡后再次出场"""
+        merger = ClaimMerger(FACT_SHEET)
+        merged = merger.merge([
+            ({"chapter_number": 1}, [{"subject": "林动", "attribute": "状态", "value": "陨落"}]),
+            ({"chapter_number": 4}, [{"subject": "林动", "attribute": "出场", "value": "是"}]),
+        ])
+        assert [c["rule"] for c in merger.find_conflicts(merged)] == ["死亡后再次出场"]
+
+    def test_recheck_only_processes_edited_chapters(self):
+        """测试重新检查时只处理内容变化的章节"""
+        manager = FakeManager()
+        cache = AIResponseCache(tiers=[MemoryCacheTier()], config={"enabled": True, "ttl": 60})
+        checker = VolumeConsistencyChecker(
+            config={"fact_sheet_tokens": 500, "max_chapters": 10}, manager=manager, cache=cache
+        )
+        contents = {"第一章": "林动突破。", "第二章": "林动修炼。", "第三章": "林动出关。"}
+
+        result = asyncio.run(checker.check(make_material(contents)))
+        assert manager.map_calls == 3
+        assert result["stats"]["conflicts"] == 2
+        assert result["issues"][0]["attribute"] == "修为"
+        assert "林动.修为［修为倒退］" in manager.review_prompts[0]
+
+        contents["第二章"] = "林动修炼，略有所得。"
+        result = asyncio.run(checker.check(make_material(contents)))
+        assert manager.map_calls == 4
+        assert result["stats"]["cache_hits"] == 2
+        assert [report["cached"] for report in result["chapters"]] == [True, False, True]
+
+    def test_fact_sheet_change_invalidates_cache(self):
+        """测试人物别名等设定修改后重新提取所有章节"""
+        manager = FakeManager()
+        checker = VolumeConsistencyChecker(
+            config={"fact_sheet_tokens": 500, "max_chapters": 10}, manager=manager,
+            cache=AIResponseCache(tiers=[MemoryCacheTier()], config={"enabled": True, "ttl": 60})
+        )
+        contents = {"第一章": "林动突破。", "第二章": "林动修炼。"}
+        asyncio.run(checker.check(make_material(contents)))
+        assert manager.map_calls == 2
+
+        material = make_material(contents)
+        material["fact_sheet"] = {
+            **FACT_SHEET,
+            "characters": [{**FACT_SHEET["characters"][0], "aliases": ["小貂", "林小子"]}],
+        }
+        result = asyncio.run(checker.check(material))
+        assert manager.map_calls == 4
+        assert result["stats"]["cache_hits"] == 0
+
+    def test_no_review_without_conflicts(self):
+        """测试没有冲突时不调用最终判断"""
+        manager = FakeManager()
+        checker = VolumeConsistencyChecker(
+            config={"fact_sheet_tokens": 500}, manager=manager,
+            cache=AIResponseCache(tiers=[MemoryCacheTier()], config={"enabled": True, "ttl": 60})
+        )
+        result = asyncio.run(checker.check(make_material({"第二章": "林动修炼。"})))
+        assert result["issues"] == [] and result["report"] is None
+        assert manager.review_prompts == []
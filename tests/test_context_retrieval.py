@@ -0,0 +1,102 @@
+"""
+项目资料检索测试
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend.app.core.database import Base
+from backend.app.models.chapter import Chapter
+from backend.app.models.character import Character
+from backend.app.models.timeline import Timeline
+from backend.app.services.context_retrieval import (
+    CONTEXT_SOURCES, ContextRetriever, HashingEmbedder, ProjectVectorIndex, estimate_tokens, split_text
+)
+
+
+class TestChunking:
+    """切分与token估算测试类"""
+
+    def test_split_merges_short_paragraphs(self):
+        """测试短段落合并、长段落按句切分"""
+        assert split_text("第一段\n\n第二段", 20) == ["第一段\n第二段"]
+        chunks = split_text("甲" * 8 + "。" + "乙" * 8 + "。", 10)
+        assert chunks == ["甲" * 8 + "。", "乙" * 8 + "。"]
+        assert all(len(chunk) <= 10 for chunk in split_text("丙" * 35, 10))
+
+    def test_estimate_tokens(self):
+        """测试中文按字、英文按字符折算"""
+        assert estimate_tokens("太极拳") == 3
+        assert estimate_tokens("abcdefgh") == 2
+        assert estimate_tokens("") == 0
+
+    def test_hashing_embedder_is_deterministic(self):
+        """测试哈希向量在多次调用间一致"""
+        embedder = HashingEmbedder(64)
+        first, second = embedder.embed(["武当太极"]), embedder.embed(["武当太极"])
+        assert (first == second).all()
+        assert first.shape == (1, 64)
+
+
+class TestContextRetriever:
+    """资料检索测试类"""
+
+    def setup_method(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine, tables=[model.__table__ for model, _ in CONTEXT_SOURCES.values()])
+        self.session = Session(self.engine)
+        self.session.add_all([
+            Character(project_id=1, name="张三丰", background="武当派创始人，精通太极拳和太极剑。"),
+            Character(project_id=1, name="李寻欢", background="小李飞刀，例无虚发。"),
+            Character(project_id=2, name="张无忌", background="也会太极剑。"),
+            Timeline(project_id=1, name="主线", events=[
+                {"time": "100年", "name": "武当立派", "description": "张三丰于武当山创立武当派"}
+            ]),
+            Chapter(project_id=1, name="第一章", title="飞刀", chapter_number=1,
+                    content="\n\n".join("李寻欢独自喝酒，飞刀在手。" * 4 for _ in range(10)))
+        ])
+        self.session.commit()
+
+    def teardown_method(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def _retriever(self, index_dir=None, **config):
+        return ContextRetriever(config={
+            "enabled": True, "embedder": "hashing", "embedding_dim": 512, "index_dir": index_dir,
+            "chunk_chars": 60, "top_k": 3, "token_budget": 200, "min_score": 0.05, **config
+        })
+
+    def test_relevant_chunks_first(self):
+        """测试最相关的片段排在前面且限定在项目内"""
+        context = self._retriever().build_context(self.session, 1, "张三丰的太极剑")
+        titles = [chunk["title"] for chunk in context["chunks"]]
+        assert titles[0] == "张三丰"
+        assert "张无忌" not in titles
+        assert context["text"].startswith("【人物】张三丰")
+
+    def test_token_budget_and_source_filter(self):
+        """测试token预算与资料类型限制"""
+        retriever = self._retriever(top_k=10)
+        chunks = retriever.retrieve(self.session, 1, "李寻欢喝酒飞刀", token_budget=40)
+        assert chunks and sum(chunk["tokens"] for chunk in chunks) <= 40
+        chunks = retriever.retrieve(self.session, 1, "李寻欢", source_types=["character"])
+        assert {chunk["model_name"] for chunk in chunks} == {"character"}
+
+    def test_index_persisted_and_rebuilt_on_change(self, tmp_path):
+        """测试索引保存到磁盘，数据变化后重建"""
+        self._retriever(str(tmp_path)).build_context(self.session, 1, "飞刀")
+        assert ProjectVectorIndex.load(str(tmp_path), 1) is not None
+
+        retriever = self._retriever(str(tmp_path))
+        retriever.build_context(self.session, 1, "飞刀")
+        assert retriever.metrics["disk_loads"] == 1 and retriever.metrics["builds"] == 0
+
+        self.session.add(Character(project_id=1, name="阿飞", background="快剑"))
+        self.session.commit()
+        context = retriever.build_context(self.session, 1, "阿飞的快剑")
+        assert retriever.metrics["builds"] == 1
+        assert context["chunks"][0]["title"] == "阿飞"
@@ -0,0 +1,143 @@
+"""
+对话输入分析与后台落库测试
+"""
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.structured_output import generate_with_retries
+from backend.app.services.conversation_service import ConversationService, ConversationStage
+from backend.app.services.conversation_store import ConversationSessionStore
+from backend.app.services.task_queue import BackgroundTaskQueue
+
+
+class FakeAnalysisManager:
+    """按提示词内容返回对应分析结果，并记录同时进行的调用数"""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.active = 0
+        self.max_active = 0
+
+    def get_current_provider(self):
+        return "openai"
+
+    def get_current_model(self):
+        return "gpt-4o"
+
+    async def generate_text(self, prompt, **kwargs):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0.01)
+            for keyword, response in self.responses.items():
+                if keyword in prompt:
+                    if isinstance(response, Exception):
+                        raise response
+                    return response
+            return ""
+        finally:
+            self.active -= 1
+
+    async def generate_structured(self, prompt, schema, max_retries=None, **kwargs):
+        return await generate_with_retries(
+            lambda current: self.generate_text(current, **kwargs), prompt, schema, max_retries
+        )
+
+
+class TestConversationAnalysis:
+    """对话输入并发分析测试类"""
+
+    def _make_service(self, tmp_path, manager, task_queue=None):
+        store = ConversationSessionStore(config={"path": str(tmp_path / "sessions.db"), "ttl": 60})
+        service = ConversationService(None, store=store, task_queue=task_queue)
+        service.ai_manager = manager
+        return service, store
+
+    def test_extractions_run_concurrently(self, tmp_path):
+        """测试三路提取并发执行并合并结果"""
+        manager = FakeAnalysisManager({
+            '"entities"': '{"entities": [{"name": "青云宗", "type": "faction"}]}',
+            "user_intent": '{"user_intent": "provide_info", "sentiment": "positive", "confidence": 0.8}',
+            "settings": '{"settings": {"project_type": "仙侠", "theme": "逆天改命"}, "preferences": {"style": "热血"}}',
+        })
+        service, store = self._make_service(tmp_path, manager)
+        service.start_conversation("u1")
+        result = asyncio.run(service.process_user_input("u1", "我想写一部仙侠小说，主题是逆天改命"))
+
+        assert manager.max_active == 3
+        assert result["collected_data"]["theme_setting"] == {"project_type": "仙侠", "theme": "逆天改命"}
+        assert result["stage"] == ConversationStage.WORLD_BUILDING.value
+        assert result["usage"]["calls"] == 3
+        context = store.get("u1", lambda data: data)
+        assert context.user_preferences == {"style": "热血"}
+        store.close()
+
+    def test_failed_extraction_falls_back(self, tmp_path):
+        """测试单路失败或输出无效时使用默认值，不影响其他结果"""
+        manager = FakeAnalysisManager({
+            '"entities"': RuntimeError("AI服务不可用"),
+            "user_intent": "好的",
+            "settings": '{"settings": {"theme": "复仇"}}',
+        })
+        service, store = self._make_service(tmp_path, manager)
+        service.start_conversation("u1")
+        context = service._get_context("u1")
+        analysis = asyncio.run(service._analyze_user_input(context, "主题是复仇", None))
+
+        assert sorted(analysis["failed"]) == ["entities", "sentiment"]
+        assert analysis["entities"] == [] and analysis["confidence"] == 0.0
+        assert analysis["extracted_data"] == {"theme": "复仇"}
+        store.close()
+
+    def test_stage_data_saved_in_background(self, tmp_path):
+        """测试阶段数据通过后台任务队列使用独立会话写入"""
+        task_queue = BackgroundTaskQueue("test", config={"workers": 1})
+        calls = []
+
+        class FakeSession:
+            def query(self, *args):
+                calls.append("query")
+                raise RuntimeError("项目表不可用")
+
+            def close(self):
+                calls.append("close")
+
+        service, store = self._make_service(tmp_path, FakeAnalysisManager({}), task_queue=task_queue)
+        service.session_factory = FakeSession
+        service.start_conversation("u1")
+        context = service._get_context("u1")
+        context.project_id = 1
+        context.stage = ConversationStage.WORLD_BUILDING
+        service._save_stage_data(context)
+
+        assert task_queue.join(timeout=5)
+        assert calls == ["query", "close"]
+        assert task_queue.metrics["failed"] == 1
+        store.close()
+
+
+class TestBackgroundTaskQueue:
+    """后台任务队列测试类"""
+
+    def test_tasks_run_in_order(self):
+        """测试任务按提交顺序在后台执行，失败不影响后续任务"""
+        task_queue = BackgroundTaskQueue("test", config={"workers": 1, "queue_size": 10})
+        results = []
+
+        def fail():
+            raise ValueError("写入失败")
+
+        for i in range(5):
+            assert task_queue.submit(results.append, i) is True
+        task_queue.submit(fail)
+        task_queue.submit(results.append, 5)
+        assert task_queue.join(timeout=5)
+        assert results == [0, 1, 2, 3, 4, 5]
+        assert task_queue.metrics["failed"] == 1
+
+        asyncio.run(task_queue.shutdown(timeout=5))
+        # 关闭后提交的任务同步执行
+        assert task_queue.submit(results.append, 6) is False
+        assert results[-1] == 6
@@ -0,0 +1,186 @@
+"""
+对话会话存储测试
+"""
+import sys
+import os
+import asyncio
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.conversation_store import ConversationSessionStore
+from backend.app.services.conversation_service import ConversationContext, ConversationService, ConversationStage
+from backend.app.services.conversation_summarizer import ConversationSummarizer
+from backend.app.services.prompt_builder import estimate_tokens
+
+
+class TestConversationSessionStore:
+    """会话存储测试类"""
+
+    def _make_store(self, tmp_path, **config):
+        return ConversationSessionStore(
+            config={"path": str(tmp_path / "sessions.db"), "ttl": 60, **config}
+        )
+
+    def test_context_round_trip(self):
+        """测试对话上下文序列化与还原"""
+        context = ConversationContext()
+        context.stage = ConversationStage.WORLD_BUILDING
+        context.project_id = 3
+        context.collected_data = {"theme_setting": {"theme": "修仙"}}
+        restored = ConversationContext.from_dict(context.to_dict())
+        assert restored.stage == ConversationStage.WORLD_BUILDING
+        assert restored.project_id == 3
+        assert restored.collected_data == context.collected_data
+        assert "pending_confirmations" not in context.to_dict()
+
+    def test_history_is_trimmed(self):
+        """测试对话记录超过上限时丢弃最早的记录"""
+        context = ConversationContext()
+        for i in range(5):
+            context.add_history({"content": i}, max_history=3)
+        assert [entry["content"] for entry in context.conversation_history] == [2, 3, 4]
+        assert context.history_offset == 2
+
+        context.add_history({"content": 5}, max_history=3, trim=False)
+        assert [entry["content"] for entry in context.conversation_history] == [2, 3, 4, 5]
+
+    def test_sessions_shared_across_processes(self, tmp_path):
+        """测试两个存储实例（模拟两个工作进程）共享会话"""
+        first, second = self._make_store(tmp_path), self._make_store(tmp_path)
+        context = ConversationContext()
+        first.save("u1", context, context.to_dict())
+
+        loaded = second.get("u1", ConversationContext.from_dict)
+        assert loaded is not None and loaded.stage == ConversationStage.INIT
+
+        loaded.stage = ConversationStage.THEME_SETTING
+        second.save("u1", loaded, loaded.to_dict())
+        assert first.get("u1", ConversationContext.from_dict).stage == ConversationStage.THEME_SETTING
+        assert first.metrics["persistent_loads"] == 1
+
+        # 未被其他进程修改时直接使用进程内缓存
+        first.get("u1", ConversationContext.from_dict)
+        assert first.metrics["memory_hits"] == 1
+        first.close()
+        second.close()
+
+    def test_expired_sessions_removed(self, tmp_path):
+        """测试过期会话读取时删除"""
+        store = self._make_store(tmp_path, ttl=-1)
+        store.save("u1", ConversationContext(), {})
+        assert store.get("u1", ConversationContext.from_dict) is None
+        assert store.persistent.count() == 0
+        store.close()
+
+    def test_service_instances_share_store(self, tmp_path):
+        """测试每个请求新建的服务实例能找到之前开始的会话"""
+        store = self._make_store(tmp_path)
+        ConversationService(None, store=store).start_conversation("u1")
+        summary = ConversationService(None, store=store).get_conversation_summary("u1")
+        assert summary["current_stage"] == ConversationStage.THEME_SETTING.value
+        assert ConversationService(None, store=store).end_conversation("u1") is True
+        assert ConversationService(None, store=store).get_conversation_summary("u1") is None
+        store.close()
+
+
+class FakeSummaryManager:
+    """记录摘要请求的AI管理器，during_compress 模拟压缩期间到达的新一轮对话"""
+
+    def __init__(self, fail=False, during_compress=None):
+        self.prompts = []
+        self.fail = fail
+        self.during_compress = during_compress
+
+    async def generate_text(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        if self.during_compress:
+            self.during_compress()
+        if self.fail:
+            raise RuntimeError("AI服务不可用")
+        return f"摘要{len(self.prompts)}：用户想写修仙小说"
+
+
+class TestConversationSummarizer:
+    """对话滚动摘要测试类"""
+
+    def _setup(self, tmp_path, manager):
+        store = ConversationSessionStore(config={"path": str(tmp_path / "sessions.db"), "ttl": 60})
+        summarizer = ConversationSummarizer(
+            store, manager, config={"enabled": True, "trigger_tokens": 100, "keep_entries": 2, "summary_max_tokens": 50}
+        )
+        context = ConversationContext()
+        for i in range(8):
+            context.add_history({"type": "user_input", "content": f"第{i}轮：" + "修仙" * 20})
+        store.save("u1", context, context.to_dict())
+        return store, summarizer, context
+
+    def test_older_entries_compressed(self, tmp_path):
+        """测试较早的记录被压缩进摘要，只保留最近的原文"""
+        store, summarizer, context = self._setup(tmp_path, FakeSummaryManager())
+        assert asyncio.run(summarizer.summarize("u1")) is True
+
+        restored = ConversationSessionStore(config={"path": str(tmp_path / "sessions.db")}).get(
+            "u1", ConversationContext.from_dict
+        )
+        assert restored.summary == "摘要1：用户想写修仙小说"
+        assert restored.summarized_entries == 6
+        assert [entry["content"][:3] for entry in restored.conversation_history] == ["第6轮", "第7轮"]
+        assert not summarizer.needs_summary(restored)
+        store.close()
+
+    def test_turns_during_compression_keep_summary(self, tmp_path):
+        """测试压缩期间新增记录并截断到上限时，按记录序号对齐后仍保存摘要，未压缩的记录不丢失"""
+        holder = {}
+
+        def new_turn():
+            store = holder["store"]
+            context = store.get("u1", ConversationContext.from_dict)
+            for i in (8, 9):
+                context.add_history({"type": "user_input", "content": f"第{i}轮：" + "修仙" * 20}, max_history=8)
+            store.save("u1", context, context.to_dict())
+
+        store, summarizer, _ = self._setup(tmp_path, FakeSummaryManager(during_compress=new_turn))
+        holder["store"] = store
+        assert asyncio.run(summarizer.summarize("u1")) is True
+
+        context = store.get("u1", ConversationContext.from_dict)
+        assert context.summary == "摘要1：用户想写修仙小说"
+        assert context.summarized_entries == 6
+        assert context.history_offset == 6
+        assert [entry["content"][:3] for entry in context.conversation_history] == ["第6轮", "第7轮", "第8轮", "第9轮"]
+        store.close()
+
+    def test_summary_triggered_before_history_cap(self, tmp_path):
+        """测试记录较短、未达到token阈值时，记录条数接近上限同样触发压缩"""
+        store = ConversationSessionStore(config={"path": str(tmp_path / "sessions.db"), "ttl": 60})
+        summarizer = ConversationSummarizer(
+            store, FakeSummaryManager(), config={"enabled": True, "trigger_tokens": 10000, "keep_entries": 2, "max_history": 8}
+        )
+        context = ConversationContext()
+        for i in range(5):
+            context.add_history({"type": "user_input", "content": f"第{i}轮"}, max_history=8)
+        assert not summarizer.needs_summary(context)
+        context.add_history({"type": "user_input", "content": "第5轮"}, max_history=8)
+        assert summarizer.needs_summary(context)
+        store.close()
+
+    def test_fallback_summary_is_bounded(self, tmp_path):
+        """测试AI不可用时退回截断，摘要长度有上限"""
+        store, summarizer, _ = self._setup(tmp_path, FakeSummaryManager(fail=True))
+        asyncio.run(summarizer.summarize("u1"))
+        context = store.get("u1", ConversationContext.from_dict)
+        assert context.summary and estimate_tokens(context.summary) <= 50
+        store.close()
+
+    def test_schedule_runs_in_background(self, tmp_path):
+        """测试后台任务与同一会话的去重"""
+        manager = FakeSummaryManager()
+        store, summarizer, context = self._setup(tmp_path, manager)
+
+        async def run():
+            assert summarizer.schedule("u1", context) is True
+            assert summarizer.schedule("u1", context) is False
+            await summarizer.wait_idle()
+
+        asyncio.run(run())
+        assert len(manager.prompts) == 1
+        store.close()
@@ -0,0 +1,76 @@
+"""
+模型派生字段缓存测试
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from backend.app.core.database import Base
+from backend.app.models.timeline import Timeline, TimelineEventIndex
+from backend.app.models.relations import CharacterRelation
+
+
+class TestDerivedFields:
+    """派生字段测试类"""
+
+    def _make_timeline(self):
+        timeline = Timeline(name="主线", project_id=1)
+        timeline.add_event({"time": "1年", "name": "出山", "participants": [1], "importance": "high"})
+        timeline.add_event({"time": "1年", "name": "拜师", "participants": [1], "importance": "high"})
+        return timeline
+
+    def test_value_is_computed_once(self, monkeypatch):
+        """测试同一实例重复调用时复用缓存结果"""
+        timeline = self._make_timeline()
+        conflicts = timeline.detect_conflicts()
+        assert len(conflicts) == 2
+
+        def fail(self):
+            raise AssertionError("缓存未生效")
+
+        monkeypatch.setattr(TimelineEventIndex, "find_participant_conflicts", fail)
+        assert timeline.detect_conflicts() == conflicts
+        assert timeline.generate_timeline_visualization_data()["conflicts"] == conflicts
+
+    def test_result_is_shared_not_copied(self):
+        """测试可变结果直接返回缓存的对象，重复访问（如 to_dict 中的嵌套引用）不产生复制开销"""
+        timeline = self._make_timeline()
+        conflicts = timeline.detect_conflicts()
+        assert timeline.detect_conflicts() is conflicts
+        data = timeline.to_dict()
+        assert data["conflicts"] is conflicts
+        assert data["visualization_data"]["summary"] is data["summary"]
+
+    def test_in_place_mutation_invalidates(self):
+        """测试通过模型方法原地修改JSON列后缓存失效"""
+        timeline = self._make_timeline()
+        timeline.detect_conflicts()
+        timeline.add_event({"time": "1年", "name": "下山", "participants": [1], "importance": "high"})
+        assert len(timeline.detect_conflicts()) == 4
+
+    def test_attribute_set_invalidates(self):
+        """测试依赖列重新赋值时缓存失效"""
+        relation = CharacterRelation(
+            strength=0.5, trust_level=0.5, intimacy_level=0.5, conflict_level=0.0, relation_type="friend"
+        )
+        assert relation.calculate_relationship_score() == 54.0
+        relation.strength = 1.0
+        assert relation.calculate_relationship_score() == 84.0
+
+    def test_expire_invalidates(self):
+        """测试实例过期后按数据库中的新值重新计算"""
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine, tables=[CharacterRelation.__table__])
+        relation = CharacterRelation(
+            strength=1.0, trust_level=0.5, intimacy_level=0.5, conflict_level=0.0, relation_type="friend"
+        )
+        with Session(engine) as session:
+            session.add(relation)
+            session.commit()
+            assert relation.calculate_relationship_score() == 84.0
+            session.execute(text("UPDATE character_relations SET strength = 0"))
+            session.expire_all()
+            assert relation.calculate_relationship_score() == 24.0
@@ -0,0 +1,123 @@
+"""
+游标分页测试
+"""
+import sys
+import os
+import asyncio
+import pytest
+from sqlalchemy import select, text
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from backend.app.core.database import Base
+from backend.app.models.project import Project
+from backend.app.services.pagination import (
+    CountCache, InvalidCursor, chapter_order, decode_cursor, encode_cursor, paginate, recent_order
+)
+from backend.app.models.chapter import Chapter
+
+
+def run_with_session(tmp_path, scenario):
+    """在临时数据库上执行测试场景"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'pages.db'}")
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            async with session_factory() as session:
+                return await scenario(session)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+def live_projects():
+    return select(Project).where(Project.is_deleted == False)
+
+
+class TestCursor:
+    """游标编码测试类"""
+
+    def test_round_trip_and_signature(self):
+        """测试游标可还原，且不能用于其他排序方式"""
+        order = recent_order(Project)
+        cursor = encode_cursor(["2024-01-01 10:00:00", 7], order.signature)
+        assert decode_cursor(cursor, order.signature) == ["2024-01-01 10:00:00", 7]
+        with pytest.raises(InvalidCursor):
+            decode_cursor(cursor, chapter_order(Chapter).signature)
+        with pytest.raises(InvalidCursor):
+            decode_cursor("不是游标", order.signature)
+
+
+class TestPaginate:
+    """键集分页测试类"""
+
+    def test_pages_stable_under_inserts(self, tmp_path):
+        """测试翻页期间插入新记录时，既不重复也不遗漏原有记录"""
+
+        async def scenario(session):
+            # 服务端默认时间精度为秒，大量记录的 updated_at 相同，依靠 id 区分
+            session.add_all([Project(name=f"项目{i}", title=f"标题{i}") for i in range(25)])
+            await session.commit()
+            original = set((await session.execute(select(Project.id))).scalars())
+
+            seen, cursor, pages = [], None, 0
+            while True:
+                page = await paginate(session, live_projects(), recent_order(Project), 10, cursor=cursor)
+                seen.extend(project.id for project in page.items)
+                pages += 1
+                if pages == 1:
+                    session.add(Project(name="新项目", title="新标题"))
+                    await session.commit()
+                if not page.has_more:
+                    break
+                cursor = page.next_cursor
+            return original, seen, pages
+
+        original, seen, pages = run_with_session(tmp_path, scenario)
+        assert len(seen) == len(set(seen))
+        assert original <= set(seen)
+        assert pages == 3
+
+    def test_mixed_timestamp_formats(self, tmp_path):
+        """测试服务端默认值与Python写入的时间格式混合时仍按存储顺序翻页"""
+
+        async def scenario(session):
+            session.add_all([Project(name=f"项目{i}", title=f"标题{i}") for i in range(4)])
+            await session.commit()
+            await session.execute(text(
+                "UPDATE projects SET updated_at = '2024-01-01 10:00:00.000000' WHERE id % 2 = 0"
+            ))
+            await session.execute(text(
+                "UPDATE projects SET updated_at = '2024-01-01 10:00:00' WHERE id % 2 = 1"
+            ))
+            await session.commit()
+            seen, cursor = [], None
+            for _ in range(4):
+                page = await paginate(session, live_projects(), recent_order(Project), 1, cursor=cursor)
+                seen.extend(project.id for project in page.items)
+                cursor = page.next_cursor
+            return seen
+
+        assert run_with_session(tmp_path, scenario) == [4, 2, 3, 1]
+
+    def test_total_cached_and_invalidated(self, tmp_path):
+        """测试总数按需计算并缓存，本进程写入后失效"""
+        cache = CountCache(ttl=60)
+
+        async def scenario(session):
+            session.add_all([Project(name=f"项目{i}", title=f"标题{i}") for i in range(3)])
+            await session.commit()
+            first = await cache.count(session, live_projects())
+            await session.execute(text("INSERT INTO projects (name, title, is_deleted) VALUES ('外部', '外部', 0)"))
+            await session.commit()
+            cached = await cache.count(session, live_projects())
+            cache.invalidate(["projects"])
+            fresh = await cache.count(session, live_projects())
+            return first, cached, fresh
+
+        assert run_with_session(tmp_path, scenario) == (3, 3, 4)
@@ -0,0 +1,91 @@
+"""
+项目数据统计测试
+"""
+import sys
+import os
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.core.database import Base
+from backend.app.models.project import Project
+from backend.app.models.character import Character
+from backend.app.models.map_structure import MapStructure
+from backend.app.services.project_data_service import ProjectDataService
+
+
+@pytest.fixture
+def session(tmp_path):
+    """带SQL记录的临时数据库会话"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'counts.db'}")
+    Base.metadata.create_all(engine)
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db = sessionmaker(bind=engine)()
+    db.statements = statements
+    yield db
+    db.close()
+    engine.dispose()
+
+
+def _seed(session):
+    """两个项目的数据，其中一条已软删除"""
+    project = Project(name="项目", title="标题")
+    other = Project(name="其他", title="标题")
+    session.add_all([project, other])
+    session.flush()
+    session.add_all([
+        Character(project_id=project.id, name="甲"),
+        Character(project_id=project.id, name="乙"),
+        Character(project_id=project.id, name="丙", is_deleted=True),
+        Character(project_id=other.id, name="丁"),
+        MapStructure(project_id=project.id, name="九州"),
+    ])
+    session.commit()
+    return project
+
+
+class TestProjectCounts:
+    """项目数据统计测试类"""
+
+    def test_single_union_query(self, session):
+        """测试所有模型的数量由一条 UNION ALL 语句统计，排除已删除记录与其他项目"""
+        project_id = _seed(session).id
+        session.statements.clear()
+
+        counts = ProjectDataService(session).get_project_counts(project_id)
+        assert counts["character"] == 2
+        assert counts["map_structure"] == 1
+        assert counts["plot"] == 0
+        assert set(counts) == set(ProjectDataService(session).project_models)
+        queries = [statement for statement in session.statements if statement.startswith("SELECT")]
+        assert len(queries) == 1
+        assert "UNION ALL" in queries[0]
+
+    def test_selected_models(self, session):
+        """测试只统计指定的模型"""
+        project = _seed(session)
+        counts = ProjectDataService(session).get_project_counts(project.id, ["character", "plot"])
+        assert counts == {"character": 2, "plot": 0}
+
+    def test_fallback_keeps_pending_changes(self, session):
+        """测试合并查询失败时回滚到保存点后逐个统计，调用方尚未提交的修改保留"""
+        project = _seed(session)
+        session.execute(text("DROP TABLE map_structures"))
+        pending = Character(project_id=project.id, name="戊")
+        session.add(pending)
+        session.flush()
+
+        session.statements.clear()
+        counts = ProjectDataService(session).get_project_counts(project.id, ["character", "map_structure"])
+        assert counts == {"character": 3, "map_structure": 0}
+        # 合并查询的失败只回滚到保存点
+        assert any(statement.startswith("ROLLBACK TO SAVEPOINT") for statement in session.statements)
+
+        session.commit()
+        assert session.query(Character).filter(Character.name == "戊").count() == 1
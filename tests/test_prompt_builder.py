@@ -0,0 +1,73 @@
+"""
+提示词token预算测试
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.prompt_builder import (
+    PromptBuilder, estimate_tokens, get_context_limit, truncate_to_tokens
+)
+
+
+class TestTokenEstimation:
+    """token估算测试类"""
+
+    def test_provider_ratios(self):
+        """测试按提供商的中文比例估算"""
+        text = "李寻欢" * 10
+        assert estimate_tokens(text, "claude") == 36
+        assert estimate_tokens(text, "zhipu") == 21
+        assert estimate_tokens("abcd" * 10, "ollama") == 12
+        assert estimate_tokens("", "claude") == 0
+
+    def test_context_limit_prefix_match(self):
+        """测试按模型名称最长前缀匹配上下文窗口"""
+        assert get_context_limit("openai", "gpt-4") == 8192
+        assert get_context_limit("openai", "gpt-4-turbo-preview") == 128000
+        assert get_context_limit("ollama", "mollysama/rwkv-7-g1:0.4B") == 4096
+
+    def test_truncate_keeps_tail(self):
+        """测试保留结尾的截断"""
+        text = "".join(str(i % 10) for i in range(400))
+        result = truncate_to_tokens(text, 50, "ollama", keep="tail")
+        assert result.endswith(text[-20:])
+        assert result.startswith("（以上内容已省略）")
+        assert estimate_tokens(result, "ollama") <= 50
+
+
+class TestPromptBuilder:
+    """提示词组装测试类"""
+
+    def test_no_trimming_within_budget(self):
+        """测试预算充足时原样拼接"""
+        builder = PromptBuilder("ollama", context_limit=4096, max_output_tokens=100, separator="|")
+        prompt, usage = builder.add("a", "说明", required=True).add("b", "正文").build()
+        assert prompt == "说明|正文"
+        assert usage["trimmed"] == []
+        assert usage["prompt_tokens"] == estimate_tokens(prompt, "ollama")
+
+    def test_lowest_priority_trimmed_first(self):
+        """测试超出预算时先裁剪低优先级段落"""
+        builder = PromptBuilder("ollama", context_limit=400, max_output_tokens=100)
+        builder.safety_margin = 0
+        builder.add("instruction", "请续写", required=True)
+        builder.add("context", "资料" * 200, priority=0, min_tokens=50)
+        builder.add("prompt", "前文" * 100, priority=1, keep="tail")
+        prompt, usage = builder.build()
+
+        assert usage["prompt_tokens"] <= builder.input_budget
+        assert [item["section"] for item in usage["trimmed"]] == ["context"]
+        assert prompt.endswith("前文" * 100)
+
+    def test_old_messages_removed_first(self):
+        """测试聊天时先移除最早的历史消息，保留系统消息与最新消息"""
+        messages = [{"role": "system", "content": "你是写作助手"}]
+        messages += [{"role": "user", "content": f"第{i}轮" + "内容" * 100} for i in range(5)]
+        builder = PromptBuilder("ollama", context_limit=600, max_output_tokens=100)
+        kept, usage = builder.build_messages(messages)
+
+        assert kept[0]["content"] == "你是写作助手"
+        assert kept[-1] == messages[-1]
+        assert usage["messages"]["kept"] < len(messages)
+        assert usage["trimmed"][0]["section"] == "1"
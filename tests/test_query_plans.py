@@ -0,0 +1,104 @@
+"""
+项目范围查询的执行计划测试
+对热点端点实际发出的SELECT语句执行 EXPLAIN QUERY PLAN，出现全表扫描即失败
+"""
+import sys
+import os
+import asyncio
+import pytest
+from sqlalchemy import event
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+# 应用导入时即打开日志文件，日志目录需事先存在
+os.makedirs(os.path.dirname(os.path.abspath("./logs/app.log")), exist_ok=True)
+
+from backend.app.main import app
+from backend.app.core.database import Base, get_async_db
+import backend.app.models  # noqa: F401  注册全部模型
+
+HOT_ENDPOINTS = [
+    "/api/projects/",
+    "/api/relations/character-relations?project_id=1&relation_type=friend",
+    "/api/relations/faction-relations?project_id=1&relation_type=alliance",
+    "/api/relations/network-analysis?project_id=1",
+    "/api/civilian-systems/?project_id=1&dimension_id=2",
+    "/api/civilian-systems/?project_id=1&fields=name,updated_at",
+    "/api/judicial-systems/?project_id=1&dimension_id=2",
+    "/api/profession-systems/?project_id=1&dimension_id=2",
+    "/api/secret-realm-distributions/?project_id=1&realm_type=ruins",
+    "/api/project-data/projects/1/statistics",
+]
+
+
+def full_scans(plan_rows):
+    """返回执行计划中未使用索引的表扫描"""
+    scans = []
+    for row in plan_rows:
+        detail = row[-1]
+        if detail.startswith("SCAN") and "INDEX" not in detail and "CONSTANT ROW" not in detail:
+            scans.append(detail)
+    return scans
+
+
+@pytest.fixture
+def captured_statements(tmp_path):
+    """在临时数据库上运行端点，收集发出的SELECT语句及参数"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'plans.db'}")
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def override_db():
+        async with session_factory() as session:
+            yield session
+
+    asyncio.run(create_tables())
+    statements.clear()
+    app.dependency_overrides[get_async_db] = override_db
+    try:
+        yield engine, statements
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+        asyncio.run(engine.dispose())
+
+
+class TestQueryPlans:
+    """查询计划测试类"""
+
+    def test_full_scan_detection(self):
+        """测试全表扫描判定"""
+        assert full_scans([(2, 0, 0, "SCAN chapters")]) == ["SCAN chapters"]
+        assert not full_scans([(2, 0, 0, "SEARCH chapters USING INDEX ix_chapters_live_chapter_number (project_id=?)")])
+        assert not full_scans([(3, 0, 0, "SCAN characters USING COVERING INDEX ix_characters_project_id_is_deleted")])
+
+    def test_hot_endpoints_use_indexes(self, captured_statements):
+        """测试热点端点的查询均命中索引"""
+        engine, statements = captured_statements
+        client = TestClient(app, base_url="http://localhost")
+        for url in HOT_ENDPOINTS:
+            response = client.get(url)
+            assert response.status_code == 200, f"{url}: {response.text}"
+        assert statements
+
+        async def explain():
+            plans = {}
+            async with engine.connect() as conn:
+                for statement, parameters in statements:
+                    result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                    plans[statement] = result.fetchall()
+            return plans
+
+        plans = asyncio.run(explain())
+        offending = {statement: full_scans(rows) for statement, rows in plans.items() if full_scans(rows)}
+        assert not offending, offending
@@ -0,0 +1,104 @@
+"""
+项目数据全文检索测试
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend.app.core.database import Base
+from backend.app.models.character import Character
+from backend.app.models.faction import Faction
+from backend.app.services.project_data_service import PROJECT_MODELS
+from backend.app.services.search_index import (
+    build_match_query, make_snippet, tokenize_text, project_search_index
+)
+
+
+class TestTokenizer:
+    """中文切分测试类"""
+
+    def test_cjk_unigram_and_bigram(self):
+        """测试中文输出单字与相邻双字"""
+        assert tokenize_text("太极拳 Tai Chi") == "太 极 拳 太极 极拳 tai chi"
+
+    def test_match_query_uses_bigrams(self):
+        """测试查询按双字切分"""
+        assert build_match_query("张三丰") == '"张三" AND "三丰"'
+        assert build_match_query("剑") == '"剑"'
+        assert build_match_query("!!") is None
+
+    def test_snippet_marks_hit(self):
+        """测试摘要片段标记命中位置"""
+        assert make_snippet("武当派以太极闻名", "太极", width=2) == "...派以<mark>太极</mark>闻名"
+
+
+class TestProjectSearchIndex:
+    """全文索引测试类"""
+
+    def setup_method(self):
+        """创建内存数据库"""
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine, tables=[model.__table__ for model in PROJECT_MODELS.values()])
+        self.session = Session(self.engine)
+
+    def teardown_method(self):
+        self.session.close()
+        self.engine.dispose()
+
+    def _search(self, query, **kwargs):
+        return project_search_index.search(self.session, 1, query, **kwargs)
+
+    def test_ranked_results_scoped_to_project(self):
+        """测试检索结果限定在项目内"""
+        self.session.add_all([
+            Character(project_id=1, name="张三丰", background="武当派创始人，精通太极拳"),
+            Character(project_id=2, name="张无忌", background="也会太极拳"),
+            Faction(project_id=1, name="武当派", description="以太极闻名")
+        ])
+        self.session.commit()
+
+        hits = self._search("太极")
+        assert {(hit["model_name"], hit["title"]) for hit in hits} == {("character", "张三丰"), ("faction", "武当派")}
+        assert [hit["title"] for hit in self._search("太极", model_names=["faction"])] == ["武当派"]
+
+    def test_incremental_update_and_delete(self):
+        """测试增删改通过会话事件同步到索引"""
+        character = Character(project_id=1, name="张三丰", background="精通太极拳")
+        self.session.add(character)
+        self.session.commit()
+        assert len(self._search("太极")) == 1
+
+        character.background = "少林寺出身"
+        self.session.commit()
+        assert self._search("太极") == []
+        assert len(self._search("少林")) == 1
+
+        character.is_deleted = True
+        self.session.commit()
+        assert self._search("少林") == []
+
+    def test_index_built_for_existing_rows(self):
+        """测试首次检索时为已有数据建立索引"""
+        self.session.add(Character(project_id=1, name="李寻欢", background="小李飞刀"))
+        self.session.commit()
+        project_search_index.invalidate_project(self.session, 1)
+        self.session.commit()
+        assert [hit["title"] for hit in self._search("飞刀")] == ["李寻欢"]
+
+    def test_rebuild_does_not_commit_caller_session(self):
+        """测试首次检索建立索引时不提交调用方会话中的修改，回滚后索引状态一并回滚"""
+        self.session.add(Character(project_id=1, name="李寻欢", background="小李飞刀"))
+        self.session.commit()
+        project_search_index.invalidate_project(self.session, 1)
+        self.session.commit()
+
+        self.session.add(Character(project_id=1, name="阿飞", background="飞剑快如闪电"))
+        assert {hit["title"] for hit in self._search("飞")} == {"李寻欢", "阿飞"}
+        self.session.rollback()
+
+        assert self.session.query(Character).count() == 1
+        assert not project_search_index.is_project_indexed(self.session, 1)
+        assert [hit["title"] for hit in self._search("飞刀")] == ["李寻欢"]
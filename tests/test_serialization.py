@@ -0,0 +1,78 @@
+"""
+序列化测试
+"""
+import sys
+import os
+import enum
+import json
+from datetime import datetime
+from decimal import Decimal
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend.app.core.database import Base
+from backend.app.core.serialization import FastJSONResponse, build_row_encoder
+from backend.app.models.map_structure import MapStructure
+from backend.app.models.project import Project, ProjectStatus
+
+
+def column_dict(row):
+    """逐列转换的参照实现"""
+    result = {}
+    for column in row.__table__.columns:
+        value = getattr(row, column.name)
+        result[column.name] = value.isoformat() if isinstance(value, datetime) else value
+    return result
+
+
+class TestRowEncoder:
+    """行编码器测试类"""
+
+    def test_matches_column_walk(self):
+        """测试已加载、部分过期与新建的行编码结果均与逐列转换一致"""
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add(MapStructure(project_id=1, name="九州", description="描述"))
+            session.commit()
+            row = session.query(MapStructure).first()
+            assert MapStructure.__row_encoder__(row) == column_dict(row)
+            assert isinstance(MapStructure.__row_encoder__(row)["created_at"], str)
+
+            session.expire(row, ["description"])
+            assert MapStructure.__row_encoder__(row)["description"] == "描述"
+
+        pending = Project(name="项目", status=ProjectStatus.WRITING)
+        assert Project.__row_encoder__(pending) == column_dict(pending)
+        engine.dispose()
+
+    def test_single_column_table(self):
+        """测试只有一列的表"""
+        from sqlalchemy import Column, Integer, MetaData, Table
+
+        table = Table("single", MetaData(), Column("id", Integer, primary_key=True))
+
+        class Row:
+            id = 5
+
+        assert build_row_encoder(table)(Row()) == {"id": 5}
+
+
+class TestFastJSONResponse:
+    """JSON响应测试类"""
+
+    def test_render(self):
+        """测试枚举、时间、非字符串键与 orjson 不支持的类型"""
+
+        class Color(enum.Enum):
+            RED = "red"
+
+        body = FastJSONResponse({
+            "color": Color.RED,
+            "time": datetime(2024, 1, 1, 10, 0),
+            "amount": Decimal("1.5"),
+            1: "一",
+        }).body
+        assert json.loads(body) == {"color": "red", "time": "2024-01-01T10:00:00", "amount": 1.5, "1": "一"}
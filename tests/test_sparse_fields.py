@@ -0,0 +1,139 @@
+"""
+列表字段选择测试
+"""
+import sys
+import os
+import asyncio
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+# 应用导入时即打开日志文件，日志目录需事先存在
+os.makedirs(os.path.dirname(os.path.abspath("./logs/app.log")), exist_ok=True)
+
+from backend.app.main import app
+from backend.app.core.database import Base, get_async_db
+from backend.app.models.project import Project
+from backend.app.models.map_structure import MapStructure
+from backend.app.services.project_data_service import ProjectDataService
+from backend.app.services.sparse_fields import InvalidFields, parse_fields
+
+
+@pytest.fixture
+def session(tmp_path):
+    """带SQL记录的临时数据库会话"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'fields.db'}")
+    Base.metadata.create_all(engine)
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db = sessionmaker(bind=engine)()
+    db.statements = statements
+    yield db
+    db.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def client(tmp_path):
+    """使用临时数据库的测试客户端"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'api.db'}")
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def override_db():
+        async with session_factory() as session:
+            yield session
+
+    asyncio.run(create_tables())
+    app.dependency_overrides[get_async_db] = override_db
+    try:
+        yield TestClient(app, base_url="http://localhost")
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+        asyncio.run(engine.dispose())
+
+
+class TestParseFields:
+    """字段参数解析测试类"""
+
+    def test_parse(self):
+        """测试去重、始终包含id，未指定时返回完整记录"""
+        assert parse_fields(None, Project) is None
+        assert parse_fields("", Project) is None
+        assert parse_fields("name, title,name", Project) == ["id", "name", "title"]
+        with pytest.raises(InvalidFields):
+            parse_fields("name,secret", Project)
+
+
+class TestProjectDataFields:
+    """项目数据字段选择测试类"""
+
+    def test_only_selected_columns_read(self, session):
+        """测试只读取并返回选择的列，大字段不出现在查询中"""
+        project = Project(name="项目", title="标题")
+        session.add(project)
+        session.flush()
+        session.add(MapStructure(project_id=project.id, name="九州", description="很长的描述" * 100))
+        session.commit()
+        session.statements.clear()
+
+        service = ProjectDataService(session)
+        data = service.get_project_model_data(project.id, "map_structure", "name,updated_at")
+        assert list(data[0]) == ["id", "name", "updated_at"]
+        assert data[0]["name"] == "九州"
+        query = next(sql for sql in session.statements if "FROM map_structures" in sql)
+        assert "description" not in query
+
+        full = service.get_project_model_data(project.id, "map_structure")
+        assert "description" in full[0]
+
+    def test_unknown_field_rejected(self, session):
+        """测试未知字段报错（端点返回400），而不是静默返回空列表"""
+        service = ProjectDataService(session)
+        with pytest.raises(ValueError):
+            service.get_project_model_data(1, "map_structure", "name,not_a_column")
+
+    def test_fields_across_models(self, session):
+        """测试整个项目的数据按各模型自身存在的列选择"""
+        project = Project(name="项目", title="标题")
+        session.add(project)
+        session.flush()
+        session.add(MapStructure(project_id=project.id, name="九州"))
+        session.commit()
+
+        data = ProjectDataService(session).get_project_data(project.id, "name,relation_type")
+        assert "outline" in data["project"]  # 项目本身返回完整信息
+        assert data["data"]["map_structure"] == [{"id": 1, "name": "九州"}]
+        with pytest.raises(InvalidFields):
+            ProjectDataService(session).get_project_data(project.id, "bogus")
+
+
+class TestListResponse:
+    """列表端点响应测试类"""
+
+    def test_full_list_filtered_by_response_model(self, client):
+        """测试完整列表与详情一样只返回响应模型声明的字段，内部字段不泄露"""
+        created = client.post("/api/civilian-systems/", json={"name": "凡人", "project_id": 1})
+        assert created.status_code == 200, created.text
+        detail = client.get(f"/api/civilian-systems/{created.json()['id']}").json()
+
+        response = client.get("/api/civilian-systems/?project_id=1&include_total=true")
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == "1"
+        assert response.json() == [detail]
+        for internal in ("is_deleted", "version", "parent_version_id", "version_note"):
+            assert internal not in response.json()[0]
+
+        sparse = client.get("/api/civilian-systems/?project_id=1&fields=name").json()
+        assert sparse == [{"id": detail["id"], "name": "凡人"}]
@@ -0,0 +1,141 @@
+"""
+结构化输出测试
+"""
+import sys
+import os
+import asyncio
+import httpx
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.ai_service import AIServiceBase
+from backend.app.services.conversation_analysis import EntityExtraction, IntentSentiment
+from backend.app.services.structured_output import (
+    JSONRepairParser, StructuredOutputError, generate_with_retries, parse_structured, repair_json
+)
+
+
+class FakeStructuredService(AIServiceBase):
+    """记录调用情况的AI服务"""
+
+    def __init__(self, mode="prompt", chunks=None, native_error=None, error_detail=""):
+        super().__init__({})
+        self.structured_mode = mode
+        self.chunks = chunks or []
+        self.native_error = native_error
+        self.error_detail = error_detail
+        self.consumed = 0
+        self.closed = False
+        self.native_calls = []
+
+    async def generate_text(self, prompt, **kwargs):
+        return "".join(self.chunks)
+
+    async def chat_completion(self, messages, **kwargs):
+        self.native_calls.append(kwargs)
+        if self.native_error:
+            request = httpx.Request("POST", "http://test/chat/completions")
+            response = httpx.Response(self.native_error, request=request, json={"error": {"message": self.error_detail}})
+            raise httpx.HTTPStatusError("bad request", request=request, response=response)
+        return '{"user_intent": "confirm", "sentiment": "positive", "confidence": 1}'
+
+    async def check_connection(self):
+        return True
+
+    async def stream_generate(self, prompt, **kwargs):
+        try:
+            for chunk in self.chunks:
+                self.consumed += 1
+                yield chunk
+        finally:
+            self.closed = True
+
+
+class TestJSONRepair:
+    """JSON修复解析测试类"""
+
+    def test_wrapped_output(self):
+        """测试容忍说明文字、代码块标记与结尾逗号"""
+        text = '分析结果如下：\n```json\n{"entities": ["青云宗", "林凡",],}\n```\n以上。'
+        assert repair_json(text) == {"entities": ["青云宗", "林凡"]}
+
+    def test_truncated_output(self):
+        """测试截断的输出补全括号，残缺的元素回退到最近的完整元素"""
+        assert repair_json('{"entities": [{"name": "林凡", "description": "少年') == {
+            "entities": [{"name": "林凡", "description": "少年"}]
+        }
+        assert repair_json('{"a": 1, "b": [1, 2], "c') == {"a": 1, "b": [1, 2]}
+        with pytest.raises(StructuredOutputError):
+            repair_json("无法分析")
+
+    def test_incremental_feed(self):
+        """测试逐块输入时在根值闭合后停止，字符串中的换行被转义"""
+        parser = JSONRepairParser(roots="{")
+        assert parser.feed('好的 {"note": "第一行\n') is False
+        assert parser.feed('第二行"} 多余的文字 {') is True
+        assert parser.result() == {"note": "第一行\n第二行"}
+
+    def test_schema_validation(self):
+        """测试按模型校验，去掉思维链后解析"""
+        result = parse_structured(
+            '<think>先想想 {草稿}</think>{"user_intent": "PROVIDE_INFO", "sentiment": "excited"}', IntentSentiment
+        )
+        assert result.user_intent == "provide_info" and result.sentiment == "neutral"
+        with pytest.raises(StructuredOutputError):
+            parse_structured('{"confidence": 3}', IntentSentiment)
+
+
+class TestStructuredGeneration:
+    """结构化生成测试类"""
+
+    def test_retries_are_bounded(self):
+        """测试输出无效时附上错误原因重试，超过次数后抛出"""
+        prompts = []
+
+        async def call(prompt):
+            prompts.append(prompt)
+            return "抱歉" if len(prompts) == 1 else '{"entities": ["林凡"]}'
+
+        result = asyncio.run(generate_with_retries(call, "提取实体", EntityExtraction, max_retries=1))
+        assert result.entities[0].name == "林凡"
+        assert "未通过格式校验" in prompts[1]
+
+        async def always_invalid(prompt):
+            prompts.append(prompt)
+            return "抱歉"
+
+        prompts.clear()
+        with pytest.raises(StructuredOutputError):
+            asyncio.run(generate_with_retries(always_invalid, "提取实体", EntityExtraction, max_retries=2))
+        assert len(prompts) == 3
+
+    def test_prompt_mode_stops_stream_early(self):
+        """测试提示词约束模式在JSON闭合后立即停止读取流"""
+        service = FakeStructuredService(chunks=[
+            "<think>{草稿}</think>结果：", '{"entities": [{"name": "林', '凡"}]}', "以上是", "全部结果"
+        ])
+        result = asyncio.run(service.generate_structured("提取实体", EntityExtraction))
+        assert result.entities[0].name == "林凡"
+        assert service.consumed == 3 and service.closed
+
+    def test_native_json_mode(self):
+        """测试原生JSON模式，服务端拒绝时退回提示词约束"""
+        service = FakeStructuredService(mode="json_object")
+        result = asyncio.run(service.generate_structured("判断意图", IntentSentiment))
+        assert result.user_intent == "confirm"
+        assert service.native_calls[0]["response_format"] == {"type": "json_object"}
+
+        service = FakeStructuredService(mode="json_object", native_error=400, chunks=['{"user_intent": "modify"}'],
+                                        error_detail="Invalid parameter: 'response_format' is not supported")
+        result = asyncio.run(service.generate_structured("判断意图", IntentSentiment))
+        assert result.user_intent == "modify"
+        assert service.structured_mode == "prompt"
+
+    def test_unrelated_error_keeps_native_mode(self):
+        """测试上下文过长、模型不存在等与结构化参数无关的错误只让本次请求退回提示词约束"""
+        for status, detail in ((400, "maximum context length is 8192 tokens"), (404, "model not found")):
+            service = FakeStructuredService(mode="json_object", native_error=status, error_detail=detail,
+                                            chunks=['{"user_intent": "modify"}'])
+            result = asyncio.run(service.generate_structured("判断意图", IntentSentiment))
+            assert result.user_intent == "modify"
+            assert service.structured_mode == "json_object"
@@ -0,0 +1,49 @@
+"""
+增量思维链解析器测试
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services.ai_service import ThinkingChainParser, process_thinking_chain
+
+
+class TestThinkingChainParser:
+    """思维链流式解析测试类"""
+
+    def _feed_all(self, chunks):
+        parser = ThinkingChainParser()
+        events = []
+        for chunk in chunks:
+            events.extend(parser.feed(chunk))
+        events.extend(parser.flush())
+        return parser, events
+
+    def test_tags_split_across_chunks(self):
+        """测试标签被拆分在多个数据块中"""
+        parser, events = self._feed_all(["<thi", "nk>推理", "过程</th", "ink>正文", "内容"])
+        thinking = "".join(text for kind, text in events if kind == "thinking")
+        content = "".join(text for kind, text in events if kind == "content")
+        assert thinking == "推理过程"
+        assert content == "正文内容"
+        assert parser.result() == ("正文内容", "推理过程")
+
+    def test_content_is_emitted_before_stream_ends(self):
+        """测试正文在流结束前即可输出"""
+        parser = ThinkingChainParser()
+        assert parser.feed("第一段") == [("content", "第一段")]
+        assert parser.feed("<") == []
+        assert parser.feed("b>") == [("content", "<b>")]
+
+    def test_matches_batch_processing(self):
+        """测试与一次性处理结果一致"""
+        text = "<think>分析需求</think>\n\n## 标题\n正文<THINK>补充</THINK>结尾"
+        parser, _ = self._feed_all([text[i:i + 3] for i in range(0, len(text), 3)])
+        content, thinking = process_thinking_chain(text)
+        assert content == "## 标题\n正文结尾"
+        assert thinking == "分析需求\n\n补充"
+        assert parser.result() == (content, thinking)
+
+    def test_text_without_thinking(self):
+        """测试不包含思维链的文本"""
+        assert process_thinking_chain("  普通回答  ") == ("普通回答", None)
@@ -0,0 +1,138 @@
+"""
+时间线事件索引与冲突检测测试
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from backend.app.core.database import Base
+from backend.app.models.project import Project
+from backend.app.models.timeline import Timeline
+from backend.app.models.fictional_calendar import FictionalCalendar, default_calendar, parse_time_expression
+from backend.app.services.project_data_service import ProjectDataService
+
+
+class TestTimelineConflicts:
+    """时间线冲突检测测试类"""
+
+    def _character_conflicts(self, timeline):
+        return [
+            (c["events"], c["characters"])
+            for c in timeline.detect_conflicts()
+            if c["type"] == "character_conflict"
+        ]
+
+    def test_participant_overlap_within_window(self):
+        """测试相近时间且参与者重叠的事件被识别"""
+        timeline = Timeline(name="主线")
+        timeline.add_event({"time": "10", "name": "比武", "participants": [1, 2]})
+        timeline.add_event({"time": "10.05", "name": "夜袭", "participants": [2, 3]})
+        timeline.add_event({"time": "10.2", "name": "闭关", "participants": [2]})
+        assert self._character_conflicts(timeline) == [(["比武", "夜袭"], [2])]
+
+    def test_incremental_update_and_remove(self):
+        """测试增量更新与删除事件后冲突结果同步"""
+        timeline = Timeline(name="主线")
+        timeline.add_event({"time": "10", "name": "比武", "participants": [1], "id": 1})
+        timeline.add_event({"time": "20", "name": "夜袭", "participants": [1], "id": 2})
+        assert self._character_conflicts(timeline) == []
+
+        timeline.update_event(2, {"time": "10"})
+        assert self._character_conflicts(timeline) == [(["比武", "夜袭"], [1])]
+
+        timeline.remove_event(1)
+        assert self._character_conflicts(timeline) == []
+
+    def test_large_timeline(self):
+        """测试大规模时间线只产生窗口内的冲突"""
+        timeline = Timeline(name="编年史")
+        timeline.events = [
+            {"time": str(i), "name": f"事件{i}", "participants": [i % 7]}
+            for i in range(10000)
+        ]
+        assert self._character_conflicts(timeline) == []
+        timeline.add_event({"time": "5000", "name": "重逢", "participants": [5000 % 7]})
+        assert len(self._character_conflicts(timeline)) == 1
+
+
+class TestFictionalCalendar:
+    """架空历法时间解析测试类"""
+
+    def test_absolute_expressions(self):
+        """测试年月日与中文数字"""
+        calendar = FictionalCalendar()
+        assert calendar.sort_key("100年") == 100
+        assert calendar.sort_key("三百二十年") == 320
+        assert calendar.sort_key("100年3月") < calendar.sort_key("100年3月初五") < calendar.sort_key("100年4月")
+        assert calendar.sort_key("公元前200年") == -200
+        assert calendar.sort_key("无法识别的时间") == 0
+
+    def test_era_and_relative_expressions(self):
+        """测试纪元偏移与相对时间"""
+        calendar = FictionalCalendar({"太初": 3000})
+        assert calendar.sort_key("太初五年") == 3005
+        assert calendar.sort_key("3年后", base=10) == 13
+        assert parse_time_expression("五个月前").relative is True
+
+    def test_time_range_query(self):
+        """测试按时间范围查询事件"""
+        timeline = Timeline(name="编年史", start_time="100年")
+        for i, time_str in enumerate(["99年", "100年2月", "3年后", "二百年"]):
+            timeline.add_event({"time": time_str, "name": f"事件{i}"})
+        names = [event["name"] for event in timeline.get_events_by_time_range("100年", "150年")]
+        assert names == ["事件1", "事件2"]
+        assert all("time_key" not in event for event in timeline.events)
+
+    def test_keys_follow_edits(self):
+        """测试客户端修改事件时间或开始时间后，排序键随之重新计算"""
+        timeline = Timeline(name="编年史", start_time="100年", time_unit="年")
+        timeline.add_event({"time": "100年", "name": "a", "id": 1})
+        timeline.add_event({"time": "3年后", "name": "b", "id": 2})
+
+        # 客户端回传整个事件列表，b 改到500年并带着旧版本写入的排序键
+        events = [dict(event) for event in timeline.events]
+        events[1].update({"time": "500年", "time_key": 103})
+        timeline.events = events
+        names = [event["name"] for event in timeline.get_events_by_time_range("400年", "600年")]
+        assert names == ["b"]
+        assert "time_key" not in timeline.to_dict()["events"][1]
+
+        timeline.update_event(2, {"time": "3年后"})
+        assert timeline.get_timeline_summary()["time_span"] == "3.0年"
+        timeline.start_time = "200年"
+        assert [event["name"] for event in timeline.get_events_by_time_range("200年", "250年")] == ["b"]
+        assert timeline.get_timeline_summary()["time_span"] == "103.0年"
+
+    def test_calendar_from_project_settings(self):
+        """测试时间线按项目设置中的纪元偏移解析年份"""
+        assert FictionalCalendar.from_settings(None) is default_calendar
+        config = {"era_offsets": {"天元": 0, "太初": 3000}}
+        calendar = FictionalCalendar.from_settings(config)
+        assert calendar is FictionalCalendar.from_settings(dict(config))
+
+        timeline = Timeline(name="编年史")
+        timeline.add_event({"time": "太初三年", "name": "开国", "id": 1})
+        timeline.add_event({"time": "天元三年", "name": "立宗", "id": 2})
+        assert timeline.get_events_by_time_range("2999", "3001") == []
+        timeline.use_calendar(calendar)
+        assert [event["name"] for event in timeline.get_events_by_time_range("太初元年", "太初五年")] == ["开国"]
+
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            project = Project(name="项目", title="标题")
+            project.set_setting("calendar", config)
+            session.add(project)
+            session.flush()
+            session.add(Timeline(project_id=project.id, name="编年史", events=[
+                {"time": "天元三年", "name": "立宗", "participants": []},
+                {"time": "太初三年", "name": "开国", "participants": []},
+            ]))
+            session.commit()
+
+            data = ProjectDataService(session).get_project_model_data(project.id, "timeline")
+            assert data[0]["summary"]["time_span"] == "3000.0year"
+        engine.dispose()